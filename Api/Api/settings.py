@@ -93,6 +93,71 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache Django partagé (Redis) : OBLIGATOIRE en production. Les workers web,
+# Daphne et les commandes de fond (outbox, dispatch) y lisent les compteurs de
+# version des instantanés (tarifs, configurations, catalogues) : un cache local
+# au processus (LocMem, par défaut) ne propagerait pas les invalidations.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/2',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'socket_connect_timeout': 0.5,
+            'socket_timeout': 0.5,
+        },
+    },
+}
+
+# Positions GPS en temps réel des chauffeurs (voir order/location_store.py)
+DRIVER_LOCATION_STORE = {
+    'BACKEND': 'order.location_store.RedisLocationStore',
+    'OPTIONS': {
+        'url': 'redis://127.0.0.1:6379/1',
+        # Délais (secondes) de connexion et de lecture : un Redis injoignable ne bloque pas les requêtes
+        'socket_connect_timeout': 0.5,
+        'socket_timeout': 0.5,
+    },
+}
+
+# Intervalle (secondes) entre deux écritures groupées des positions chauffeurs dans PostgreSQL
+DRIVER_LOCATION_SYNC_INTERVAL = 15
+# Nombre de chauffeurs en attente au-delà duquel le tampon est vidé sans attendre l'intervalle
+DRIVER_LOCATION_BUFFER_MAX_SIZE = 5000
+
+# Points GPS de course (TripTracking) : nombre maximal de points par envoi groupé du chauffeur
+TRIP_TRACKING_MAX_POINTS = 500
+
+# Filtrage du bruit GPS pour la distance cumulée des courses (TripDistance)
+TRIP_DISTANCE_MAX_ACCURACY_M = 50  # points moins précis ignorés
+TRIP_DISTANCE_MIN_SEGMENT_M = 10  # déplacements plus courts ignorés (bruit à l'arrêt)
+TRIP_DISTANCE_MAX_SPEED_KMH = 200  # sauts GPS ignorés
+# Écart (km) entre parcouru + restant et la distance estimée, accumulé depuis le dernier retour
+# sur l'itinéraire, au-delà duquel une déviation est signalée
+ROUTE_DEVIATION_THRESHOLD_KM = 2.0
+
+# Registre des GeneralConfig (core.config_registry) : durée de vie des valeurs en mémoire
+# et fréquence de vérification de la version dans le cache (secondes)
+GENERAL_CONFIG_CACHE_TTL = 60
+GENERAL_CONFIG_CHECK_INTERVAL = 5
+
+# Instantané tarifaire (order.pricing_snapshot) : fréquence de vérification de la version
+# dans le cache (secondes) et âge maximal avant rechargement forcé
+PRICING_SNAPSHOT_CHECK_INTERVAL = 5
+PRICING_SNAPSHOT_MAX_AGE = 300
+
+# Devis multi-types (customer/quote-prices/) : durée en cache (secondes) et arrondi des coordonnées
+PRICE_QUOTE_CACHE_TTL = 60
+PRICE_QUOTE_COORDINATE_PRECISION = 3  # ~110 m
+
+# Recherche de villes / zones VIP (order.catalog_search) : fréquence de vérification de la
+# version dans le cache (secondes) et âge maximal avant rechargement forcé
+CATALOG_SEARCH_CHECK_INTERVAL = 5
+CATALOG_SEARCH_MAX_AGE = 300
+
+# Index des contours de villes / zones VIP (core.zone_index) : taille d'une cellule en degrés
+ZONE_INDEX_CELL_SIZE_DEG = 0.05  # ~5.5 km
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -377,4 +442,62 @@ MIGRATION_MODULES = {
 
 # Firebase Cloud Messaging Configuration
 import os
-FCM_SERVICE_ACCOUNT_PATH = os.path.join(BASE_DIR, 'api', 'secret', 'woila-4be6b-firebase-adminsdk-fbsvc-14075b647a.json')
\ No newline at end of file
+FCM_SERVICE_ACCOUNT_PATH = os.path.join(BASE_DIR, 'api', 'secret', 'woila-4be6b-firebase-adminsdk-fbsvc-14075b647a.json')
+
+# Transport FCM (notifications.services.fcm_transport) : URL de l'API (serveur local en test),
+# envois simultanés (= connexions keep-alive gardées ouvertes) et délais en secondes
+FCM_API_BASE_URL = 'https://fcm.googleapis.com'
+FCM_MAX_CONCURRENCY = 10
+FCM_CONNECT_TIMEOUT = 3
+FCM_READ_TIMEOUT = 10
+
+# Jeton OAuth2 Firebase (notifications.services.fcm_auth) : URL d'échange (serveur local en test)
+# et renouvellement anticipé, en secondes avant l'expiration annoncée par Google
+FCM_OAUTH_TOKEN_URL = 'https://oauth2.googleapis.com/token'
+FCM_TOKEN_REFRESH_MARGIN = 300
+
+# Outbox des notifications (notifications.services.outbox), vidée par
+# `python manage.py process_notification_outbox` : workers par processus, messages
+# réservés par lot, bail avant reprise d'un message abandonné, tentatives et délais
+# de nouvelle tentative (exponentiels) en secondes
+NOTIFICATION_OUTBOX_WORKERS = 4
+NOTIFICATION_OUTBOX_BATCH_SIZE = 20
+NOTIFICATION_OUTBOX_POLL_INTERVAL = 1.0
+NOTIFICATION_OUTBOX_LEASE_SECONDS = 60
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = 6
+NOTIFICATION_OUTBOX_RETRY_BASE_DELAY = 10
+NOTIFICATION_OUTBOX_RETRY_MAX_DELAY = 3600
+# Appels Nexah / WhatsApp : délais (secondes) de connexion et de lecture, à garder bien
+# en deçà de NOTIFICATION_OUTBOX_LEASE_SECONDS (sinon un message peut partir deux fois)
+NOTIFICATION_PROVIDER_CONNECT_TIMEOUT = 3
+NOTIFICATION_PROVIDER_READ_TIMEOUT = 10
+
+# Diffusion des nouvelles commandes aux chauffeurs (order.dispatch), après le commit :
+# envois WebSocket simultanés au plus par commande
+ORDER_DISPATCH_MAX_CONCURRENCY = 50
+
+# Diffusion à tous les chauffeurs / clients (notifications.services.fcm_broadcast) :
+# tokens lus (curseur côté serveur) et envoyés par lots de cette taille
+FCM_BROADCAST_CHUNK_SIZE = 500
+
+# Cache de routage des push (notifications.services.push_routing) : session active et
+# tokens FCM de chaque utilisateur, invalidé à chaque changement ; durée de vie maximale (s)
+PUSH_ROUTING_CACHE_TTL = 300
+
+# Reçus de livraison FCM (notifications.services.fcm_receipts) : écrits par lots hors requête
+# toutes les FCM_RECEIPT_FLUSH_INTERVAL secondes (0 = à chaque envoi), reçus gardés en mémoire au
+# plus si la base est indisponible, et conservation en base (jours)
+FCM_RECEIPT_FLUSH_INTERVAL = 2
+FCM_RECEIPT_BATCH_SIZE = 500
+FCM_RECEIPT_BUFFER_MAX_SIZE = 20000
+FCM_RECEIPT_RETENTION_DAYS = 7
+
+# Élagage des tokens FCM (`python manage.py prune_fcm_tokens`) : fenêtre d'analyse des reçus (heures)
+# et nombre d'échecs sans aucun succès au-delà duquel un token est désactivé
+FCM_PRUNE_WINDOW_HOURS = 24
+FCM_PRUNE_FAILURE_THRESHOLD = 5
+
+# Boîte de réception des notifications (notifications.services.inbox) : pagination par curseur,
+# taille de page par défaut et maximale (paramètre limit)
+NOTIFICATION_INBOX_PAGE_SIZE = 50
+NOTIFICATION_INBOX_MAX_PAGE_SIZE = 100
@@ -10,8 +10,6 @@ from django.utils.decorators import method_decorator
 from drf_spectacular.utils import extend_schema, OpenApiExample
 from django.db import transaction
 from django.contrib.contenttypes.models import ContentType
-import threading
-import time
 
 # Import from api app (legacy)
 from .models import Token, OTPVerification, ReferralCode
@@ -22,6 +20,7 @@ from notifications.models import Notification
 from wallet.models import Wallet
 from core.models import GeneralConfig
 from notifications.services.notification_service import NotificationService
+from notifications.services.outbox import enqueue_otp
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -124,18 +123,10 @@ class LoginView(APIView):
                 ).exists()
                 
                 if not welcome_notifications:
-                    # Envoyer notification de bienvenue après un délai de 2 secondes
-                    def send_welcome_delayed():
-                        time.sleep(2)  # Attendre 2 secondes
-                        try:
-                            NotificationService.send_welcome_notification(user)
-                            print(f"📤 Notification de bienvenue envoyée à {user.name if hasattr(user, 'name') else f'Client {user.phone_number}'} lors du premier login")
-                        except Exception as e:
-                            print(f"❌ Erreur envoi notification bienvenue: {e}")
-                    
-                    thread = threading.Thread(target=send_welcome_delayed)
-                    thread.daemon = True
-                    thread.start()
+                    # Notification de bienvenue ; push FCM différé de 2 secondes
+                    # (le temps que l'application enregistre son token FCM)
+                    NotificationService.send_welcome_notification(user, push_delay=2)
+                    print(f"📤 Notification de bienvenue en file d'attente pour {user.name if hasattr(user, 'name') else f'Client {user.phone_number}'} lors du premier login")
             
             # Préparer les informations utilisateur
             if user_type == 'driver':
@@ -644,42 +635,27 @@ class ForgotPasswordView(APIView):
                 'error': 'Aucun compte trouvé avec ce numéro de téléphone'
             }, status=status.HTTP_404_NOT_FOUND)
 
-        # Désactiver les anciens OTP pour ce numéro
-        OTPVerification.objects.filter(
-            phone_number=phone_number,
-            user_type=user_type,
-            is_verified=False
-        ).update(is_verified=True)
-
         # Générer un code OTP à 4 chiffres
         otp_code = ''.join([str(random.randint(0, 9)) for _ in range(4)])
 
-        # Créer l'OTP
-        otp = OTPVerification.objects.create(
-            phone_number=phone_number,
-            otp_code=otp_code,
-            user_type=user_type
-        )
-
-        print(f"✅ Password reset OTP created: code={otp.otp_code}, phone={otp.phone_number}, user_type={otp.user_type}")
+        # OTP et envoi WhatsApp/SMS (outbox) dans la même transaction
+        with transaction.atomic():
+            # Désactiver les anciens OTP pour ce numéro
+            OTPVerification.objects.filter(
+                phone_number=phone_number,
+                user_type=user_type,
+                is_verified=False
+            ).update(is_verified=True)
 
-        # Envoyer l'OTP via WhatsApp/SMS (en arrière-plan pour ne pas bloquer)
-        def send_otp_async():
-            try:
-                result = NotificationService.send_otp(
-                    recipient=phone_number,
-                    otp_code=otp_code
-                )
-                if result['success']:
-                    print(f"✅ Password reset OTP envoyé avec succès via {result.get('channel', 'unknown')}")
-                else:
-                    print(f"❌ Échec envoi password reset OTP: {result.get('message', 'Unknown error')}")
-            except Exception as e:
-                print(f"❌ Erreur lors de l'envoi password reset OTP: {str(e)}")
+            # Créer l'OTP
+            otp = OTPVerification.objects.create(
+                phone_number=phone_number,
+                otp_code=otp_code,
+                user_type=user_type
+            )
+            enqueue_otp(recipient=phone_number, otp_code=otp_code)
 
-        # Lancer l'envoi en arrière-plan
-        thread = threading.Thread(target=send_otp_async)
-        thread.start()
+        print(f"✅ Password reset OTP created: code={otp.otp_code}, phone={otp.phone_number}, user_type={otp.user_type}")
 
         return Response({
             'success': True,
@@ -861,42 +837,27 @@ class GenerateOTPView(APIView):
                     'error': 'Aucun utilisateur trouvé avec ce numéro'
                 }, status=status.HTTP_404_NOT_FOUND)
 
-        # Désactiver les anciens OTP pour ce numéro
-        OTPVerification.objects.filter(
-            phone_number=phone_number,
-            user_type=user_type,
-            is_verified=False
-        ).update(is_verified=True)  # Marquer comme "utilisés"
-
         # Générer un code OTP à 4 chiffres (compatible avec l'app Flutter)
         otp_code = ''.join([str(random.randint(0, 9)) for _ in range(4)])
 
-        # Créer l'OTP
-        otp = OTPVerification.objects.create(
-            phone_number=phone_number,
-            otp_code=otp_code,
-            user_type=user_type
-        )
-
-        print(f"✅ OTP created: code={otp.otp_code}, phone={otp.phone_number}, user_type={otp.user_type}, is_verified={otp.is_verified}, expires_at={otp.expires_at}")
+        # OTP et envoi WhatsApp/SMS (outbox) dans la même transaction
+        with transaction.atomic():
+            # Désactiver les anciens OTP pour ce numéro
+            OTPVerification.objects.filter(
+                phone_number=phone_number,
+                user_type=user_type,
+                is_verified=False
+            ).update(is_verified=True)  # Marquer comme "utilisés"
 
-        # Envoyer l'OTP via WhatsApp/SMS (en arrière-plan pour ne pas bloquer)
-        def send_otp_async():
-            try:
-                result = NotificationService.send_otp(
-                    recipient=phone_number,
-                    otp_code=otp_code
-                )
-                if result['success']:
-                    print(f"✅ OTP envoyé avec succès via {result.get('channel', 'unknown')}")
-                else:
-                    print(f"❌ Échec envoi OTP: {result.get('message', 'Unknown error')}")
-            except Exception as e:
-                print(f"❌ Erreur lors de l'envoi OTP: {str(e)}")
+            # Créer l'OTP
+            otp = OTPVerification.objects.create(
+                phone_number=phone_number,
+                otp_code=otp_code,
+                user_type=user_type
+            )
+            enqueue_otp(recipient=phone_number, otp_code=otp_code)
 
-        # Lancer l'envoi en arrière-plan
-        thread = threading.Thread(target=send_otp_async)
-        thread.start()
+        print(f"✅ OTP created: code={otp.otp_code}, phone={otp.phone_number}, user_type={otp.user_type}, is_verified={otp.is_verified}, expires_at={otp.expires_at}")
 
         # Réponse différente selon DEBUG mode
         response_data = {
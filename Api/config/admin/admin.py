@@ -17,6 +17,10 @@ from wallet.models import Wallet
 from notifications.models import (
     NotificationConfig, Notification, FCMToken
 )
+from notifications.services.notification_counters import reconcile_users
+from core.config_registry import invalidate_config_registry
+from order.catalog_search import invalidate_catalog_search
+from order.pricing_snapshot import invalidate_pricing_snapshot
 
 
 @admin.register(GeneralConfig)
@@ -109,12 +113,16 @@ class GeneralConfigAdmin(admin.ModelAdmin):
     def activate_configs(self, request, queryset):
         """Activer les configurations sélectionnées"""
         updated = queryset.update(active=True)
+        invalidate_config_registry()
+        invalidate_pricing_snapshot()
         self.message_user(request, f'✅ {updated} configuration(s) activée(s).')
     activate_configs.short_description = "✅ Activer les configurations"
     
     def deactivate_configs(self, request, queryset):
         """Désactiver les configurations sélectionnées"""
         updated = queryset.update(active=False)
+        invalidate_config_registry()
+        invalidate_pricing_snapshot()
         self.message_user(request, f'❌ {updated} configuration(s) désactivée(s).')
     deactivate_configs.short_description = "❌ Désactiver les configurations"
     
@@ -649,10 +657,12 @@ class VehicleTypeAdmin(admin.ModelAdmin):
 
     def activate(self, request, queryset):
         queryset.update(is_active=True)
+        invalidate_pricing_snapshot()
     activate.short_description = "✅ Activer les types sélectionnés"
 
     def deactivate(self, request, queryset):
         queryset.update(is_active=False)
+        invalidate_pricing_snapshot()
     deactivate.short_description = "❌ Désactiver les types sélectionnés"
 
 
@@ -1205,11 +1215,13 @@ class CountryAdmin(admin.ModelAdmin):
 
     def activate_countries(self, request, queryset):
         updated = queryset.update(active=True)
+        invalidate_catalog_search()
         self.message_user(request, f'✅ {updated} pays activé(s).')
     activate_countries.short_description = "✅ Activer les pays sélectionnés"
 
     def deactivate_countries(self, request, queryset):
         updated = queryset.update(active=False)
+        invalidate_catalog_search()
         self.message_user(request, f'❌ {updated} pays désactivé(s).')
     deactivate_countries.short_description = "❌ Désactiver les pays sélectionnés"
 
@@ -1278,11 +1290,15 @@ class CityAdmin(admin.ModelAdmin):
 
     def activate_cities(self, request, queryset):
         updated = queryset.update(active=True)
+        invalidate_pricing_snapshot()
+        invalidate_catalog_search()
         self.message_user(request, f'✅ {updated} ville(s) activée(s).')
     activate_cities.short_description = "✅ Activer les villes sélectionnées"
 
     def deactivate_cities(self, request, queryset):
         updated = queryset.update(active=False)
+        invalidate_pricing_snapshot()
+        invalidate_catalog_search()
         self.message_user(request, f'❌ {updated} ville(s) désactivée(s).')
     deactivate_cities.short_description = "❌ Désactiver les villes sélectionnées"
 
@@ -1365,11 +1381,15 @@ class VipZoneAdmin(admin.ModelAdmin):
 
     def activate_zones(self, request, queryset):
         updated = queryset.update(active=True)
+        invalidate_pricing_snapshot()
+        invalidate_catalog_search()
         self.message_user(request, f'✅ {updated} zone(s) VIP activée(s).')
     activate_zones.short_description = "✅ Activer les zones VIP sélectionnées"
 
     def deactivate_zones(self, request, queryset):
         updated = queryset.update(active=False)
+        invalidate_pricing_snapshot()
+        invalidate_catalog_search()
         self.message_user(request, f'❌ {updated} zone(s) VIP désactivée(s).')
     deactivate_zones.short_description = "❌ Désactiver les zones VIP sélectionnées"
 
@@ -1418,11 +1438,15 @@ class VipZoneKilometerRuleAdminDisabled(admin.ModelAdmin):
 
     def activate_rules(self, request, queryset):
         updated = queryset.update(active=True)
+        invalidate_pricing_snapshot()
+        invalidate_catalog_search()
         self.message_user(request, f'✅ {updated} règle(s) activée(s).')
     activate_rules.short_description = "✅ Activer les règles sélectionnées"
 
     def deactivate_rules(self, request, queryset):
         updated = queryset.update(active=False)
+        invalidate_pricing_snapshot()
+        invalidate_catalog_search()
         self.message_user(request, f'❌ {updated} règle(s) désactivée(s).')
     deactivate_rules.short_description = "❌ Désactiver les règles sélectionnées"
 
@@ -1726,7 +1750,9 @@ class NotificationAdmin(admin.ModelAdmin):
     
     def mark_as_unread(self, request, queryset):
         """Marquer les notifications comme non lues"""
+        users = list(queryset.order_by().values_list('user_type_id', 'user_id').distinct())
         updated = queryset.update(is_read=False, read_at=None)
+        reconcile_users(users)
         self.message_user(request, f'📩 {updated} notification(s) marquée(s) comme non lue(s).')
     mark_as_unread.short_description = "📩 Marquer comme non lues"
     
@@ -1735,14 +1761,16 @@ class NotificationAdmin(admin.ModelAdmin):
         count = 0
         for notification in queryset:
             if not notification.is_deleted:
-                notification.mark_as_deleted()
+                notification.soft_delete()
                 count += 1
         self.message_user(request, f'🗑️ {count} notification(s) supprimée(s).')
     soft_delete.short_description = "🗑️ Supprimer les notifications"
     
     def restore(self, request, queryset):
         """Restaurer les notifications supprimées"""
+        users = list(queryset.order_by().values_list('user_type_id', 'user_id').distinct())
         updated = queryset.update(is_deleted=False, deleted_at=None)
+        reconcile_users(users)
         self.message_user(request, f'♻️ {updated} notification(s) restaurée(s).')
     restore.short_description = "♻️ Restaurer les notifications"
 
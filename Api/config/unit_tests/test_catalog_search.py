@@ -0,0 +1,45 @@
+"""
+Recherche de villes par nom : préfixes, sous-chaînes, filtre par pays
+Usage: python manage.py test config.unit_tests.test_catalog_search
+"""
+from django.test import SimpleTestCase
+
+from order.catalog_search import SearchCatalog
+
+
+def city(city_id, name, country):
+    return {'id': city_id, 'name': name, 'country': country}
+
+
+class SearchCatalogTest(SimpleTestCase):
+
+    def setUp(self):
+        self.catalog = SearchCatalog({
+            1: city(1, 'Yaoundé', 'Cameroun'),
+            2: city(2, 'Yaoundé Centre', 'Cameroun'),
+            3: city(3, 'Mfou', 'Cameroun'),
+            4: city(4, 'Yaoun Ville', 'Gabon'),
+            5: city(5, 'Kribi', 'Cameroun'),
+            6: city(6, 'Centreville', 'Gabon'),
+            7: city(7, 'Oussouye', 'Sénégal'),
+        })
+
+    def ids(self, query, limit=10, country=None):
+        predicate = (lambda entry: entry['country'] == country) if country else None
+        return [entry['id'] for entry in self.catalog.search(query, limit=limit, predicate=predicate)]
+
+    def test_prefix_matches_ranked_before_substrings(self):
+        self.assertEqual(self.ids('yaoun'), [4, 1, 2])
+        # « ville » : début de mot de « Yaoun Ville », sous-chaîne de « Centreville »
+        self.assertEqual(self.ids('ville'), [4, 6])
+        self.assertEqual(self.ids('ou'), [7, 3, 4, 1, 2])
+
+    def test_substrings_fill_the_page_after_prefix_hits(self):
+        self.assertEqual(self.ids('ou', limit=3), [7, 3, 4])
+        self.assertEqual(self.ids('ville', limit=1), [4])
+
+    def test_predicate_applied_before_limit(self):
+        # Le préfixe « Oussouye » (Sénégal) ne masque pas les sous-chaînes du Cameroun
+        self.assertEqual(self.ids('ou', country='Cameroun'), [3, 1, 2])
+        self.assertEqual(self.ids('yaoun', limit=1, country='Cameroun'), [1])
+        self.assertEqual(self.ids('ville', country='Gabon'), [4, 6])
@@ -0,0 +1,62 @@
+"""
+Résumé des notes chauffeur : recalculé à la suppression des notations
+Usage: python manage.py test config.unit_tests.test_driver_rating_summary
+"""
+from datetime import date
+
+from django.test import TestCase
+
+from core.models import Country, City
+from order.models import DriverRatingSummary, Order, Rating
+from users.models import UserCustomer, UserDriver
+from vehicles.models import VehicleType
+
+
+class DriverRatingSummaryDeleteTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehicle_type = VehicleType.objects.create(name='Standard')
+        country = Country.objects.create(name='Cameroun')
+        cls.city = City.objects.create(country=country, name='Yaoundé', prix_jour=0, prix_nuit=0)
+        cls.customer = UserCustomer.objects.create(phone_number='690000011', password='x')
+        cls.driver = UserDriver.objects.create(
+            phone_number='670000011', password='x', name='Chauffeur', surname='Test',
+            gender='M', age=30, birthday=date(1990, 1, 1)
+        )
+
+    def rate(self, score, **criteria):
+        order = Order.objects.create(
+            customer=self.customer, driver=self.driver,
+            pickup_address='Départ', pickup_latitude=3.848, pickup_longitude=11.502,
+            destination_address='Arrivée', destination_latitude=3.86, destination_longitude=11.52,
+            vehicle_type=self.vehicle_type, city=self.city, estimated_distance_km=2,
+            base_price=500, distance_price=250, total_price=750, status='COMPLETED'
+        )
+        rating = Rating.objects.create(
+            order=order, rating_type='CUSTOMER_TO_DRIVER', rated_driver=self.driver, score=score, **criteria
+        )
+        DriverRatingSummary.record_rating(rating)
+        return rating
+
+    def summary(self):
+        return DriverRatingSummary.objects.get(driver=self.driver)
+
+    def test_single_and_bulk_delete(self):
+        first = self.rate(5, punctuality=4)
+        self.rate(3)
+        self.rate(1)
+
+        first.delete()
+        summary = self.summary()
+        self.assertEqual((summary.ratings_count, float(summary.average_score)), (2, 2.0))
+        self.assertIsNone(summary.get_criteria_averages()['punctuality'])
+
+        Rating.objects.filter(score=1).delete()
+        self.assertEqual((self.summary().ratings_count, float(self.summary().average_score)), (1, 3.0))
+
+    def test_cascade_delete_with_order(self):
+        rating = self.rate(4)
+        rating.order.delete()
+        self.assertEqual(self.summary().ratings_count, 0)
+        self.assertEqual(DriverRatingSummary.get_average(self.driver), 5.0)
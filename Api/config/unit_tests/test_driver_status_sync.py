@@ -0,0 +1,88 @@
+"""
+Report du statut chauffeur dans le store des positions : après le commit, sans erreur propagée,
+et sans course entre position et statut dans Redis
+Usage: python manage.py test config.unit_tests.test_driver_status_sync
+"""
+from datetime import date
+from unittest import mock, skipUnless
+
+import redis
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from order.location_store import RedisLocationStore, get_location_store, reset_location_store
+from order.models import DriverStatus
+from users.models import UserDriver
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@override_settings(DRIVER_LOCATION_STORE={'BACKEND': 'order.location_store.InMemoryLocationStore'})
+class DriverStatusSyncTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.driver = UserDriver.objects.create(
+            phone_number='670000009', password='x', name='Chauffeur', surname='Test',
+            gender='M', age=30, birthday=date(1990, 1, 1)
+        )
+
+    def setUp(self):
+        reset_location_store()
+        self.addCleanup(reset_location_store)
+
+    def test_status_reported_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            DriverStatus.objects.create(
+                driver=self.driver, status='ONLINE', current_latitude=3.848, current_longitude=11.502
+            )
+            self.assertIsNone(get_location_store().get_position(self.driver.id))
+
+        entry = get_location_store().get_position(self.driver.id)
+        self.assertEqual((entry['status'], entry['latitude']), ('ONLINE', 3.848))
+
+    def test_unavailable_store_does_not_fail_the_save(self):
+        with mock.patch('order.services.get_location_store', side_effect=ConnectionError("Redis injoignable")):
+            with self.captureOnCommitCallbacks(execute=True):
+                status = DriverStatus.objects.create(driver=self.driver, status='OFFLINE')
+                status.go_online()
+
+        self.assertEqual(DriverStatus.objects.get(driver=self.driver).status, 'ONLINE')
+
+
+@skipUnless(fakeredis, "fakeredis non installé")
+class RedisLocationStoreAtomicityTest(SimpleTestCase):
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        self.store = RedisLocationStore()
+        self.store._client = fakeredis.FakeRedis(server=server, decode_responses=True)
+        # Autre processus (consumer, commande) partageant le même Redis
+        self.other = RedisLocationStore()
+        self.other._client = fakeredis.FakeRedis(server=server, decode_responses=True)
+
+    def geo_members(self, status):
+        return {int(member) for member in self.store._client.zrange(self.store._geo_key(status), 0, -1)}
+
+    def test_status_change_during_position_update(self):
+        self.store.set_status(7, 'ONLINE')
+        self.store.update_position(7, 3.848, 11.502)
+
+        # Le chauffeur passe BUSY entre la lecture du statut et l'écriture de la position
+        hget = redis.client.Pipeline.hget
+        def hget_then_go_busy(pipe, *args):
+            value = hget(pipe, *args)
+            if not hasattr(self, 'raced'):
+                self.raced = True
+                self.other.set_status(7, 'BUSY')
+            return value
+
+        with mock.patch.object(redis.client.Pipeline, 'hget', hget_then_go_busy):
+            entry = self.store.update_position(7, 3.86, 11.52)
+
+        self.assertEqual((entry['status'], entry['latitude']), ('BUSY', 3.86))
+        self.assertEqual(self.geo_members('ONLINE'), set())
+        self.assertEqual(self.geo_members('BUSY'), {7})
+        self.assertEqual(self.store.search_radius(3.86, 11.52, 1, status='BUSY')[0][0], 7)
@@ -0,0 +1,109 @@
+"""
+Diffusion FCM par lots : progression enregistrée, reprise, tokens invalides désactivés
+Usage: python manage.py test config.unit_tests.test_fcm_broadcast
+"""
+import threading
+from datetime import date
+from http.server import ThreadingHTTPServer
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, override_settings
+
+from config.unit_tests.test_fcm_transport import StubFCMHandler
+from notifications.models import FCMDeliveryReceipt, FCMToken
+from notifications.services.fcm_broadcast import BroadcastInterrupted, FCMBroadcaster
+from notifications.services.fcm_receipts import reset_receipt_recorder
+from notifications.services.fcm_service import FCMService
+from notifications.services.fcm_transport import reset_fcm_transport
+from users.models import UserDriver
+
+
+class FCMBroadcasterTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        driver_type = ContentType.objects.get_for_model(UserDriver)
+        driver = UserDriver.objects.create(
+            phone_number='670000000', password='x', name='Chauffeur', surname='Test',
+            gender='M', age=30, birthday=date(1990, 1, 1)
+        )
+        for i in range(25):
+            FCMToken.objects.create(
+                user_type=driver_type, user_id=driver.id, device_id=f'device-{i}', platform='android',
+                token=f'dead-{i}' if i % 10 == 3 else f'token-{i}', is_active=i != 24
+            )
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubFCMHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.connections = 0
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.authorizations = set()
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        settings_override = override_settings(FCM_API_BASE_URL=f'http://127.0.0.1:{self.server.server_address[1]}')
+        settings_override.enable()
+        reset_fcm_transport()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(reset_fcm_transport)
+        self.addCleanup(reset_receipt_recorder)
+        self.addCleanup(settings_override.disable)
+
+        for name, value in (('get_firebase_oauth2_token', 'oauth-token'), ('get_project_id', 'test')):
+            patcher = mock.patch.object(FCMService, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_broadcast_in_chunks(self):
+        chunks = []
+        broadcaster = FCMBroadcaster(chunk_size=10, progress=lambda broadcast, stats: chunks.append(stats['tokens']))
+        broadcast = broadcaster.run(broadcaster.create('driver', 'Annonce', 'Bonjour'))
+
+        self.assertEqual(chunks, [10, 10, 4])
+        self.assertEqual(broadcast.status, 'COMPLETED')
+        self.assertEqual((broadcast.total_tokens, broadcast.sent, broadcast.failed), (24, 21, 3))
+        self.assertEqual(broadcast.deactivated, 3)
+        self.assertFalse(FCMToken.objects.filter(token__startswith='dead-', is_active=True).exists())
+        self.assertEqual(FCMDeliveryReceipt.objects.filter(error_class='unregistered').count(), 3)
+        self.assertGreater(broadcast.throughput, 0)
+
+    def test_interrupted_broadcast_resumes_after_last_chunk(self):
+        def interrupt_after_first_chunk(broadcast, stats):
+            raise KeyboardInterrupt
+
+        broadcaster = FCMBroadcaster(chunk_size=10, progress=interrupt_after_first_chunk)
+        broadcast = broadcaster.create('driver', 'Annonce', 'Bonjour')
+        with self.assertRaises(KeyboardInterrupt):
+            broadcaster.run(broadcast)
+
+        broadcast.refresh_from_db()
+        self.assertEqual((broadcast.status, broadcast.processed, broadcast.chunks), ('INTERRUPTED', 10, 1))
+
+        broadcast = FCMBroadcaster(chunk_size=10).run(broadcast)
+        self.assertEqual((broadcast.status, broadcast.processed, broadcast.chunks), ('COMPLETED', 24, 3))
+
+    def test_chunk_failing_temporarily_stops_without_advancing(self):
+        broadcaster = FCMBroadcaster(chunk_size=10)
+        broadcast = broadcaster.create('driver', 'Annonce', 'Bonjour')
+        # Jeton OAuth indisponible : tous les envois du lot échouent sans réponse FCM
+        with mock.patch.object(FCMService, 'get_firebase_oauth2_token', return_value=None):
+            with self.assertRaises(BroadcastInterrupted):
+                broadcaster.run(broadcast)
+
+        broadcast.refresh_from_db()
+        self.assertEqual((broadcast.status, broadcast.last_token_id, broadcast.processed), ('INTERRUPTED', 0, 0))
+        # Aucun token désactivé (seul le token inactif de départ)
+        self.assertEqual(FCMToken.objects.filter(is_active=False).count(), 1)
+
+        broadcast = FCMBroadcaster(chunk_size=10).run(broadcast)
+        self.assertEqual((broadcast.status, broadcast.sent, broadcast.chunks), ('COMPLETED', 21, 3))
+
+    def test_send_to_user_type_uses_broadcaster(self):
+        self.assertTrue(FCMService.send_to_user_type('driver', 'Annonce', 'Bonjour'))
+        self.assertFalse(FCMService.send_to_user_type('customer', 'Annonce', 'Bonjour'))
+        self.assertFalse(FCMService.send_to_user_type('admin', 'Annonce', 'Bonjour'))
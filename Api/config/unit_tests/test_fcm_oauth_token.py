@@ -0,0 +1,149 @@
+"""
+Jeton OAuth2 Firebase : mise en cache et renouvellement single-flight
+Usage: python manage.py test config.unit_tests.test_fcm_oauth_token
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.test import SimpleTestCase
+
+from notifications.services.fcm_auth import FirebaseTokenProvider
+
+
+class StubTokenHandler(BaseHTTPRequestHandler):
+    """Endpoint OAuth2 : compte les échanges et délivre token-<n> valable `expires_in` secondes"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        with self.server.lock:
+            self.server.requests += 1
+            number = self.server.requests
+        time.sleep(self.server.delay)
+
+        if self.server.fail:
+            status_code, body = 500, {'error': 'unavailable'}
+        else:
+            status_code, body = 200, {'access_token': f'token-{number}', 'expires_in': self.server.expires_in}
+
+        encoded = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FirebaseTokenProviderTest(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        cls.service_account_file = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        json.dump({
+            'project_id': 'woila-test',
+            'client_email': 'fcm@woila-test.iam.gserviceaccount.com',
+            'private_key': private_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption()
+            ).decode(),
+        }, cls.service_account_file)
+        cls.service_account_file.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.unlink(cls.service_account_file.name)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubTokenHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.delay = 0.1
+        self.server.fail = False
+        self.server.expires_in = 3600
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def provider(self, refresh_margin=300):
+        return FirebaseTokenProvider(
+            service_account_path=self.service_account_file.name,
+            token_url=f'http://127.0.0.1:{self.server.server_address[1]}/token',
+            refresh_margin=refresh_margin
+        )
+
+    def concurrent_tokens(self, provider, count=20):
+        tokens = []
+        threads = [threading.Thread(target=lambda: tokens.append(provider.get_token())) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return tokens
+
+    def test_token_is_cached(self):
+        provider = self.provider()
+
+        self.assertEqual(provider.get_token(), 'token-1')
+        self.assertEqual(provider.get_token(), 'token-1')
+        self.assertEqual(provider.project_id, 'woila-test')
+        self.assertEqual(self.server.requests, 1)
+
+    def test_concurrent_senders_share_one_exchange(self):
+        tokens = self.concurrent_tokens(self.provider())
+
+        self.assertEqual(tokens, ['token-1'] * 20)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_refresh_inside_margin_is_single_flight(self):
+        # Jeton valable 2 s avec une marge de 1 s : renouvellement anticipé après 1 s
+        self.server.expires_in = 2
+        provider = self.provider(refresh_margin=1)
+        self.assertEqual(provider.get_token(), 'token-1')
+
+        time.sleep(1.1)
+        tokens = self.concurrent_tokens(provider)
+
+        # Un seul échange ; les autres envois gardent le jeton courant, encore valide
+        self.assertEqual(self.server.requests, 2)
+        self.assertIn('token-2', tokens)
+        self.assertEqual(set(tokens), {'token-1', 'token-2'})
+        self.assertEqual(provider.get_token(), 'token-2')
+
+    def test_expired_token_is_replaced(self):
+        self.server.expires_in = 0.2
+        provider = self.provider(refresh_margin=0)
+        self.assertEqual(provider.get_token(), 'token-1')
+
+        time.sleep(0.3)
+        self.assertEqual(provider.get_token(), 'token-2')
+
+    def test_failure_is_not_retried_by_waiting_senders(self):
+        self.server.fail = True
+        tokens = self.concurrent_tokens(self.provider())
+
+        self.assertEqual(tokens, [None] * 20)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_invalidate_forces_new_exchange(self):
+        provider = self.provider()
+        provider.get_token()
+        provider.invalidate()
+
+        self.assertEqual(provider.get_token(), 'token-2')
@@ -0,0 +1,117 @@
+"""
+Reçus de livraison FCM : classes d'erreur, écriture par lots, élagage des tokens morts
+Usage: python manage.py test config.unit_tests.test_fcm_receipts
+"""
+from datetime import date, timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from notifications.models import FCMDeliveryReceipt, FCMToken
+from notifications.services.fcm_receipts import DeliveryReceiptRecorder, FCMTokenPruner
+from notifications.services.fcm_transport import FCMSendResult, classify_error
+from users.models import UserDriver
+
+
+class ClassifyErrorTest(SimpleTestCase):
+
+    def test_fcm_responses(self):
+        cases = [
+            (200, '', 'ok'),
+            (None, 'Connection refused', 'network'),
+            (404, '{"errorCode": "UNREGISTERED"}', 'unregistered'),
+            (400, 'The registration token is not a valid FCM registration token', 'invalid_token'),
+            (403, '{"errorCode": "SENDER_ID_MISMATCH"}', 'sender_mismatch'),
+            (400, '{"errorCode": "INVALID_ARGUMENT"}', 'invalid_argument'),
+            (401, 'Request had invalid authentication credentials', 'auth'),
+            (429, '{"errorCode": "QUOTA_EXCEEDED"}', 'quota'),
+            (503, 'unavailable', 'server'),
+        ]
+        for status_code, error, expected in cases:
+            with self.subTest(status_code=status_code, error=error):
+                self.assertEqual(classify_error(status_code, error), expected)
+
+
+class FCMReceiptsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.driver_type = ContentType.objects.get_for_model(UserDriver)
+        cls.driver = UserDriver.objects.create(
+            phone_number='670000001', password='x', name='Chauffeur', surname='Test',
+            gender='M', age=30, birthday=date(1990, 1, 1)
+        )
+
+    def create_token(self, token, platform='android'):
+        return FCMToken.objects.create(
+            user_type=self.driver_type, user_id=self.driver.id, device_id=f'device-{token}',
+            platform=platform, token=token
+        )
+
+    def receipts(self, token, error_class, count=1, **fields):
+        FCMDeliveryReceipt.objects.bulk_create([
+            FCMDeliveryReceipt(token=token, platform=token.platform, error_class=error_class, **fields)
+            for _ in range(count)
+        ])
+
+    def test_recorder_writes_receipts_and_deactivates_dead_tokens(self):
+        self.create_token('token-ok', platform='ios')
+        self.create_token('token-dead')
+        recorder = DeliveryReceiptRecorder(flush_interval=60, batch_size=2)
+        self.addCleanup(recorder.close)
+
+        recorder.record([
+            FCMSendResult('token-ok', True, status_code=200, message_id='projects/test/messages/0:abc',
+                          error_class='ok', latency_ms=12.6),
+            FCMSendResult('token-dead', False, status_code=404, unregistered=True,
+                          error_class='unregistered', latency_ms=8),
+            FCMSendResult('token-unknown', False, error='timeout', error_class='network'),
+        ], notification_type='new_order')
+
+        # Rien n'est écrit pendant l'envoi : le thread de fond s'en charge
+        self.assertFalse(FCMDeliveryReceipt.objects.exists())
+        self.assertEqual(recorder.flush(), 3)
+
+        ok = FCMDeliveryReceipt.objects.get(token__token='token-ok')
+        self.assertEqual((ok.platform, ok.message_id, ok.latency_ms, ok.notification_type),
+                         ('ios', '0:abc', 12, 'new_order'))
+        self.assertEqual(FCMDeliveryReceipt.objects.get(token=None).error_class, 'network')
+        self.assertFalse(FCMToken.objects.get(token='token-dead').is_active)
+        self.assertEqual(recorder.get_metrics()['deactivated'], 1)
+        self.assertEqual(recorder.get_metrics()['pending'], 0)
+
+    def test_pruner_deactivates_dead_and_repeatedly_failing_tokens(self):
+        failing = self.create_token('token-failing')
+        flaky = self.create_token('token-flaky')
+        dead = self.create_token('token-dead', platform='ios')
+        renewed = self.create_token('token-renewed')
+        bad_message = self.create_token('token-bad-message')
+        credentials = self.create_token('token-credentials')
+
+        self.receipts(failing, 'invalid_argument', count=5)
+        self.receipts(flaky, 'invalid_argument', count=5)
+        self.receipts(flaky, 'ok')
+        # Message mal formé : le type « promo » n'a réussi sur aucun token
+        self.receipts(bad_message, 'invalid_argument', count=5, notification_type='promo')
+        # Erreurs d'identifiants / inconnues : non imputables au token
+        self.receipts(credentials, 'auth', count=5)
+        self.receipts(credentials, 'other', count=5)
+        self.receipts(dead, 'unregistered')
+        # Token réenregistré après son dernier échec : il est conservé
+        self.receipts(renewed, 'unregistered', created_at=timezone.now() - timedelta(hours=1))
+        # Reçu expiré : purgé, et hors de la fenêtre
+        self.receipts(flaky, 'server', created_at=timezone.now() - timedelta(days=30))
+
+        stats = FCMTokenPruner(window_hours=24, failure_threshold=5, retention_days=7).run()
+
+        self.assertEqual((stats['dead_tokens'], stats['failing_tokens'], stats['deactivated']), (1, 1, 2))
+        self.assertEqual(stats['purged_receipts'], 1)
+        self.assertEqual(
+            set(FCMToken.objects.filter(is_active=True).values_list('token', flat=True)),
+            {'token-flaky', 'token-renewed', 'token-bad-message', 'token-credentials'}
+        )
+
+        rates = {row['platform']: row for row in stats['platforms']}
+        self.assertEqual((rates['android']['total'], rates['android']['failed']), (27, 26))
+        self.assertEqual(rates['ios']['failure_rate'], 100.0)
@@ -0,0 +1,115 @@
+"""
+Transport FCM contre un serveur FCM local (bouchon HTTP)
+Usage: python manage.py test config.unit_tests.test_fcm_transport
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+
+from notifications.services.fcm_transport import FCMTransport
+
+
+class StubFCMHandler(BaseHTTPRequestHandler):
+    """Répond comme l'API FCM v1 : 200 + name, ou 404 UNREGISTERED pour les tokens 'dead-*'"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+            self.server.authorizations.add(self.headers.get('Authorization'))
+
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        token = payload['message']['token']
+        time.sleep(self.server.delay)
+
+        if token.startswith('dead-'):
+            status_code, body = 404, {'error': {'code': 404, 'status': 'NOT_FOUND',
+                                                'details': [{'errorCode': 'UNREGISTERED'}]}}
+        else:
+            status_code, body = 200, {'name': f'projects/test/messages/{token}'}
+
+        encoded = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+        with self.server.lock:
+            self.server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FCMTransportTest(SimpleTestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubFCMHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.connections = 0
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.authorizations = set()
+        self.server.delay = 0.02
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.transport = FCMTransport(
+            base_url=f'http://127.0.0.1:{self.server.server_address[1]}', max_concurrency=4
+        )
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def messages(tokens):
+        return [{'message': {'token': token, 'notification': {'title': 't', 'body': 'b'}}} for token in tokens]
+
+    def test_returns_one_result_per_token_in_order(self):
+        tokens = [f'token-{i}' for i in range(10)] + ['dead-1']
+        results = self.transport.send('test', 'oauth-token', self.messages(tokens))
+
+        self.assertEqual([result.token for result in results], tokens)
+        self.assertTrue(all(result.success for result in results[:-1]))
+        self.assertEqual(results[0].message_id, 'projects/test/messages/token-0')
+        self.assertFalse(results[-1].success)
+        self.assertEqual(results[-1].status_code, 404)
+        self.assertTrue(results[-1].unregistered)
+        self.assertEqual(self.server.authorizations, {'Bearer oauth-token'})
+
+    def test_concurrency_is_bounded(self):
+        self.transport.send('test', 'oauth-token', self.messages([f'token-{i}' for i in range(20)]))
+
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLessEqual(self.server.max_in_flight, 4)
+
+    def test_connections_are_reused_between_batches(self):
+        for _ in range(3):
+            self.transport.send('test', 'oauth-token', self.messages([f'token-{i}' for i in range(8)]))
+
+        # 24 envois sur au plus max_concurrency connexions
+        self.assertLessEqual(self.server.connections, 4)
+
+    def test_unreachable_server_gives_failed_results(self):
+        transport = FCMTransport(base_url='http://127.0.0.1:9', max_concurrency=2)
+        try:
+            results = transport.send('test', 'oauth-token', self.messages(['token-1', 'token-2']))
+        finally:
+            transport.close()
+
+        self.assertEqual([result.success for result in results], [False, False])
+        self.assertIsNone(results[0].status_code)
+        self.assertTrue(results[0].error)
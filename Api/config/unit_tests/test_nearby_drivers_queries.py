@@ -0,0 +1,128 @@
+"""
+Test du nombre de requêtes SQL de la recherche de chauffeurs proches
+Usage: python manage.py test config.unit_tests.test_nearby_drivers_queries
+"""
+from datetime import date
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from users.models import UserDriver, UserCustomer
+from vehicles.models import Vehicle, VehicleType, VehicleBrand, VehicleModel, VehicleColor
+from core.models import Country, City
+from order.models import DriverStatus, Order, Rating, DriverRatingSummary
+from order.services import OrderService
+
+
+PICKUP_LAT = 3.8480
+PICKUP_LNG = 11.5021
+
+
+class NearbyDriversQueryCountTest(TestCase):
+    """La recherche doit coûter un nombre constant de requêtes, quel que soit le nombre de chauffeurs"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehicle_type = VehicleType.objects.create(name='Standard')
+        cls.brand = VehicleBrand.objects.create(name='Toyota')
+        cls.model = VehicleModel.objects.create(name='Corolla', brand=cls.brand)
+        cls.color = VehicleColor.objects.create(name='Blanc')
+        country = Country.objects.create(name='Cameroun')
+        cls.city = City.objects.create(country=country, name='Yaoundé', prix_jour=0, prix_nuit=0)
+        cls.customer = UserCustomer.objects.create(phone_number='690000000', password='secret')
+        cls.driver_count = 0
+
+    def _create_drivers(self, count):
+        for _ in range(count):
+            index = self.driver_count
+            self.driver_count += 1
+
+            driver = UserDriver.objects.create(
+                phone_number=f'67{index:07d}',
+                password='secret',
+                name='Chauffeur',
+                surname=str(index),
+                gender='M',
+                age=30,
+                birthday=date(1995, 1, 1)
+            )
+            Vehicle.objects.create(
+                driver=driver,
+                vehicle_type=self.vehicle_type,
+                brand=self.brand,
+                model=self.model,
+                color=self.color,
+                nom=f'Véhicule {index}',
+                plaque_immatriculation=f'LT-{index:05d}',
+                etat_vehicule=7,
+                is_active=True,
+                is_online=True
+            )
+            DriverStatus.objects.create(
+                driver=driver,
+                status='ONLINE',
+                current_latitude=PICKUP_LAT + 0.001 * (index % 10),
+                current_longitude=PICKUP_LNG + 0.001 * (index % 7)
+            )
+            order = Order.objects.create(
+                customer=self.customer,
+                driver=driver,
+                pickup_address='Départ',
+                pickup_latitude=PICKUP_LAT,
+                pickup_longitude=PICKUP_LNG,
+                destination_address='Arrivée',
+                destination_latitude=PICKUP_LAT,
+                destination_longitude=PICKUP_LNG,
+                vehicle_type=self.vehicle_type,
+                city=self.city,
+                estimated_distance_km=1,
+                base_price=500,
+                distance_price=250,
+                total_price=750,
+                status='COMPLETED'
+            )
+            rating = Rating.objects.create(
+                order=order,
+                rating_type='CUSTOMER_TO_DRIVER',
+                rated_driver=driver,
+                score=4
+            )
+            DriverRatingSummary.record_rating(rating)
+
+    def _count_search_queries(self, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            drivers = OrderService().find_nearby_drivers(PICKUP_LAT, PICKUP_LNG, limit=100, **kwargs)
+        return len(context.captured_queries), drivers
+
+    def test_query_count_is_constant(self):
+        self._create_drivers(2)
+        small_count, small_result = self._count_search_queries()
+
+        self._create_drivers(18)
+        large_count, large_result = self._count_search_queries()
+
+        self.assertEqual(len(small_result), 2)
+        self.assertEqual(len(large_result), 20)
+        self.assertEqual(small_count, large_count)
+
+    def test_query_count_is_constant_with_vehicle_type(self):
+        self._create_drivers(3)
+        small_count, _ = self._count_search_queries(vehicle_type_id=self.vehicle_type.id)
+
+        self._create_drivers(12)
+        large_count, large_result = self._count_search_queries(vehicle_type_id=self.vehicle_type.id)
+
+        self.assertEqual(len(large_result), 15)
+        self.assertEqual(small_count, large_count)
+
+    def test_result_contains_vehicle_and_rating(self):
+        self._create_drivers(1)
+        _, drivers = self._count_search_queries()
+
+        vehicle = drivers[0]['vehicle']
+        self.assertEqual(vehicle['type'], 'Standard')
+        self.assertEqual(vehicle['brand'], 'Toyota')
+        self.assertEqual(vehicle['model'], 'Corolla')
+        self.assertEqual(vehicle['color'], 'Blanc')
+        self.assertEqual(drivers[0]['rating'], 4.0)
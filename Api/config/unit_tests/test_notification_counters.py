@@ -0,0 +1,74 @@
+"""
+Compteurs de notifications : tenue à jour, lecture d'une ligne, recalcul
+Usage: python manage.py test config.unit_tests.test_notification_counters
+"""
+from datetime import date, timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from django.utils import timezone
+
+from notifications.models import Notification, NotificationCounter
+from notifications.services import notification_counters
+from notifications.services.notification_counters import get_counters, get_stats, reconcile_all
+from users.models import UserCustomer
+
+
+class NotificationCountersTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = UserCustomer.objects.create(phone_number='690000002', password='x')
+        cls.content_type = ContentType.objects.get_for_model(UserCustomer)
+
+    def notify(self, notification_type='system', **fields):
+        return Notification.objects.create(
+            user_type=self.content_type, user_id=self.customer.id,
+            title='Titre', content='Contenu', notification_type=notification_type, **fields
+        )
+
+    def test_counters_follow_create_read_delete(self):
+        welcome = self.notify('welcome')
+        self.notify()
+        order = self.notify('order')
+
+        welcome.mark_as_read()
+        welcome.mark_as_read()
+        order.soft_delete()
+
+        expected = {'total': 2, 'unread': 1, 'today': 2, 'this_week': 2,
+                    'by_type': {'welcome': 1, 'system': 1}}
+        self.assertEqual(get_stats(self.customer), expected)
+
+        # Lecture : la seule ligne de compteurs, sans recompter les notifications
+        with self.assertNumQueries(1):
+            self.assertEqual(get_stats(self.customer), expected)
+
+        self.assertEqual(notification_counters.mark_all_read(self.content_type.id, self.customer.id), 1)
+        self.assertEqual(get_counters(self.customer)['unread'], 0)
+
+    def test_week_window_and_hard_delete(self):
+        old = self.notify()
+        Notification.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=10))
+        notification_counters.recompute(self.content_type.id, self.customer.id)
+        recent = self.notify()
+
+        self.assertEqual(get_stats(self.customer)['this_week'], 1)
+        recent.delete()
+        self.assertEqual((get_stats(self.customer)['total'], get_stats(self.customer)['this_week']), (1, 0))
+
+    def test_reconcile_fixes_drifted_and_missing_counters(self):
+        self.notify()
+        self.notify()
+        NotificationCounter.objects.filter(user_id=self.customer.id).update(total=7, unread=0)
+        other = UserCustomer.objects.create(phone_number='690000003', password='x')
+        Notification.objects.bulk_create([Notification(
+            user_type=self.content_type, user_id=other.id, title='Titre', content='Contenu'
+        )])
+
+        self.assertEqual(reconcile_all(dry_run=True), {'checked': 2, 'fixed': 1, 'created': 1})
+        self.assertEqual(reconcile_all(), {'checked': 2, 'fixed': 1, 'created': 1})
+        self.assertEqual(reconcile_all(), {'checked': 2, 'fixed': 0, 'created': 0})
+
+        self.assertEqual((get_counters(self.customer)['total'], get_counters(self.customer)['unread']), (2, 2))
+        self.assertEqual(get_counters(other)['by_type'], {'system': 1})
@@ -0,0 +1,68 @@
+"""
+Boîte de réception : pagination par curseur (created_at, id) et index partiels
+Usage: python manage.py test config.unit_tests.test_notification_inbox
+"""
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from notifications.models import Notification
+from notifications.services.inbox import decode_cursor, encode_cursor, get_inbox_page
+from users.models import UserCustomer
+
+
+class NotificationInboxTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = UserCustomer.objects.create(phone_number='690000004', password='x')
+        content_type = ContentType.objects.get_for_model(UserCustomer)
+        Notification.objects.bulk_create([
+            Notification(user_type=content_type, user_id=cls.customer.id, title=f'N{i}', content='Contenu',
+                         is_read=i % 2 == 0, is_deleted=i == 6)
+            for i in range(8)
+        ])
+        # Trois notifications à la même seconde : départagées par id
+        base = timezone.now() - timedelta(days=400)
+        for i, notification in enumerate(Notification.objects.order_by('id')):
+            Notification.objects.filter(id=notification.id).update(created_at=base + timedelta(hours=min(i, 5)))
+
+    def read_all(self, **kwargs):
+        titles, cursor, pages = [], None, 0
+        while True:
+            notifications, cursor = get_inbox_page(self.customer, limit=2, cursor=cursor, **kwargs)
+            titles += [notification.title for notification in notifications]
+            pages += 1
+            if cursor is None:
+                return titles, pages
+
+    def test_pages_follow_created_at_then_id_without_gaps(self):
+        titles, pages = self.read_all()
+        self.assertEqual(titles, ['N7', 'N5', 'N4', 'N3', 'N2', 'N1', 'N0'])
+        self.assertEqual(pages, 4)
+
+    def test_unread_only(self):
+        titles, _ = self.read_all(unread_only=True)
+        self.assertEqual(titles, ['N7', 'N5', 'N3', 'N1'])
+
+    def test_new_notification_does_not_shift_next_page(self):
+        first, cursor = get_inbox_page(self.customer, limit=3)
+        Notification.objects.create(user_type=first[0].user_type, user_id=self.customer.id,
+                                    title='Nouvelle', content='Contenu')
+        second, _ = get_inbox_page(self.customer, limit=3, cursor=cursor)
+        self.assertEqual([notification.title for notification in second], ['N3', 'N2', 'N1'])
+
+    @override_settings(NOTIFICATION_INBOX_MAX_PAGE_SIZE=3)
+    def test_limit_is_capped(self):
+        self.assertEqual(len(get_inbox_page(self.customer, limit=1000)[0]), 3)
+        with self.assertRaises(ValueError):
+            get_inbox_page(self.customer, limit=0)
+
+    def test_cursor_round_trip_and_invalid_cursor(self):
+        notification = Notification.objects.first()
+        self.assertEqual(decode_cursor(encode_cursor(notification)), (notification.created_at, notification.id))
+        for cursor in ('pas-un-curseur', 'YWJj'):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                get_inbox_page(self.customer, cursor=cursor)
@@ -0,0 +1,128 @@
+"""
+Outbox des notifications : réservation, nouvelles tentatives et résultat enregistré
+Usage: python manage.py test config.unit_tests.test_notification_outbox
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+
+from notifications.models import NotificationOutbox
+from notifications.services.nexah_service import NexahService
+from notifications.services.outbox import (
+    OutboxFailure, OutboxRetry, OutboxSkip, OutboxWorker, enqueue, enqueue_otp
+)
+
+
+class OutboxWorkerTest(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.outcomes = []
+
+        def handler(payload):
+            self.calls.append(payload)
+            outcome = self.outcomes.pop(0) if self.outcomes else None
+            if isinstance(outcome, Exception):
+                raise outcome
+            return {'ok': payload['n']}
+
+        self.worker = OutboxWorker(batch_size=10, lease_seconds=30, handlers={'sms': handler})
+
+    def refresh(self, message):
+        message.refresh_from_db()
+        return message
+
+    def test_due_messages_are_delivered_once(self):
+        sent = enqueue('sms', {'n': 1})
+        later = enqueue('sms', {'n': 2}, delay=60)
+
+        self.assertEqual(self.worker.run_once(), {'SENT': 1})
+        self.assertEqual(self.worker.run_once(), {})
+
+        sent = self.refresh(sent)
+        self.assertEqual((sent.status, sent.attempts, sent.result), ('SENT', 1, {'ok': 1}))
+        self.assertEqual(self.refresh(later).status, 'PENDING')
+        self.assertEqual(self.calls, [{'n': 1}])
+
+    def test_temporary_failure_is_retried_with_backoff(self):
+        message = enqueue('sms', {'n': 1}, max_attempts=2)
+        self.outcomes = [OutboxRetry('timeout'), OutboxRetry('timeout')]
+
+        self.assertEqual(self.worker.run_once(), {'PENDING': 1})
+        message = self.refresh(message)
+        self.assertEqual(message.last_error, 'timeout')
+        self.assertGreater(message.available_at, timezone.now())
+
+        NotificationOutbox.objects.filter(id=message.id).update(available_at=timezone.now())
+        self.assertEqual(self.worker.run_once(), {'FAILED': 1})
+        self.assertEqual(self.refresh(message).attempts, 2)
+
+    def test_permanent_failure_and_skip_are_not_retried(self):
+        failed = enqueue('sms', {'n': 1})
+        skipped = enqueue('sms', {'n': 2})
+        self.outcomes = [OutboxFailure('400'), OutboxSkip('Pas de session active')]
+
+        self.assertEqual(self.worker.run_once(), {'FAILED': 1, 'SKIPPED': 1})
+        self.assertEqual(self.refresh(failed).attempts, 1)
+        self.assertEqual(self.refresh(skipped).last_error, 'Pas de session active')
+
+    def test_expired_otp_is_not_sent(self):
+        message = enqueue_otp('690000000', '1234')
+        NotificationOutbox.objects.filter(id=message.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.worker.run_once(), {'EXPIRED': 1})
+
+    def test_abandoned_message_is_reclaimed_after_lease(self):
+        message = enqueue('sms', {'n': 1})
+        self.assertEqual(len(self.worker.claim()), 1)
+        self.assertEqual(self.worker.claim(), [])
+
+        # Worker arrêté avant d'avoir enregistré le résultat : bail expiré
+        NotificationOutbox.objects.filter(id=message.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.worker.run_once(), {'SENT': 1})
+        self.assertEqual(self.refresh(message).attempts, 2)
+
+    def test_each_message_gets_its_own_lease(self):
+        first = enqueue('sms', {'n': 1})
+        second = enqueue('sms', {'n': 2})
+        claimed = self.worker.claim()
+        leases = []
+
+        def handler(payload):
+            leases.append(NotificationOutbox.objects.get(id=first.id if payload['n'] == 1 else second.id).locked_until)
+            return {'ok': payload['n']}
+
+        self.worker.handlers = {'sms': handler}
+        # Livraison du premier message lente : bail du lot presque écoulé
+        NotificationOutbox.objects.filter(id=second.id).update(locked_until=timezone.now() + timedelta(seconds=1))
+        for message in claimed:
+            self.assertEqual(self.worker.deliver(message), 'SENT')
+
+        self.assertTrue(all(lease >= timezone.now() + timedelta(seconds=25) for lease in leases))
+
+    def test_message_with_expired_lease_is_left_to_its_new_owner(self):
+        message = enqueue('sms', {'n': 1})
+        stale = self.worker.claim()[0]
+        NotificationOutbox.objects.filter(id=message.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertIsNone(self.worker.deliver(stale))
+        self.assertEqual(self.calls, [])
+
+        # Repris par un autre worker : une seule livraison
+        self.assertEqual(self.worker.run_once(), {'SENT': 1})
+        self.assertIsNone(self.worker.deliver(stale))
+        self.assertEqual(self.calls, [{'n': 1}])
+
+
+class ProviderTimeoutTest(TestCase):
+
+    def test_nexah_call_has_timeout_shorter_than_lease(self):
+        with mock.patch('notifications.services.nexah_service.requests.post') as post:
+            post.return_value.status_code = 500
+            NexahService.send_sms('690000000', 'Bonjour')
+
+        connect, read = post.call_args.kwargs['timeout']
+        self.assertLess(connect + read, settings.NOTIFICATION_OUTBOX_LEASE_SECONDS)
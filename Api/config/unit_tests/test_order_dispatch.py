@@ -0,0 +1,99 @@
+"""
+Diffusion des nouvelles commandes après le commit, hors requête
+Usage: python manage.py test config.unit_tests.test_order_dispatch
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from order.dispatch import OrderDispatcher
+
+
+class StubChannelLayer:
+    """group_send lent (50 ms) qui note les groupes atteints et le parallélisme"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.groups = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def group_send(self, group, message):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        self.groups.append((group, message['type'], message['order_data']['id']))
+
+
+class OrderDispatcherTest(TestCase):
+
+    def setUp(self):
+        self.channel_layer = StubChannelLayer()
+        self.dispatcher = OrderDispatcher(channel_layer=self.channel_layer, max_concurrency=8)
+        self.pushed = []
+
+        def push_pool(job):
+            time.sleep(0.05)
+            self.pushed.append(job.driver_ids)
+            return {driver_id: driver_id % 2 == 0 for driver_id in job.driver_ids}
+
+        patcher = mock.patch.object(self.dispatcher, '_push_pool', side_effect=push_pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.dispatcher.close)
+
+        self.order = SimpleNamespace(
+            id='order-1', customer=SimpleNamespace(id=7, phone_number='690000000'),
+            pickup_address='A', pickup_latitude=3.86, pickup_longitude=11.51,
+            destination_address='B', destination_latitude=3.84, destination_longitude=11.50,
+            vehicle_type=None, estimated_distance_km=4.2, total_price=2500, customer_notes=None,
+            created_at=timezone.now()
+        )
+        self.pool = [SimpleNamespace(driver_id=driver_id) for driver_id in range(1, 21)]
+
+    def wait_for_dispatches(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while self.dispatcher.get_metrics()['dispatched'] < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_nothing_is_sent_before_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.assertEqual(self.dispatcher.dispatch_after_commit(self.order, self.pool), 20)
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.dispatcher.get_metrics()['scheduled'], 0)
+        self.assertEqual(self.channel_layer.groups, [])
+
+    def test_pool_is_notified_concurrently_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dispatcher.dispatch_after_commit(self.order, self.pool)
+        self.wait_for_dispatches(1)
+
+        self.assertEqual(
+            sorted(self.channel_layer.groups),
+            sorted((f'driver_{driver_id}', 'order_request', 'order-1') for driver_id in range(1, 21))
+        )
+        self.assertEqual(self.channel_layer.max_in_flight, 8)
+        self.assertEqual(self.pushed, [list(range(1, 21))])
+
+        metrics = self.dispatcher.get_metrics()
+        self.assertEqual((metrics['websocket_sent'], metrics['push_delivered'], metrics['push_failed']), (20, 10, 10))
+        self.assertEqual(metrics['in_flight'], 0)
+        # 20 envois de 50 ms, 8 à la fois, en parallèle du push : ~150 ms au lieu de 1 s
+        self.assertLess(metrics['latency_ms']['max'], 600)
+
+    def test_latency_percentiles(self):
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.dispatcher.dispatch_after_commit(self.order, self.pool[:2])
+        self.wait_for_dispatches(3)
+
+        latency = self.dispatcher.get_metrics()['latency_ms']
+        self.assertEqual(latency['window'], 3)
+        self.assertGreaterEqual(latency['p50'], 50)
+        self.assertLessEqual(latency['p50'], latency['max'])
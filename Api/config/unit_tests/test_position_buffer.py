@@ -0,0 +1,61 @@
+"""
+Tampon d'écriture des positions : garde de fraîcheur, accès aux endpoints de debug
+Usage: python manage.py test config.unit_tests.test_position_buffer
+"""
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from order.models import DriverStatus
+from order.position_buffer import PositionWriteBuffer
+from users.models import UserDriver
+
+
+class PositionWriteBufferTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.driver = UserDriver.objects.create(
+            phone_number='670000010', password='x', name='Chauffeur', surname='Test',
+            gender='M', age=30, birthday=date(1990, 1, 1)
+        )
+
+    def test_older_position_does_not_overwrite_newer_row(self):
+        now = timezone.now()
+        DriverStatus.objects.create(
+            driver=self.driver, status='ONLINE', current_latitude=3.9, current_longitude=11.5,
+            last_location_update=now
+        )
+        buffer = PositionWriteBuffer(flush_interval=60)
+
+        # Position retardée (tampon d'un autre processus vidé après la nôtre)
+        buffer.add(self.driver.id, 3.8, 11.4, timestamp=now - timedelta(seconds=10))
+        self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(float(DriverStatus.objects.get(driver=self.driver).current_latitude), 3.9)
+
+        buffer.add(self.driver.id, 3.7, 11.3, timestamp=now + timedelta(seconds=10))
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(float(DriverStatus.objects.get(driver=self.driver).current_latitude), 3.7)
+
+
+class DebugEndpointAccessTest(TestCase):
+
+    urls = [reverse('order:debug_position_buffer'), reverse('order:debug_order_dispatch')]
+
+    @override_settings(DEBUG=False)
+    def test_reserved_to_staff_outside_debug(self):
+        for url in self.urls:
+            self.assertEqual(self.client.get(url).status_code, 403)
+
+        staff = User.objects.create_user('admin', password='x', is_staff=True)
+        self.client.force_login(staff)
+        for url in self.urls:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(DEBUG=True)
+    def test_open_in_debug(self):
+        for url in self.urls:
+            self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,90 @@
+"""
+Devis multi-types : mêmes prix que estimate_price_range, cache par coordonnées arrondies
+Usage: python manage.py test config.unit_tests.test_price_quotes
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+
+from core.admin import VipZoneProxy, VipZoneKilometerRuleProxy
+from core.models import Country, City, VipZone, VipZoneKilometerRule
+from order import geo_distance
+from order.services import PricingService
+from vehicles.models import VehicleType
+
+
+PICKUP = (3.84812, 11.50207)
+DESTINATION = (3.87334, 11.51841)
+
+
+class PriceQuoteTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Les tables réelles ont la structure des modèles non gérés de core.admin (instantané tarifaire)
+        with connection.schema_editor() as editor:
+            editor.delete_model(VipZoneKilometerRule)
+            editor.delete_model(VipZone)
+            editor.create_model(VipZoneProxy)
+            editor.create_model(VipZoneKilometerRuleProxy)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(VipZoneKilometerRuleProxy)
+            editor.delete_model(VipZoneProxy)
+            editor.create_model(VipZone)
+            editor.create_model(VipZoneKilometerRule)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            country = Country.objects.create(name='Cameroun')
+            self.city = City.objects.create(country=country, name='Yaoundé', prix_jour=200, prix_nuit=400)
+            self.vehicle_types = [
+                VehicleType.objects.create(name='Standard', additional_amount=0),
+                VehicleType.objects.create(name='Confort', additional_amount=500),
+                VehicleType.objects.create(name='Van', additional_amount=1250),
+            ]
+        self.service = PricingService()
+
+    def quote(self, pickup=PICKUP, destination=DESTINATION):
+        return self.service.quote_vehicle_types(*pickup, *destination, city_id=self.city.id)
+
+    def test_quote_matches_estimate_price_range(self):
+        quote = self.quote()
+        distance = geo_distance.distance_km(*PICKUP, *DESTINATION)
+        self.assertEqual(quote['distance_km'], round(distance, 2))
+
+        quotes = {entry['vehicle_type_id']: entry for entry in quote['quotes']}
+        self.assertEqual(set(quotes), {vehicle_type.id for vehicle_type in self.vehicle_types})
+        for vehicle_type in self.vehicle_types:
+            with self.subTest(vehicle_type=vehicle_type.name):
+                expected = self.service.estimate_price_range(vehicle_type.id, self.city.id, distance)
+                self.assertEqual(
+                    {key: quotes[vehicle_type.id][key] for key in ('min_price', 'max_price', 'estimated_price')},
+                    {key: expected[key] for key in ('min_price', 'max_price', 'estimated_price')}
+                )
+
+    def test_cache_hit_and_miss(self):
+        first = self.quote()
+        self.assertFalse(first['cached'])
+
+        # Même cellule arrondie (PRICE_QUOTE_COORDINATE_PRECISION) : devis en cache
+        nearby = self.quote(pickup=(PICKUP[0] + 0.0001, PICKUP[1]))
+        self.assertTrue(nearby['cached'])
+        self.assertEqual(nearby['quotes'], first['quotes'])
+
+        # Autre destination : nouveau devis
+        self.assertFalse(self.quote(destination=(3.9, 11.55))['cached'])
+
+        # Changement de tarif : nouvelle version de l'instantané, devis recalculé
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vehicle_types[1].additional_amount = 700
+            self.vehicle_types[1].save()
+        refreshed = self.quote()
+        self.assertFalse(refreshed['cached'])
+        self.assertNotEqual(refreshed['quotes'], first['quotes'])
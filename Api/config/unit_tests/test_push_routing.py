@@ -0,0 +1,102 @@
+"""
+Cache de routage des push : session active et tokens FCM sans requête répétée
+Usage: python manage.py test config.unit_tests.test_push_routing
+"""
+from datetime import date
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase
+
+from authentication.models import Token
+from notifications.models import FCMToken
+from notifications.services.fcm_service import FCMService
+from notifications.services.push_routing import get_push_route, get_push_routes
+from users.models import UserDriver
+
+
+class PushRoutingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.drivers = [
+            UserDriver.objects.create(
+                phone_number=f'67000000{i}', password='x', name='Chauffeur', surname=str(i),
+                gender='M', age=30, birthday=date(1990, 1, 1)
+            )
+            for i in range(3)
+        ]
+        cls.driver_type = ContentType.objects.get_for_model(UserDriver)
+        Token.objects.create(user_type=cls.driver_type, user_id=cls.drivers[0].id)
+        Token.objects.create(user_type=cls.driver_type, user_id=cls.drivers[1].id)
+        for i, driver in enumerate(cls.drivers[:2]):
+            FCMToken.objects.create(user_type=cls.driver_type, user_id=driver.id, device_id='phone',
+                                    token=f'token-{i}', platform='android')
+        FCMToken.objects.create(user_type=cls.driver_type, user_id=cls.drivers[0].id, device_id='tablet',
+                                token='token-0b', platform='ios')
+
+    def setUp(self):
+        cache.clear()
+        ContentType.objects.get_for_model(UserDriver)
+
+    def test_route_is_cached(self):
+        with self.assertNumQueries(1):
+            route = get_push_route(self.drivers[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_push_route(self.drivers[0]), route)
+
+        self.assertTrue(route['session'])
+        self.assertEqual(sorted(route['tokens']), ['token-0', 'token-0b'])
+
+    def test_bulk_routes_in_one_query(self):
+        get_push_route(self.drivers[0])
+        with self.assertNumQueries(1):
+            routes = get_push_routes(self.driver_type, [driver.id for driver in self.drivers])
+
+        self.assertEqual(routes[self.drivers[1].id], {'session': True, 'tokens': ['token-1']})
+        self.assertEqual(routes[self.drivers[2].id], {'session': False, 'tokens': []})
+        with self.assertNumQueries(0):
+            get_push_routes(self.driver_type, [driver.id for driver in self.drivers])
+
+    def test_uncached_read_ignores_stale_entry(self):
+        driver = self.drivers[1]
+        get_push_route(driver)
+        # Désactivation faite par un autre processus : le cache local n'en sait rien
+        FCMToken.objects.filter(token='token-1').update(is_active=False)
+
+        self.assertEqual(get_push_route(driver)['tokens'], ['token-1'])
+        with self.assertNumQueries(1):
+            route = get_push_routes(self.driver_type, [driver.id], use_cache=False)[driver.id]
+        self.assertEqual(route['tokens'], [])
+
+    def test_login_and_logout_invalidate(self):
+        driver = self.drivers[2]
+        self.assertFalse(get_push_route(driver)['session'])
+
+        token = Token.objects.create(user_type=self.driver_type, user_id=driver.id)
+        self.assertTrue(get_push_route(driver)['session'])
+
+        token.is_active = False
+        token.save()
+        self.assertFalse(get_push_route(driver)['session'])
+
+    def test_token_changes_invalidate(self):
+        driver = self.drivers[1]
+        self.assertEqual(get_push_route(driver)['tokens'], ['token-1'])
+
+        FCMService.register_token(driver, 'token-1c', {'platform': 'android', 'device_id': 'car'})
+        self.assertEqual(sorted(get_push_route(driver)['tokens']), ['token-1', 'token-1c'])
+
+        FCMService.unregister_token(driver, 'token-1c')
+        self.assertEqual(get_push_route(driver)['tokens'], ['token-1'])
+
+        FCMService._deactivate_invalid_tokens(['token-1'])
+        self.assertEqual(get_push_route(driver)['tokens'], [])
+
+    def test_reassigned_token_leaves_previous_owner(self):
+        self.assertIn('token-0b', get_push_route(self.drivers[0])['tokens'])
+
+        FCMService.register_token(self.drivers[1], 'token-0b', {'platform': 'ios', 'device_id': 'tablet'})
+
+        self.assertEqual(get_push_route(self.drivers[0])['tokens'], ['token-0'])
+        self.assertIn('token-0b', get_push_route(self.drivers[1])['tokens'])
@@ -0,0 +1,127 @@
+"""
+Déviation d'itinéraire : une alerte par détour, réarmée au retour sur l'itinéraire, envoyée après le commit
+Usage: python manage.py test config.unit_tests.test_route_deviation
+"""
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.models import Country, City
+from order import geo_distance
+from order.models import Order, OrderTracking, TripDistance, TripTracking
+from order.services import RouteDeviationService
+from users.models import UserCustomer, UserDriver
+from vehicles.models import VehicleType
+
+
+PICKUP = (3.848, 11.502)
+DESTINATION = (3.9, 11.502)  # ~5.8 km au nord
+THRESHOLD_KM = 2.0
+
+# Un point toutes les 2 minutes
+ROUTE = [
+    PICKUP,
+    (3.848, 11.512),   # vers l'est : écart ~1.2 km
+    (3.848, 11.522),   # écart ~2.6 km : alerte
+    (3.848, 11.532),   # le détour continue : pas de nouvelle alerte
+    (3.858, 11.532),   # cap sur la destination : retour sur l'itinéraire, alerte réarmée
+    (3.868, 11.522),
+    (3.868, 11.502),   # +1.6 km depuis le retour : sous le seuil
+    (3.868, 11.482),   # nouveau détour vers l'ouest : +4.5 km, seconde alerte
+]
+ALERTS_AT = [2, 7]
+
+
+def estimated_distance_km():
+    return round(geo_distance.distance_km(*PICKUP, *DESTINATION), 2)
+
+
+class UpdateDeviationTest(SimpleTestCase):
+
+    def test_alert_fires_once_per_detour_and_rearms_on_route(self):
+        order = SimpleNamespace(
+            destination_latitude=DESTINATION[0], destination_longitude=DESTINATION[1],
+            estimated_distance_km=estimated_distance_km()
+        )
+        trip_distance = TripDistance()
+        start = timezone.now()
+
+        alerts = []
+        armed = []
+        for index, (latitude, longitude) in enumerate(ROUTE):
+            self.assertEqual(trip_distance.add_point(latitude, longitude, start + timedelta(minutes=2 * index), 5), 'accepted')
+            if trip_distance.update_deviation(order, THRESHOLD_KM):
+                alerts.append(index)
+            armed.append(not trip_distance.deviation_alerted)
+
+        self.assertEqual(alerts, ALERTS_AT)
+        self.assertEqual(armed, [True, True, False, False, True, True, True, False])
+        # L'écart total n'a fait que croître : le réarmement ne dépend pas d'une baisse de l'écart
+        self.assertEqual(trip_distance.max_deviation_km, trip_distance.deviation_km)
+
+    def test_no_position_no_alert(self):
+        order = SimpleNamespace(destination_latitude=3.9, destination_longitude=11.502, estimated_distance_km=1)
+        self.assertFalse(TripDistance().update_deviation(order, THRESHOLD_KM))
+
+
+class HandleDeviationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        vehicle_type = VehicleType.objects.create(name='Standard')
+        country = Country.objects.create(name='Cameroun')
+        city = City.objects.create(country=country, name='Yaoundé', prix_jour=0, prix_nuit=0)
+        cls.customer = UserCustomer.objects.create(phone_number='690000014', password='x')
+        cls.driver = UserDriver.objects.create(
+            phone_number='670000014', password='x', name='Chauffeur', surname='Test',
+            gender='M', age=30, birthday=date(1990, 1, 1)
+        )
+        cls.order = Order.objects.create(
+            customer=cls.customer, driver=cls.driver,
+            pickup_address='Départ', pickup_latitude=PICKUP[0], pickup_longitude=PICKUP[1],
+            destination_address='Arrivée', destination_latitude=DESTINATION[0], destination_longitude=DESTINATION[1],
+            vehicle_type=vehicle_type, city=city, estimated_distance_km=estimated_distance_km(),
+            base_price=500, distance_price=250, total_price=750, status='IN_PROGRESS'
+        )
+
+    def setUp(self):
+        self.channel_layer = mock.Mock()
+        self.channel_layer.group_send = mock.AsyncMock()
+        self.service = RouteDeviationService(channel_layer=self.channel_layer)
+
+    def points(self):
+        start = timezone.now() - timedelta(minutes=2 * len(ROUTE))
+        return [
+            TripTracking(
+                order=self.order, driver=self.driver, latitude=latitude, longitude=longitude, accuracy=5,
+                order_status='IN_PROGRESS', recorded_at=start + timedelta(minutes=2 * index)
+            )
+            for index, (latitude, longitude) in enumerate(ROUTE)
+        ]
+
+    def test_alert_sent_to_customer_and_driver_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TripDistance.record_points(self.order.id, self.points(), on_deviation=self.service.handle_deviation)
+            # Événements enregistrés dans la transaction, rien d'envoyé avant le commit
+            self.assertEqual(OrderTracking.objects.filter(order=self.order, event_type='ROUTE_DEVIATION').count(), 2)
+            self.channel_layer.group_send.assert_not_called()
+
+        groups = [call.args[0] for call in self.channel_layer.group_send.call_args_list]
+        self.assertEqual(groups, [f'customer_{self.customer.id}', f'driver_{self.driver.id}'] * 2)
+        alert = self.channel_layer.group_send.call_args_list[0].args[1]
+        self.assertEqual((alert['type'], alert['order_id']), ('route_deviation', str(self.order.id)))
+
+    def test_rolled_back_batch_sends_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    TripDistance.record_points(self.order.id, self.points(), on_deviation=self.service.handle_deviation)
+                    raise RuntimeError("Insertion des points échouée")
+
+        self.assertEqual(callbacks, [])
+        self.channel_layer.group_send.assert_not_called()
+        self.assertFalse(OrderTracking.objects.filter(event_type='ROUTE_DEVIATION').exists())
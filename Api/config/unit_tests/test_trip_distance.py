@@ -0,0 +1,130 @@
+"""
+Distance parcourue (TripDistance) : filtrage du bruit GPS et recalcul depuis l'historique
+Usage: python manage.py test config.unit_tests.test_trip_distance
+"""
+from datetime import date, timedelta
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Country, City
+from order import geo_distance
+from order.models import Order, TripDistance
+from order.services import TrackingService
+from order.trip_tracking_writer import TripTrackingWriter
+from users.models import UserCustomer, UserDriver
+from vehicles.models import VehicleType
+
+
+START = timezone.now().replace(microsecond=0)
+
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+
+# (latitude, longitude, secondes, précision, résultat attendu)
+SEQUENCE = [
+    (3.848, 11.502, 0, 5, 'accepted'),
+    (3.849, 11.502, 10, 5, 'accepted'),     # ~111 m en 10 s (40 km/h)
+    (3.850, 11.502, 20, 80, 'rejected'),    # précision > TRIP_DISTANCE_MAX_ACCURACY_M
+    (3.84902, 11.502, 20, 5, 'filtered'),   # ~2 m : bruit à l'arrêt
+    (3.894, 11.502, 30, 5, 'rejected'),     # ~5 km en 10 s : saut GPS
+    (3.8485, 11.502, 5, 5, 'rejected'),     # antérieur au dernier point retenu
+    (3.850, 11.502, 40, 5, 'accepted'),
+    (3.850, 11.503, 50, 20, 'accepted'),    # ~111 m, au-delà de la précision annoncée
+]
+
+
+@override_settings(TRIP_DISTANCE_MAX_ACCURACY_M=50, TRIP_DISTANCE_MIN_SEGMENT_M=10, TRIP_DISTANCE_MAX_SPEED_KMH=200)
+class TripDistanceAddPointTest(SimpleTestCase):
+
+    def test_known_sequence(self):
+        trip_distance = TripDistance()
+        results = [
+            trip_distance.add_point(latitude, longitude, at(seconds), accuracy)
+            for latitude, longitude, seconds, accuracy, _ in SEQUENCE
+        ]
+
+        self.assertEqual(results, [expected for *_, expected in SEQUENCE])
+        self.assertEqual(
+            (trip_distance.accepted_points, trip_distance.filtered_points, trip_distance.rejected_points),
+            (4, 1, 3)
+        )
+        expected_km = (
+            geo_distance.distance_km(3.848, 11.502, 3.849, 11.502)
+            + geo_distance.distance_km(3.849, 11.502, 3.850, 11.502)
+            + geo_distance.distance_km(3.850, 11.502, 3.850, 11.503)
+        )
+        self.assertAlmostEqual(float(trip_distance.distance_km), expected_km, places=5)
+        self.assertEqual((float(trip_distance.last_longitude), trip_distance.last_recorded_at), (11.503, at(50)))
+
+    def test_filtered_point_does_not_move_reference(self):
+        trip_distance = TripDistance()
+        trip_distance.add_point(3.848, 11.502, at(0), 5)
+        # Dérive lente à l'arrêt : chaque point à 6 m du précédent, mais mesuré depuis le point de référence
+        for step in range(1, 4):
+            trip_distance.add_point(3.848 + step * 0.000054, 11.502, at(10 * step), 5)
+
+        # 6 m filtré, 12 m depuis la référence retenu, puis 6 m filtré
+        self.assertEqual((trip_distance.filtered_points, trip_distance.accepted_points), (2, 2))
+        self.assertAlmostEqual(
+            float(trip_distance.distance_km),
+            geo_distance.distance_km(3.848, 11.502, 3.848 + 2 * 0.000054, 11.502),
+            places=5
+        )
+
+    def test_accuracy_threshold(self):
+        trip_distance = TripDistance()
+        self.assertEqual(trip_distance.add_point(3.848, 11.502, at(0), 51), 'rejected')
+        self.assertEqual(trip_distance.add_point(3.848, 11.502, at(0), 50), 'accepted')
+        # Point sans précision annoncée : accepté
+        self.assertEqual(trip_distance.add_point(3.849, 11.502, at(10), None), 'accepted')
+
+
+@override_settings(
+    DRIVER_LOCATION_STORE={'BACKEND': 'order.location_store.InMemoryLocationStore'},
+    ROUTE_DEVIATION_THRESHOLD_KM=100
+)
+class TripDistanceRebuildTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        vehicle_type = VehicleType.objects.create(name='Standard')
+        country = Country.objects.create(name='Cameroun')
+        city = City.objects.create(country=country, name='Yaoundé', prix_jour=0, prix_nuit=0)
+        customer = UserCustomer.objects.create(phone_number='690000013', password='x')
+        cls.driver = UserDriver.objects.create(
+            phone_number='670000013', password='x', name='Chauffeur', surname='Test',
+            gender='M', age=30, birthday=date(1990, 1, 1)
+        )
+        cls.order = Order.objects.create(
+            customer=customer, driver=cls.driver,
+            pickup_address='Départ', pickup_latitude=3.848, pickup_longitude=11.502,
+            destination_address='Arrivée', destination_latitude=3.86, destination_longitude=11.502,
+            vehicle_type=vehicle_type, city=city, estimated_distance_km=1.5,
+            base_price=500, distance_price=250, total_price=750, status='IN_PROGRESS'
+        )
+
+    def test_rebuild_matches_incremental_total(self):
+        service = TrackingService(writer=TripTrackingWriter())
+        points = [
+            {'latitude': latitude, 'longitude': longitude, 'accuracy': accuracy, 'recorded_at': at(seconds)}
+            for latitude, longitude, seconds, accuracy, _ in SEQUENCE
+        ]
+        # Lots successifs, le dernier reçu dans le désordre
+        service.record_positions(self.order, self.driver, points[:3])
+        service.record_positions(self.order, self.driver, points[3:5])
+        service.record_positions(self.order, self.driver, points[5:][::-1])
+
+        stored = TripDistance.objects.get(order=self.order)
+        self.assertEqual((stored.accepted_points, stored.filtered_points, stored.rejected_points), (4, 1, 3))
+
+        stored_km, rebuilt_km = TripDistance.rebuild(order_ids=[self.order.id], commit=False)[self.order.id]
+        self.assertAlmostEqual(stored_km, float(stored.distance_km), places=6)
+        self.assertAlmostEqual(rebuilt_km, stored_km, places=6)
+
+        TripDistance.rebuild(order_ids=[self.order.id])
+        rebuilt = TripDistance.objects.get(order=self.order)
+        for field in TripDistance.COMPUTED_FIELDS:
+            self.assertEqual(getattr(rebuilt, field), getattr(stored, field), field)
@@ -0,0 +1,116 @@
+"""
+Points GPS de course : envoi groupé du chauffeur, écriture en base pendant la requête
+Usage: python manage.py test config.unit_tests.test_trip_tracking_writer
+"""
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Country, City
+from order.models import DriverStatus, Order, TripDistance, TripTracking
+from order.services import TrackingService
+from order.trip_tracking_writer import TripTrackingWriter
+from users.models import UserCustomer, UserDriver
+from vehicles.models import VehicleType
+
+
+def point(order_id):
+    return SimpleNamespace(order_id=order_id, recorded_at=timezone.now())
+
+
+class TripTrackingWriterTest(TestCase):
+
+    def setUp(self):
+        self.writer = TripTrackingWriter()
+        self.written = []
+        self.failures = {}
+
+        def write(points):
+            error = self.failures.get(points[0].order_id)
+            if error:
+                raise error
+            self.written += [p.order_id for p in points]
+            return len(points)
+
+        for name, side_effect in (('_write', write), ('_accumulate_distance', lambda order_id, points: None)):
+            patcher = mock.patch.object(self.writer, name, side_effect=side_effect)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_points_grouped_by_order(self):
+        self.assertEqual(self.writer.write([point('a'), point('b'), point('a')]), 3)
+        self.assertEqual(self.written, ['a', 'a', 'b'])
+        self.assertEqual(self.writer.get_metrics()['batches'], 2)
+
+    def test_failing_order_does_not_block_others(self):
+        self.failures = {'a': RuntimeError('timeout')}
+        with self.assertRaises(RuntimeError):
+            self.writer.write([point('a'), point('b')])
+        self.assertEqual(self.written, ['b'])
+        self.assertEqual(self.writer.get_metrics()['failed_batches'], 1)
+
+
+@override_settings(
+    DRIVER_LOCATION_STORE={'BACKEND': 'order.location_store.InMemoryLocationStore'},
+    TRIP_TRACKING_MAX_POINTS=20
+)
+class BatchedTripPointsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        vehicle_type = VehicleType.objects.create(name='Standard')
+        country = Country.objects.create(name='Cameroun')
+        city = City.objects.create(country=country, name='Yaoundé', prix_jour=0, prix_nuit=0)
+        customer = UserCustomer.objects.create(phone_number='690000012', password='x')
+        cls.driver = UserDriver.objects.create(
+            phone_number='670000012', password='x', name='Chauffeur', surname='Test',
+            gender='M', age=30, birthday=date(1990, 1, 1)
+        )
+        DriverStatus.objects.create(driver=cls.driver, status='BUSY', current_latitude=3.848, current_longitude=11.502)
+        cls.order = Order.objects.create(
+            customer=customer, driver=cls.driver,
+            pickup_address='Départ', pickup_latitude=3.848, pickup_longitude=11.502,
+            destination_address='Arrivée', destination_latitude=3.9, destination_longitude=11.502,
+            vehicle_type=vehicle_type, city=city, estimated_distance_km=6,
+            base_price=500, distance_price=250, total_price=750, status='IN_PROGRESS'
+        )
+
+    def points(self, count):
+        # ~111 m vers le nord toutes les 10 secondes
+        start = timezone.now() - timedelta(seconds=10 * count)
+        return [
+            {'latitude': round(3.848 + i * 0.001, 6), 'longitude': 11.502, 'accuracy': 5,
+             'recorded_at': start + timedelta(seconds=10 * i)}
+            for i in range(count)
+        ]
+
+    def test_query_count_independent_of_batch_size(self):
+        service = TrackingService(writer=TripTrackingWriter())
+        with CaptureQueriesContext(connection) as small:
+            service.record_positions(self.order, self.driver, self.points(2))
+        TripTracking.objects.all().delete()
+        TripDistance.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            service.record_positions(self.order, self.driver, self.points(20))
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(TripTracking.objects.filter(order=self.order).count(), 20)
+        self.assertAlmostEqual(float(TripDistance.objects.get(order=self.order).distance_km), 19 * 0.111, places=1)
+
+    def test_driver_uploads_points_in_one_request(self):
+        payload = {'latitude': 3.867, 'longitude': 11.502, 'points': [
+            {**p, 'recorded_at': p['recorded_at'].isoformat()} for p in self.points(20)
+        ]}
+        with mock.patch('order.views.get_driver_from_token', return_value=self.driver):
+            response = self.client.post('/api/order/driver/location/update/', payload, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(TripTracking.objects.filter(order=self.order).count(), 20)
+
+            payload['points'] = payload['points'] + payload['points'][:1]
+            response = self.client.post('/api/order/driver/location/update/', payload, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
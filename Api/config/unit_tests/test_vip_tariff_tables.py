@@ -0,0 +1,162 @@
+"""
+Équivalence des tables kilométriques VIP compilées avec le calcul par requête
+Usage: python manage.py test config.unit_tests.test_vip_tariff_tables
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import VipZone, VipZoneKilometerRule
+from core.admin import VipZoneProxy, VipZoneKilometerRuleProxy
+from order.pricing_snapshot import VERSION_CACHE_KEY, PricingSnapshot, get_pricing_snapshot
+from vehicles.models import VehicleType
+
+
+def query_vip_zone_price(vip_zone_id, distance_km, is_night):
+    """Calcul historique de PricingService._get_vip_zone_price : une requête par appel"""
+    try:
+        vip_zone = VipZoneProxy.objects.get(id=vip_zone_id, active=True)
+    except VipZoneProxy.DoesNotExist:
+        return Decimal('0')
+
+    base_vip_price = vip_zone.prix_nuit if is_night else vip_zone.prix_jour
+    rule = VipZoneKilometerRuleProxy.objects.filter(
+        vip_zone=vip_zone,
+        min_kilometers__lte=distance_km,
+        active=True
+    ).order_by('-min_kilometers', 'id').first()
+
+    if rule is None:
+        return base_vip_price
+    km_price = rule.prix_nuit_per_km if is_night else rule.prix_jour_per_km
+    return base_vip_price + Decimal(str(distance_km)) * km_price
+
+
+class VipTariffTablesTest(TestCase):
+    """Les tables compilées (bisect) doivent donner exactement le prix de la requête"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Les tables réelles ont la structure des modèles non gérés de core.admin
+        with connection.schema_editor() as editor:
+            editor.delete_model(VipZoneKilometerRule)
+            editor.delete_model(VipZone)
+            editor.create_model(VipZoneProxy)
+            editor.create_model(VipZoneKilometerRuleProxy)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(VipZoneKilometerRuleProxy)
+            editor.delete_model(VipZoneProxy)
+            editor.create_model(VipZone)
+            editor.create_model(VipZoneKilometerRule)
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        rng = random.Random(14)
+
+        def zone(name, active=True):
+            return VipZoneProxy.objects.create(
+                name=name, prix_jour=1000, prix_nuit=1500,
+                active=active, created_at=now, updated_at=now
+            )
+
+        def rule(vip_zone, min_kilometers, day, night, active=True):
+            VipZoneKilometerRuleProxy.objects.create(
+                vip_zone=vip_zone, min_kilometers=Decimal(min_kilometers),
+                prix_jour_per_km=day, prix_nuit_per_km=night,
+                active=active, created_at=now
+            )
+
+        cls.zones = []
+
+        # Paliers réguliers, avec une règle inactive au milieu
+        brackets = zone('Aéroport')
+        for min_kilometers, day in [('0', 200), ('5', 180), ('10', 150), ('20.5', 120)]:
+            rule(brackets, min_kilometers, day, day * 2)
+        rule(brackets, '15', 1, 1, active=False)
+        cls.zones.append(brackets)
+
+        # Premier palier au-delà de 0 km : en dessous, seul le prix de base s'applique
+        late_start = zone('Bastos')
+        rule(late_start, '3.25', 90, 110)
+        rule(late_start, '7', 70, 95)
+        cls.zones.append(late_start)
+
+        # Seuils en double : la règle la plus ancienne l'emporte
+        duplicates = zone('Golf')
+        rule(duplicates, '2', 50, 60)
+        rule(duplicates, '2', 55, 65)
+        rule(duplicates, '8', 40, 45)
+        cls.zones.append(duplicates)
+
+        # Paliers aléatoires
+        random_zone = zone('Odza')
+        for min_kilometers in rng.sample(range(0, 6000), 40):
+            price = rng.randint(10, 300)
+            rule(random_zone, f'{min_kilometers / 100:.2f}', price, price + rng.randint(0, 100))
+        cls.zones.append(random_zone)
+
+        # Zone sans règle, et zone inactive
+        cls.zones.append(zone('Mvan'))
+        inactive = zone('Nlongkak', active=False)
+        rule(inactive, '0', 100, 100)
+        cls.zones.append(inactive)
+
+        cls.distances = sorted(
+            [0.0, 2.0, 3.25, 5.0, 7.0, 10.0, 15.0, 20.5, 20.49, 60.0, 100.0]
+            + [round(rng.uniform(0, 70), 3) for _ in range(200)]
+        )
+
+    def test_compiled_tables_match_queries(self):
+        snapshot = PricingSnapshot.load()
+
+        for vip_zone in self.zones:
+            for distance_km in self.distances:
+                for is_night in (False, True):
+                    with self.subTest(zone=vip_zone.name, distance_km=distance_km, is_night=is_night):
+                        self.assertEqual(
+                            snapshot.get_vip_zone_price(vip_zone.id, distance_km, is_night),
+                            query_vip_zone_price(vip_zone.id, distance_km, is_night)
+                        )
+
+    def test_lookup_runs_no_query(self):
+        snapshot = PricingSnapshot.load()
+
+        with CaptureQueriesContext(connection) as context:
+            for distance_km in self.distances:
+                snapshot.get_vip_zone_price(self.zones[0].id, distance_km, False)
+
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_tables_follow_rule_changes(self):
+        VipZoneKilometerRuleProxy.objects.filter(vip_zone=self.zones[0], min_kilometers=10).update(active=False)
+
+        snapshot = PricingSnapshot.load()
+        self.assertEqual(
+            snapshot.get_vip_zone_price(self.zones[0].id, 12.0, False),
+            query_vip_zone_price(self.zones[0].id, 12.0, False)
+        )
+
+    def test_admin_bulk_action_invalidates_snapshot(self):
+        """Les actions groupées de l'admin (queryset.update()) publient une nouvelle version"""
+        with self.captureOnCommitCallbacks(execute=True):
+            vehicle_type = VehicleType.objects.create(name='Confort', additional_amount=500)
+        self.assertIn(vehicle_type.id, get_pricing_snapshot().vehicle_types)
+        version = cache.get(VERSION_CACHE_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            site._registry[VehicleType].deactivate(None, VehicleType.objects.filter(id=vehicle_type.id))
+
+        self.assertEqual(cache.get(VERSION_CACHE_KEY), version + 1)
+        self.assertNotIn(vehicle_type.id, get_pricing_snapshot().vehicle_types)
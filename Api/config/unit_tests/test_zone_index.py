@@ -0,0 +1,138 @@
+"""
+Index des contours de villes / zones VIP : trous, multipolygones, bords, plus petite zone, reconstruction
+Usage: python manage.py test config.unit_tests.test_zone_index
+"""
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from core.admin import VipZoneProxy, VipZoneKilometerRuleProxy
+from core.models import Country, City, VipZone, VipZoneKilometerRule
+from core.zone_index import ZoneIndex
+from order.pricing_snapshot import get_pricing_snapshot
+
+
+def square(min_lng, min_lat, size):
+    return [
+        [min_lng, min_lat], [min_lng + size, min_lat], [min_lng + size, min_lat + size],
+        [min_lng, min_lat + size], [min_lng, min_lat],
+    ]
+
+
+def polygon(*rings):
+    return {'type': 'Polygon', 'coordinates': list(rings)}
+
+
+class ZoneIndexTest(SimpleTestCase):
+
+    def test_point_in_hole_is_outside(self):
+        # Ville de 0.2° avec un trou de 0.05° au centre
+        index = ZoneIndex.build([(1, polygon(square(11.4, 3.8, 0.2), square(11.475, 3.875, 0.05)))], cell_size=0.05)
+
+        self.assertEqual(index.locate(3.85, 11.45), 1)
+        self.assertIsNone(index.locate(3.9, 11.5))
+        self.assertIsNone(index.locate(4.1, 11.5))
+
+    def test_multipolygon(self):
+        boundary = {'type': 'MultiPolygon', 'coordinates': [
+            [square(11.4, 3.8, 0.1)],
+            [square(12.0, 4.0, 0.1)],
+        ]}
+        index = ZoneIndex.build([(1, boundary)], cell_size=0.05)
+
+        self.assertEqual(index.locate(3.85, 11.45), 1)
+        self.assertEqual(index.locate(4.05, 12.05), 1)
+        # Entre les deux parties, dans la boîte englobante
+        self.assertIsNone(index.locate(3.95, 11.7))
+
+    def test_point_on_shared_edge_belongs_to_one_zone(self):
+        index = ZoneIndex.build([
+            (1, polygon(square(11.4, 3.8, 0.1))),
+            (2, polygon(square(11.5, 3.8, 0.1))),
+            (3, polygon(square(11.4, 3.9, 0.1))),
+        ], cell_size=0.05)
+
+        # Bord vertical commun (lng 11.5) : zone de droite ; bord horizontal (lat 3.9) : zone du dessus
+        self.assertEqual(index.locate(3.85, 11.5), 2)
+        self.assertEqual(index.locate(3.9, 11.45), 3)
+        # Bords extérieurs : gauche / bas inclus, droite / haut exclus
+        self.assertEqual(index.locate(3.85, 11.4), 1)
+        self.assertIsNone(index.locate(3.85, 11.6))
+
+    def test_smallest_matching_zone_wins(self):
+        index = ZoneIndex.build([
+            (1, polygon(square(11.0, 3.5, 1.0))),
+            (2, polygon(square(11.4, 3.8, 0.2))),
+            (3, polygon(square(11.45, 3.85, 0.05))),
+        ], cell_size=0.05)
+
+        self.assertEqual(index.locate(3.87, 11.47), 3)
+        self.assertEqual(index.locate(3.81, 11.41), 2)
+        self.assertEqual(index.locate(3.6, 11.1), 1)
+
+    def test_invalid_or_empty_boundaries_are_ignored(self):
+        index = ZoneIndex.build([
+            (1, None),
+            (2, {'type': 'Point', 'coordinates': [11.5, 3.85]}),
+            (3, polygon(square(11.4, 3.8, 0.1))),
+        ])
+        self.assertEqual((index.size, index.locate(3.85, 11.45)), (1, 3))
+
+
+class ZoneIndexRebuildTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Les tables réelles ont la structure des modèles non gérés de core.admin (instantané tarifaire)
+        with connection.schema_editor() as editor:
+            editor.delete_model(VipZoneKilometerRule)
+            editor.delete_model(VipZone)
+            editor.create_model(VipZoneProxy)
+            editor.create_model(VipZoneKilometerRuleProxy)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(VipZoneKilometerRuleProxy)
+            editor.delete_model(VipZoneProxy)
+            editor.create_model(VipZone)
+            editor.create_model(VipZoneKilometerRule)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.city = City.objects.create(
+                country=Country.objects.create(name='Cameroun'), name='Yaoundé', prix_jour=0, prix_nuit=0,
+                boundary=polygon(square(11.4, 3.8, 0.2))
+            )
+
+    def test_index_rebuilt_after_boundary_change(self):
+        self.assertEqual(get_pricing_snapshot().locate_city(3.85, 11.45), self.city.id)
+        self.assertIsNone(get_pricing_snapshot().locate_city(4.05, 12.05))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.city.boundary = polygon(square(12.0, 4.0, 0.1))
+            self.city.save()
+
+        self.assertEqual(get_pricing_snapshot().locate_city(4.05, 12.05), self.city.id)
+        self.assertIsNone(get_pricing_snapshot().locate_city(3.85, 11.45))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.city.active = False
+            self.city.save()
+        self.assertIsNone(get_pricing_snapshot().locate_city(4.05, 12.05))
+
+    def test_invalid_boundary_rejected_on_save(self):
+        self.city.boundary = {'type': 'Polygon', 'coordinates': [[[3.85, 11.45], [3.9, 11.5]]]}
+        with self.assertRaises(ValidationError):
+            self.city.save()
+
+        zone = VipZoneProxy(name='Bastos', prix_jour=0, prix_nuit=0, active=True,
+                            boundary={'type': 'Point', 'coordinates': [11.5, 3.85]})
+        with self.assertRaises(ValidationError):
+            zone.save()
+        self.assertFalse(VipZoneProxy.objects.exists())
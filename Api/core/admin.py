@@ -2,17 +2,22 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.db import models
-from .models import GeneralConfig, Country, City, VipZone, VipZoneKilometerRule
+from .models import GeneralConfig, Country, City, VipZone, VipZoneKilometerRule, validate_boundary
 
 # Proxy model pour VipZone basé sur la vraie structure de la table
 class VipZoneProxy(models.Model):
     name = models.CharField(max_length=100, unique=True)
     prix_jour = models.DecimalField(max_digits=10, decimal_places=2)
     prix_nuit = models.DecimalField(max_digits=10, decimal_places=2)
+    boundary = models.JSONField(null=True, blank=True, validators=[validate_boundary])
     active = models.BooleanField()
     created_at = models.DateTimeField()
     updated_at = models.DateTimeField()
     
+    def save(self, *args, **kwargs):
+        validate_boundary(self.boundary)
+        super().save(*args, **kwargs)
+    
     class Meta:
         managed = False
         db_table = 'vip_zones'
@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
-    verbose_name = '⚙️ Configuration Générale'
\ No newline at end of file
+    verbose_name = '⚙️ Configuration Générale'
+
+    def ready(self):
+        from .config_registry import connect_signals
+        connect_signals()
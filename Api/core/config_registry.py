@@ -0,0 +1,151 @@
+"""
+Registre central des configurations générales (GeneralConfig)
+
+Toutes les configurations actives sont chargées en une requête et gardées en
+mémoire du processus, déjà converties (nombre / booléen / texte) :
+
+    from core.config_registry import get_config_registry
+
+    max_wait = get_config_registry().get_numeric('MAX_DRIVER_WAITING_TIME', 30)
+
+Rechargement :
+- au plus tard GENERAL_CONFIG_CACHE_TTL secondes après le chargement ;
+- à chaque modification (admin, API) : les signaux post_save / post_delete,
+  et les actions groupées de l'admin (queryset.update()), incrémentent un
+  compteur de version dans le cache Django, relu par chaque processus au plus
+  toutes les GENERAL_CONFIG_CHECK_INTERVAL secondes, et le processus courant
+  oublie immédiatement ses valeurs. Ce cache doit être partagé entre
+  processus (CACHES Redis, voir settings).
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+
+VERSION_CACHE_KEY = 'general_config:version'
+
+
+class ConfigValue:
+    """Valeur d'une configuration, convertie une fois au chargement"""
+
+    __slots__ = ('text', 'numeric', 'boolean')
+
+    def __init__(self, config):
+        self.text = config.valeur
+        self.numeric = config.get_numeric_value()
+        self.boolean = config.get_boolean_value()
+
+
+class ConfigRegistry:
+    """Configurations actives en mémoire, rechargées par TTL ou changement de version"""
+
+    def __init__(self, ttl: float = None, check_interval: float = None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'GENERAL_CONFIG_CACHE_TTL', 60)
+        self.check_interval = (
+            check_interval if check_interval is not None
+            else getattr(settings, 'GENERAL_CONFIG_CHECK_INTERVAL', 5)
+        )
+        self._values = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # --- Lectures ---
+
+    def get_numeric(self, search_key: str, default=None):
+        """Valeur numérique (default si absente, nulle ou non numérique, comme get_numeric_value() or default)"""
+        value = self._get(search_key)
+        return (value.numeric if value else None) or default
+
+    def get_boolean(self, search_key: str, default=None):
+        """Valeur booléenne (default si absente ou non reconnue)"""
+        value = self._get(search_key)
+        if value is None or value.boolean is None:
+            return default
+        return value.boolean
+
+    def get_text(self, search_key: str, default=None):
+        """Valeur brute (default si absente)"""
+        value = self._get(search_key)
+        return value.text if value else default
+
+    def numeric_values(self, refresh: bool = False) -> Dict[str, Optional[float]]:
+        """{search_key: valeur numérique} de toutes les configurations actives"""
+        if refresh:
+            self.invalidate()
+        return {search_key: value.numeric for search_key, value in self._get_values().items()}
+
+    def _get(self, search_key: str) -> Optional[ConfigValue]:
+        return self._get_values().get(search_key)
+
+    # --- Chargement ---
+
+    def _get_values(self) -> Dict[str, ConfigValue]:
+        now = time.monotonic()
+        values = self._values
+        if values is not None and now - self._loaded_at < self.ttl and now - self._checked_at < self.check_interval:
+            return values
+
+        with self._lock:
+            version = cache.get(VERSION_CACHE_KEY)
+            if self._values is None or version != self._version or now - self._loaded_at >= self.ttl:
+                self._values = self._load()
+                self._version = version
+                self._loaded_at = now
+            self._checked_at = now
+            return self._values
+
+    @staticmethod
+    def _load() -> Dict[str, ConfigValue]:
+        from .models import GeneralConfig
+
+        return {
+            config.search_key: ConfigValue(config)
+            for config in GeneralConfig.objects.filter(active=True).only('search_key', 'valeur')
+        }
+
+    def invalidate(self):
+        """Oublie les valeurs du processus : la prochaine lecture recharge"""
+        with self._lock:
+            self._values = None
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_config_registry() -> ConfigRegistry:
+    """Registre partagé du processus"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ConfigRegistry()
+    return _registry
+
+
+def invalidate_config_registry(**kwargs):
+    """Publie une nouvelle version (tous les processus) une fois la transaction validée"""
+    transaction.on_commit(_publish_new_version)
+
+
+def _publish_new_version():
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+    get_config_registry().invalidate()
+
+
+def connect_signals():
+    """Branche l'invalidation sur GeneralConfig (appelé par CoreConfig.ready)"""
+    from .models import GeneralConfig
+
+    post_save.connect(invalidate_config_registry, sender=GeneralConfig, dispatch_uid='config_registry_save')
+    post_delete.connect(invalidate_config_registry, sender=GeneralConfig, dispatch_uid='config_registry_delete')
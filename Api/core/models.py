@@ -1,6 +1,25 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 
 
+def validate_boundary(value):
+    """Valide un contour GeoJSON (Polygon / MultiPolygon en [longitude, latitude])"""
+    from .zone_index import BoundaryError, parse_boundary
+
+    if value in (None, {}):
+        return
+    try:
+        parse_boundary(value)
+    except BoundaryError as e:
+        raise ValidationError(str(e))
+
+
+BOUNDARY_HELP_TEXT = (
+    "Contour GeoJSON (Polygon ou MultiPolygon, coordonnées [longitude, latitude]) "
+    "utilisé pour détecter la zone à partir du point de départ"
+)
+
+
 class GeneralConfig(models.Model):
     """
     Model pour les configurations générales de l'application.
@@ -90,6 +109,13 @@ class City(models.Model):
         decimal_places=2,
         verbose_name="Prix nuit (FCFA)"
     )
+    boundary = models.JSONField(
+        null=True,
+        blank=True,
+        validators=[validate_boundary],
+        verbose_name="Contour",
+        help_text=BOUNDARY_HELP_TEXT
+    )
     active = models.BooleanField(default=True, verbose_name="Actif")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
@@ -97,6 +123,11 @@ class City(models.Model):
     def __str__(self):
         return f"{self.name} ({self.country.name})"
 
+    def save(self, *args, **kwargs):
+        """Contour validé à chaque enregistrement (API, shell, import), pas seulement par full_clean"""
+        validate_boundary(self.boundary)
+        super().save(*args, **kwargs)
+
     class Meta:
         db_table = 'cities'
         verbose_name = '🏙️ Ville'
@@ -119,6 +150,13 @@ class VipZone(models.Model):
         default=0.00,
         verbose_name="Montant additionnel (FCFA)"
     )
+    boundary = models.JSONField(
+        null=True,
+        blank=True,
+        validators=[validate_boundary],
+        verbose_name="Contour",
+        help_text=BOUNDARY_HELP_TEXT
+    )
     active = models.BooleanField(default=True, verbose_name="Actif")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
@@ -126,6 +164,11 @@ class VipZone(models.Model):
     def __str__(self):
         return f"{self.name} - {self.city.name}"
 
+    def save(self, *args, **kwargs):
+        """Contour validé à chaque enregistrement (voir City.save)"""
+        validate_boundary(self.boundary)
+        super().save(*args, **kwargs)
+
     class Meta:
         db_table = 'vip_zones'
         verbose_name = '⭐ Zone VIP'
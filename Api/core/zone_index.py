@@ -0,0 +1,184 @@
+"""
+Index géométrique des contours de villes et de zones VIP
+
+Les contours (champ `boundary`) sont des géométries GeoJSON `Polygon` ou
+`MultiPolygon`, en coordonnées [longitude, latitude] :
+
+    {"type": "Polygon", "coordinates": [[[11.45, 3.80], [11.58, 3.80], [11.58, 3.92], [11.45, 3.80]]]}
+
+Le premier anneau d'un polygone est le contour extérieur, les suivants sont
+des trous. ZoneIndex range chaque contour dans les cellules d'une grille fixe
+recouvrant sa boîte englobante : une recherche ne teste (ray casting) que
+les contours de la cellule du point, après un filtre sur la boîte englobante.
+
+Quand plusieurs contours contiennent le point (zone VIP incluse dans une
+autre), le plus petit l'emporte. Un point sur un bord appartient au contour
+situé à sa droite ou au-dessus (convention du ray casting) : sur le bord
+commun de deux zones voisines, il est attribué à une seule des deux.
+"""
+import logging
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Au-delà, un contour est testé à chaque recherche plutôt que rangé dans la grille
+MAX_CELLS_PER_SHAPE = 10000
+
+
+class BoundaryError(ValueError):
+    """Contour GeoJSON invalide"""
+
+
+def parse_boundary(boundary) -> List[List[List[Tuple[float, float]]]]:
+    """
+    Convertit un contour GeoJSON en liste de polygones, chacun une liste
+    d'anneaux [(lng, lat), ...]
+    """
+    if not isinstance(boundary, dict):
+        raise BoundaryError("Le contour doit être un objet GeoJSON")
+
+    geometry_type = boundary.get('type')
+    coordinates = boundary.get('coordinates')
+    if geometry_type == 'Polygon':
+        polygons = [coordinates]
+    elif geometry_type == 'MultiPolygon':
+        polygons = coordinates
+    else:
+        raise BoundaryError("Type de contour non supporté (Polygon ou MultiPolygon attendu)")
+
+    try:
+        parsed = [
+            [[(float(point[0]), float(point[1])) for point in ring] for ring in polygon]
+            for polygon in polygons
+        ]
+    except (TypeError, ValueError, IndexError):
+        raise BoundaryError("Coordonnées du contour invalides")
+
+    for polygon in parsed:
+        if not polygon:
+            raise BoundaryError("Polygone sans contour extérieur")
+        for ring in polygon:
+            if len(ring) < 3:
+                raise BoundaryError("Un anneau doit compter au moins 3 points")
+            for lng, lat in ring:
+                if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+                    raise BoundaryError("Coordonnées hors limites ([longitude, latitude] attendu)")
+    if not parsed:
+        raise BoundaryError("Contour vide")
+    return parsed
+
+
+def point_in_ring(lng: float, lat: float, ring: Sequence[Tuple[float, float]]) -> bool:
+    """Ray casting : nombre impair de croisements = point à l'intérieur"""
+    inside = False
+    previous_lng, previous_lat = ring[-1]
+    for current_lng, current_lat in ring:
+        if (current_lat > lat) != (previous_lat > lat):
+            crossing_lng = (
+                current_lng
+                + (lat - current_lat) * (previous_lng - current_lng) / (previous_lat - current_lat)
+            )
+            if lng < crossing_lng:
+                inside = not inside
+        previous_lng, previous_lat = current_lng, current_lat
+    return inside
+
+
+def ring_area(ring: Sequence[Tuple[float, float]]) -> float:
+    """Aire (en degrés carrés) d'un anneau, formule du lacet"""
+    area = 0.0
+    previous_lng, previous_lat = ring[-1]
+    for current_lng, current_lat in ring:
+        area += previous_lng * current_lat - current_lng * previous_lat
+        previous_lng, previous_lat = current_lng, current_lat
+    return abs(area) / 2
+
+
+class ZoneShape:
+    """Contour d'une zone, avec sa boîte englobante et son aire"""
+
+    __slots__ = ('zone_id', 'polygons', 'min_lng', 'min_lat', 'max_lng', 'max_lat', 'area')
+
+    def __init__(self, zone_id, boundary):
+        self.zone_id = zone_id
+        self.polygons = parse_boundary(boundary)
+
+        points = [point for polygon in self.polygons for point in polygon[0]]
+        self.min_lng = min(lng for lng, _ in points)
+        self.max_lng = max(lng for lng, _ in points)
+        self.min_lat = min(lat for _, lat in points)
+        self.max_lat = max(lat for _, lat in points)
+        self.area = sum(
+            ring_area(polygon[0]) - sum(ring_area(hole) for hole in polygon[1:])
+            for polygon in self.polygons
+        )
+
+    def contains(self, lng: float, lat: float) -> bool:
+        if not (self.min_lng <= lng <= self.max_lng and self.min_lat <= lat <= self.max_lat):
+            return False
+        for polygon in self.polygons:
+            if point_in_ring(lng, lat, polygon[0]) and not any(
+                point_in_ring(lng, lat, hole) for hole in polygon[1:]
+            ):
+                return True
+        return False
+
+
+class ZoneIndex:
+    """Grille fixe sur les boîtes englobantes des contours, puis test exact"""
+
+    def __init__(self, shapes: List[ZoneShape], cell_size: float = None):
+        self.cell_size = cell_size or getattr(settings, 'ZONE_INDEX_CELL_SIZE_DEG', 0.05)
+        self._cells: Dict[Tuple[int, int], List[ZoneShape]] = {}
+        self._large_shapes: List[ZoneShape] = []
+        self.size = len(shapes)
+
+        for shape in shapes:
+            min_x, min_y = self._cell(shape.min_lng, shape.min_lat)
+            max_x, max_y = self._cell(shape.max_lng, shape.max_lat)
+            if (max_x - min_x + 1) * (max_y - min_y + 1) > MAX_CELLS_PER_SHAPE:
+                self._large_shapes.append(shape)
+                continue
+            for x in range(min_x, max_x + 1):
+                for y in range(min_y, max_y + 1):
+                    self._cells.setdefault((x, y), []).append(shape)
+
+    @classmethod
+    def build(cls, boundaries, cell_size: float = None) -> 'ZoneIndex':
+        """
+        Construit l'index depuis [(zone_id, boundary)] ; les contours vides
+        ou invalides sont ignorés (un contour invalide est journalisé)
+        """
+        shapes = []
+        for zone_id, boundary in boundaries:
+            if not boundary:
+                continue
+            try:
+                shapes.append(ZoneShape(zone_id, boundary))
+            except BoundaryError as e:
+                logger.warning(f"Contour ignoré pour la zone {zone_id}: {str(e)}")
+        return cls(shapes, cell_size=cell_size)
+
+    def _cell(self, lng: float, lat: float) -> Tuple[int, int]:
+        return int(math.floor(lng / self.cell_size)), int(math.floor(lat / self.cell_size))
+
+    def locate(self, latitude, longitude) -> Optional[int]:
+        """Identifiant de la plus petite zone contenant le point, ou None"""
+        if latitude is None or longitude is None:
+            return None
+        lat = float(latitude)
+        lng = float(longitude)
+
+        candidates = self._cells.get(self._cell(lng, lat), [])
+        if self._large_shapes:
+            candidates = candidates + self._large_shapes
+
+        best = None
+        for shape in candidates:
+            if (best is None or shape.area < best.area) and shape.contains(lng, lat):
+                best = shape
+        return best.zone_id if best else None
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:43
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_create_vip_zones_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='boundary',
+            field=models.JSONField(blank=True, help_text='Contour GeoJSON (Polygon ou MultiPolygon, coordonnées [longitude, latitude]) utilisé pour détecter la zone à partir du point de départ', null=True, validators=[core.models.validate_boundary], verbose_name='Contour'),
+        ),
+        migrations.AddField(
+            model_name='vipzone',
+            name='boundary',
+            field=models.JSONField(blank=True, help_text='Contour GeoJSON (Polygon ou MultiPolygon, coordonnées [longitude, latitude]) utilisé pour détecter la zone à partir du point de départ', null=True, validators=[core.models.validate_boundary], verbose_name='Contour'),
+        ),
+    ]
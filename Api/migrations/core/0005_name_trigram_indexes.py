@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:05
+
+from django.db import migrations
+
+
+# name__icontains est traduit par UPPER(name) LIKE UPPER(%s) sur PostgreSQL :
+# un index GIN trigramme sur UPPER(name) évite le parcours séquentiel
+# (recherche de l'admin, requêtes hors du catalogue en mémoire)
+TRIGRAM_INDEXES = [
+    ('cities_name_trgm_idx', 'cities'),
+    ('countries_name_trgm_idx', 'countries'),
+    ('vip_zones_name_trgm_idx', 'vip_zones'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index_name, table in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING gin (UPPER(name) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index_name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index_name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_city_vip_zone_boundary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('push', 'Push FCM'), ('otp', 'Code OTP (SMS / WhatsApp)'), ('sms', 'SMS')], max_length=10, verbose_name='Canal')),
+                ('payload', models.JSONField(default=dict, verbose_name='Contenu')),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('PROCESSING', 'En cours de livraison'), ('SENT', 'Envoyé'), ('SKIPPED', 'Ignoré'), ('FAILED', 'Échec définitif'), ('EXPIRED', 'Expiré')], default='PENDING', max_length=10, verbose_name='Statut')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentatives')),
+                ('max_attempts', models.PositiveIntegerField(default=6, verbose_name='Tentatives maximum')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Livrable à partir de')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name="Réservé jusqu'à")),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Expire le')),
+                ('last_error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('result', models.JSONField(blank=True, default=dict, verbose_name='Résultat')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Traité le')),
+            ],
+            options={
+                'verbose_name': 'Message sortant',
+                'verbose_name_plural': 'Messages sortants',
+                'db_table': 'notification_outbox',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='notif_outbox_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0001_initial'),
+        ('notifications', '0002_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FCMBroadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_type', models.CharField(choices=[('driver', 'Chauffeurs'), ('customer', 'Clients')], max_length=10, verbose_name='Destinataires')),
+                ('title', models.CharField(max_length=200, verbose_name='Titre')),
+                ('body', models.TextField(verbose_name='Message')),
+                ('data', models.JSONField(blank=True, default=dict, verbose_name='Données')),
+                ('notification_type', models.CharField(default='system', max_length=50, verbose_name='Type de notification')),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('RUNNING', 'En cours'), ('INTERRUPTED', 'Interrompue'), ('COMPLETED', 'Terminée')], default='PENDING', max_length=12, verbose_name='Statut')),
+                ('last_token_id', models.BigIntegerField(default=0, verbose_name='Dernier token traité')),
+                ('total_tokens', models.PositiveIntegerField(default=0, verbose_name='Tokens à traiter')),
+                ('sent', models.PositiveIntegerField(default=0, verbose_name='Envoyés')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Échecs')),
+                ('deactivated', models.PositiveIntegerField(default=0, verbose_name='Tokens désactivés')),
+                ('chunks', models.PositiveIntegerField(default=0, verbose_name='Lots traités')),
+                ('elapsed_seconds', models.FloatField(default=0, verbose_name="Durée d'envoi (s)")),
+                ('last_error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Démarrée le')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminée le')),
+            ],
+            options={
+                'verbose_name': 'Diffusion FCM',
+                'verbose_name_plural': 'Diffusions FCM',
+                'db_table': 'fcm_broadcasts',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='fcmtoken',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user_type', 'id'], name='fcm_token_active_scan_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_fcm_broadcast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FCMDeliveryReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(blank=True, max_length=20, verbose_name='Plateforme')),
+                ('notification_type', models.CharField(blank=True, max_length=50, verbose_name='Type de notification')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Code HTTP')),
+                ('error_class', models.CharField(choices=[('ok', 'Envoyé'), ('unregistered', 'Token désinscrit'), ('invalid_token', 'Token invalide'), ('sender_mismatch', "Token d'un autre projet"), ('invalid_argument', 'Message refusé'), ('auth', 'Authentification refusée'), ('quota', 'Quota dépassé'), ('server', 'Erreur serveur FCM'), ('network', 'Erreur réseau'), ('other', 'Autre erreur')], default='ok', max_length=20, verbose_name="Classe d'erreur")),
+                ('message_id', models.CharField(blank=True, max_length=64, verbose_name='ID du message FCM')),
+                ('latency_ms', models.PositiveIntegerField(default=0, verbose_name='Latence (ms)')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name="Date d'envoi")),
+                ('token', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='receipts', to='notifications.fcmtoken', verbose_name='Token FCM')),
+            ],
+            options={
+                'verbose_name': 'Reçu de livraison FCM',
+                'verbose_name_plural': 'Reçus de livraison FCM',
+                'db_table': 'fcm_delivery_receipts',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['created_at'], name='fcm_receipt_created_idx'), models.Index(fields=['token', 'created_at'], name='fcm_receipt_token_idx')],
+            },
+        ),
+    ]
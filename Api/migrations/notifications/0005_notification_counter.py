@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0001_initial'),
+        ('notifications', '0004_fcm_delivery_receipt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.PositiveIntegerField()),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Notifications')),
+                ('unread', models.PositiveIntegerField(default=0, verbose_name='Non lues')),
+                ('by_type', models.JSONField(blank=True, default=dict, verbose_name='Par type')),
+                ('recent', models.JSONField(blank=True, default=list, verbose_name='Créations récentes')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernière modification')),
+                ('user_type', models.ForeignKey(limit_choices_to=models.Q(models.Q(('app_label', 'users'), ('model', 'userdriver')), models.Q(('app_label', 'users'), ('model', 'usercustomer')), _connector='OR'), on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Compteurs de notifications',
+                'verbose_name_plural': 'Compteurs de notifications',
+                'db_table': 'notification_counters',
+                'unique_together': {('user_type', 'user_id')},
+            },
+        ),
+    ]
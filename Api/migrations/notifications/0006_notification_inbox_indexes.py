@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0001_initial'),
+        ('notifications', '0005_notification_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user_type', 'user_id', '-created_at', '-id'], name='notif_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('is_read', False)), fields=['user_type', 'user_id', '-created_at', '-id'], name='notif_unread_idx'),
+        ),
+    ]
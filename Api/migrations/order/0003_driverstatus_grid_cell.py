@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:09
+
+from django.db import migrations, models
+
+
+def populate_grid_cells(apps, schema_editor):
+    """Calcule la cellule de grille des positions déjà enregistrées"""
+    from order.spatial_index import grid_cell_for
+
+    DriverStatus = apps.get_model('order', 'DriverStatus')
+    statuses = DriverStatus.objects.filter(
+        current_latitude__isnull=False,
+        current_longitude__isnull=False
+    )
+    for driver_status in statuses.iterator():
+        driver_status.grid_cell = grid_cell_for(
+            driver_status.current_latitude,
+            driver_status.current_longitude
+        )
+        driver_status.save(update_fields=['grid_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0002_initial'),
+        ('users', '0002_migrate_document_user_type_to_contenttype'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driverstatus',
+            name='grid_cell',
+            field=models.CharField(blank=True, editable=False, help_text='Calculée automatiquement depuis la position actuelle', max_length=32, null=True, verbose_name='Cellule de la grille spatiale'),
+        ),
+        migrations.AddIndex(
+            model_name='driverstatus',
+            index=models.Index(fields=['status', 'grid_cell'], name='driver_stat_status_30679b_idx'),
+        ),
+        migrations.RunPython(populate_grid_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0003_driverstatus_grid_cell'),
+        ('users', '0002_migrate_document_user_type_to_contenttype'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverRatingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ratings_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de notes')),
+                ('score_sum', models.PositiveIntegerField(default=0, verbose_name='Somme des notes')),
+                ('average_score', models.DecimalField(decimal_places=2, default=0, max_digits=3, verbose_name='Note moyenne')),
+                ('punctuality_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de notes ponctualité')),
+                ('punctuality_sum', models.PositiveIntegerField(default=0, verbose_name='Somme ponctualité')),
+                ('driving_quality_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de notes conduite')),
+                ('driving_quality_sum', models.PositiveIntegerField(default=0, verbose_name='Somme qualité de conduite')),
+                ('vehicle_cleanliness_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de notes propreté')),
+                ('vehicle_cleanliness_sum', models.PositiveIntegerField(default=0, verbose_name='Somme propreté du véhicule')),
+                ('communication_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de notes communication')),
+                ('communication_sum', models.PositiveIntegerField(default=0, verbose_name='Somme communication')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Mis à jour le')),
+                ('driver', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rating_summary', to='users.userdriver')),
+            ],
+            options={
+                'verbose_name': 'Résumé des notes chauffeur',
+                'verbose_name_plural': 'Résumés des notes chauffeurs',
+                'db_table': 'driver_rating_summaries',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0004_driverratingsummary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='triptracking',
+            name='recorded_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Enregistré le'),
+        ),
+    ]
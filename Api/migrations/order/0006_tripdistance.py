@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0005_triptracking_recorded_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripDistance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance_km', models.DecimalField(decimal_places=6, default=0, max_digits=12, verbose_name='Distance parcourue (km)')),
+                ('accepted_points', models.PositiveIntegerField(default=0, verbose_name='Points retenus')),
+                ('filtered_points', models.PositiveIntegerField(default=0, verbose_name='Points filtrés (bruit)')),
+                ('rejected_points', models.PositiveIntegerField(default=0, verbose_name='Points rejetés')),
+                ('last_latitude', models.DecimalField(blank=True, decimal_places=8, max_digits=10, null=True)),
+                ('last_longitude', models.DecimalField(blank=True, decimal_places=8, max_digits=11, null=True)),
+                ('last_recorded_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Mis à jour le')),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trip_distance', to='order.order')),
+            ],
+            options={
+                'verbose_name': 'Distance parcourue',
+                'verbose_name_plural': 'Distances parcourues',
+                'db_table': 'trip_distances',
+            },
+        ),
+    ]
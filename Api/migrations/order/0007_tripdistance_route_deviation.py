@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0006_tripdistance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tripdistance',
+            name='deviation_alerted',
+            field=models.BooleanField(default=False, verbose_name='Déviation signalée'),
+        ),
+        migrations.AddField(
+            model_name='tripdistance',
+            name='deviation_km',
+            field=models.DecimalField(decimal_places=6, default=0, max_digits=12, verbose_name='Écart à la distance estimée (km)'),
+        ),
+        migrations.AddField(
+            model_name='tripdistance',
+            name='max_deviation_km',
+            field=models.DecimalField(decimal_places=6, default=0, max_digits=12, verbose_name='Écart maximal (km)'),
+        ),
+        migrations.AddField(
+            model_name='tripdistance',
+            name='remaining_km',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=12, null=True, verbose_name='Distance restante (km)'),
+        ),
+        migrations.AlterField(
+            model_name='ordertracking',
+            name='event_type',
+            field=models.CharField(choices=[('ORDER_CREATED', 'Commande créée'), ('DRIVER_SEARCH_STARTED', 'Recherche chauffeur démarrée'), ('DRIVER_NOTIFIED', 'Chauffeur notifié'), ('DRIVER_ACCEPTED', 'Chauffeur a accepté'), ('DRIVER_REJECTED', 'Chauffeur a refusé'), ('DRIVER_ASSIGNED', 'Chauffeur assigné'), ('DRIVER_EN_ROUTE', 'Chauffeur en route'), ('DRIVER_ARRIVED', 'Chauffeur arrivé'), ('TRIP_STARTED', 'Course démarrée'), ('TRIP_COMPLETED', 'Course terminée'), ('ORDER_CANCELLED', 'Commande annulée'), ('PAYMENT_INITIATED', 'Paiement initié'), ('PAYMENT_COMPLETED', 'Paiement complété'), ('PAYMENT_FAILED', 'Paiement échoué'), ('RATING_SUBMITTED', 'Note soumise'), ('LOCATION_UPDATE', 'MAJ position'), ('ROUTE_DEVIATION', "Déviation d'itinéraire")], max_length=30, verbose_name="Type d'événement"),
+        ),
+    ]
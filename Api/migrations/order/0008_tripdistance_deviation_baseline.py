@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0007_tripdistance_route_deviation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tripdistance',
+            name='deviation_baseline_km',
+            field=models.DecimalField(decimal_places=6, default=0, max_digits=12, verbose_name="Écart au dernier retour sur l'itinéraire (km)"),
+        ),
+    ]
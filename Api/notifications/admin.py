@@ -1,7 +1,10 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
 from django.db import models
-from .models import NotificationConfig, Notification, FCMToken
+from .models import NotificationConfig, Notification, FCMToken, NotificationOutbox, FCMBroadcast, FCMDeliveryReceipt
+from .services.notification_counters import reconcile_users
+from .services.push_routing import invalidate_push_routes
 
 # Proxy model pour NotificationConfig basé sur la vraie structure de la table
 class NotificationConfigProxy(models.Model):
@@ -135,9 +138,29 @@ class NotificationProxyAdmin(admin.ModelAdmin):
     @admin.action(description='🗑️ Supprimer tous les éléments sélectionnés')
     def delete_all_selected(self, request, queryset):
         count = queryset.count()
+        users = self.get_users(queryset)
         queryset.delete()
+        reconcile_users(users)
         self.message_user(request, f'{count} notification(s) supprimée(s) avec succès.')
 
+    # Modèle non géré : aucun signal sur Notification, les compteurs sont recalculés ici
+    @staticmethod
+    def get_users(queryset):
+        return list(queryset.order_by().values_list('user_type_id', 'user_id').distinct())
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        reconcile_users([(obj.user_type_id, obj.user_id)])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        reconcile_users([(obj.user_type_id, obj.user_id)])
+
+    def delete_queryset(self, request, queryset):
+        users = self.get_users(queryset)
+        super().delete_queryset(request, queryset)
+        reconcile_users(users)
+
     fieldsets = (
         ('👤 Destinataire', {
             'fields': ('user_type', 'user_id'),
@@ -223,23 +246,31 @@ class NotificationProxyAdmin(admin.ModelAdmin):
     
     def mark_as_read(self, request, queryset):
         from django.utils import timezone
+        users = self.get_users(queryset)
         updated = queryset.filter(is_read=False).update(is_read=True, read_at=timezone.now())
+        reconcile_users(users)
         self.message_user(request, f'👁️ {updated} notification(s) marquée(s) comme lue(s).')
     mark_as_read.short_description = "👁️ Marquer comme lues"
     
     def mark_as_unread(self, request, queryset):
+        users = self.get_users(queryset)
         updated = queryset.update(is_read=False, read_at=None)
+        reconcile_users(users)
         self.message_user(request, f'📩 {updated} notification(s) marquée(s) comme non lue(s).')
     mark_as_unread.short_description = "📩 Marquer comme non lues"
     
     def soft_delete(self, request, queryset):
         from django.utils import timezone
+        users = self.get_users(queryset)
         updated = queryset.filter(is_deleted=False).update(is_deleted=True, deleted_at=timezone.now())
+        reconcile_users(users)
         self.message_user(request, f'🗑️ {updated} notification(s) supprimée(s).')
     soft_delete.short_description = "🗑️ Supprimer les notifications"
     
     def restore(self, request, queryset):
+        users = self.get_users(queryset)
         updated = queryset.update(is_deleted=False, deleted_at=None)
+        reconcile_users(users)
         self.message_user(request, f'♻️ {updated} notification(s) restaurée(s).')
     restore.short_description = "♻️ Restaurer les notifications"
 
@@ -306,11 +337,89 @@ class FCMTokenAdmin(admin.ModelAdmin):
     is_active_display.short_description = 'Statut'
     
     def activate_tokens(self, request, queryset):
+        invalidate_push_routes(queryset.values_list('user_type_id', 'user_id'))
         count = queryset.filter(is_active=False).update(is_active=True)
         self.message_user(request, f'✅ {count} token(s) FCM activé(s).')
     activate_tokens.short_description = "✅ Activer les tokens"
     
     def deactivate_tokens(self, request, queryset):
+        invalidate_push_routes(queryset.values_list('user_type_id', 'user_id'))
         count = queryset.filter(is_active=True).update(is_active=False)
         self.message_user(request, f'❌ {count} token(s) FCM désactivé(s).')
-    deactivate_tokens.short_description = "❌ Désactiver les tokens"
\ No newline at end of file
+    deactivate_tokens.short_description = "❌ Désactiver les tokens"
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'channel', 'get_status_display_colored', 'attempts', 'available_at', 'processed_at', 'created_at']
+    list_filter = ['channel', 'status', 'created_at']
+    search_fields = ['id', 'last_error']
+    readonly_fields = [field.name for field in NotificationOutbox._meta.fields]
+    ordering = ['-created_at']
+
+    actions = ['retry_messages']
+
+    STATUS_COLORS = {
+        'PENDING': '#6c757d',
+        'PROCESSING': '#007bff',
+        'SENT': '#28a745',
+        'SKIPPED': '#17a2b8',
+        'FAILED': '#dc3545',
+        'EXPIRED': '#ffc107',
+    }
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_status_display_colored(self, obj):
+        return format_html('<span style="color: {}; font-weight: bold;">{}</span>',
+                           self.STATUS_COLORS.get(obj.status, '#000'), obj.get_status_display())
+    get_status_display_colored.short_description = 'Statut'
+
+    @admin.action(description='🔁 Relancer les messages en échec')
+    def retry_messages(self, request, queryset):
+        count = queryset.filter(status='FAILED').update(
+            status='PENDING', attempts=0, available_at=timezone.now(), last_error=''
+        )
+        self.message_user(request, f'🔁 {count} message(s) remis en file d\'attente.')
+
+
+@admin.register(FCMBroadcast)
+class FCMBroadcastAdmin(admin.ModelAdmin):
+    list_display = ['id', 'title', 'user_type', 'status', 'get_progress', 'deactivated', 'get_throughput', 'created_at']
+    list_filter = ['user_type', 'status', 'created_at']
+    search_fields = ['title', 'body']
+    readonly_fields = [field.name for field in FCMBroadcast._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_progress(self, obj):
+        return f"{obj.processed}/{obj.total_tokens} ({obj.sent} envoyés)"
+    get_progress.short_description = 'Progression'
+
+    def get_throughput(self, obj):
+        return f"{obj.throughput} tokens/s"
+    get_throughput.short_description = 'Débit'
+
+
+@admin.register(FCMDeliveryReceipt)
+class FCMDeliveryReceiptAdmin(admin.ModelAdmin):
+    list_display = ['id', 'token_id', 'platform', 'notification_type', 'status_code', 'error_class', 'latency_ms', 'created_at']
+    list_filter = ['error_class', 'platform', 'notification_type', 'created_at']
+    search_fields = ['message_id']
+    readonly_fields = [field.name for field in FCMDeliveryReceipt._meta.fields]
+    # Pas de jointure sur fcm_tokens : la table des reçus est volumineuse
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
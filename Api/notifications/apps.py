@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notifications'
-    verbose_name = '📢 Notifications'
\ No newline at end of file
+    verbose_name = '📢 Notifications'
+    def ready(self):
+        from .services import notification_counters, push_routing
+        push_routing.connect_signals()
+        notification_counters.connect_signals()
@@ -0,0 +1,125 @@
+"""
+Commande pour diffuser une notification push a tous les chauffeurs ou clients
+Usage: python manage.py broadcast_notification --user-type driver --title "..." --body "..."
+       python manage.py broadcast_notification --resume 12
+       python manage.py broadcast_notification --list
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from notifications.models import FCMBroadcast
+from notifications.services.fcm_broadcast import BroadcastInterrupted, FCMBroadcaster
+
+
+class Command(BaseCommand):
+    help = 'Diffuse une notification push par lots a tous les appareils d\'un type d\'utilisateur'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-type', choices=['driver', 'customer'], help='Destinataires')
+        parser.add_argument('--title', help='Titre de la notification')
+        parser.add_argument('--body', help='Message de la notification')
+        parser.add_argument('--data', help='Donnees supplementaires (objet JSON)')
+        parser.add_argument('--notification-type', default='system', help='Type de notification')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Tokens lus et envoyes par lot (defaut: FCM_BROADCAST_CHUNK_SIZE)'
+        )
+        parser.add_argument(
+            '--resume',
+            type=int,
+            metavar='ID',
+            help='Reprendre une diffusion interrompue'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Lister les dernieres diffusions'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("\n" + "="*80)
+        self.stdout.write(self.style.SUCCESS("DIFFUSION DE NOTIFICATION PUSH"))
+        self.stdout.write("="*80 + "\n")
+
+        if options['list']:
+            self.list_broadcasts()
+            return
+
+        broadcaster = FCMBroadcaster(chunk_size=options['chunk_size'], progress=self.report_chunk)
+        broadcast = self.get_broadcast(broadcaster, options)
+
+        self.stdout.write(f"[INFO] Diffusion #{broadcast.id} vers: {broadcast.get_user_type_display()}")
+        self.stdout.write(f"[INFO] Titre: {broadcast.title}")
+        self.stdout.write(f"[INFO] Lots de {broadcaster.chunk_size} token(s)")
+        if broadcast.processed:
+            self.stdout.write(f"[REPRISE] {broadcast.processed} token(s) deja traite(s), "
+                              f"reprise apres le token #{broadcast.last_token_id}")
+
+        try:
+            broadcaster.run(broadcast)
+        except (KeyboardInterrupt, BroadcastInterrupted) as e:
+            if isinstance(e, BroadcastInterrupted):
+                self.stdout.write(self.style.ERROR(f"\n[ECHEC FCM] {e}"))
+            self.stdout.write(self.style.WARNING(
+                f"\n[INTERROMPU] Progression enregistree. Reprendre avec: "
+                f"python manage.py broadcast_notification --resume {broadcast.id}"
+            ))
+            return
+
+        self.stdout.write("\n" + "-"*80)
+        self.stdout.write(f"Tokens traites: {broadcast.processed}/{broadcast.total_tokens}")
+        self.stdout.write(self.style.SUCCESS(f"Envoyes: {broadcast.sent}"))
+        if broadcast.failed:
+            self.stdout.write(self.style.WARNING(f"Echecs: {broadcast.failed} "
+                                                 f"(dont {broadcast.deactivated} token(s) desactive(s))"))
+        self.stdout.write(f"Duree d'envoi: {broadcast.elapsed_seconds:.1f} s | "
+                          f"Debit: {broadcast.throughput} tokens/s")
+        self.stdout.write("="*80 + "\n")
+
+    def get_broadcast(self, broadcaster, options) -> FCMBroadcast:
+        if options['resume']:
+            try:
+                broadcast = FCMBroadcast.objects.get(id=options['resume'])
+            except FCMBroadcast.DoesNotExist:
+                raise CommandError(f"Diffusion #{options['resume']} introuvable")
+            if broadcast.status == 'COMPLETED':
+                raise CommandError(f"Diffusion #{broadcast.id} deja terminee")
+            return broadcast
+
+        if not (options['user_type'] and options['title'] and options['body']):
+            raise CommandError("--user-type, --title et --body sont requis (ou --resume ID)")
+
+        try:
+            data = json.loads(options['data']) if options['data'] else {}
+        except ValueError as e:
+            raise CommandError(f"--data n'est pas un JSON valide: {e}")
+
+        return broadcaster.create(
+            user_type=options['user_type'],
+            title=options['title'],
+            body=options['body'],
+            data=data,
+            notification_type=options['notification_type']
+        )
+
+    def report_chunk(self, broadcast: FCMBroadcast, chunk_stats):
+        self.stdout.write(
+            f"  [LOT {broadcast.chunks}] {chunk_stats['sent']}/{chunk_stats['tokens']} envoyes en "
+            f"{chunk_stats['duration']:.2f} s ({chunk_stats['throughput']} tokens/s) - "
+            f"total {broadcast.processed}/{broadcast.total_tokens}"
+        )
+
+    def list_broadcasts(self):
+        broadcasts = FCMBroadcast.objects.all()[:20]
+        if not broadcasts:
+            self.stdout.write("Aucune diffusion")
+        for broadcast in broadcasts:
+            self.stdout.write(
+                f"  #{broadcast.id} {broadcast.created_at.strftime('%Y-%m-%d %H:%M')} "
+                f"{broadcast.user_type:<8} {broadcast.status:<11} "
+                f"{broadcast.processed}/{broadcast.total_tokens} ({broadcast.throughput} tokens/s) "
+                f"- {broadcast.title[:40]}"
+            )
+        self.stdout.write("="*80 + "\n")
@@ -0,0 +1,117 @@
+"""
+Commande pour livrer les messages de l'outbox des notifications (push FCM, OTP, SMS)
+Usage: python manage.py process_notification_outbox [--workers 4] [--once]
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notifications.models import NotificationOutbox
+from notifications.services.outbox import OutboxWorker
+
+
+OUTCOME_LABELS = (
+    ('SENT', 'Envoyes'),
+    ('SKIPPED', 'Ignores (pas de session / appareil)'),
+    ('PENDING', 'Reprogrammes'),
+    ('FAILED', 'Echecs definitifs'),
+    ('EXPIRED', 'Expires'),
+)
+
+
+class Command(BaseCommand):
+    help = "Livre les messages en attente dans l'outbox des notifications"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_OUTBOX_WORKERS', 4),
+            help='Nombre de workers (threads) de livraison'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 20),
+            help='Messages reserves par worker a chaque tour'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=getattr(settings, 'NOTIFICATION_OUTBOX_POLL_INTERVAL', 1.0),
+            help="Attente (secondes) d'un worker quand l'outbox est vide"
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Vider l'outbox des messages dus puis s'arreter"
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        once = options['once']
+
+        self.stdout.write("\n" + "="*80)
+        self.stdout.write(self.style.SUCCESS("LIVRAISON DE L'OUTBOX DES NOTIFICATIONS"))
+        self.stdout.write("="*80 + "\n")
+        self.stdout.write(f"[INFO] Workers: {workers} | Lot: {options['batch_size']} | "
+                          f"Attente si vide: {options['poll_interval']} s")
+        self.stdout.write(f"[INFO] Messages en attente: "
+                          f"{NotificationOutbox.objects.filter(status='PENDING').count()}")
+
+        stop = threading.Event()
+        totals = {}
+        totals_lock = threading.Lock()
+
+        def run_worker():
+            worker = OutboxWorker(batch_size=options['batch_size'])
+            try:
+                while not stop.is_set():
+                    close_old_connections()
+                    try:
+                        outcomes = worker.run_once()
+                    except Exception as e:
+                        self.stderr.write(f"[ERREUR] {threading.current_thread().name}: {e}")
+                        outcomes = {}
+
+                    with totals_lock:
+                        for status, count in outcomes.items():
+                            totals[status] = totals.get(status, 0) + count
+
+                    if not outcomes:
+                        if once:
+                            break
+                        stop.wait(options['poll_interval'])
+            finally:
+                close_old_connections()
+
+        threads = [
+            threading.Thread(target=run_worker, name=f'outbox-{i + 1}', daemon=True)
+            for i in range(workers)
+        ]
+        started_at = time.monotonic()
+        for thread in threads:
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("\n[ARRET] Fin des livraisons en cours..."))
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        elapsed = time.monotonic() - started_at
+        self.stdout.write("\n" + "-"*80)
+        self.stdout.write(f"Duree: {elapsed:.1f} s")
+        for status, label in OUTCOME_LABELS:
+            if totals.get(status):
+                self.stdout.write(f"{label}: {totals[status]}")
+        if not totals:
+            self.stdout.write("Aucun message livre")
+        self.stdout.write("="*80 + "\n")
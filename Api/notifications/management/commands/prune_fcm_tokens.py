@@ -0,0 +1,86 @@
+"""
+Commande pour desactiver les tokens FCM morts a partir des recus de livraison
+et afficher les taux d'echec par plateforme
+Usage: python manage.py prune_fcm_tokens [--window-hours 24] [--interval 300]
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notifications.services.fcm_receipts import FCMTokenPruner
+
+
+class Command(BaseCommand):
+    help = 'Desactive par lots les tokens FCM morts et purge les recus de livraison expires'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window-hours',
+            type=float,
+            default=getattr(settings, 'FCM_PRUNE_WINDOW_HOURS', 24),
+            help='Fenetre d\'analyse des recus (heures)'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=int,
+            default=getattr(settings, 'FCM_PRUNE_FAILURE_THRESHOLD', 5),
+            help='Echecs sans succes au-dela desquels un token est desactive'
+        )
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=getattr(settings, 'FCM_RECEIPT_RETENTION_DAYS', 7),
+            help='Conservation des recus de livraison (jours)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Relancer toutes les N secondes (0 = un seul passage)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("\n" + "="*80)
+        self.stdout.write(self.style.SUCCESS("ELAGAGE DES TOKENS FCM"))
+        self.stdout.write("="*80 + "\n")
+        self.stdout.write(f"[INFO] Fenetre: {options['window_hours']} h | Seuil: {options['threshold']} echecs | "
+                          f"Conservation: {options['retention_days']} j")
+
+        pruner = FCMTokenPruner(
+            window_hours=options['window_hours'],
+            failure_threshold=options['threshold'],
+            retention_days=options['retention_days']
+        )
+
+        try:
+            while True:
+                close_old_connections()
+                self.report(pruner.run())
+                if options['interval'] <= 0:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("\n[ARRET] Elagage interrompu"))
+
+        self.stdout.write("="*80 + "\n")
+
+    def report(self, stats):
+        self.stdout.write("\n" + "-"*80)
+        self.stdout.write(self.style.SUCCESS(f"Tokens desactives: {stats['deactivated']}"))
+        self.stdout.write(f"  - morts (desinscrits / invalides): {stats['dead_tokens']}")
+        self.stdout.write(f"  - echecs repetes sans succes: {stats['failing_tokens']}")
+        self.stdout.write(f"Recus purges: {stats['purged_receipts']}")
+
+        if not stats['platforms']:
+            self.stdout.write("Aucun envoi sur la fenetre")
+        else:
+            self.stdout.write(f"\n{'Plateforme':<12} {'Envois':>8} {'Echecs':>8} {'Taux':>8} "
+                              f"{'Morts':>7} {'Latence':>10}")
+            for row in stats['platforms']:
+                line = (f"{row['platform']:<12} {row['total']:>8} {row['failed']:>8} "
+                        f"{row['failure_rate']:>7}% {row['dead']:>7} {row['avg_latency_ms']:>7} ms")
+                self.stdout.write(self.style.WARNING(line) if row['failure_rate'] >= 10 else line)
+
+        self.stdout.write(f"\n[INFO] Passage termine en {stats['duration_ms']} ms")
@@ -0,0 +1,41 @@
+"""
+Commande pour recalculer les compteurs de notifications (total, non lues, par type)
+Usage: python manage.py reconcile_notification_counters [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+
+from notifications.services.notification_counters import reconcile_all
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les compteurs de notifications de chaque utilisateur et corrige les ecarts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compter les ecarts sans les corriger'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Compteurs lus et ecrits par lot'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("\n" + "="*80)
+        self.stdout.write(self.style.SUCCESS("RECALCUL DES COMPTEURS DE NOTIFICATIONS"))
+        self.stdout.write("="*80 + "\n")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("[DRY-RUN] Aucune modification ne sera enregistree"))
+
+        result = reconcile_all(dry_run=options['dry_run'], batch_size=options['batch_size'])
+
+        self.stdout.write(f"Utilisateurs verifies: {result['checked']}")
+        if result['fixed'] or result['created']:
+            self.stdout.write(self.style.WARNING(f"Compteurs faux: {result['fixed']}"))
+            self.stdout.write(self.style.WARNING(f"Compteurs manquants: {result['created']}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Tous les compteurs sont a jour"))
+        self.stdout.write("="*80 + "\n")
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
@@ -156,18 +156,28 @@ class Notification(models.Model):
     deleted_at = models.DateTimeField(null=True, blank=True, verbose_name="Supprimé le")
     
     def mark_as_read(self):
-        """Marque la notification comme lue"""
+        """Marque la notification comme lue (compteurs de l'utilisateur mis à jour)"""
+        from .services import notification_counters
+
         if not self.is_read:
             self.is_read = True
             self.read_at = timezone.now()
-            self.save(update_fields=['is_read', 'read_at'])
+            # Mise à jour conditionnelle : une lecture concurrente n'est décomptée qu'une fois
+            with transaction.atomic():
+                if Notification.objects.filter(id=self.id, is_read=False).update(is_read=True, read_at=self.read_at):
+                    if not self.is_deleted:
+                        notification_counters.notification_read(self)
     
     def soft_delete(self):
-        """Suppression douce de la notification"""
+        """Suppression douce de la notification (compteurs de l'utilisateur mis à jour)"""
+        from .services import notification_counters
+
         if not self.is_deleted:
             self.is_deleted = True
             self.deleted_at = timezone.now()
-            self.save(update_fields=['is_deleted', 'deleted_at'])
+            with transaction.atomic():
+                if Notification.objects.filter(id=self.id, is_deleted=False).update(is_deleted=True, deleted_at=self.deleted_at):
+                    notification_counters.notification_deleted(self, was_read=self.is_read)
     
     def __str__(self):
         user_str = f"{self.user_type.model} {self.user_id}"
@@ -178,6 +188,14 @@ class Notification(models.Model):
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
         ordering = ['-created_at']
+        indexes = [
+            # Boîte de réception paginée par curseur (notifications.services.inbox)
+            models.Index(fields=['user_type', 'user_id', '-created_at', '-id'],
+                         condition=models.Q(is_deleted=False), name='notif_inbox_idx'),
+            # Notifications non lues seules (endpoint unread)
+            models.Index(fields=['user_type', 'user_id', '-created_at', '-id'],
+                         condition=models.Q(is_deleted=False, is_read=False), name='notif_unread_idx'),
+        ]
 
 
 class FCMToken(models.Model):
@@ -238,4 +256,216 @@ class FCMToken(models.Model):
         verbose_name = 'Token FCM'
         verbose_name_plural = 'Tokens FCM'
         ordering = ['-created_at']
-        unique_together = ('user_type', 'user_id', 'device_id')
\ No newline at end of file
+        unique_together = ('user_type', 'user_id', 'device_id')
+        indexes = [
+            # Parcours par lots (id croissant) des tokens actifs d'un type d'utilisateur (FCMBroadcaster)
+            models.Index(fields=['user_type', 'id'], condition=models.Q(is_active=True),
+                         name='fcm_token_active_scan_idx'),
+        ]
+
+class NotificationOutbox(models.Model):
+    """
+    Message sortant (push FCM, OTP, SMS) écrit dans la même transaction que
+    le changement métier, puis livré par les workers de
+    `process_notification_outbox` (voir notifications.services.outbox)
+    """
+    CHANNEL_CHOICES = [
+        ('push', 'Push FCM'),
+        ('otp', 'Code OTP (SMS / WhatsApp)'),
+        ('sms', 'SMS'),
+    ]
+
+    STATUS_CHOICES = [
+        ('PENDING', 'En attente'),
+        ('PROCESSING', 'En cours de livraison'),
+        ('SENT', 'Envoyé'),
+        ('SKIPPED', 'Ignoré'),
+        ('FAILED', 'Échec définitif'),
+        ('EXPIRED', 'Expiré'),
+    ]
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES, verbose_name="Canal")
+    payload = models.JSONField(default=dict, verbose_name="Contenu")
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='PENDING',
+        verbose_name="Statut"
+    )
+
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentatives")
+    max_attempts = models.PositiveIntegerField(default=6, verbose_name="Tentatives maximum")
+    available_at = models.DateTimeField(default=timezone.now, verbose_name="Livrable à partir de")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="Réservé jusqu'à")
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name="Expire le")
+
+    last_error = models.TextField(blank=True, verbose_name="Dernière erreur")
+    result = models.JSONField(default=dict, blank=True, verbose_name="Résultat")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Traité le")
+
+    def __str__(self):
+        return f"Outbox #{self.id} - {self.get_channel_display()} ({self.status})"
+
+    class Meta:
+        db_table = 'notification_outbox'
+        verbose_name = 'Message sortant'
+        verbose_name_plural = 'Messages sortants'
+        ordering = ['-created_at']
+        indexes = [
+            # Sélection des messages à livrer par les workers
+            models.Index(fields=['status', 'available_at'], name='notif_outbox_due_idx'),
+        ]
+
+
+class FCMBroadcast(models.Model):
+    """
+    Diffusion d'une notification push à tous les appareils d'un type
+    d'utilisateur. La progression (dernier token traité, compteurs) est
+    enregistrée après chaque lot : une diffusion interrompue reprend là où
+    elle s'était arrêtée.
+    """
+
+    USER_TYPE_CHOICES = [
+        ('driver', 'Chauffeurs'),
+        ('customer', 'Clients'),
+    ]
+
+    STATUS_CHOICES = [
+        ('PENDING', 'En attente'),
+        ('RUNNING', 'En cours'),
+        ('INTERRUPTED', 'Interrompue'),
+        ('COMPLETED', 'Terminée'),
+    ]
+
+    user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES, verbose_name="Destinataires")
+    title = models.CharField(max_length=200, verbose_name="Titre")
+    body = models.TextField(verbose_name="Message")
+    data = models.JSONField(default=dict, blank=True, verbose_name="Données")
+    notification_type = models.CharField(max_length=50, default='system', verbose_name="Type de notification")
+
+    status = models.CharField(
+        max_length=12,
+        choices=STATUS_CHOICES,
+        default='PENDING',
+        verbose_name="Statut"
+    )
+    last_token_id = models.BigIntegerField(default=0, verbose_name="Dernier token traité")
+    total_tokens = models.PositiveIntegerField(default=0, verbose_name="Tokens à traiter")
+    sent = models.PositiveIntegerField(default=0, verbose_name="Envoyés")
+    failed = models.PositiveIntegerField(default=0, verbose_name="Échecs")
+    deactivated = models.PositiveIntegerField(default=0, verbose_name="Tokens désactivés")
+    chunks = models.PositiveIntegerField(default=0, verbose_name="Lots traités")
+    elapsed_seconds = models.FloatField(default=0, verbose_name="Durée d'envoi (s)")
+    last_error = models.TextField(blank=True, verbose_name="Dernière erreur")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Démarrée le")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Terminée le")
+
+    def __str__(self):
+        return f"Diffusion #{self.id} - {self.get_user_type_display()} ({self.status})"
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed
+
+    @property
+    def throughput(self) -> float:
+        """Tokens traités par seconde d'envoi"""
+        return round(self.processed / self.elapsed_seconds, 1) if self.elapsed_seconds else 0.0
+
+    class Meta:
+        db_table = 'fcm_broadcasts'
+        verbose_name = 'Diffusion FCM'
+        verbose_name_plural = 'Diffusions FCM'
+        ordering = ['-created_at']
+
+
+class FCMDeliveryReceipt(models.Model):
+    """
+    Résultat compact d'un envoi FCM à un token (statut, identifiant du
+    message, latence, classe d'erreur). Écrit par lots hors requête
+    (notifications.services.fcm_receipts), exploité par `prune_fcm_tokens`
+    pour désactiver les tokens morts et suivre les taux d'échec par plateforme.
+    """
+
+    ERROR_CLASS_CHOICES = [
+        ('ok', 'Envoyé'),
+        ('unregistered', 'Token désinscrit'),
+        ('invalid_token', 'Token invalide'),
+        ('sender_mismatch', 'Token d\'un autre projet'),
+        ('invalid_argument', 'Message refusé'),
+        ('auth', 'Authentification refusée'),
+        ('quota', 'Quota dépassé'),
+        ('server', 'Erreur serveur FCM'),
+        ('network', 'Erreur réseau'),
+        ('other', 'Autre erreur'),
+    ]
+
+    # Pas de contrainte : les reçus survivent à la suppression des tokens (nettoyage)
+    token = models.ForeignKey(
+        FCMToken,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='receipts',
+        verbose_name="Token FCM"
+    )
+    platform = models.CharField(max_length=20, blank=True, verbose_name="Plateforme")
+    notification_type = models.CharField(max_length=50, blank=True, verbose_name="Type de notification")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Code HTTP")
+    error_class = models.CharField(
+        max_length=20,
+        choices=ERROR_CLASS_CHOICES,
+        default='ok',
+        verbose_name="Classe d'erreur"
+    )
+    message_id = models.CharField(max_length=64, blank=True, verbose_name="ID du message FCM")
+    latency_ms = models.PositiveIntegerField(default=0, verbose_name="Latence (ms)")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Date d'envoi")
+
+    def __str__(self):
+        return f"Reçu FCM #{self.id} - {self.platform or '?'} ({self.error_class})"
+
+    class Meta:
+        db_table = 'fcm_delivery_receipts'
+        verbose_name = 'Reçu de livraison FCM'
+        verbose_name_plural = 'Reçus de livraison FCM'
+        ordering = ['-created_at']
+        indexes = [
+            # Fenêtre glissante (taux d'échec) et purge des reçus expirés
+            models.Index(fields=['created_at'], name='fcm_receipt_created_idx'),
+            # Historique récent d'un token (échecs répétés)
+            models.Index(fields=['token', 'created_at'], name='fcm_receipt_token_idx'),
+        ]
+
+
+class NotificationCounter(models.Model):
+    """
+    Compteurs de notifications d'un utilisateur (total, non lues, par type,
+    créations des 7 derniers jours), tenus à jour à chaque création, lecture
+    ou suppression (notifications.services.notification_counters) et
+    recalculés par `reconcile_notification_counters`
+    """
+    limit = models.Q(app_label='users', model='userdriver') | models.Q(app_label='users', model='usercustomer')
+    user_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, limit_choices_to=limit)
+    user_id = models.PositiveIntegerField()
+
+    total = models.PositiveIntegerField(default=0, verbose_name="Notifications")
+    unread = models.PositiveIntegerField(default=0, verbose_name="Non lues")
+    by_type = models.JSONField(default=dict, blank=True, verbose_name="Par type")
+    # Horodatages (epoch) des notifications créées ces 7 derniers jours : today / this_week
+    recent = models.JSONField(default=list, blank=True, verbose_name="Créations récentes")
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
+
+    def __str__(self):
+        return f"Compteurs {self.user_type.model} {self.user_id} ({self.unread}/{self.total})"
+
+    class Meta:
+        db_table = 'notification_counters'
+        verbose_name = 'Compteurs de notifications'
+        verbose_name_plural = 'Compteurs de notifications'
+        unique_together = ('user_type', 'user_id')
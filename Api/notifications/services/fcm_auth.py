@@ -0,0 +1,196 @@
+"""
+Jeton d'accès OAuth2 de l'API Firebase Cloud Messaging
+
+Le fichier service account (FCM_SERVICE_ACCOUNT_PATH) est lu et analysé une
+seule fois. Le jeton d'accès obtenu en échange d'un JWT signé (RS256) est
+gardé en mémoire jusqu'à FCM_TOKEN_REFRESH_MARGIN secondes avant son
+expiration (`expires_in`) :
+
+- jeton valide et hors de la marge : renvoyé sans aucun appel réseau ;
+- jeton dans la marge : un seul thread le renouvelle, les autres continuent
+  avec le jeton courant (encore valide) ;
+- jeton absent ou expiré : un seul thread interroge oauth2.googleapis.com,
+  les autres attendent son résultat (single-flight).
+"""
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import jwt
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+OAUTH_TOKEN_URL = 'https://oauth2.googleapis.com/token'
+FCM_SCOPE = 'https://www.googleapis.com/auth/firebase.messaging'
+
+# Durée de vie demandée pour l'assertion JWT (maximum accepté par Google)
+ASSERTION_LIFETIME = 3600
+
+
+class FirebaseTokenProvider:
+    """Service account chargé une fois et jeton d'accès mis en cache"""
+
+    def __init__(self, service_account_path: str = None, token_url: str = None,
+                 refresh_margin: float = None):
+        self.service_account_path = service_account_path or settings.FCM_SERVICE_ACCOUNT_PATH
+        self.token_url = token_url or getattr(settings, 'FCM_OAUTH_TOKEN_URL', OAUTH_TOKEN_URL)
+        self.refresh_margin = (
+            refresh_margin if refresh_margin is not None
+            else getattr(settings, 'FCM_TOKEN_REFRESH_MARGIN', 300)
+        )
+
+        self._service_account = None
+        self._access_token = None
+        self._expires_at = 0.0
+        self._refreshing = False
+        self._attempts = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+        self._metrics = {
+            'token_requests': 0,  # échanges JWT -> jeton réellement effectués
+            'token_failures': 0,
+            'cache_hits': 0,
+        }
+
+    # --- Service account ---
+
+    @property
+    def service_account(self) -> Dict:
+        """Contenu du fichier service account (lu au premier accès)"""
+        if self._service_account is None:
+            with self._lock:
+                if self._service_account is None:
+                    with open(self.service_account_path, 'r') as f:
+                        self._service_account = json.load(f)
+        return self._service_account
+
+    @property
+    def project_id(self) -> str:
+        return self.service_account['project_id']
+
+    # --- Jeton d'accès ---
+
+    def get_token(self) -> Optional[str]:
+        """Jeton d'accès valide, ou None si l'échange échoue"""
+        now = time.monotonic()
+        token, expires_at = self._access_token, self._expires_at
+
+        if token and now < expires_at - self.refresh_margin:
+            self._metrics['cache_hits'] += 1
+            return token
+
+        if token and now < expires_at:
+            # Renouvellement anticipé : un seul thread s'en charge, les autres gardent le jeton courant
+            with self._lock:
+                if self._refreshing:
+                    self._metrics['cache_hits'] += 1
+                    return token
+                self._refreshing = True
+            try:
+                return self._refresh(token) or token
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        return self._refresh(token)
+
+    def _refresh(self, seen_token: Optional[str]) -> Optional[str]:
+        attempt = self._attempts
+        with self._refresh_lock:
+            # Un autre thread a interrogé le serveur pendant l'attente du verrou : partager son résultat
+            token_is_fresh = self._access_token and time.monotonic() < self._expires_at
+            if token_is_fresh and self._access_token != seen_token:
+                self._metrics['cache_hits'] += 1
+                return self._access_token
+            if self._attempts != attempt:
+                self._metrics['cache_hits'] += 1
+                return self._access_token if token_is_fresh else None
+
+            self._metrics['token_requests'] += 1
+            try:
+                access_token, expires_in = self._request_token()
+            except Exception as e:
+                self._metrics['token_failures'] += 1
+                logger.error(f"Erreur lors de l'obtention du token OAuth2: {str(e)}")
+                return None
+            finally:
+                # Échanges terminés : ceux qui attendaient celui-ci en partagent le résultat
+                self._attempts += 1
+
+            self._access_token = access_token
+            self._expires_at = time.monotonic() + expires_in
+            logger.debug(f"Token OAuth2 Firebase obtenu (valable {expires_in} s)")
+            return access_token
+
+    def _request_token(self):
+        """Échange un JWT signé contre un jeton d'accès : (access_token, expires_in)"""
+        from .fcm_transport import get_fcm_transport
+
+        service_account = self.service_account
+        issued_at = int(time.time())
+        assertion = jwt.encode(
+            {
+                'iss': service_account['client_email'],
+                'sub': service_account['client_email'],
+                'aud': OAUTH_TOKEN_URL,
+                'iat': issued_at,
+                'exp': issued_at + ASSERTION_LIFETIME,
+                'scope': FCM_SCOPE,
+            },
+            service_account['private_key'],
+            algorithm='RS256'
+        )
+
+        transport = get_fcm_transport()
+        response = transport.session.post(
+            self.token_url,
+            data={
+                'grant_type': 'urn:ietf:params:oauth:grant-type:jwt-bearer',
+                'assertion': assertion
+            },
+            timeout=transport.timeout
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code}, {response.text}")
+
+        payload = response.json()
+        return payload['access_token'], float(payload.get('expires_in', ASSERTION_LIFETIME))
+
+    def invalidate(self):
+        """Oublie le jeton (rejeté par FCM) : le prochain envoi en demande un nouveau"""
+        with self._lock:
+            self._access_token = None
+            self._expires_at = 0.0
+
+    def get_metrics(self) -> Dict:
+        metrics = dict(self._metrics)
+        metrics['expires_in'] = (
+            round(self._expires_at - time.monotonic(), 1) if self._access_token else None
+        )
+        return metrics
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_firebase_token_provider() -> FirebaseTokenProvider:
+    """Fournisseur de jeton partagé du processus"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = FirebaseTokenProvider()
+    return _provider
+
+
+def reset_firebase_token_provider():
+    """Oublie le fournisseur partagé (tests, changement de service account)"""
+    global _provider
+    with _provider_lock:
+        _provider = None
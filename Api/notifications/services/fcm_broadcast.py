@@ -0,0 +1,166 @@
+"""
+Diffusion d'une notification push à tous les chauffeurs ou tous les clients
+
+Les tokens actifs ne sont jamais chargés d'un bloc : ils sont lus par ordre
+d'id croissant avec un curseur côté serveur (QuerySet.iterator, curseur
+nommé sous PostgreSQL) et traités par lots de FCM_BROADCAST_CHUNK_SIZE.
+Chaque lot est envoyé en parallèle par le transport FCM, ses reçus de
+livraison sont écrits et ses tokens morts désactivés en une requête
+(sans attendre le thread de fond des reçus), puis la progression est
+enregistrée dans FCMBroadcast (dernier id traité, compteurs, durée).
+
+Une diffusion interrompue (arrêt du processus, Ctrl+C, erreur) reprend après
+le dernier lot enregistré : au pire le lot en cours est renvoyé. Un lot dont
+tous les envois ont échoué temporairement (réseau, identifiants, quota, 5xx)
+n'est pas compté : la diffusion s'arrête (BroadcastInterrupted) et reprendra
+à ce lot.
+"""
+import logging
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+
+from ..models import FCMBroadcast, FCMToken
+from .fcm_receipts import get_receipt_recorder
+from users.models import UserDriver, UserCustomer
+
+
+logger = logging.getLogger(__name__)
+
+USER_TYPE_MODELS = {
+    'driver': UserDriver,
+    'customer': UserCustomer,
+}
+
+
+class BroadcastInterrupted(Exception):
+    """Lot entier en échec temporaire : la diffusion est à reprendre plus tard"""
+
+
+def is_retryable(result) -> bool:
+    """Échec non imputable au token : réseau, identifiants (401), quota (429), erreur FCM (5xx)"""
+    if result.success:
+        return False
+    return result.status_code is None or result.status_code in (401, 429) or result.status_code >= 500
+
+
+class FCMBroadcaster:
+    """Envoi par lots, reprenable, d'une diffusion FCMBroadcast"""
+
+    def __init__(self, chunk_size: int = None, progress: Optional[Callable[[FCMBroadcast, Dict], None]] = None):
+        self.chunk_size = chunk_size or getattr(settings, 'FCM_BROADCAST_CHUNK_SIZE', 500)
+        self.progress = progress
+
+    @staticmethod
+    def create(user_type: str, title: str, body: str, data: Optional[Dict] = None,
+               notification_type: str = 'system') -> FCMBroadcast:
+        if user_type not in USER_TYPE_MODELS:
+            raise ValueError(f"Type d'utilisateur invalide: {user_type}")
+        return FCMBroadcast.objects.create(
+            user_type=user_type,
+            title=title,
+            body=body,
+            data=data or {},
+            notification_type=notification_type
+        )
+
+    def tokens_queryset(self, broadcast: FCMBroadcast):
+        """Tokens actifs restant à traiter, par id croissant"""
+        content_type = ContentType.objects.get_for_model(USER_TYPE_MODELS[broadcast.user_type])
+        return FCMToken.objects.filter(
+            user_type=content_type,
+            is_active=True,
+            id__gt=broadcast.last_token_id
+        ).order_by('id')
+
+    def iter_chunks(self, broadcast: FCMBroadcast) -> Iterator[List[Tuple[int, str]]]:
+        """Lots de (id, token) lus via un curseur côté serveur"""
+        chunk = []
+        for row in self.tokens_queryset(broadcast).values_list('id', 'token').iterator(chunk_size=self.chunk_size):
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def run(self, broadcast: FCMBroadcast) -> FCMBroadcast:
+        """Envoie (ou reprend) la diffusion jusqu'au dernier token"""
+        from .fcm_service import FCMService
+
+        if broadcast.status == 'COMPLETED':
+            return broadcast
+
+        remaining = self.tokens_queryset(broadcast).count()
+        broadcast.total_tokens = broadcast.processed + remaining
+        broadcast.status = 'RUNNING'
+        broadcast.started_at = broadcast.started_at or timezone.now()
+        broadcast.save(update_fields=['total_tokens', 'status', 'started_at'])
+        logger.info(f"📣 Diffusion #{broadcast.id} ({broadcast.user_type}): "
+                    f"{remaining} token(s) restant(s) sur {broadcast.total_tokens}")
+
+        try:
+            for chunk in self.iter_chunks(broadcast):
+                started = time.monotonic()
+                results = FCMService.send_to_tokens_detailed(
+                    tokens=[token for _, token in chunk],
+                    title=broadcast.title,
+                    body=broadcast.body,
+                    data=broadcast.data,
+                    notification_type=broadcast.notification_type
+                )
+                duration = time.monotonic() - started
+                try:
+                    get_receipt_recorder().flush()
+                except Exception:
+                    # Déjà journalisé ; les reçus restent en attente pour le thread de fond
+                    pass
+
+                if results and all(is_retryable(result) for result in results):
+                    # Ni compteurs ni curseur avancés : la reprise renverra ce lot
+                    raise BroadcastInterrupted(
+                        f"Lot de {len(chunk)} token(s) en échec temporaire "
+                        f"(HTTP {results[0].status_code or '-'}: {(results[0].error or results[0].error_class)[:200]})"
+                    )
+
+                sent = sum(1 for result in results if result.success)
+                broadcast.sent += sent
+                broadcast.failed += len(results) - sent
+                broadcast.deactivated += sum(1 for result in results if result.unregistered)
+                broadcast.chunks += 1
+                broadcast.elapsed_seconds += duration
+                broadcast.last_token_id = chunk[-1][0]
+                broadcast.save(update_fields=[
+                    'sent', 'failed', 'deactivated', 'chunks', 'elapsed_seconds', 'last_token_id'
+                ])
+
+                chunk_stats = {
+                    'tokens': len(chunk),
+                    'sent': sent,
+                    'duration': duration,
+                    'throughput': round(len(chunk) / duration, 1) if duration else 0.0,
+                }
+                logger.info(f"📣 Diffusion #{broadcast.id} lot {broadcast.chunks}: {sent}/{len(chunk)} en "
+                            f"{duration:.2f} s ({chunk_stats['throughput']} tokens/s) - "
+                            f"{broadcast.processed}/{broadcast.total_tokens}")
+                if self.progress:
+                    self.progress(broadcast, chunk_stats)
+
+        except BaseException as e:
+            # Ctrl+C compris : la progression des lots terminés est déjà enregistrée
+            broadcast.status = 'INTERRUPTED'
+            broadcast.last_error = str(e) or e.__class__.__name__
+            broadcast.save(update_fields=['status', 'last_error'])
+            logger.warning(f"⏸️ Diffusion #{broadcast.id} interrompue après {broadcast.processed} token(s): "
+                           f"{broadcast.last_error}")
+            raise
+
+        broadcast.status = 'COMPLETED'
+        broadcast.finished_at = timezone.now()
+        broadcast.save(update_fields=['status', 'finished_at'])
+        logger.info(f"✅ Diffusion #{broadcast.id} terminée: {broadcast.sent}/{broadcast.processed} envoyés, "
+                    f"{broadcast.deactivated} token(s) désactivé(s), {broadcast.throughput} tokens/s")
+        return broadcast
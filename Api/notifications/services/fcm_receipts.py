@@ -0,0 +1,320 @@
+"""
+Reçus de livraison FCM et élagage des tokens morts
+
+L'envoi ne touche plus la base : FCMService.send_to_tokens_detailed dépose
+le résultat de chaque token (code HTTP, identifiant du message, latence,
+classe d'erreur) dans DeliveryReceiptRecorder. Un thread de fond vide ce
+tampon toutes les FCM_RECEIPT_FLUSH_INTERVAL secondes :
+
+- une requête pour retrouver l'id et la plateforme des tokens du lot ;
+- un bulk_create des FCMDeliveryReceipt ;
+- une seule mise à jour pour désactiver les tokens morts du lot
+  (désinscrits, invalides, d'un autre projet), routage push invalidé.
+
+FCMTokenPruner (`python manage.py prune_fcm_tokens`) complète ce travail sur
+une fenêtre glissante : tokens morts encore actifs, tokens en échec répété
+(INVALID_ARGUMENT sur un type de notification livré à d'autres tokens) sans
+aucun succès, taux d'échec par plateforme, purge des reçus expirés.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Avg, Count, F, Q
+from django.utils import timezone
+
+from .fcm_transport import DEAD_TOKEN_ERRORS, ERROR_INVALID_ARGUMENT, ERROR_OK, FCMSendResult
+
+
+logger = logging.getLogger(__name__)
+
+# Échecs pouvant venir du token (et non de FCM, du réseau ou de nos identifiants).
+# INVALID_ARGUMENT peut aussi signaler un message mal formé : un échec n'est
+# compté que si le même type de notification a réussi sur un autre token de la
+# fenêtre. Au-delà de FCM_PRUNE_FAILURE_THRESHOLD sans succès, le token est désactivé
+TOKEN_FAILURE_ERRORS = (ERROR_INVALID_ARGUMENT,)
+
+
+class DeliveryReceiptRecorder:
+    """Tampon des résultats d'envoi, écrit par lots hors requête"""
+
+    def __init__(self, flush_interval: float = None, batch_size: int = None, max_size: int = None):
+        self.flush_interval = (flush_interval if flush_interval is not None
+                               else getattr(settings, 'FCM_RECEIPT_FLUSH_INTERVAL', 2))
+        self.batch_size = batch_size or getattr(settings, 'FCM_RECEIPT_BATCH_SIZE', 500)
+        self.max_size = max_size or getattr(settings, 'FCM_RECEIPT_BUFFER_MAX_SIZE', 20000)
+
+        # Au-delà de max_size (base indisponible), les reçus les plus anciens sont perdus
+        self._pending = deque(maxlen=self.max_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._metrics = {
+            'received': 0,           # résultats reçus
+            'written': 0,            # reçus insérés
+            'dropped': 0,            # reçus perdus (tampon plein)
+            'deactivated': 0,        # tokens morts désactivés
+            'batches': 0,
+            'failed_batches': 0,
+            'last_flush_at': None,
+        }
+
+    # --- Alimentation ---
+
+    def record(self, results: List[FCMSendResult], notification_type: str = ''):
+        """Dépose les résultats d'un envoi ; écrits immédiatement si l'intervalle est 0"""
+        if not results:
+            return
+        now = timezone.now()
+        with self._lock:
+            overflow = max(0, len(self._pending) + len(results) - self.max_size)
+            self._pending.extend((result, notification_type, now) for result in results)
+            self._metrics['received'] += len(results)
+            self._metrics['dropped'] += overflow
+
+        if self.flush_interval <= 0:
+            try:
+                self.flush()
+            except Exception:
+                # Déjà journalisé ; les reçus restent en attente pour le prochain lot
+                pass
+        else:
+            self._ensure_started()
+
+    # --- Écriture ---
+
+    def flush(self) -> int:
+        """Écrit les reçus en attente, désactive les tokens morts ; retourne le nombre de reçus"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if not batch:
+                    break
+                try:
+                    written += self._write(batch)
+                except Exception as e:
+                    with self._lock:
+                        self._pending.extendleft(reversed(batch))
+                        self._metrics['failed_batches'] += 1
+                    logger.error(f"Écriture des reçus FCM échouée ({len(batch)} reçus): {str(e)}")
+                    raise
+        return written
+
+    def _write(self, batch) -> int:
+        from ..models import FCMDeliveryReceipt, FCMToken
+        from .fcm_service import FCMService
+
+        known = {
+            token: (token_id, platform)
+            for token, token_id, platform in FCMToken.objects.filter(
+                token__in={result.token for result, _, _ in batch}
+            ).values_list('token', 'id', 'platform')
+        }
+
+        receipts = []
+        dead_tokens = set()
+        for result, notification_type, created_at in batch:
+            token_id, platform = known.get(result.token, (None, ''))
+            receipts.append(FCMDeliveryReceipt(
+                token_id=token_id,
+                platform=platform,
+                notification_type=notification_type[:50],
+                status_code=result.status_code,
+                error_class=result.error_class,
+                message_id=(result.message_id or '').rsplit('/', 1)[-1][:64],
+                latency_ms=int(result.latency_ms or 0),
+                created_at=created_at,
+            ))
+            if result.error_class in DEAD_TOKEN_ERRORS and token_id is not None:
+                dead_tokens.add(result.token)
+
+        FCMDeliveryReceipt.objects.bulk_create(receipts, batch_size=self.batch_size)
+        deactivated = FCMService._deactivate_invalid_tokens(list(dead_tokens)) if dead_tokens else 0
+
+        with self._lock:
+            self._metrics['written'] += len(receipts)
+            self._metrics['deactivated'] += deactivated
+            self._metrics['batches'] += 1
+            self._metrics['last_flush_at'] = timezone.now()
+        return len(receipts)
+
+    # --- Cycle de vie ---
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='fcm-receipts-flush', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                # Déjà journalisé ; les reçus restent en attente pour le prochain passage
+                pass
+        close_old_connections()
+
+    def close(self):
+        """Arrête le thread d'écriture et écrit les reçus restants (arrêt du processus)"""
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 5)
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['pending'] = len(self._pending)
+        return metrics
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_receipt_recorder() -> DeliveryReceiptRecorder:
+    """Tampon partagé du processus, vidé automatiquement à l'arrêt"""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = DeliveryReceiptRecorder()
+                atexit.register(_recorder.close)
+    return _recorder
+
+
+def reset_receipt_recorder():
+    """Vide et oublie le tampon partagé (tests, changement de réglages)"""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is not None:
+            _recorder.close()
+        _recorder = None
+
+
+class FCMTokenPruner:
+    """Désactivation groupée des tokens morts et statistiques d'échec par plateforme"""
+
+    def __init__(self, window_hours: float = None, failure_threshold: int = None,
+                 retention_days: int = None, purge_batch_size: int = 5000):
+        self.window_hours = window_hours or getattr(settings, 'FCM_PRUNE_WINDOW_HOURS', 24)
+        self.failure_threshold = failure_threshold or getattr(settings, 'FCM_PRUNE_FAILURE_THRESHOLD', 5)
+        self.retention_days = retention_days or getattr(settings, 'FCM_RECEIPT_RETENTION_DAYS', 7)
+        self.purge_batch_size = purge_batch_size
+
+    def window_start(self):
+        return timezone.now() - timedelta(hours=self.window_hours)
+
+    def dead_tokens(self, since) -> List[str]:
+        """Tokens actifs avec un reçu « mort » postérieur à leur dernier enregistrement"""
+        from ..models import FCMToken
+
+        return list(FCMToken.objects.filter(
+            is_active=True,
+            receipts__created_at__gte=since,
+            receipts__created_at__gt=F('updated_at'),
+            receipts__error_class__in=DEAD_TOKEN_ERRORS,
+        ).order_by().values_list('token', flat=True).distinct())
+
+    def failing_tokens(self, since) -> List[str]:
+        """
+        Tokens actifs en échec répété, sans aucun succès, sur la fenêtre ; seuls
+        comptent les échecs des types de notification livrés ailleurs (le
+        message est valide, le token est en cause)
+        """
+        from ..models import FCMDeliveryReceipt, FCMToken
+
+        delivered_types = FCMDeliveryReceipt.objects.filter(
+            created_at__gte=since, error_class=ERROR_OK
+        ).order_by().values('notification_type')
+        recent = Q(receipts__created_at__gte=since, receipts__created_at__gt=F('updated_at'))
+        token_failure = Q(
+            receipts__error_class__in=TOKEN_FAILURE_ERRORS,
+            receipts__notification_type__in=delivered_types,
+        )
+        return list(FCMToken.objects.filter(is_active=True).annotate(
+            failures=Count('receipts', filter=recent & token_failure),
+            successes=Count('receipts', filter=recent & Q(receipts__error_class=ERROR_OK)),
+        ).filter(
+            failures__gte=self.failure_threshold, successes=0
+        ).order_by().values_list('token', flat=True))
+
+    def failure_rates(self, since) -> List[Dict]:
+        """Envois, échecs, tokens morts et latence moyenne par plateforme sur la fenêtre"""
+        from ..models import FCMDeliveryReceipt
+
+        rows = FCMDeliveryReceipt.objects.filter(created_at__gte=since).order_by().values('platform').annotate(
+            total=Count('id'),
+            failed=Count('id', filter=~Q(error_class=ERROR_OK)),
+            dead=Count('id', filter=Q(error_class__in=DEAD_TOKEN_ERRORS)),
+            avg_latency_ms=Avg('latency_ms'),
+        ).order_by('platform')
+
+        rates = []
+        for row in rows:
+            row['platform'] = row['platform'] or 'inconnue'
+            row['failure_rate'] = round(100 * row['failed'] / row['total'], 2) if row['total'] else 0.0
+            row['avg_latency_ms'] = round(row['avg_latency_ms'] or 0, 1)
+            rates.append(row)
+        return rates
+
+    def purge(self) -> int:
+        """Supprime, par lots, les reçus plus vieux que la durée de conservation"""
+        from ..models import FCMDeliveryReceipt
+
+        expired = FCMDeliveryReceipt.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=self.retention_days)
+        ).order_by()
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:self.purge_batch_size])
+            if not ids:
+                return deleted
+            deleted += FCMDeliveryReceipt.objects.filter(id__in=ids).delete()[0]
+
+    def run(self) -> Dict:
+        """Un passage complet ; retourne les compteurs et les taux par plateforme"""
+        from .fcm_service import FCMService
+
+        started = time.monotonic()
+        since = self.window_start()
+
+        dead = self.dead_tokens(since)
+        failing = self.failing_tokens(since)
+        deactivated = FCMService._deactivate_invalid_tokens(list(set(dead) | set(failing))) if (dead or failing) else 0
+
+        platforms = self.failure_rates(since)
+        purged = self.purge()
+
+        stats = {
+            'dead_tokens': len(dead),
+            'failing_tokens': len(failing),
+            'deactivated': deactivated,
+            'platforms': platforms,
+            'purged_receipts': purged,
+            'duration_ms': round((time.monotonic() - started) * 1000, 2),
+        }
+        logger.info(f"🧹 Élagage FCM: {deactivated} token(s) désactivé(s) "
+                    f"({len(dead)} morts, {len(failing)} en échec répété), "
+                    f"{stats['purged_receipts']} reçu(s) purgé(s)")
+        return stats
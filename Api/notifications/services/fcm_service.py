@@ -2,18 +2,20 @@
 Service Firebase Cloud Messaging pour l'envoi de notifications push
 Utilise OAuth2 avec Service Account (méthode moderne et sécurisée)
 """
-import json
-import time
 import logging
 import traceback
-import jwt
-import requests
 from typing import List, Dict, Optional, Union
-from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 
 from ..models import NotificationConfig, FCMToken, Notification
+from .fcm_auth import get_firebase_token_provider
+from .fcm_receipts import get_receipt_recorder
+from .fcm_transport import FCMSendResult, get_fcm_transport
+from .push_routing import (
+    get_push_route, get_push_routes, invalidate_push_route, invalidate_push_routes,
+    invalidate_push_routes_for_tokens
+)
 from users.models import UserDriver, UserCustomer
 
 
@@ -25,55 +27,10 @@ class FCMService:
     Service pour gérer Firebase Cloud Messaging avec OAuth2
     """
     
-    FCM_API_URL = "https://fcm.googleapis.com/v1/projects/{}/messages:send"
-    OAUTH_TOKEN_URL = "https://oauth2.googleapis.com/token"
-    
     @classmethod
     def get_firebase_oauth2_token(cls) -> Optional[str]:
-        """Obtient un token OAuth2 pour l'authentification Firebase API"""
-        try:
-            service_account_path = settings.FCM_SERVICE_ACCOUNT_PATH
-            
-            with open(service_account_path, 'r') as f:
-                service_account = json.load(f)
-            
-            # Créer le payload JWT
-            payload = {
-                'iss': service_account['client_email'],
-                'sub': service_account['client_email'], 
-                'aud': cls.OAUTH_TOKEN_URL,
-                'iat': int(time.time()),
-                'exp': int(time.time()) + 3600,
-                'scope': 'https://www.googleapis.com/auth/firebase.messaging'
-            }
-            
-            # Encoder le JWT
-            encoded_jwt = jwt.encode(
-                payload,
-                service_account['private_key'],
-                algorithm='RS256'
-            )
-            
-            # Échanger le JWT contre un token OAuth2
-            response = requests.post(
-                cls.OAUTH_TOKEN_URL,
-                data={
-                    'grant_type': 'urn:ietf:params:oauth:grant-type:jwt-bearer',
-                    'assertion': encoded_jwt
-                }
-            )
-            
-            if response.status_code == 200:
-                oauth2_token = response.json().get('access_token')
-                logger.debug("Token OAuth2 Firebase obtenu avec succès")
-                return oauth2_token
-            else:
-                logger.error(f"Erreur token OAuth2: {response.status_code}, {response.text}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Erreur lors de l'obtention du token OAuth2: {str(e)}")
-            return None
+        """Token OAuth2 pour l'authentification Firebase API (mis en cache jusqu'à son expiration)"""
+        return get_firebase_token_provider().get_token()
     
     @classmethod
     def register_token(cls, user: Union[UserDriver, UserCustomer], 
@@ -92,6 +49,8 @@ class FCMService:
             # Vérifier si le token existe déjà (chercher d'abord par token pour éviter les conflits unique)
             try:
                 fcm_token = FCMToken.objects.get(token=token)
+                # Token repris par un autre compte : oublier aussi le routage de l'ancien propriétaire
+                invalidate_push_routes([(fcm_token.user_type_id, fcm_token.user_id)])
                 # Token existe déjà, mettre à jour les infos utilisateur et appareil
                 fcm_token.user_type = content_type
                 fcm_token.user_id = user.id
@@ -138,6 +97,8 @@ class FCMService:
             )
             
             updated_count = fcm_tokens.update(is_active=False)
+            if updated_count:
+                invalidate_push_route(user)
             
             logger.info(f"Désactivé {updated_count} token(s) FCM pour {user.name} {user.surname}" if hasattr(user, 'name') else f"Client {user.phone_number}")
             return updated_count > 0
@@ -185,15 +146,9 @@ class FCMService:
         try:
             logger.info(f"🔔 Début envoi FCM pour {user.name} {user.surname}" if hasattr(user, 'name') else f"Client {user.phone_number} - Type: {notification_type}")
 
-            # Vérifier si l'utilisateur a une session active
-            from authentication.models import Token
-            user_type_name = 'driver' if isinstance(user, UserDriver) else 'customer'
-
-            has_active_session = Token.objects.filter(
-                user_type=user_type_name,
-                user_id=user.id,
-                is_active=True
-            ).exists()
+            # Session active et tokens FCM (cache de routage, sans requête s'il est à jour)
+            route = get_push_route(user)
+            has_active_session = route['session']
             
             logger.info(f"🔐 Session active pour {user.name} {user.surname}" if hasattr(user, 'name') else f"Client {user.phone_number}: {'✅ Oui' if has_active_session else '❌ Non'}")
             
@@ -202,7 +157,7 @@ class FCMService:
                 logger.info(f"ℹ️  {user_display}: Pas de session active - FCM non envoyée (notification DB créée)")
                 return False
             
-            tokens = cls.get_user_tokens(user)
+            tokens = route['tokens']
             if not tokens:
                 logger.warning(f"❌ Aucun token FCM trouvé pour {user.name} {user.surname}" if hasattr(user, 'name') else f"Client {user.phone_number}")
                 return False
@@ -225,6 +180,94 @@ class FCMService:
             logger.error(traceback.format_exc())
             return False
     
+    @classmethod
+    def send_to_users(cls,
+                      users: List[Union[UserDriver, UserCustomer]],
+                      title: str,
+                      body: str,
+                      data: Optional[Dict] = None,
+                      notification_type: str = 'system') -> Dict[int, bool]:
+        """
+        Envoie une même notification à plusieurs utilisateurs d'un même type,
+        en un seul lot : routage (sessions et tokens) lu dans le cache ou en
+        une requête, tous les appareils servis en parallèle.
+        Retourne {user_id: au moins un appareil atteint}
+        """
+        if not users:
+            return {}
+        
+        try:
+            content_type = ContentType.objects.get_for_model(users[0])
+            user_ids = [user.id for user in users]
+            
+            # Comme send_notification : pas de push sans session active
+            tokens_by_user = {
+                user_id: route['tokens']
+                for user_id, route in get_push_routes(content_type, user_ids).items()
+                if route['session'] and route['tokens']
+            }
+            
+            tokens = [token for user_tokens in tokens_by_user.values() for token in user_tokens]
+            logger.info(f"📤 FCM groupé: {len(tokens_by_user)}/{len(users)} utilisateur(s) joignable(s), {len(tokens)} appareil(s)")
+            
+            results = cls.send_to_tokens_detailed(
+                tokens=tokens,
+                title=title,
+                body=body,
+                data=data,
+                notification_type=notification_type
+            )
+            delivered = {result.token for result in results if result.success}
+            
+            return {
+                user_id: any(token in delivered for token in tokens_by_user.get(user_id, []))
+                for user_id in user_ids
+            }
+            
+        except Exception as e:
+            logger.error(f"💥 Erreur lors de l'envoi FCM groupé: {e}")
+            logger.error(traceback.format_exc())
+            return {user.id: False for user in users}
+    
+    @classmethod
+    def get_project_id(cls) -> Optional[str]:
+        """Project ID Firebase (service account lu une seule fois)"""
+        try:
+            return get_firebase_token_provider().project_id
+        except Exception as e:
+            logger.error(f"❌ Erreur lecture fichier Firebase service account: {e}")
+            return None
+    
+    @classmethod
+    def build_message(cls, token: str, title: str, body: str, string_data: Dict[str, str]) -> Dict:
+        """Message FCM v1 pour un token"""
+        return {
+            "message": {
+                "token": token,
+                "notification": {
+                    "title": title,
+                    "body": body
+                },
+                "data": string_data,
+                "android": {
+                    "notification": {
+                        "click_action": "FLUTTER_NOTIFICATION_CLICK",
+                        "sound": "default",
+                        "channel_id": "woila_notifications"
+                    }
+                },
+                "apns": {
+                    "payload": {
+                        "aps": {
+                            "sound": "default",
+                            "badge": 1,
+                            "content-available": 1
+                        }
+                    }
+                }
+            }
+        }
+    
     @classmethod
     def send_to_tokens(cls,
                       tokens: List[str],
@@ -233,34 +276,48 @@ class FCMService:
                       data: Optional[Dict] = None,
                       notification_type: str = 'system') -> bool:
         """
-        Envoie une notification à plusieurs tokens en utilisant la nouvelle API Firebase v1
+        Envoie une notification à plusieurs tokens ; True si au moins un envoi a réussi
+        """
+        results = cls.send_to_tokens_detailed(
+            tokens=tokens,
+            title=title,
+            body=body,
+            data=data,
+            notification_type=notification_type
+        )
+        return any(result.success for result in results)
+    
+    @classmethod
+    def send_to_tokens_detailed(cls,
+                               tokens: List[str],
+                               title: str,
+                               body: str,
+                               data: Optional[Dict] = None,
+                               notification_type: str = 'system') -> List[FCMSendResult]:
+        """
+        Envoie une notification à plusieurs tokens (API Firebase v1, un message
+        par token, envoyés en parallèle sur des connexions réutilisées) et
+        retourne le résultat de chaque token, dans l'ordre de `tokens`
         """
+        if not tokens:
+            return []
+        
         try:
-            logger.info(f"🚀 Début envoi FCM vers {len(tokens)} token(s)")
-            logger.info(f"📋 Titre: {title}")
-            logger.info(f"💬 Corps: {body[:100]}{'...' if len(body) > 100 else ''}")
-            logger.info(f"🏷️ Type: {notification_type}")
+            logger.info(f"🚀 Début envoi FCM vers {len(tokens)} token(s) - Type: {notification_type}")
+            logger.debug(f"📋 Titre: {title} 💬 Corps: {body[:100]}{'...' if len(body) > 100 else ''}")
             
             # Obtenir le token OAuth2
             oauth2_token = cls.get_firebase_oauth2_token()
             if not oauth2_token:
                 logger.error("❌ Échec de l'obtention du token OAuth2")
-                return False
+                return [FCMSendResult(token, False, error="Token OAuth2 indisponible") for token in tokens]
             
-            logger.info("✅ Token OAuth2 Firebase obtenu")
-            
-            # Obtenir le project_id depuis le fichier service account
-            try:
-                with open(settings.FCM_SERVICE_ACCOUNT_PATH, 'r') as f:
-                    service_account = json.load(f)
-                project_id = service_account['project_id']
-                logger.info(f"🔧 Project ID Firebase: {project_id}")
-            except Exception as e:
-                logger.error(f"❌ Erreur lecture fichier Firebase service account: {e}")
-                return False
+            project_id = cls.get_project_id()
+            if not project_id:
+                return [FCMSendResult(token, False, error="Project ID Firebase indisponible") for token in tokens]
             
-            # Préparer les données
-            notification_data = data or {}
+            # Préparer les données (sans modifier le dictionnaire de l'appelant)
+            notification_data = dict(data or {})
             notification_data.update({
                 'notification_type': notification_type,
                 'timestamp': str(timezone.now().timestamp())
@@ -269,115 +326,93 @@ class FCMService:
             # Convertir toutes les valeurs en string pour FCM
             string_data = {str(k): str(v) for k, v in notification_data.items()}
             
-            success_count = 0
-            invalid_tokens = []
+            results = get_fcm_transport().send(
+                project_id,
+                oauth2_token,
+                [cls.build_message(token, title, body, string_data) for token in tokens]
+            )
             
-            # Envoyer à chaque token individuellement (nouvelle API Firebase v1)
-            for i, token in enumerate(tokens, 1):
-                logger.info(f"📤 Envoi {i}/{len(tokens)} vers token: {token[:20]}...")
-                
-                fcm_message = {
-                    "message": {
-                        "token": token,
-                        "notification": {
-                            "title": title,
-                            "body": body
-                        },
-                        "data": string_data,
-                        "android": {
-                            "notification": {
-                                "click_action": "FLUTTER_NOTIFICATION_CLICK",
-                                "sound": "default",
-                                "channel_id": "woila_notifications"
-                            }
-                        },
-                        "apns": {
-                            "payload": {
-                                "aps": {
-                                    "sound": "default",
-                                    "badge": 1,
-                                    "content-available": 1
-                                }
-                            }
-                        }
-                    }
-                }
-                
-                # Headers avec token OAuth2
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {oauth2_token}"
-                }
-                
-                # Envoyer la requête à l'API FCM v1
-                url = cls.FCM_API_URL.format(project_id)
-                logger.debug(f"🌐 URL FCM: {url}")
-                
-                response = requests.post(
-                    url,
-                    json=fcm_message,
-                    headers=headers,
-                    timeout=30
-                )
-                
-                logger.info(f"📨 Réponse FCM {i}/{len(tokens)}: Status {response.status_code}")
-                
-                if response.status_code == 200:
-                    success_count += 1
-                    logger.info(f"✅ FCM envoyé avec succès au token: {token[:20]}...")
-                    response_data = response.json()
-                    if 'name' in response_data:
-                        logger.debug(f"💌 Message ID Firebase: {response_data['name']}")
-                else:
-                    logger.error(f"❌ FCM échoué pour token {token[:20]}...: {response.status_code}")
-                    logger.error(f"📝 Réponse: {response.text}")
-                    # Si le token FCM n'est plus valide, le marquer comme invalide
-                    if response.status_code == 404 or "registration token" in response.text.lower():
-                        invalid_tokens.append(token)
-            
-            # Désactiver les tokens invalides
-            if invalid_tokens:
-                cls._deactivate_invalid_tokens(invalid_tokens)
-            
-            logger.info(f"FCM envoyé: {success_count}/{len(tokens)} réussis, {len(invalid_tokens)} tokens invalides")
-            return success_count > 0
+            # Token OAuth2 refusé (révoqué) : en redemander un au prochain envoi
+            if any(result.status_code == 401 for result in results):
+                get_firebase_token_provider().invalidate()
+            
+            # Reçus de livraison écrits hors requête ; les tokens morts y sont désactivés par lots
+            get_receipt_recorder().record(results, notification_type)
+            
+            success_count = sum(1 for result in results if result.success)
+            invalid_count = sum(1 for result in results if result.unregistered)
+            logger.info(f"FCM envoyé: {success_count}/{len(tokens)} réussis, {invalid_count} tokens invalides")
+            return results
                 
         except Exception as e:
             logger.error(f"Erreur lors de l'envoi FCM: {e}")
             logger.error(traceback.format_exc())
-            return False
+            return [FCMSendResult(token, False, error=str(e)) for token in tokens]
     
     @classmethod
-    def _deactivate_invalid_tokens(cls, invalid_tokens: List[str]):
+    def _deactivate_invalid_tokens(cls, invalid_tokens: List[str]) -> int:
         """
-        Désactive les tokens FCM invalides
+        Désactive les tokens FCM invalides et retourne leur nombre
         """
         try:
+            invalidate_push_routes_for_tokens(invalid_tokens)
             count = FCMToken.objects.filter(
                 token__in=invalid_tokens, 
                 is_active=True
             ).update(is_active=False)
             
             logger.info(f"Désactivé {count} token(s) FCM invalide(s)")
+            return count
                     
         except Exception as e:
             logger.error(f"Erreur lors de la désactivation des tokens: {e}")
+            return 0
     
+    # Contenu des notifications push (plus court que la notification en base)
+
+    @classmethod
+    def welcome_push(cls, user: Union[UserDriver, UserCustomer]) -> Dict:
+        return {
+            'title': "🎉 Bienvenue sur WOILA !",
+            'body': f"Bonjour et bienvenue dans la famille WOILA ! Nous sommes ravis de vous compter parmi nous.",
+            'notification_type': 'welcome',
+            'data': {
+                'welcome_message': True,
+                'user_name': user.name if hasattr(user, 'name') else f"Client {user.phone_number}"
+            },
+        }
+
+    @classmethod
+    def referral_bonus_push(cls, referral_code: str, bonus_amount: float) -> Dict:
+        return {
+            'title': "🎁 Bonus de parrainage reçu !",
+            'body': f"Félicitations ! Votre code parrain {referral_code} a été utilisé. Vous avez reçu {bonus_amount} FCFA de bonus !",
+            'notification_type': 'referral_used',
+            'data': {
+                'referral_code': referral_code,
+                'bonus_amount': str(bonus_amount),
+                'bonus_type': 'referral'
+            },
+        }
+
+    @classmethod
+    def vehicle_approval_push(cls, vehicle_name: str) -> Dict:
+        return {
+            'title': "🚗✅ Véhicule approuvé !",
+            'body': f"Excellente nouvelle ! Votre véhicule {vehicle_name} a été approuvé et est maintenant actif sur la plateforme.",
+            'notification_type': 'vehicle_approved',
+            'data': {
+                'vehicle_name': vehicle_name,
+                'approval_status': 'approved'
+            },
+        }
+
     @classmethod
     def send_welcome_notification(cls, user: Union[UserDriver, UserCustomer]) -> bool:
         """
         Envoie une notification de bienvenue
         """
-        return cls.send_notification(
-            user=user,
-            title="🎉 Bienvenue sur WOILA !",
-            body=f"Bonjour et bienvenue dans la famille WOILA ! Nous sommes ravis de vous compter parmi nous.",
-            notification_type='welcome',
-            data={
-                'welcome_message': True,
-                'user_name': user.name if hasattr(user, 'name') else f"Client {user.phone_number}"
-            }
-        )
+        return cls.send_notification(user=user, **cls.welcome_push(user))
     
     @classmethod
     def send_referral_bonus_notification(cls, 
@@ -387,17 +422,7 @@ class FCMService:
         """
         Envoie une notification de bonus de parrainage
         """
-        return cls.send_notification(
-            user=user,
-            title="🎁 Bonus de parrainage reçu !",
-            body=f"Félicitations ! Votre code parrain {referral_code} a été utilisé. Vous avez reçu {bonus_amount} FCFA de bonus !",
-            notification_type='referral_used',
-            data={
-                'referral_code': referral_code,
-                'bonus_amount': str(bonus_amount),
-                'bonus_type': 'referral'
-            }
-        )
+        return cls.send_notification(user=user, **cls.referral_bonus_push(referral_code, bonus_amount))
     
     @classmethod
     def send_vehicle_approval_notification(cls, 
@@ -406,16 +431,7 @@ class FCMService:
         """
         Envoie une notification d'approbation de véhicule
         """
-        return cls.send_notification(
-            user=driver,
-            title="🚗✅ Véhicule approuvé !",
-            body=f"Excellente nouvelle ! Votre véhicule {vehicle_name} a été approuvé et est maintenant actif sur la plateforme.",
-            notification_type='vehicle_approved',
-            data={
-                'vehicle_name': vehicle_name,
-                'approval_status': 'approved'
-            }
-        )
+        return cls.send_notification(user=driver, **cls.vehicle_approval_push(vehicle_name))
     
     @classmethod
     def cleanup_inactive_tokens(cls, days_old: int = 30) -> int:
@@ -464,38 +480,31 @@ class FCMService:
                          notification_type: str = 'system') -> bool:
         """
         Envoie une notification à tous les utilisateurs d'un type donné
+        (par lots, voir FCMBroadcaster ; reprendre une diffusion interrompue
+        avec `python manage.py broadcast_notification --resume <id>`)
         """
+        from .fcm_broadcast import BroadcastInterrupted, FCMBroadcaster
+        
+        broadcast = None
         try:
-            if user_type == 'driver':
-                model_class = UserDriver
-            elif user_type == 'customer':
-                model_class = UserCustomer
-            else:
-                logger.error(f"Type d'utilisateur invalide: {user_type}")
-                return False
-            
-            content_type = ContentType.objects.get_for_model(model_class)
-            
-            # Récupérer tous les tokens actifs pour ce type d'utilisateur
-            tokens = list(FCMToken.objects.filter(
-                user_type=content_type,
-                is_active=True
-            ).values_list('token', flat=True))
-            
-            if not tokens:
-                logger.warning(f"Aucun token FCM actif trouvé pour les {user_type}s")
-                return False
-            
-            logger.info(f"Envoi FCM à {len(tokens)} {user_type}s")
-            
-            return cls.send_to_tokens(
-                tokens=tokens,
+            broadcaster = FCMBroadcaster()
+            broadcast = broadcaster.create(
+                user_type=user_type,
                 title=title,
                 body=body,
                 data=data,
                 notification_type=notification_type
             )
+            broadcaster.run(broadcast)
             
+            if not broadcast.total_tokens:
+                logger.warning(f"Aucun token FCM actif trouvé pour les {user_type}s")
+            return broadcast.sent > 0
+            
+        except BroadcastInterrupted as e:
+            logger.error(f"Diffusion #{broadcast.id} aux {user_type}s interrompue: {e} - reprendre avec "
+                         f"`python manage.py broadcast_notification --resume {broadcast.id}`")
+            return False
         except Exception as e:
             logger.error(f"Erreur lors de l'envoi FCM aux {user_type}s: {e}")
             return False
\ No newline at end of file
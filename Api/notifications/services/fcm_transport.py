@@ -0,0 +1,209 @@
+"""
+Transport HTTP vers l'API Firebase Cloud Messaging v1
+
+L'API v1 n'accepte qu'un token par requête. FCMTransport garde une session
+HTTP dont les connexions keep-alive sont réutilisées d'un envoi à l'autre
+(une seule poignée de main TLS par connexion du pool), et envoie les
+messages d'un lot en parallèle, au plus FCM_MAX_CONCURRENCY à la fois.
+
+Chaque envoi produit un FCMSendResult (succès, code HTTP, identifiant du
+message, latence, classe d'erreur, token à désactiver). L'URL de base (FCM_API_BASE_URL) peut pointer
+vers un serveur local pour les tests.
+"""
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = 'https://fcm.googleapis.com'
+
+# Erreurs FCM indiquant que le token n'est plus utilisable
+UNREGISTERED_ERRORS = ('UNREGISTERED', 'registration token')
+
+# Classes d'erreur d'un envoi (FCMSendResult.error_class, FCMDeliveryReceipt)
+ERROR_OK = 'ok'
+ERROR_UNREGISTERED = 'unregistered'          # 404 / UNREGISTERED : application désinstallée
+ERROR_INVALID_TOKEN = 'invalid_token'        # 400 « registration token » : token mal formé
+ERROR_SENDER_MISMATCH = 'sender_mismatch'    # 403 : token d'un autre projet Firebase
+ERROR_INVALID_ARGUMENT = 'invalid_argument'  # 400 : message refusé
+ERROR_AUTH = 'auth'                          # 401 : jeton OAuth2 refusé
+ERROR_QUOTA = 'quota'                        # 429 : quota dépassé
+ERROR_SERVER = 'server'                      # 5xx : indisponibilité FCM
+ERROR_NETWORK = 'network'                    # pas de réponse (connexion, délai)
+ERROR_OTHER = 'other'
+
+# Classes qui condamnent le token : il est désactivé sans nouvel essai
+DEAD_TOKEN_ERRORS = (ERROR_UNREGISTERED, ERROR_INVALID_TOKEN, ERROR_SENDER_MISMATCH)
+
+
+def classify_error(status_code: Optional[int], error: str = '') -> str:
+    """Classe d'erreur d'une réponse FCM (code HTTP et corps)"""
+    if status_code == 200:
+        return ERROR_OK
+    if status_code is None:
+        return ERROR_NETWORK
+
+    error = (error or '').lower()
+    if status_code == 404 or 'unregistered' in error:
+        return ERROR_UNREGISTERED
+    if 'sender_id_mismatch' in error:
+        return ERROR_SENDER_MISMATCH
+    if any(marker.lower() in error for marker in UNREGISTERED_ERRORS):
+        return ERROR_INVALID_TOKEN
+    if status_code == 400:
+        return ERROR_INVALID_ARGUMENT
+    if status_code == 401:
+        return ERROR_AUTH
+    if status_code == 429:
+        return ERROR_QUOTA
+    if status_code >= 500:
+        return ERROR_SERVER
+    return ERROR_OTHER
+
+
+class FCMSendResult:
+    """Résultat de l'envoi d'un message à un token"""
+
+    __slots__ = ('token', 'success', 'status_code', 'message_id', 'error', 'unregistered',
+                 'error_class', 'latency_ms')
+
+    def __init__(self, token: str, success: bool, status_code: Optional[int] = None,
+                 message_id: Optional[str] = None, error: Optional[str] = None,
+                 unregistered: bool = False, error_class: Optional[str] = None,
+                 latency_ms: Optional[float] = None):
+        self.token = token
+        self.success = success
+        self.status_code = status_code
+        self.message_id = message_id
+        self.error = error
+        self.unregistered = unregistered
+        self.error_class = error_class or (ERROR_OK if success else ERROR_OTHER)
+        self.latency_ms = latency_ms
+
+    def to_dict(self) -> Dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self):
+        return f"<FCMSendResult {self.token[:20]}... {'ok' if self.success else self.status_code}>"
+
+
+class FCMTransport:
+    """Session HTTP poolée et envoi concurrent borné"""
+
+    def __init__(self, base_url: str = None, max_concurrency: int = None,
+                 connect_timeout: float = None, read_timeout: float = None):
+        self.base_url = (base_url or getattr(settings, 'FCM_API_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self.max_concurrency = max_concurrency or getattr(settings, 'FCM_MAX_CONCURRENCY', 10)
+        self.timeout = (
+            connect_timeout or getattr(settings, 'FCM_CONNECT_TIMEOUT', 3),
+            read_timeout or getattr(settings, 'FCM_READ_TIMEOUT', 10),
+        )
+
+        self.session = requests.Session()
+        # Autant de connexions gardées ouvertes que d'envois simultanés
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def send_url(self, project_id: str) -> str:
+        return f"{self.base_url}/v1/projects/{project_id}/messages:send"
+
+    def send(self, project_id: str, access_token: str, messages: List[Dict]) -> List[FCMSendResult]:
+        """
+        Envoie les messages ({"message": {"token": ..., ...}}) et retourne un
+        FCMSendResult par message, dans le même ordre
+        """
+        if not messages:
+            return []
+
+        url = self.send_url(project_id)
+        headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {access_token}',
+        }
+
+        if len(messages) == 1:
+            return [self._send_one(url, headers, messages[0])]
+        return list(self._get_executor().map(
+            lambda message: self._send_one(url, headers, message), messages
+        ))
+
+    def _send_one(self, url: str, headers: Dict, message: Dict) -> FCMSendResult:
+        token = message['message'].get('token', '')
+        started = time.monotonic()
+        try:
+            response = self.session.post(url, json=message, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.error(f"❌ FCM injoignable pour token {token[:20]}...: {e}")
+            return FCMSendResult(token, False, error=str(e), error_class=ERROR_NETWORK,
+                                 latency_ms=round((time.monotonic() - started) * 1000, 2))
+        latency_ms = round((time.monotonic() - started) * 1000, 2)
+
+        if response.status_code == 200:
+            try:
+                message_id = response.json().get('name')
+            except ValueError:
+                message_id = None
+            return FCMSendResult(token, True, status_code=200, message_id=message_id,
+                                 error_class=ERROR_OK, latency_ms=latency_ms)
+
+        error = response.text
+        error_class = classify_error(response.status_code, error)
+        logger.error(f"❌ FCM échoué pour token {token[:20]}...: {response.status_code} ({error_class})")
+        logger.debug(f"📝 Réponse: {error}")
+        return FCMSendResult(token, False, status_code=response.status_code, error=error,
+                             unregistered=error_class in DEAD_TOKEN_ERRORS,
+                             error_class=error_class, latency_ms=latency_ms)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_concurrency, thread_name_prefix='fcm-send'
+                    )
+        return self._executor
+
+    def close(self):
+        """Arrête les threads d'envoi et ferme les connexions du pool"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        self.session.close()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_fcm_transport() -> FCMTransport:
+    """Transport partagé du processus (connexions réutilisées entre les envois)"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = FCMTransport()
+                atexit.register(_transport.close)
+    return _transport
+
+
+def reset_fcm_transport():
+    """Ferme et oublie le transport partagé (tests, changement de réglages)"""
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = None
@@ -0,0 +1,80 @@
+"""
+Boîte de réception : pagination par curseur (keyset)
+
+Les notifications d'un utilisateur sont lues par (created_at, id)
+décroissants. Une page s'arrête à `limit` lignes et renvoie un curseur
+opaque désignant sa dernière notification ; la page suivante reprend
+strictement avant elle :
+
+    WHERE user_type_id = ? AND user_id = ? AND is_deleted = false
+      AND (created_at < ? OR (created_at = ? AND id < ?))
+    ORDER BY created_at DESC, id DESC
+    LIMIT limit + 1
+
+La requête suit les index partiels notif_inbox_idx / notif_unread_idx : son
+coût ne dépend pas de l'ancienneté de la page (pas d'OFFSET) et les
+notifications créées entre deux pages ne décalent pas les suivantes.
+"""
+import base64
+import binascii
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+
+from ..models import Notification
+
+
+def page_size(limit: Optional[int] = None) -> int:
+    """Taille de page demandée, bornée par NOTIFICATION_INBOX_MAX_PAGE_SIZE"""
+    if limit is None:
+        limit = getattr(settings, 'NOTIFICATION_INBOX_PAGE_SIZE', 50)
+    if limit < 1:
+        raise ValueError("limit doit être positif")
+    return min(limit, getattr(settings, 'NOTIFICATION_INBOX_MAX_PAGE_SIZE', 100))
+
+
+def encode_cursor(notification: Notification) -> str:
+    raw = f"{notification.created_at.isoformat()}|{notification.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(created_at, id) de la dernière notification de la page précédente ; ValueError si invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, notification_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(notification_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Curseur invalide")
+
+
+def inbox_queryset(user, unread_only: bool = False):
+    content_type = ContentType.objects.get_for_model(user)
+    queryset = Notification.objects.filter(user_type=content_type, user_id=user.id, is_deleted=False)
+    if unread_only:
+        queryset = queryset.filter(is_read=False)
+    return queryset.order_by('-created_at', '-id')
+
+
+def get_inbox_page(user, unread_only: bool = False, limit: Optional[int] = None,
+                   cursor: Optional[str] = None) -> Tuple[List[Notification], Optional[str]]:
+    """
+    Une page de notifications et le curseur de la suivante (None en fin de liste)
+    """
+    limit = page_size(limit)
+    queryset = inbox_queryset(user, unread_only=unread_only)
+
+    if cursor:
+        created_at, notification_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=notification_id)
+        )
+
+    notifications = list(queryset[:limit + 1])
+    if len(notifications) <= limit:
+        return notifications, None
+    notifications = notifications[:limit]
+    return notifications, encode_cursor(notifications[-1])
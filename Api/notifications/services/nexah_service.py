@@ -1,6 +1,7 @@
 # api/services/nexah_service.py
 import requests
 import logging
+from django.conf import settings
 from ..models import NotificationConfig
 
 logger = logging.getLogger(__name__)
@@ -8,6 +9,14 @@ logger = logging.getLogger(__name__)
 class NexahService:
     """Service to handle SMS communications with Nexah API"""
     
+    @staticmethod
+    def _timeout():
+        """(connect, read) timeouts, shorter than the outbox lease"""
+        return (
+            getattr(settings, 'NOTIFICATION_PROVIDER_CONNECT_TIMEOUT', 3),
+            getattr(settings, 'NOTIFICATION_PROVIDER_READ_TIMEOUT', 10),
+        )
+    
     @classmethod
     def send_sms(cls, recipient, message, sender_id=None):
         """
@@ -49,7 +58,7 @@ class NexahService:
             logger.debug(f"Nexah API payload user: {payload['user']}, sender: {payload['senderid']}")
             
             # Send request
-            response = requests.post(url, json=payload, headers=headers)
+            response = requests.post(url, json=payload, headers=headers, timeout=cls._timeout())
             
             # Log response
             logger.info(f"Nexah API response: {response.status_code}")
@@ -125,7 +134,7 @@ class NexahService:
             }
             
             # Send request
-            response = requests.post(url, json=payload, headers=headers)
+            response = requests.post(url, json=payload, headers=headers, timeout=cls._timeout())
             
             logger.info(f"Account info response: {response.status_code}")
             
@@ -0,0 +1,268 @@
+"""
+Compteurs de notifications par utilisateur
+
+Le badge (non lues) et les statistiques de la boîte de réception ne
+recomptent plus la table notifications : ils lisent une seule ligne
+NotificationCounter, par sa clé unique (user_type, user_id) :
+
+    {'total', 'unread', 'by_type': {type: n}, 'recent': [epoch, ...]}
+
+La ligne est verrouillée (select_for_update) et mise à jour dans la
+transaction de chaque création, lecture ou suppression : sans cache
+intermédiaire, tous les processus lisent la valeur validée. `recent` garde
+l'heure de création des notifications des 7 derniers jours (today / this_week).
+
+Les update() groupés de l'admin recalculent les compteurs des utilisateurs
+touchés ; `python manage.py reconcile_notification_counters` recalcule tout.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, Tuple
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+
+# Fenêtre des statistiques this_week
+RECENT_WINDOW = timedelta(days=7)
+
+
+def _empty() -> Dict:
+    return {'total': 0, 'unread': 0, 'by_type': {}, 'recent': []}
+
+
+def _as_dict(counter) -> Dict:
+    return {'total': counter.total, 'unread': counter.unread, 'by_type': counter.by_type, 'recent': counter.recent}
+
+
+# --- Lecture ---
+
+def get_counters(user) -> Dict:
+    """Compteurs d'un utilisateur : une ligne lue par index, recalculée si absente"""
+    from ..models import NotificationCounter
+
+    user_type_id = ContentType.objects.get_for_model(user).id
+    counter = NotificationCounter.objects.filter(user_type_id=user_type_id, user_id=user.id).only(
+        'total', 'unread', 'by_type', 'recent'
+    ).first()
+    return _as_dict(counter) if counter else recompute(user_type_id, user.id)
+
+
+def get_unread_count(user) -> int:
+    return get_counters(user)['unread']
+
+
+def get_stats(user) -> Dict:
+    """Statistiques de l'endpoint stats (total, unread, today, this_week, by_type)"""
+    counters = get_counters(user)
+    now = timezone.now()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    week_start = (now - RECENT_WINDOW).timestamp()
+    return {
+        'total': counters['total'],
+        'unread': counters['unread'],
+        'today': sum(1 for created in counters['recent'] if created >= today_start),
+        'this_week': sum(1 for created in counters['recent'] if created >= week_start),
+        'by_type': dict(counters['by_type']),
+    }
+
+
+# --- Mise à jour ---
+
+def _update(user_type_id: int, user_id: int, change: Callable):
+    """
+    Verrouille la ligne de compteurs et applique `change(counter)` ; sans ligne,
+    les compteurs sont recalculés (la base contient déjà le changement)
+    """
+    from ..models import NotificationCounter
+
+    with transaction.atomic():
+        counter = NotificationCounter.objects.select_for_update().filter(
+            user_type_id=user_type_id, user_id=user_id
+        ).first()
+        if counter is None:
+            result = None
+            recompute(user_type_id, user_id)
+        else:
+            result = change(counter)
+            week_start = (timezone.now() - RECENT_WINDOW).timestamp()
+            counter.recent = [created for created in counter.recent if created >= week_start]
+            counter.save(update_fields=['total', 'unread', 'by_type', 'recent', 'updated_at'])
+    return result
+
+
+def _add_type(counter, notification_type: str, delta: int):
+    count = counter.by_type.get(notification_type, 0) + delta
+    if count > 0:
+        counter.by_type[notification_type] = count
+    else:
+        counter.by_type.pop(notification_type, None)
+
+
+def notification_created(notification):
+    if notification.is_deleted:
+        return
+
+    def change(counter):
+        counter.total += 1
+        counter.unread += 0 if notification.is_read else 1
+        _add_type(counter, notification.notification_type, 1)
+        counter.recent.append(notification.created_at.timestamp())
+
+    _update(notification.user_type_id, notification.user_id, change)
+
+
+def notification_read(notification):
+    def change(counter):
+        counter.unread = max(0, counter.unread - 1)
+
+    _update(notification.user_type_id, notification.user_id, change)
+
+
+def notification_deleted(notification, was_read: bool):
+    def change(counter):
+        counter.total = max(0, counter.total - 1)
+        if not was_read:
+            counter.unread = max(0, counter.unread - 1)
+        _add_type(counter, notification.notification_type, -1)
+        created = notification.created_at.timestamp()
+        if created in counter.recent:
+            counter.recent.remove(created)
+
+    _update(notification.user_type_id, notification.user_id, change)
+
+
+def mark_all_read(user_type_id: int, user_id: int) -> int:
+    """
+    Marque toutes les notifications comme lues en une requête, sous le verrou
+    des compteurs (une notification créée entre-temps reste comptée)
+    """
+    from ..models import Notification, NotificationCounter
+
+    def change(counter):
+        counter.unread = 0
+        return Notification.objects.filter(
+            user_type_id=user_type_id, user_id=user_id, is_read=False, is_deleted=False
+        ).update(is_read=True, read_at=timezone.now())
+
+    with transaction.atomic():
+        if not NotificationCounter.objects.filter(user_type_id=user_type_id, user_id=user_id).exists():
+            recompute(user_type_id, user_id)
+        return _update(user_type_id, user_id, change)
+
+
+# --- Recalcul ---
+
+def _compute(**filters) -> Dict[Tuple[int, int], Dict]:
+    """Compteurs attendus, calculés depuis la table notifications (deux requêtes groupées)"""
+    from ..models import Notification
+
+    visible = Notification.objects.filter(is_deleted=False, **filters).order_by()
+    expected = defaultdict(_empty)
+
+    rows = visible.values('user_type_id', 'user_id', 'notification_type').annotate(
+        total=Count('id'), unread=Count('id', filter=Q(is_read=False))
+    )
+    for row in rows.iterator():
+        counters = expected[(row['user_type_id'], row['user_id'])]
+        counters['total'] += row['total']
+        counters['unread'] += row['unread']
+        counters['by_type'][row['notification_type']] = row['total']
+
+    recent = visible.filter(created_at__gte=timezone.now() - RECENT_WINDOW).values_list(
+        'user_type_id', 'user_id', 'created_at'
+    )
+    for user_type_id, user_id, created_at in recent.iterator():
+        expected[(user_type_id, user_id)]['recent'].append(created_at.timestamp())
+
+    return expected
+
+
+def _differs(counter, expected: Dict) -> bool:
+    return (
+        counter.total != expected['total']
+        or counter.unread != expected['unread']
+        or counter.by_type != expected['by_type']
+        or sorted(counter.recent) != sorted(expected['recent'])
+    )
+
+
+def recompute(user_type_id: int, user_id: int) -> Dict:
+    """Recalcule et enregistre les compteurs d'un utilisateur"""
+    from ..models import NotificationCounter
+
+    expected = _compute(user_type_id=user_type_id, user_id=user_id).get((user_type_id, user_id), _empty())
+    NotificationCounter.objects.update_or_create(user_type_id=user_type_id, user_id=user_id, defaults=expected)
+    return expected
+
+
+def reconcile_users(users: Iterable[Tuple[int, int]]):
+    """Recalcule les compteurs des (content_type_id, user_id) donnés (après un update() groupé)"""
+    for user_type_id, user_id in set(users):
+        recompute(user_type_id, user_id)
+
+
+def reconcile_all(dry_run: bool = False, batch_size: int = 500) -> Dict:
+    """
+    Compare les compteurs de tous les utilisateurs à la table notifications et
+    corrige les écarts ; retourne le nombre d'utilisateurs vérifiés, corrigés, créés
+    """
+    from ..models import NotificationCounter
+
+    expected = _compute()
+    checked = 0
+    stale = []
+    for counter in NotificationCounter.objects.order_by('id').iterator(chunk_size=batch_size):
+        checked += 1
+        counters = expected.pop((counter.user_type_id, counter.user_id), _empty())
+        if _differs(counter, counters):
+            for field, value in counters.items():
+                setattr(counter, field, value)
+            stale.append(counter)
+
+    # Utilisateurs avec des notifications mais sans ligne de compteurs
+    missing = [
+        NotificationCounter(user_type_id=user_type_id, user_id=user_id, **counters)
+        for (user_type_id, user_id), counters in expected.items()
+    ]
+
+    if not dry_run:
+        with transaction.atomic():
+            NotificationCounter.objects.bulk_update(
+                stale, ['total', 'unread', 'by_type', 'recent'], batch_size=batch_size
+            )
+            NotificationCounter.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+
+    return {
+        'checked': checked + len(missing),
+        'fixed': len(stale),
+        'created': len(missing),
+    }
+
+
+# --- Signaux ---
+
+def _on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        notification_created(instance)
+    else:
+        # Modification directe (admin, script) : état précédent inconnu
+        recompute(instance.user_type_id, instance.user_id)
+
+
+def _on_delete(sender, instance, **kwargs):
+    if not instance.is_deleted:
+        notification_deleted(instance, was_read=instance.is_read)
+
+
+def connect_signals():
+    """Branche la tenue des compteurs sur Notification (appelé par NotificationsConfig.ready)"""
+    from ..models import Notification
+
+    post_save.connect(_on_save, sender=Notification, dispatch_uid='notification_counters_save')
+    post_delete.connect(_on_delete, sender=Notification, dispatch_uid='notification_counters_delete')
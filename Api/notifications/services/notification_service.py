@@ -2,6 +2,7 @@
 import logging
 from typing import Dict, Any, Optional
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from django.utils import timezone
 from ..models import NotificationConfig, Notification
 from users.models import UserDriver, UserCustomer
@@ -10,6 +11,8 @@ from core.models import GeneralConfig
 from .nexah_service import NexahService
 from .whatsapp_service import WhatsAppService
 from .fcm_service import FCMService
+from .outbox import enqueue_push
+from . import notification_counters
 
 logger = logging.getLogger(__name__)
 
@@ -117,7 +120,9 @@ Il expire dans 5 minutes."""
     @classmethod
     def create_notification(cls, user, title: str, content: str, 
                           notification_type: str = 'system', 
-                          metadata: Optional[Dict[str, Any]] = None) -> Optional[Notification]:
+                          metadata: Optional[Dict[str, Any]] = None,
+                          push: Optional[Dict[str, Any]] = None,
+                          push_delay: float = 0) -> Optional[Notification]:
         """
         Crée une nouvelle notification pour un utilisateur
         
@@ -127,6 +132,9 @@ Il expire dans 5 minutes."""
             content: Contenu de la notification
             notification_type: Type de notification
             metadata: Métadonnées supplémentaires
+            push: Push FCM à la place du titre/contenu (title, body, data,
+                  notification_type), ou False pour ne pas en envoyer
+            push_delay: Délai (secondes) avant l'envoi du push
         
         Returns:
             Instance Notification créée ou None en cas d'erreur
@@ -135,42 +143,27 @@ Il expire dans 5 minutes."""
             # Obtenir le ContentType approprié
             content_type = ContentType.objects.get_for_model(user)
             
-            # Créer la notification
-            notification = Notification.objects.create(
-                user_type=content_type,
-                user_id=user.id,
-                title=title,
-                content=content,
-                notification_type=notification_type,
-                metadata=metadata or {}
-            )
-
-            logger.info(f"Notification créée: {title} pour {cls._get_user_display_name(user)}")
-
-            # Envoyer la notification push FCM si l'utilisateur a une session active
-            try:
-                from authentication.models import Token as AuthToken
-                user_type_str = 'driver' if isinstance(user, UserDriver) else 'customer'
-                has_session = AuthToken.objects.filter(
-                    user_type=user_type_str,
+            # Notification et push FCM dans la même transaction (outbox)
+            with transaction.atomic():
+                notification = Notification.objects.create(
+                    user_type=content_type,
                     user_id=user.id,
-                    is_active=True
-                ).exists()
+                    title=title,
+                    content=content,
+                    notification_type=notification_type,
+                    metadata=metadata or {}
+                )
 
-                if has_session:
-                    from .fcm_service import FCMService
-                    FCMService.send_notification(
-                        user=user,
-                        title=title,
-                        body=content,
-                        data=metadata or {}
-                    )
-                    logger.info(f"Push FCM envoyée pour {cls._get_user_display_name(user)}")
-                else:
-                    logger.info(f"Pas de session active pour {cls._get_user_display_name(user)}, FCM non envoyée")
-            except Exception as e:
-                logger.warning(f"Erreur lors de l'envoi FCM: {e}")
+                if push is not False:
+                    # Le worker vérifie la session active et les appareils au moment de l'envoi
+                    enqueue_push(user, delay=push_delay, **(push or {
+                        'title': title,
+                        'body': content,
+                        'data': metadata or {},
+                        'notification_type': notification_type,
+                    }))
 
+            logger.info(f"Notification créée: {title} pour {cls._get_user_display_name(user)}")
             return notification
             
         except Exception as e:
@@ -178,12 +171,13 @@ Il expire dans 5 minutes."""
             return None
     
     @classmethod
-    def send_welcome_notification(cls, user) -> bool:
+    def send_welcome_notification(cls, user, push_delay: float = 0) -> bool:
         """
         Envoie une notification de bienvenue à un nouvel utilisateur
         
         Args:
             user: Instance UserDriver ou UserCustomer
+            push_delay: Délai (secondes) avant l'envoi du push FCM
             
         Returns:
             True si succès, False sinon
@@ -212,14 +206,13 @@ L'équipe WOILA vous souhaite la bienvenue ! 🤝"""
                 title=title,
                 content=content,
                 notification_type='welcome',
-                metadata=metadata
+                metadata=metadata,
+                push=FCMService.welcome_push(user),
+                push_delay=push_delay
             )
             
             if notification:
-                # Envoyer également via FCM (notification push)
-                fcm_success = FCMService.send_welcome_notification(user)
-                
-                logger.info(f"Notification de bienvenue envoyée à {cls._get_user_display_name(user)} - DB: ✅ FCM: {'✅' if fcm_success else '❌'}")
+                logger.info(f"Notification de bienvenue créée pour {cls._get_user_display_name(user)} - push FCM en file d'attente")
                 return True
             
             return False
@@ -280,18 +273,12 @@ Merci de faire grandir la communauté WOILA ! 🚀"""
                 title=title,
                 content=content,
                 notification_type='referral_used',
-                metadata=metadata
+                metadata=metadata,
+                push=FCMService.referral_bonus_push(referral_code, bonus_amount)
             )
             
             if notification:
-                # Envoyer également via FCM (notification push)
-                fcm_success = FCMService.send_referral_bonus_notification(
-                    user=referrer_user,
-                    referral_code=referral_code,
-                    bonus_amount=bonus_amount
-                )
-                
-                logger.info(f"Notification de parrainage envoyée à {cls._get_user_display_name(referrer_user)} - Bonus: {bonus_amount} FCFA - DB: ✅ FCM: {'✅' if fcm_success else '❌'}")
+                logger.info(f"Notification de parrainage créée pour {cls._get_user_display_name(referrer_user)} - Bonus: {bonus_amount} FCFA - push FCM en file d'attente")
                 return True
             
             return False
@@ -344,20 +331,14 @@ Bonne route avec WOILA ! 🛣️"""
                 title=title,
                 content=content,
                 notification_type='vehicle_approved',
-                metadata=metadata
+                metadata=metadata,
+                push=FCMService.vehicle_approval_push(vehicle.nom)
             )
             
             logger.info(f"🚗 NOTIFICATION: Création notification DB: {'✅' if notification else '❌'}")
             
             if notification:
-                # Envoyer également via FCM (notification push)
-                logger.info(f"🚗 NOTIFICATION: Tentative envoi FCM pour véhicule {vehicle.nom}")
-                fcm_success = FCMService.send_vehicle_approval_notification(
-                    driver=driver,
-                    vehicle_name=vehicle.nom
-                )
-                
-                logger.info(f"🚗 NOTIFICATION: Notification d'approbation véhicule envoyée à {driver.name} pour {vehicle.nom} - DB: ✅ FCM: {'✅' if fcm_success else '❌'}")
+                logger.info(f"🚗 NOTIFICATION: Notification d'approbation véhicule créée pour {driver.name} pour {vehicle.nom} - push FCM en file d'attente")
                 return True
             else:
                 logger.error(f"🚗 NOTIFICATION: Échec création notification DB pour {driver.name}")
@@ -395,7 +376,7 @@ Bonne route avec WOILA ! 🛣️"""
             if not include_deleted:
                 queryset = queryset.filter(is_deleted=False)
             
-            return list(queryset.order_by('-created_at'))
+            return list(queryset.order_by('-created_at', '-id'))
             
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des notifications: {str(e)}")
@@ -404,7 +385,7 @@ Bonne route avec WOILA ! 🛣️"""
     @classmethod
     def get_unread_count(cls, user) -> int:
         """
-        Compte les notifications non lues d'un utilisateur
+        Compte les notifications non lues d'un utilisateur (compteurs en cache)
         
         Args:
             user: Instance UserDriver ou UserCustomer
@@ -413,19 +394,33 @@ Bonne route avec WOILA ! 🛣️"""
             Nombre de notifications non lues
         """
         try:
-            content_type = ContentType.objects.get_for_model(user)
-            
-            return Notification.objects.filter(
-                user_type=content_type,
-                user_id=user.id,
-                is_read=False,
-                is_deleted=False
-            ).count()
+            return notification_counters.get_unread_count(user)
             
         except Exception as e:
             logger.error(f"Erreur lors du comptage des notifications non lues: {str(e)}")
             return 0
     
+    @classmethod
+    def get_notification_stats(cls, user) -> Dict[str, Any]:
+        """
+        Statistiques des notifications d'un utilisateur (total, unread, today,
+        this_week, by_type), lues dans les compteurs en cache
+        """
+        return notification_counters.get_stats(user)
+    
+    @classmethod
+    def mark_all_as_read(cls, user) -> int:
+        """
+        Marque toutes les notifications d'un utilisateur comme lues (une requête)
+        
+        Returns:
+            Nombre de notifications marquées comme lues
+        """
+        content_type = ContentType.objects.get_for_model(user)
+        updated_count = notification_counters.mark_all_read(content_type.id, user.id)
+        logger.info(f"{updated_count} notification(s) marquée(s) comme lue(s) pour {cls._get_user_display_name(user)}")
+        return updated_count
+    
     @classmethod
     def mark_notification_as_read(cls, notification_id: int, user) -> bool:
         """
@@ -487,7 +482,7 @@ Bonne route avec WOILA ! 🛣️"""
             )
             
             # Supprimer (soft delete)
-            notification.mark_as_deleted()
+            notification.soft_delete()
             logger.info(f"Notification {notification_id} supprimée pour {cls._get_user_display_name(user)}")
             return True
             
@@ -0,0 +1,288 @@
+"""
+Outbox transactionnelle des notifications sortantes
+
+Les vues n'appellent plus FCM, Nexah ou WhatsApp : elles écrivent une ligne
+NotificationOutbox dans la même transaction que le changement métier (OTP,
+notification, inscription...). Si la transaction est annulée, le message
+disparaît avec elle ; si elle est validée, il survit aux redémarrages.
+
+Les workers de `python manage.py process_notification_outbox` réservent
+les messages dus avec SELECT ... FOR UPDATE SKIP LOCKED (plusieurs workers
+et processus sans double envoi), les livrent hors transaction puis
+enregistrent le résultat :
+
+- SENT       : livré (résultat du fournisseur dans `result`)
+- SKIPPED    : rien à livrer (pas de session active, aucun appareil)
+- PENDING    : échec temporaire, nouvelle tentative après un délai
+               exponentiel (NOTIFICATION_OUTBOX_RETRY_BASE_DELAY x 2^n)
+- FAILED     : échec définitif ou tentatives épuisées
+- EXPIRED    : plus d'actualité (OTP périmé avant d'avoir pu partir)
+
+Chaque message a son propre bail (NOTIFICATION_OUTBOX_LEASE_SECONDS),
+prolongé juste avant l'appel au fournisseur : un message réservé par un
+worker arrêté brutalement redevient livrable à son expiration, et un worker
+qui découvre le bail d'un message déjà expiré (lot trop lent) le laisse à
+celui qui l'a repris. Les appels Nexah / WhatsApp / FCM ont un délai
+maximal bien plus court que le bail.
+"""
+import logging
+import random
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..models import NotificationOutbox
+
+
+logger = logging.getLogger(__name__)
+
+# Validité d'un code OTP (voir OTPVerification)
+OTP_VALIDITY_SECONDS = 300
+
+
+class OutboxRetry(Exception):
+    """Échec temporaire : le message sera retenté"""
+
+
+class OutboxFailure(Exception):
+    """Échec définitif : le message ne sera pas retenté"""
+
+
+class OutboxSkip(Exception):
+    """Rien à livrer pour ce message"""
+
+
+# --- Écriture ---
+
+def enqueue(channel: str, payload: Dict, delay: float = 0, max_attempts: int = None,
+            expires_in: float = None) -> NotificationOutbox:
+    """
+    Ajoute un message à l'outbox, dans la transaction en cours s'il y en a une
+    """
+    now = timezone.now()
+    message = NotificationOutbox.objects.create(
+        channel=channel,
+        payload=payload,
+        available_at=now + timedelta(seconds=delay),
+        max_attempts=max_attempts or getattr(settings, 'NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 6),
+        expires_at=now + timedelta(seconds=expires_in) if expires_in else None,
+    )
+    logger.debug(f"📥 Outbox #{message.id} ({channel}) en attente")
+    return message
+
+
+def enqueue_push(user, title: str, body: str, data: Optional[Dict] = None,
+                 notification_type: str = 'system', delay: float = 0) -> NotificationOutbox:
+    """Push FCM vers tous les appareils actifs d'un utilisateur"""
+    return enqueue('push', {
+        'user_type_id': ContentType.objects.get_for_model(user).id,
+        'user_id': user.id,
+        'title': title,
+        'body': body,
+        'data': data or {},
+        'notification_type': notification_type,
+    }, delay=delay)
+
+
+def enqueue_otp(recipient: str, otp_code: str, message: str = None) -> NotificationOutbox:
+    """Code OTP par le canal configuré ; inutile de l'envoyer une fois périmé"""
+    return enqueue('otp', {
+        'recipient': recipient,
+        'otp_code': otp_code,
+        'message': message,
+    }, max_attempts=3, expires_in=OTP_VALIDITY_SECONDS)
+
+
+def enqueue_sms(recipient: str, message: str) -> NotificationOutbox:
+    """Message texte par le canal configuré"""
+    return enqueue('sms', {'recipient': recipient, 'message': message})
+
+
+# --- Livraison ---
+
+def _deliver_push(payload: Dict) -> Dict:
+    from .fcm_service import FCMService
+    from .push_routing import get_push_routes
+
+    content_type = ContentType.objects.get_for_id(payload['user_type_id'])
+    # Lecture en base : le worker ne dépend pas des invalidations du cache
+    route = get_push_routes(content_type, [payload['user_id']], use_cache=False)[payload['user_id']]
+    if not route['session']:
+        raise OutboxSkip("Pas de session active")
+    tokens = route['tokens']
+    if not tokens:
+        raise OutboxSkip("Aucun appareil actif")
+
+    results = FCMService.send_to_tokens_detailed(
+        tokens=tokens,
+        title=payload['title'],
+        body=payload['body'],
+        data=payload.get('data'),
+        notification_type=payload.get('notification_type', 'system')
+    )
+    delivered = [result for result in results if result.success]
+    if delivered:
+        return {
+            'delivered': len(delivered),
+            'failed': len(results) - len(delivered),
+            'message_ids': [result.message_id for result in delivered],
+        }
+
+    # Réessayer seulement ce qui peut réussir plus tard (réseau, quota, erreur serveur, jeton OAuth)
+    errors = '; '.join(f"{result.status_code}: {(result.error or '')[:200]}" for result in results)
+    if any(
+        result.status_code is None or result.status_code in (401, 429) or result.status_code >= 500
+        for result in results if not result.unregistered
+    ):
+        raise OutboxRetry(errors)
+    raise OutboxFailure(errors)
+
+
+def _deliver_provider_response(response: Dict) -> Dict:
+    """Réponse {'success', 'message', 'data'} de NexahService / WhatsAppService"""
+    if not response.get('success'):
+        raise OutboxRetry(response.get('message') or 'Échec fournisseur')
+    return {
+        'message': response.get('message'),
+        'message_id': response.get('message_id'),
+    }
+
+
+def _deliver_otp(payload: Dict) -> Dict:
+    from .notification_service import NotificationService
+
+    return _deliver_provider_response(NotificationService.send_otp(
+        recipient=payload['recipient'],
+        otp_code=payload['otp_code'],
+        message=payload.get('message')
+    ))
+
+
+def _deliver_sms(payload: Dict) -> Dict:
+    from .notification_service import NotificationService
+
+    return _deliver_provider_response(NotificationService.send_message(
+        recipient=payload['recipient'],
+        message=payload['message']
+    ))
+
+
+HANDLERS = {
+    'push': _deliver_push,
+    'otp': _deliver_otp,
+    'sms': _deliver_sms,
+}
+
+
+def retry_delay(attempts: int) -> float:
+    """Délai avant la tentative suivante : exponentiel, plafonné, avec ±10 % d'aléa"""
+    base = getattr(settings, 'NOTIFICATION_OUTBOX_RETRY_BASE_DELAY', 10)
+    cap = getattr(settings, 'NOTIFICATION_OUTBOX_RETRY_MAX_DELAY', 3600)
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.9, 1.1)
+
+
+class OutboxWorker:
+    """Réserve un lot de messages dus, les livre et enregistre le résultat"""
+
+    def __init__(self, batch_size: int = None, lease_seconds: float = None, handlers: Dict = None):
+        self.batch_size = batch_size or getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 20)
+        self.lease_seconds = lease_seconds or getattr(settings, 'NOTIFICATION_OUTBOX_LEASE_SECONDS', 60)
+        self.handlers = handlers or HANDLERS
+
+    def claim(self) -> List[NotificationOutbox]:
+        """Réserve jusqu'à batch_size messages dus (verrous ignorés : SKIP LOCKED)"""
+        now = timezone.now()
+        with transaction.atomic():
+            messages = list(
+                NotificationOutbox.objects.select_for_update(skip_locked=True).filter(
+                    Q(status='PENDING', available_at__lte=now)
+                    | Q(status='PROCESSING', locked_until__lt=now)  # worker arrêté en cours de livraison
+                ).order_by('available_at', 'id')[:self.batch_size]
+            )
+            if not messages:
+                return []
+
+            locked_until = now + timedelta(seconds=self.lease_seconds)
+            NotificationOutbox.objects.filter(id__in=[message.id for message in messages]).update(
+                status='PROCESSING',
+                locked_until=locked_until,
+                attempts=F('attempts') + 1
+            )
+
+        for message in messages:
+            message.status = 'PROCESSING'
+            message.locked_until = locked_until
+            message.attempts += 1
+        return messages
+
+    def renew_lease(self, message: NotificationOutbox) -> bool:
+        """
+        Prolonge le bail d'un message réservé avant sa livraison ; False si le
+        bail a déjà expiré (le message a pu être repris par un autre worker)
+        """
+        now = timezone.now()
+        locked_until = now + timedelta(seconds=self.lease_seconds)
+        renewed = NotificationOutbox.objects.filter(
+            id=message.id, status='PROCESSING', attempts=message.attempts, locked_until__gte=now
+        ).update(locked_until=locked_until)
+        if renewed:
+            message.locked_until = locked_until
+        return bool(renewed)
+
+    def deliver(self, message: NotificationOutbox) -> Optional[str]:
+        """
+        Livre un message réservé et retourne son nouveau statut ; None si son
+        bail a expiré avant la livraison (message laissé à un autre worker)
+        """
+        if not self.renew_lease(message):
+            logger.warning(f"📤 Outbox #{message.id} ({message.channel}) bail expiré avant livraison : ignoré")
+            return None
+
+        now = timezone.now()
+        fields = {'locked_until': None, 'processed_at': now}
+
+        if message.expires_at and now >= message.expires_at:
+            fields.update(status='EXPIRED', last_error="Expiré avant livraison")
+        else:
+            try:
+                result = self.handlers[message.channel](message.payload)
+                fields.update(status='SENT', result=result or {}, last_error='')
+            except OutboxSkip as e:
+                fields.update(status='SKIPPED', last_error=str(e))
+            except OutboxFailure as e:
+                fields.update(status='FAILED', last_error=str(e))
+            except Exception as e:
+                # OutboxRetry ou erreur inattendue (réseau, base...) : nouvelle tentative
+                if message.attempts >= message.max_attempts:
+                    fields.update(status='FAILED', last_error=str(e))
+                else:
+                    fields.update(
+                        status='PENDING',
+                        last_error=str(e),
+                        processed_at=None,
+                        available_at=now + timedelta(seconds=retry_delay(message.attempts))
+                    )
+
+        # Ne pas écraser un message repris par un autre worker après expiration du bail
+        NotificationOutbox.objects.filter(
+            id=message.id, status='PROCESSING', attempts=message.attempts
+        ).update(**fields)
+
+        log = logger.warning if fields['status'] in ('FAILED', 'PENDING') else logger.info
+        log(f"📤 Outbox #{message.id} ({message.channel}) tentative {message.attempts}: "
+            f"{fields['status']}{' - ' + fields['last_error'][:200] if fields.get('last_error') else ''}")
+        return fields['status']
+
+    def run_once(self) -> Dict[str, int]:
+        """Traite un lot ; retourne le nombre de messages par statut obtenu"""
+        outcomes = {}
+        for message in self.claim():
+            status = self.deliver(message) or 'LEASE_EXPIRED'
+            outcomes[status] = outcomes.get(status, 0) + 1
+        return outcomes
@@ -0,0 +1,133 @@
+"""
+Cache de routage des notifications push
+
+Avant chaque push il faut savoir si l'utilisateur a une session active
+(auth Token) et lister ses tokens FCM actifs. Ce « routage » est gardé dans
+le cache Django, par utilisateur, pendant PUSH_ROUTING_CACHE_TTL secondes :
+
+    push_routing:<content_type_id>:<user_id> -> {'session': bool, 'tokens': [...]}
+
+get_push_routes() résout N utilisateurs d'un coup : lecture groupée du
+cache, puis une seule requête (UNION sessions / tokens) pour les absents.
+
+L'entrée d'un utilisateur est supprimée à la connexion / déconnexion et à
+l'enregistrement, la suppression ou la désactivation d'un token FCM
+(signaux post_save / post_delete, et appels explicites après les update()
+groupés qui ne déclenchent pas de signal). Ces suppressions ne touchent les
+autres processus que si le cache est partagé (CACHES Redis, voir settings).
+
+Le worker de l'outbox (hors requête) relit le routage en base
+(use_cache=False) : un token désactivé ou une déconnexion sont pris en
+compte dès la livraison suivante, quel que soit l'état du cache.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+
+
+CACHE_PREFIX = 'push_routing'
+
+
+def _key(user_type_id: int, user_id: int) -> str:
+    return f'{CACHE_PREFIX}:{user_type_id}:{user_id}'
+
+
+def _ttl() -> int:
+    return getattr(settings, 'PUSH_ROUTING_CACHE_TTL', 300)
+
+
+def get_push_route(user) -> Dict:
+    """Routage d'un utilisateur : {'session': bool, 'tokens': [tokens FCM actifs]}"""
+    content_type = ContentType.objects.get_for_model(user)
+    return get_push_routes(content_type, [user.id])[user.id]
+
+
+def get_push_routes(content_type: ContentType, user_ids: Iterable[int], use_cache: bool = True) -> Dict[int, Dict]:
+    """
+    Routage de plusieurs utilisateurs d'un même type : au plus une requête ;
+    use_cache=False lit la base sans consulter ni remplir le cache
+    """
+    from authentication.models import Token
+    from ..models import FCMToken
+
+    user_ids = list(dict.fromkeys(user_ids))
+    keys = {user_id: _key(content_type.id, user_id) for user_id in user_ids}
+    cached = cache.get_many(keys.values()) if use_cache else {}
+
+    routes = {}
+    missing = []
+    for user_id in user_ids:
+        route = cached.get(keys[user_id])
+        if route is None:
+            missing.append(user_id)
+        else:
+            routes[user_id] = route
+
+    if missing:
+        loaded = {user_id: {'session': False, 'tokens': []} for user_id in missing}
+
+        # Sessions (token vide) et tokens FCM actifs en une requête (UNION sans ORDER BY)
+        sessions = Token.objects.filter(
+            user_type=content_type, user_id__in=missing, is_active=True
+        ).order_by().values_list('user_id', models.Value('', output_field=models.TextField()))
+        devices = FCMToken.objects.filter(
+            user_type=content_type, user_id__in=missing, is_active=True
+        ).order_by().values_list('user_id', 'token')
+
+        for user_id, token in sessions.union(devices, all=True):
+            if token:
+                loaded[user_id]['tokens'].append(token)
+            else:
+                loaded[user_id]['session'] = True
+
+        if use_cache:
+            cache.set_many({keys[user_id]: route for user_id, route in loaded.items()}, _ttl())
+        routes.update(loaded)
+
+    return routes
+
+
+# --- Invalidation ---
+
+def invalidate_push_routes(users: Iterable[Tuple[int, int]]):
+    """
+    Oublie le routage des (content_type_id, user_id) donnés, tout de suite
+    et à nouveau au commit (une lecture concurrente a pu le recharger avant)
+    """
+    keys = [_key(user_type_id, user_id) for user_type_id, user_id in set(users)]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_push_route(user):
+    invalidate_push_routes([(ContentType.objects.get_for_model(user).id, user.id)])
+
+
+def invalidate_push_routes_for_tokens(tokens: List[str]):
+    """Oublie le routage des propriétaires de ces tokens FCM (avant un update() groupé)"""
+    from ..models import FCMToken
+
+    invalidate_push_routes(
+        FCMToken.objects.filter(token__in=tokens).values_list('user_type_id', 'user_id')
+    )
+
+
+def _invalidate_for_instance(sender, instance, **kwargs):
+    invalidate_push_routes([(instance.user_type_id, instance.user_id)])
+
+
+def connect_signals():
+    """Branche l'invalidation sur les sessions et tokens FCM (appelé par NotificationsConfig.ready)"""
+    from authentication.models import Token
+    from ..models import FCMToken
+
+    for model in (Token, FCMToken):
+        dispatch_uid = f'push_routing_{model._meta.label_lower}'
+        post_save.connect(_invalidate_for_instance, sender=model, dispatch_uid=f'{dispatch_uid}_save')
+        post_delete.connect(_invalidate_for_instance, sender=model, dispatch_uid=f'{dispatch_uid}_delete')
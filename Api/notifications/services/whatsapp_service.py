@@ -1,6 +1,7 @@
 # api/services/whatsapp_service.py
 import requests
 import logging
+from django.conf import settings
 from ..models import NotificationConfig
 
 logger = logging.getLogger(__name__)
@@ -8,6 +9,14 @@ logger = logging.getLogger(__name__)
 class WhatsAppService:
     """Service to handle WhatsApp communications with Meta API"""
     
+    @staticmethod
+    def _timeout():
+        """(connect, read) timeouts, shorter than the outbox lease"""
+        return (
+            getattr(settings, 'NOTIFICATION_PROVIDER_CONNECT_TIMEOUT', 3),
+            getattr(settings, 'NOTIFICATION_PROVIDER_READ_TIMEOUT', 10),
+        )
+    
     @classmethod
     def send_otp(cls, recipient, otp_code, template_name=None, language_code=None):
         """
@@ -84,7 +93,7 @@ class WhatsAppService:
             logger.debug(f"WhatsApp API payload template: {template_name}")
             
             # Send request
-            response = requests.post(base_url, json=payload, headers=headers)
+            response = requests.post(base_url, json=payload, headers=headers, timeout=cls._timeout())
             
             # Log response
             logger.info(f"WhatsApp API response status: {response.status_code}")
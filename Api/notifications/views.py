@@ -23,6 +23,7 @@ from .serializers import (
     FCMTokenRegisterSerializer, FCMTokenSerializer, FCMTokenListSerializer
 )
 from notifications.services.notification_service import NotificationService
+from notifications.services.inbox import get_inbox_page
 from notifications.services.fcm_service import FCMService
 
 
@@ -74,12 +75,20 @@ class NotificationListView(APIView):
                 name='limit',
                 type=OpenApiTypes.INT,
                 location=OpenApiParameter.QUERY,
-                description='Nombre maximum de notifications à retourner',
+                description='Nombre maximum de notifications à retourner (100 au plus)',
                 default=50
+            ),
+            OpenApiParameter(
+                name='cursor',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Curseur de la page suivante (next_cursor de la réponse précédente)',
+                required=False
             )
         ],
         responses={
             200: NotificationListSerializer(many=True),
+            400: {'description': 'Paramètre limit ou cursor invalide'},
             401: {'description': 'Non autorisé'},
         },
         examples=[
@@ -91,6 +100,8 @@ class NotificationListView(APIView):
                     'success': True,
                     'count': 5,
                     'unread_count': 2,
+                    'has_more': False,
+                    'next_cursor': None,
                     'notifications': [
                         {
                             'id': 1,
@@ -116,18 +127,20 @@ class NotificationListView(APIView):
             # Obtenir les paramètres de requête
             include_read = request.query_params.get('include_read', 'true').lower() == 'true'
             limit = int(request.query_params.get('limit', 50))
+            cursor = request.query_params.get('cursor')
             
             # Obtenir l'utilisateur depuis le token
             user, auth_error = get_user_from_token(request)
             if auth_error:
                 return auth_error
             
-            # Récupérer les notifications
-            notifications = NotificationService.get_user_notifications(
-                user=user,
-                include_read=include_read,
-                include_deleted=False
-            )[:limit]
+            # Une page de notifications (pagination par curseur)
+            notifications, next_cursor = get_inbox_page(
+                user,
+                unread_only=not include_read,
+                limit=limit,
+                cursor=cursor
+            )
             
             # Compter les notifications non lues
             unread_count = NotificationService.get_unread_count(user)
@@ -139,6 +152,8 @@ class NotificationListView(APIView):
                 'success': True,
                 'count': len(notifications),
                 'unread_count': unread_count,
+                'has_more': next_cursor is not None,
+                'next_cursor': next_cursor,
                 'notifications': serializer.data
             }, status=status.HTTP_200_OK)
             
@@ -150,7 +165,7 @@ class NotificationListView(APIView):
         except ValueError as e:
             return Response({
                 'success': False,
-                'error': 'Paramètre limit invalide'
+                'error': 'Paramètre limit ou cursor invalide'
             }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
@@ -169,7 +184,23 @@ class NotificationUnreadView(APIView):
     @extend_schema(
         tags=['Notifications'],
         summary='Notifications non lues',
-        description='Récupère uniquement les notifications non lues de l\'utilisateur',
+        description='Récupère les notifications non lues de l\'utilisateur, par pages (curseur)',
+        parameters=[
+            OpenApiParameter(
+                name='limit',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description='Nombre maximum de notifications à retourner (100 au plus)',
+                default=50
+            ),
+            OpenApiParameter(
+                name='cursor',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Curseur de la page suivante (next_cursor de la réponse précédente)',
+                required=False
+            )
+        ],
         responses={200: NotificationListSerializer(many=True)}
     )
     def get(self, request):
@@ -177,14 +208,18 @@ class NotificationUnreadView(APIView):
         Récupère uniquement les notifications non lues
         """
         try:
+            limit = int(request.query_params.get('limit', 50))
+            cursor = request.query_params.get('cursor')
+            
             user, auth_error = get_user_from_token(request)
             if auth_error:
                 return auth_error
             
-            notifications = NotificationService.get_user_notifications(
-                user=user,
-                include_read=False,
-                include_deleted=False
+            notifications, next_cursor = get_inbox_page(
+                user,
+                unread_only=True,
+                limit=limit,
+                cursor=cursor
             )
             
             serializer = NotificationListSerializer(notifications, many=True)
@@ -192,9 +227,17 @@ class NotificationUnreadView(APIView):
             return Response({
                 'success': True,
                 'count': len(notifications),
+                'unread_count': NotificationService.get_unread_count(user),
+                'has_more': next_cursor is not None,
+                'next_cursor': next_cursor,
                 'notifications': serializer.data
             }, status=status.HTTP_200_OK)
             
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'Paramètre limit ou cursor invalide'
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 'success': False,
@@ -340,20 +383,8 @@ class NotificationMarkAllReadView(APIView):
             if auth_error:
                 return auth_error
             
-            # Récupérer toutes les notifications non lues
-            content_type = ContentType.objects.get_for_model(user)
-            unread_notifications = Notification.objects.filter(
-                user_type=content_type,
-                user_id=user.id,
-                is_read=False,
-                is_deleted=False
-            )
-            
-            # Marquer comme lues
-            updated_count = 0
-            for notification in unread_notifications:
-                notification.mark_as_read()
-                updated_count += 1
+            # Une seule requête, compteurs mis à jour
+            updated_count = NotificationService.mark_all_as_read(user)
             
             return Response({
                 'success': True,
@@ -409,60 +440,12 @@ class NotificationStatsView(APIView):
             if auth_error:
                 return auth_error
             
-            content_type = ContentType.objects.get_for_model(user)
-            
-            # Statistiques générales
-            total = Notification.objects.filter(
-                user_type=content_type,
-                user_id=user.id,
-                is_deleted=False
-            ).count()
-            
-            unread = NotificationService.get_unread_count(user)
-            
-            # Statistiques temporelles
-            from django.utils import timezone
-            from datetime import timedelta
-            
-            now = timezone.now()
-            today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            week_start = now - timedelta(days=7)
-            
-            today = Notification.objects.filter(
-                user_type=content_type,
-                user_id=user.id,
-                is_deleted=False,
-                created_at__gte=today_start
-            ).count()
-            
-            this_week = Notification.objects.filter(
-                user_type=content_type,
-                user_id=user.id,
-                is_deleted=False,
-                created_at__gte=week_start
-            ).count()
-            
-            # Statistiques par type
-            from django.db.models import Count
-            by_type = dict(
-                Notification.objects.filter(
-                    user_type=content_type,
-                    user_id=user.id,
-                    is_deleted=False
-                ).values('notification_type').annotate(
-                    count=Count('notification_type')
-                ).values_list('notification_type', 'count')
-            )
+            # Compteurs de l'utilisateur : une lecture du cache
+            stats = NotificationService.get_notification_stats(user)
             
             return Response({
                 'success': True,
-                'stats': {
-                    'total': total,
-                    'unread': unread,
-                    'today': today,
-                    'this_week': this_week,
-                    'by_type': by_type
-                }
+                'stats': stats
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
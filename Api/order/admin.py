@@ -4,7 +4,7 @@ from django.urls import reverse
 from django.utils import timezone
 from .models import (
     Order, DriverStatus, CustomerStatus, OrderTracking, PaymentMethod, 
-    Rating, TripTracking, DriverPool
+    Rating, TripTracking, DriverPool, DriverRatingSummary, TripDistance
 )
 
 
@@ -201,6 +201,7 @@ class RatingAdmin(admin.ModelAdmin):
     @admin.action(description='🗑️ Supprimer tous les éléments sélectionnés')
     def delete_all_selected(self, request, queryset):
         count = queryset.count()
+        # Résumés de notes recalculés par le signal post_delete de Rating
         queryset.delete()
         self.message_user(request, f'{count} évaluation(s) supprimée(s) avec succès.')
 
@@ -250,6 +251,35 @@ class RatingAdmin(admin.ModelAdmin):
     rated_info.short_description = 'Évalué'
 
 
+@admin.register(DriverRatingSummary)
+class DriverRatingSummaryAdmin(admin.ModelAdmin):
+    list_display = ['driver', 'average_score', 'ratings_count', 'updated_at']
+    search_fields = ['driver__name', 'driver__surname', 'driver__phone_number']
+    ordering = ['-average_score']
+
+    def get_readonly_fields(self, request, obj=None):
+        # Résumé calculé : maintenu par rate_order, à la suppression des notations
+        # et par la commande rebuild_driver_ratings
+        return [field.name for field in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(TripDistance)
+class TripDistanceAdmin(admin.ModelAdmin):
+    list_display = ['order', 'distance_km', 'deviation_km', 'deviation_alerted', 'accepted_points', 'rejected_points', 'updated_at']
+    search_fields = ['order__id']
+    ordering = ['-updated_at']
+
+    def get_readonly_fields(self, request, obj=None):
+        # Cumul calculé : maintenu à l'insertion des points et par la commande rebuild_trip_distances
+        return [field.name for field in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(TripTracking)
 class TripTrackingAdmin(admin.ModelAdmin):
     list_display = [
@@ -5,3 +5,13 @@ class OrderConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'order'
     verbose_name = '📋 Gestion des Commandes'
+
+    def ready(self):
+        from django.db.models.signals import post_delete
+        from . import catalog_search, pricing_snapshot
+        from .models import DriverRatingSummary, Rating
+        pricing_snapshot.connect_signals()
+        catalog_search.connect_signals()
+        post_delete.connect(
+            DriverRatingSummary.rating_deleted, sender=Rating, dispatch_uid='driver_rating_summary_delete'
+        )
@@ -0,0 +1,231 @@
+"""
+Recherche par nom (autocomplétion) des villes et des zones VIP
+
+Les catalogues (villes actives avec leur pays, zones VIP actives avec leurs
+règles kilométriques) sont chargés en 3 requêtes et gardés en mémoire du
+processus. Les noms sont normalisés (minuscules, sans accents ni
+ponctuation) : « yaounde » trouve « Yaoundé ».
+
+Chaque début de mot d'un nom est inséré dans un trie : une recherche par
+préfixe ne parcourt que les caractères de la saisie. Le filtre (pays) est
+appliqué avant la limite ; tant que la page n'est pas pleine, les noms
+contenant la saisie ailleurs qu'en début de mot sont ajoutés, classés en
+dernier (mêmes résultats que name__icontains, comportement historique).
+
+Rechargement : signaux post_save / post_delete sur les modèles concernés et
+actions groupées de l'admin (compteur de version dans le cache partagé, relu
+au plus toutes les CATALOG_SEARCH_CHECK_INTERVAL secondes), et au plus tard
+CATALOG_SEARCH_MAX_AGE secondes après le chargement.
+"""
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+
+VERSION_CACHE_KEY = 'catalog_search:version'
+
+# Rangs de pertinence (le plus petit d'abord)
+RANK_EXACT, RANK_PREFIX, RANK_WORD_PREFIX, RANK_SUBSTRING = range(4)
+
+
+def normalize(text: str) -> str:
+    """Minuscules, sans accents, ponctuation remplacée par des espaces"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^\w]+', ' ', stripped.casefold()).split())
+
+
+class PrefixTrie:
+    """Trie des débuts de mots : chaque nœud connaît les entrées situées sous lui"""
+
+    __slots__ = ('_root',)
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, key: str, entry_id):
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+            node.setdefault(None, set()).add(entry_id)
+
+    def search(self, prefix: str) -> set:
+        """Identifiants des entrées dont une clé commence par `prefix`"""
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node.get(None, set())
+
+
+class SearchCatalog:
+    """Entrées d'un catalogue, indexées par nom normalisé"""
+
+    def __init__(self, entries: Dict[int, Dict]):
+        # id -> données renvoyées par l'API
+        self.entries = entries
+        self._names = {entry_id: normalize(entry['name']) for entry_id, entry in entries.items()}
+        self._trie = PrefixTrie()
+        for entry_id, name in self._names.items():
+            words = name.split(' ')
+            # Chaque suffixe commençant par un mot : « centre » trouve « Yaoundé Centre »
+            for index in range(len(words)):
+                self._trie.insert(' '.join(words[index:]), entry_id)
+
+    def search(self, query: str, limit: int = 10, predicate=None) -> List[Dict]:
+        """Entrées correspondant à la saisie, les plus pertinentes d'abord"""
+        query = normalize(query)
+        if not query:
+            return []
+
+        def accepted(entry_id):
+            return predicate is None or predicate(self.entries[entry_id])
+
+        matches = {entry_id for entry_id in self._trie.search(query) if accepted(entry_id)}
+        if len(matches) < limit:
+            # Sous-chaînes hors début de mot (rang RANK_SUBSTRING, donc après les
+            # préfixes) : inutiles si les préfixes remplissent déjà la page
+            matches |= {
+                entry_id for entry_id, name in self._names.items()
+                if entry_id not in matches and query in name and accepted(entry_id)
+            }
+
+        def rank(entry_id):
+            name = self._names[entry_id]
+            if name == query:
+                position = RANK_EXACT
+            elif name.startswith(query):
+                position = RANK_PREFIX
+            elif f' {query}' in f' {name}':
+                position = RANK_WORD_PREFIX
+            else:
+                position = RANK_SUBSTRING
+            return position, name, entry_id
+
+        return [self.entries[entry_id] for entry_id in sorted(matches, key=rank)[:limit]]
+
+
+class CatalogSearch:
+    """Catalogues des villes et des zones VIP actives"""
+
+    def __init__(self, version=None):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.cities = SearchCatalog(self._load_cities())
+        self.vip_zones = SearchCatalog(self._load_vip_zones())
+
+    @staticmethod
+    def _load_cities() -> Dict[int, Dict]:
+        from core.models import City
+
+        return {
+            city_id: {
+                'id': city_id,
+                'name': name,
+                'country': country_name,
+                'prix_jour': float(prix_jour),
+                'prix_nuit': float(prix_nuit),
+                'full_name': f"{name} ({country_name})",
+            }
+            for city_id, name, country_name, prix_jour, prix_nuit in City.objects.filter(
+                active=True
+            ).values_list('id', 'name', 'country__name', 'prix_jour', 'prix_nuit')
+        }
+
+    @staticmethod
+    def _load_vip_zones() -> Dict[int, Dict]:
+        from core.admin import VipZoneProxy, VipZoneKilometerRuleProxy
+
+        zones = {
+            zone_id: {
+                'id': zone_id,
+                'name': name,
+                'prix_jour': float(prix_jour),
+                'prix_nuit': float(prix_nuit),
+                'kilometer_rules': [],
+            }
+            for zone_id, name, prix_jour, prix_nuit in VipZoneProxy.objects.filter(
+                active=True
+            ).values_list('id', 'name', 'prix_jour', 'prix_nuit')
+        }
+        for zone_id, min_kilometers, prix_jour_per_km, prix_nuit_per_km in VipZoneKilometerRuleProxy.objects.filter(
+            active=True, vip_zone_id__in=list(zones)
+        ).order_by('vip_zone_id', 'min_kilometers', 'id').values_list(
+            'vip_zone_id', 'min_kilometers', 'prix_jour_per_km', 'prix_nuit_per_km'
+        ):
+            zones[zone_id]['kilometer_rules'].append({
+                'min_kilometers': float(min_kilometers),
+                'prix_jour_per_km': float(prix_jour_per_km),
+                'prix_nuit_per_km': float(prix_nuit_per_km),
+            })
+        return zones
+
+    def search_cities(self, name: str, country: str = None, limit: int = 10) -> List[Dict]:
+        predicate = None
+        if country:
+            country = normalize(country)
+            predicate = lambda entry: country in normalize(entry['country'])
+        return self.cities.search(name, limit=limit, predicate=predicate)
+
+    def search_vip_zones(self, name: str, limit: int = 10) -> List[Dict]:
+        return self.vip_zones.search(name, limit=limit)
+
+
+_catalog = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_catalog_search() -> CatalogSearch:
+    """Catalogues du processus, rechargés quand la version du cache change"""
+    global _catalog, _checked_at
+
+    now = time.monotonic()
+    catalog = _catalog
+    check_interval = getattr(settings, 'CATALOG_SEARCH_CHECK_INTERVAL', 5)
+    max_age = getattr(settings, 'CATALOG_SEARCH_MAX_AGE', 300)
+
+    if catalog is not None and now - _checked_at < check_interval and now - catalog.loaded_at < max_age:
+        return catalog
+
+    with _lock:
+        catalog = _catalog
+        version = cache.get(VERSION_CACHE_KEY)
+        if catalog is None or catalog.version != version or now - catalog.loaded_at >= max_age:
+            catalog = _catalog = CatalogSearch(version=version)
+        _checked_at = now
+    return catalog
+
+
+def invalidate_catalog_search(**kwargs):
+    """Publie une nouvelle version une fois la transaction en cours validée"""
+    transaction.on_commit(_publish_new_version)
+
+
+def _publish_new_version():
+    global _catalog
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+    with _lock:
+        _catalog = None
+
+
+def connect_signals():
+    """Branche l'invalidation sur les catalogues (appelé par OrderConfig.ready)"""
+    from core.models import Country, City
+    from core.admin import VipZoneProxy, VipZoneKilometerRuleProxy
+
+    for model in (Country, City, VipZoneProxy, VipZoneKilometerRuleProxy):
+        dispatch_uid = f'catalog_search_{model._meta.label_lower}'
+        post_save.connect(invalidate_catalog_search, sender=model, dispatch_uid=f'{dispatch_uid}_save')
+        post_delete.connect(invalidate_catalog_search, sender=model, dispatch_uid=f'{dispatch_uid}_delete')
@@ -115,7 +115,7 @@ class DriverConsumer(AsyncWebsocketConsumer):
         
         if latitude and longitude:
             await self.update_driver_location(latitude, longitude)
-            print(f"🔄 Position GPS sauvegardée en base de données")
+            print(f"🔄 Position GPS enregistrée")
         else:
             print(f"❌ Coordonnées GPS manquantes: latitude={latitude}, longitude={longitude}")
 
@@ -291,6 +291,18 @@ class DriverConsumer(AsyncWebsocketConsumer):
             'message': 'Commande annulée par le client'
         }))
 
+    async def route_deviation(self, event):
+        """Handler pour l'alerte de déviation d'itinéraire pendant la course"""
+        await self.send(text_data=json.dumps({
+            'type': 'route_deviation',
+            'order_id': event['order_id'],
+            'deviation_km': event['deviation_km'],
+            'latitude': event['latitude'],
+            'longitude': event['longitude'],
+            'timestamp': event['timestamp'],
+            'message': f"Écart de {event['deviation_km']} km par rapport à l'itinéraire prévu"
+        }))
+
     # ============= MÉTHODES DE DIFFUSION GPS =============
     
     async def start_location_broadcasting(self, event):
@@ -450,38 +462,26 @@ class DriverConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def update_driver_location(self, latitude, longitude):
-        try:
-            from .models import DriverStatus
-            driver_status = DriverStatus.objects.get(driver_id=self.driver_id)
-            driver_status.current_latitude = latitude
-            driver_status.current_longitude = longitude
-            driver_status.last_location_update = timezone.now()
-            driver_status.save()
+        # Position écrite dans le store live ; DriverStatus est mis à jour en différé
+        from .services import DriverLocationService
+        entry = DriverLocationService().record_location(self.driver_id, latitude, longitude)
+        if entry:
             print(f"✅ Position GPS mise à jour pour chauffeur {self.driver_id}: ({latitude}, {longitude})")
-        except DriverStatus.DoesNotExist:
+        else:
             print(f"❌ DriverStatus non trouvé pour chauffeur {self.driver_id}")
-            pass
 
     @database_sync_to_async
     def get_driver_current_position(self):
         """
-        Récupérer la position GPS actuelle du chauffeur
+        Récupérer la position GPS actuelle du chauffeur (store live, sinon base)
         """
-        try:
-            from .models import DriverStatus
-            driver_status = DriverStatus.objects.get(driver_id=self.driver_id)
-            print(f" DriverStatus pour chauffeur {driver_status}")
-            return {
-                'latitude': driver_status.current_latitude,
-                'longitude': driver_status.current_longitude
-            }
-        except DriverStatus.DoesNotExist:
-            return None
+        from .services import DriverLocationService
+        return DriverLocationService().get_current_position(self.driver_id)
 
     @database_sync_to_async
     def accept_order(self, order_id):
         try:
-            from .models import Order, DriverStatus, OrderTracking
+            from .models import Order, DriverStatus, OrderTracking, DriverRatingSummary
             from users.models import UserDriver
             
             order = Order.objects.get(id=order_id, status='PENDING')
@@ -496,7 +496,7 @@ class DriverConsumer(AsyncWebsocketConsumer):
             driver_status.save()
             
             # Récupérer les informations du chauffeur
-            driver = UserDriver.objects.get(id=self.driver_id)
+            driver = UserDriver.objects.select_related('rating_summary').get(id=self.driver_id)
             
             # Créer un événement de tracking
             OrderTracking.objects.create(
@@ -514,7 +514,7 @@ class DriverConsumer(AsyncWebsocketConsumer):
                     'id': driver.id,
                     'name': f"{driver.name} {driver.surname}",
                     'phone': driver.phone_number,
-                    'rating': 4.5,  # TODO: Récupérer la vraie note
+                    'rating': DriverRatingSummary.get_average(driver),
                 },
                 'pickup_address': order.pickup_address,
                 'destination_address': order.destination_address,
@@ -550,6 +550,7 @@ class DriverConsumer(AsyncWebsocketConsumer):
         try:
             from .models import Order, DriverStatus, OrderTracking
             order = Order.objects.get(id=order_id, driver_id=self.driver_id, status='IN_PROGRESS')
+            
             order.status = 'COMPLETED'
             order.completed_at = timezone.now()
             order.save()
@@ -752,6 +753,18 @@ class CustomerConsumer(AsyncWebsocketConsumer):
             'customer_location': event['customer_location']
         }))
     
+    async def route_deviation(self, event):
+        """Handler pour l'alerte de déviation d'itinéraire du chauffeur"""
+        await self.send(text_data=json.dumps({
+            'type': 'route_deviation',
+            'order_id': event['order_id'],
+            'deviation_km': event['deviation_km'],
+            'latitude': event['latitude'],
+            'longitude': event['longitude'],
+            'timestamp': event['timestamp'],
+            'message': f"Le chauffeur s'écarte de l'itinéraire prévu ({event['deviation_km']} km)"
+        }))
+    
     async def eta_update(self, event):
         """Handler pour recevoir les mises à jour d'ETA temps réel avec position du chauffeur"""
         await self.send(text_data=json.dumps({
@@ -0,0 +1,277 @@
+"""
+Diffusion d'une nouvelle commande aux chauffeurs du pool, hors requête
+
+create_order ne contacte plus les chauffeurs lui-même : la diffusion est
+programmée avec transaction.on_commit() et confiée à OrderDispatcher, qui
+tourne dans une boucle asyncio sur un thread dédié. La réponse 201 part dès
+que la commande et le pool sont enregistrés ; un rollback annule la diffusion.
+
+Pour chaque commande, la boucle lance en parallèle :
+
+- les messages WebSocket `order_request` vers tous les groupes driver_<id>
+  (au plus ORDER_DISPATCH_MAX_CONCURRENCY envois simultanés) ;
+- le push FCM groupé du pool (FCMService.send_to_users, dans un thread).
+
+La latence (commit -> dernier envoi terminé) est mesurée pour chaque
+commande ; get_metrics() en donne la moyenne et les percentiles sur les
+dernières diffusions (endpoint debug/order-dispatch/).
+"""
+import asyncio
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+# Nombre de diffusions gardées pour les percentiles de latence
+LATENCY_WINDOW = 500
+
+# Délai de réponse laissé au chauffeur (secondes), repris par l'application
+RESPONSE_TIMEOUT_SECONDS = 30
+
+
+def build_order_request(order) -> Dict:
+    """Données de la commande envoyées aux chauffeurs - Format compatible Flutter"""
+    return {
+        'id': str(order.id),
+        'customer_id': str(order.customer.id),
+        'customer_name': f"Client {order.customer.phone_number}",
+        'customer_phone': order.customer.phone_number,
+        'pickup_address': order.pickup_address,
+        'pickup_latitude': float(order.pickup_latitude),
+        'pickup_longitude': float(order.pickup_longitude),
+        'destination_address': order.destination_address,
+        'destination_latitude': float(order.destination_latitude),
+        'destination_longitude': float(order.destination_longitude),
+        'vehicle_type': order.vehicle_type.name if order.vehicle_type else 'Standard',
+        'estimated_distance_km': float(order.estimated_distance_km or 0),
+        'total_price': float(order.total_price),
+        'customer_notes': order.customer_notes or '',
+        'timeout_seconds': RESPONSE_TIMEOUT_SECONDS,
+        'created_at': order.created_at.isoformat(),
+    }
+
+
+class DispatchJob:
+    """Diffusion d'une commande : données figées au moment de la requête"""
+
+    __slots__ = ('order_id', 'order_data', 'driver_ids', 'committed_at')
+
+    def __init__(self, order_id: str, order_data: Dict, driver_ids: List[int]):
+        self.order_id = order_id
+        self.order_data = order_data
+        self.driver_ids = driver_ids
+        self.committed_at = None
+
+
+class OrderDispatcher:
+    """Boucle asyncio dédiée qui diffuse les commandes validées aux chauffeurs"""
+
+    def __init__(self, channel_layer=None, max_concurrency: int = None):
+        self.channel_layer = channel_layer
+        self.max_concurrency = max_concurrency or getattr(settings, 'ORDER_DISPATCH_MAX_CONCURRENCY', 50)
+
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+        self._metrics = {
+            'scheduled': 0,          # diffusions programmées au commit
+            'dispatched': 0,         # diffusions terminées
+            'in_flight': 0,
+            'websocket_sent': 0,
+            'websocket_failed': 0,
+            'push_delivered': 0,     # chauffeurs avec au moins un appareil atteint
+            'push_failed': 0,
+            'last_dispatch_at': None,
+            'last_latency_ms': None,
+        }
+
+    # --- Programmation ---
+
+    def dispatch_after_commit(self, order, pool_entries) -> int:
+        """
+        Programme la diffusion au commit de la transaction en cours (immédiate
+        hors transaction) ; retourne le nombre de chauffeurs à contacter
+        """
+        job = DispatchJob(
+            order_id=str(order.id),
+            order_data=build_order_request(order),
+            driver_ids=[pool_entry.driver_id for pool_entry in pool_entries],
+        )
+        if job.driver_ids:
+            transaction.on_commit(lambda: self.submit(job))
+        return len(job.driver_ids)
+
+    def submit(self, job: DispatchJob):
+        """Confie une diffusion à la boucle ; retourne un concurrent.futures.Future"""
+        job.committed_at = time.monotonic()
+        with self._lock:
+            self._metrics['scheduled'] += 1
+            self._metrics['in_flight'] += 1
+        return asyncio.run_coroutine_threadsafe(self._dispatch(job), self._ensure_started())
+
+    # --- Diffusion ---
+
+    async def _dispatch(self, job: DispatchJob):
+        try:
+            (ws_sent, ws_failed), (push_delivered, push_failed) = await asyncio.gather(
+                self._send_websockets(job),
+                self._send_pushes(job),
+            )
+        except Exception as e:
+            logger.error(f"❌ Erreur diffusion commande {job.order_id}: {e}")
+            ws_sent = ws_failed = push_delivered = push_failed = 0
+
+        latency_ms = round((time.monotonic() - job.committed_at) * 1000, 2)
+        with self._lock:
+            self._latencies.append(latency_ms)
+            self._metrics['in_flight'] -= 1
+            self._metrics['dispatched'] += 1
+            self._metrics['websocket_sent'] += ws_sent
+            self._metrics['websocket_failed'] += ws_failed
+            self._metrics['push_delivered'] += push_delivered
+            self._metrics['push_failed'] += push_failed
+            self._metrics['last_dispatch_at'] = timezone.now()
+            self._metrics['last_latency_ms'] = latency_ms
+
+        logger.info(f"📊 Commande {job.order_id} diffusée en {latency_ms} ms: "
+                    f"WebSocket {ws_sent}/{len(job.driver_ids)}, FCM {push_delivered}/{len(job.driver_ids)} chauffeurs")
+
+    async def _send_websockets(self, job: DispatchJob):
+        channel_layer = self.channel_layer or get_channel_layer()
+        if not channel_layer:
+            logger.warning("Channel layer non disponible - notifications WebSocket non envoyées")
+            return 0, len(job.driver_ids)
+
+        message = {'type': 'order_request', 'order_data': job.order_data}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def send(driver_id):
+            async with semaphore:
+                try:
+                    await channel_layer.group_send(f'driver_{driver_id}', message)
+                    return True
+                except Exception as e:
+                    logger.error(f"❌ Erreur WebSocket chauffeur {driver_id}: {e}")
+                    return False
+
+        results = await asyncio.gather(*(send(driver_id) for driver_id in job.driver_ids))
+        sent = sum(results)
+        return sent, len(results) - sent
+
+    async def _send_pushes(self, job: DispatchJob):
+        # Requêtes ORM et HTTP bloquantes : exécutées hors de la boucle
+        results = await asyncio.get_running_loop().run_in_executor(None, self._push_pool, job)
+        delivered = sum(1 for success in results.values() if success)
+        return delivered, len(job.driver_ids) - delivered
+
+    def _push_pool(self, job: DispatchJob) -> Dict[int, bool]:
+        from notifications.services.fcm_service import FCMService
+        from users.models import UserDriver
+
+        order_data = job.order_data
+        try:
+            return FCMService.send_to_users(
+                users=list(UserDriver.objects.filter(id__in=job.driver_ids)),
+                title="🚗 Nouvelle commande disponible!",
+                body=(f"{order_data['customer_name']} • {order_data['estimated_distance_km']:.1f} km • "
+                      f"{order_data['total_price']:.0f} FCFA"),
+                data={
+                    'notification_type': 'new_order',
+                    'order_id': job.order_id,
+                    'order_data': json.dumps(order_data),
+                    'action_required': 'accept_or_decline',
+                    'timeout_seconds': str(RESPONSE_TIMEOUT_SECONDS)
+                },
+                notification_type='new_order'
+            )
+        except Exception as e:
+            logger.error(f"❌ Erreur FCM pool commande {job.order_id}: {e}")
+            return {}
+        finally:
+            close_old_connections()
+
+    # --- Cycle de vie ---
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        if self._thread is not None and self._thread.is_alive():
+            return self._loop
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='order-dispatch', daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    def close(self, timeout: float = 10):
+        """Termine les diffusions en cours puis arrête la boucle (arrêt du processus)"""
+        loop, thread = self._loop, self._thread
+        if thread is None or not thread.is_alive():
+            return
+
+        async def drain():
+            pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            if pending:
+                await asyncio.wait(pending, timeout=timeout)
+
+        try:
+            asyncio.run_coroutine_threadsafe(drain(), loop).result(timeout + 1)
+        except Exception as e:
+            logger.warning(f"Diffusions non terminées à l'arrêt: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=1)
+
+    def get_metrics(self) -> Dict:
+        """Compteurs de diffusion et latence commit -> fin de diffusion (ms)"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            latencies = sorted(self._latencies)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+        metrics['latency_ms'] = {
+            'window': len(latencies),
+            'avg': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'max': latencies[-1] if latencies else None,
+        }
+        return metrics
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_order_dispatcher() -> OrderDispatcher:
+    """Diffuseur partagé du processus, vidé à l'arrêt"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = OrderDispatcher()
+                atexit.register(_dispatcher.close)
+    return _dispatcher
+
+
+def dispatch_new_order(order, pool_entries) -> int:
+    """Diffuse la commande aux chauffeurs du pool après le commit ; retourne leur nombre"""
+    return get_order_dispatcher().dispatch_after_commit(order, pool_entries)
@@ -0,0 +1,195 @@
+"""
+Calcul de distances GPS en lot
+
+Les fonctions `*_km` prennent des tableaux de coordonnées (listes, tuples ou
+tableaux NumPy, en degrés) et retournent toutes les distances en un seul
+appel vectorisé. Deux modes de précision, choisis par le paramètre `mode`
+ou par le réglage DISTANCE_ACCURACY_MODE :
+
+- 'haversine'   : sphère de rayon moyen, le plus rapide. Écart avec
+                  geopy.geodesic jusqu'à ~0.6 % de la distance.
+- 'ellipsoidal' : formule de Lambert sur l'ellipsoïde WGS84 (mode par
+                  défaut). Écart relatif avec geopy.geodesic inférieur à
+                  ELLIPSOIDAL_RELATIVE_TOLERANCE (2 m sur 1000 km).
+
+Sans NumPy, les mêmes formules sont appliquées point par point.
+"""
+import math
+from typing import Sequence
+
+from django.conf import settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy est dans requirements.txt
+    np = None
+
+
+HAVERSINE = 'haversine'
+ELLIPSOIDAL = 'ellipsoidal'
+ACCURACY_MODES = (HAVERSINE, ELLIPSOIDAL)
+
+DISTANCE_ACCURACY_MODE = getattr(settings, 'DISTANCE_ACCURACY_MODE', ELLIPSOIDAL)
+
+# Rayon moyen de la Terre (km), utilisé par le mode haversine
+EARTH_RADIUS_KM = 6371.0
+
+# Ellipsoïde WGS84
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+
+# Écart relatif maximal entre le mode ellipsoïdal et geopy.geodesic
+ELLIPSOIDAL_RELATIVE_TOLERANCE = 2e-6
+
+
+def _resolve_mode(mode):
+    mode = mode or DISTANCE_ACCURACY_MODE
+    if mode not in ACCURACY_MODES:
+        raise ValueError(f"Mode de précision inconnu: {mode} (attendu: {', '.join(ACCURACY_MODES)})")
+    return mode
+
+
+# --- Formules scalaires (un couple de points) ---
+
+def _haversine_scalar(lat1, lng1, lat2, lng2):
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlng = math.radians(lng2 - lng1)
+
+    a = (math.sin(dlat / 2) ** 2 +
+         math.cos(lat1_rad) * math.cos(lat2_rad) *
+         math.sin(dlng / 2) ** 2)
+    return EARTH_RADIUS_KM * 2 * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _lambert_scalar(lat1, lng1, lat2, lng2):
+    # Latitudes réduites, puis angle central sur la sphère auxiliaire
+    beta1 = math.atan((1 - WGS84_F) * math.tan(math.radians(lat1)))
+    beta2 = math.atan((1 - WGS84_F) * math.tan(math.radians(lat2)))
+    dlng = math.radians(lng2 - lng1)
+
+    a = (math.sin((beta2 - beta1) / 2) ** 2 +
+         math.cos(beta1) * math.cos(beta2) *
+         math.sin(dlng / 2) ** 2)
+    sigma = 2 * math.asin(min(1.0, math.sqrt(a)))
+    if sigma == 0:
+        return 0.0
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+    x = (sigma - math.sin(sigma)) * (math.sin(p) * math.cos(q)) ** 2 / max(math.cos(sigma / 2) ** 2, 1e-15)
+    y = (sigma + math.sin(sigma)) * (math.cos(p) * math.sin(q)) ** 2 / math.sin(sigma / 2) ** 2
+    return WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y))
+
+
+_SCALAR_FORMULAS = {
+    HAVERSINE: _haversine_scalar,
+    ELLIPSOIDAL: _lambert_scalar,
+}
+
+
+# --- Formules vectorisées (NumPy) ---
+
+def _haversine_vector(lat1, lng1, lat2, lng2):
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlng = np.radians(lng2 - lng1)
+
+    a = (np.sin(dlat / 2) ** 2 +
+         np.cos(lat1_rad) * np.cos(lat2_rad) *
+         np.sin(dlng / 2) ** 2)
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def _lambert_vector(lat1, lng1, lat2, lng2):
+    beta1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    dlng = np.radians(lng2 - lng1)
+
+    a = (np.sin((beta2 - beta1) / 2) ** 2 +
+         np.cos(beta1) * np.cos(beta2) *
+         np.sin(dlng / 2) ** 2)
+    sigma = 2 * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (sigma - np.sin(sigma)) * (np.sin(p) * np.cos(q)) ** 2 / np.maximum(np.cos(sigma / 2) ** 2, 1e-15)
+        y = (sigma + np.sin(sigma)) * (np.cos(p) * np.sin(q)) ** 2 / np.sin(sigma / 2) ** 2
+        distances = WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y))
+
+    # Points confondus : sigma = 0 donne 0/0
+    return np.where(sigma > 0, distances, 0.0)
+
+
+_VECTOR_FORMULAS = {
+    HAVERSINE: _haversine_vector,
+    ELLIPSOIDAL: _lambert_vector,
+}
+
+
+# --- API publique ---
+
+def distance_km(lat1: float, lng1: float, lat2: float, lng2: float, mode: str = None) -> float:
+    """
+    Distance entre deux points. Pour un seul couple, la version scalaire
+    évite le coût de conversion en tableaux.
+    """
+    formula = _SCALAR_FORMULAS[_resolve_mode(mode)]
+    return formula(float(lat1), float(lng1), float(lat2), float(lng2))
+
+
+def distances_km(lats1: Sequence, lngs1: Sequence, lats2: Sequence, lngs2: Sequence,
+                 mode: str = None):
+    """
+    Distances entre les couples (lats1[i], lngs1[i]) → (lats2[i], lngs2[i]).
+    Retourne un tableau NumPy (une liste sans NumPy).
+    """
+    mode = _resolve_mode(mode)
+
+    if np is None:
+        formula = _SCALAR_FORMULAS[mode]
+        return [
+            formula(float(lat1), float(lng1), float(lat2), float(lng2))
+            for lat1, lng1, lat2, lng2 in zip(lats1, lngs1, lats2, lngs2)
+        ]
+
+    return _VECTOR_FORMULAS[mode](
+        np.asarray(lats1, dtype=float), np.asarray(lngs1, dtype=float),
+        np.asarray(lats2, dtype=float), np.asarray(lngs2, dtype=float)
+    )
+
+
+def distances_from_point_km(lat: float, lng: float, lats: Sequence, lngs: Sequence,
+                            mode: str = None):
+    """
+    Distances entre un point d'origine et chaque point de (lats, lngs)
+    """
+    mode = _resolve_mode(mode)
+
+    if np is None:
+        formula = _SCALAR_FORMULAS[mode]
+        return [formula(float(lat), float(lng), float(lat2), float(lng2)) for lat2, lng2 in zip(lats, lngs)]
+
+    # Diffusion NumPy : le point d'origine est un scalaire
+    return _VECTOR_FORMULAS[mode](
+        float(lat), float(lng),
+        np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float)
+    )
+
+
+def path_length_km(lats: Sequence, lngs: Sequence, mode: str = None) -> float:
+    """
+    Longueur totale d'une trace GPS (somme des segments consécutifs)
+    """
+    if len(lats) < 2:
+        return 0.0
+
+    if np is None:
+        return float(sum(distances_km(lats[:-1], lngs[:-1], lats[1:], lngs[1:], mode=mode)))
+
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    return float(distances_km(lats[:-1], lngs[:-1], lats[1:], lngs[1:], mode=mode).sum())
@@ -0,0 +1,274 @@
+"""
+Store des positions GPS en temps réel des chauffeurs
+
+Les positions reçues toutes les quelques secondes (WebSocket, REST, tracking
+de course) sont écrites ici plutôt que dans PostgreSQL. DriverStatus n'est
+resynchronisé qu'en écriture différée (voir DriverLocationService).
+
+Le backend est choisi par le réglage DRIVER_LOCATION_STORE :
+
+    DRIVER_LOCATION_STORE = {
+        'BACKEND': 'order.location_store.RedisLocationStore',
+        'OPTIONS': {'url': 'redis://127.0.0.1:6379/1'},
+    }
+
+- RedisLocationStore    : partagé entre les processus, recherches par GEOSEARCH
+- InMemoryLocationStore : propre au processus, pour les tests et le développement
+
+Chaque entrée est un dictionnaire :
+    {'driver_id', 'latitude', 'longitude', 'status', 'last_update'}
+"""
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import geo_distance
+
+
+DEFAULT_BACKEND = 'order.location_store.InMemoryLocationStore'
+
+# Demi-circonférence terrestre : rayon couvrant toute la planète (recherche kNN sans rayon)
+MAX_SEARCH_RADIUS_KM = 20038
+
+
+class BaseLocationStore:
+    """Interface commune des stores de positions"""
+
+    def update_position(self, driver_id: int, latitude: float, longitude: float,
+                        timestamp: datetime = None) -> Dict:
+        """Enregistre la position courante du chauffeur et retourne son entrée"""
+        raise NotImplementedError
+
+    def set_status(self, driver_id: int, status: str):
+        """Met à jour le statut (ONLINE / BUSY / OFFLINE) utilisé par les recherches"""
+        raise NotImplementedError
+
+    def get_position(self, driver_id: int) -> Optional[Dict]:
+        """Entrée du chauffeur, ou None s'il est inconnu du store"""
+        raise NotImplementedError
+
+    def remove(self, driver_id: int):
+        """Retire le chauffeur du store"""
+        raise NotImplementedError
+
+    def search_radius(self, latitude: float, longitude: float, radius_km: float,
+                      status: str = 'ONLINE', limit: int = None) -> List[Tuple[int, float]]:
+        """Chauffeurs du statut donné dans le rayon : [(driver_id, distance_km)] du plus proche au plus loin"""
+        raise NotImplementedError
+
+    def search_nearest(self, latitude: float, longitude: float, count: int,
+                       status: str = 'ONLINE', radius_km: float = None) -> List[Tuple[int, float]]:
+        """Les `count` chauffeurs les plus proches (kNN), éventuellement bornés par un rayon"""
+        return self.search_radius(
+            latitude, longitude, radius_km or MAX_SEARCH_RADIUS_KM,
+            status=status, limit=count
+        )
+
+    def clear(self):
+        """Vide le store"""
+        raise NotImplementedError
+
+
+class InMemoryLocationStore(BaseLocationStore):
+    """Store en mémoire du processus (tests, développement, serveur unique)"""
+
+    def __init__(self, **options):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def update_position(self, driver_id, latitude, longitude, timestamp=None):
+        with self._lock:
+            entry = self._entries.setdefault(int(driver_id), {
+                'driver_id': int(driver_id),
+                'status': None,
+            })
+            entry['latitude'] = float(latitude)
+            entry['longitude'] = float(longitude)
+            entry['last_update'] = timestamp or timezone.now()
+            return dict(entry)
+
+    def set_status(self, driver_id, status):
+        with self._lock:
+            entry = self._entries.setdefault(int(driver_id), {
+                'driver_id': int(driver_id),
+                'latitude': None,
+                'longitude': None,
+                'last_update': None,
+            })
+            entry['status'] = status
+
+    def get_position(self, driver_id):
+        with self._lock:
+            entry = self._entries.get(int(driver_id))
+            return dict(entry) if entry else None
+
+    def remove(self, driver_id):
+        with self._lock:
+            self._entries.pop(int(driver_id), None)
+
+    def search_radius(self, latitude, longitude, radius_km, status='ONLINE', limit=None):
+        with self._lock:
+            entries = [
+                entry for entry in self._entries.values()
+                if entry['status'] == status and entry.get('latitude') is not None
+            ]
+
+        distances = geo_distance.distances_from_point_km(
+            latitude, longitude,
+            [entry['latitude'] for entry in entries],
+            [entry['longitude'] for entry in entries]
+        )
+        results = sorted(
+            (
+                (entry['driver_id'], float(distance))
+                for entry, distance in zip(entries, distances)
+                if distance <= radius_km
+            ),
+            key=lambda result: result[1]
+        )
+        return results[:limit] if limit else results
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisLocationStore(BaseLocationStore):
+    """
+    Store Redis partagé par tous les processus (Daphne, workers, commandes).
+
+    - un index GEO par statut : `<prefix>:geo:<STATUS>` (membre = driver_id)
+    - un hash par chauffeur   : `<prefix>:driver:<id>` (position, statut, dates)
+
+    Lecture du hash et écriture des index dans une même transaction
+    (WATCH/MULTI, rejouée en cas de conflit) : une position et un changement
+    de statut simultanés ne laissent pas le chauffeur dans l'index GEO d'un
+    ancien statut.
+
+    Les distances renvoyées par GEOSEARCH sont calculées par Redis sur une
+    sphère (écart < 0.5 % avec geo_distance en mode ellipsoïdal).
+    """
+    STATUSES = ('ONLINE', 'BUSY', 'OFFLINE')
+
+    def __init__(self, url='redis://127.0.0.1:6379/0', key_prefix='drivers:location', **options):
+        import redis
+        # Délais bornés : un Redis injoignable fait échouer l'appel (journalisé
+        # par l'appelant) au lieu de bloquer la requête ou le consumer
+        options.setdefault('socket_connect_timeout', 0.5)
+        options.setdefault('socket_timeout', 0.5)
+        self._client = redis.Redis.from_url(url, decode_responses=True, **options)
+        self._prefix = key_prefix
+
+    def _driver_key(self, driver_id):
+        return f"{self._prefix}:driver:{driver_id}"
+
+    def _geo_key(self, status):
+        return f"{self._prefix}:geo:{status}"
+
+    @staticmethod
+    def _parse_entry(driver_id, data):
+        if not data:
+            return None
+
+        def _float(value):
+            return float(value) if value not in (None, '') else None
+
+        def _datetime(value):
+            return datetime.fromisoformat(value) if value else None
+
+        return {
+            'driver_id': int(driver_id),
+            'latitude': _float(data.get('latitude')),
+            'longitude': _float(data.get('longitude')),
+            'status': data.get('status') or None,
+            'last_update': _datetime(data.get('last_update')),
+        }
+
+    def update_position(self, driver_id, latitude, longitude, timestamp=None):
+        key = self._driver_key(driver_id)
+        timestamp = timestamp or timezone.now()
+
+        def apply(pipe):
+            status = pipe.hget(key, 'status')
+            pipe.multi()
+            pipe.hset(key, mapping={
+                'latitude': float(latitude),
+                'longitude': float(longitude),
+                'last_update': timestamp.isoformat(),
+            })
+            if status:
+                pipe.geoadd(self._geo_key(status), (float(longitude), float(latitude), int(driver_id)))
+            pipe.hgetall(key)
+
+        # WATCH/MULTI : un set_status concurrent (hash modifié entre la lecture du
+        # statut et l'écriture) annule la transaction, rejouée avec le nouveau statut
+        return self._parse_entry(driver_id, self._client.transaction(apply, key)[-1])
+
+    def set_status(self, driver_id, status):
+        key = self._driver_key(driver_id)
+
+        def apply(pipe):
+            latitude, longitude, previous_status = pipe.hmget(key, 'latitude', 'longitude', 'status')
+            pipe.multi()
+            pipe.hset(key, 'status', status)
+            if previous_status and previous_status != status:
+                pipe.zrem(self._geo_key(previous_status), int(driver_id))
+            if latitude and longitude:
+                pipe.geoadd(self._geo_key(status), (float(longitude), float(latitude), int(driver_id)))
+
+        self._client.transaction(apply, key)
+
+    def get_position(self, driver_id):
+        return self._parse_entry(driver_id, self._client.hgetall(self._driver_key(driver_id)))
+
+    def remove(self, driver_id):
+        pipe = self._client.pipeline()
+        pipe.delete(self._driver_key(driver_id))
+        for status in self.STATUSES:
+            pipe.zrem(self._geo_key(status), int(driver_id))
+        pipe.execute()
+
+    def search_radius(self, latitude, longitude, radius_km, status='ONLINE', limit=None):
+        results = self._client.geosearch(
+            self._geo_key(status),
+            longitude=float(longitude),
+            latitude=float(latitude),
+            radius=radius_km,
+            unit='km',
+            sort='ASC',
+            count=limit,
+            withdist=True
+        )
+        return [(int(member), float(distance)) for member, distance in results]
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=f"{self._prefix}:*"))
+        if keys:
+            self._client.delete(*keys)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_location_store() -> BaseLocationStore:
+    """Instance partagée du store configuré par DRIVER_LOCATION_STORE"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = getattr(settings, 'DRIVER_LOCATION_STORE', {})
+                backend = import_string(config.get('BACKEND', DEFAULT_BACKEND))
+                _store = backend(**config.get('OPTIONS', {}))
+    return _store
+
+
+def reset_location_store():
+    """Oublie l'instance partagée (tests, changement de réglages)"""
+    global _store
+    with _store_lock:
+        _store = None
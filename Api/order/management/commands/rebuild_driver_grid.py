@@ -0,0 +1,54 @@
+"""
+Commande pour recalculer les cellules de la grille spatiale des chauffeurs
+Usage: python manage.py rebuild_driver_grid
+
+A lancer après un changement de DRIVER_GRID_CELL_SIZE_DEG.
+"""
+from django.core.management.base import BaseCommand
+from order.models import DriverStatus
+from order.spatial_index import grid_cell_for, GRID_CELL_SIZE_DEG
+
+
+class Command(BaseCommand):
+    help = 'Recalcule la cellule de grille spatiale de chaque statut chauffeur'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre de statuts mis a jour par requete',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        self.stdout.write("\n" + "="*80)
+        self.stdout.write(self.style.SUCCESS("RECONSTRUCTION DE LA GRILLE SPATIALE"))
+        self.stdout.write("="*80 + "\n")
+        self.stdout.write(f"[INFO] Taille de cellule: {GRID_CELL_SIZE_DEG} degre(s)")
+
+        batch = []
+        updated_count = 0
+
+        for driver_status in DriverStatus.objects.only(
+            'id', 'current_latitude', 'current_longitude', 'grid_cell'
+        ).iterator(chunk_size=batch_size):
+            grid_cell = grid_cell_for(driver_status.current_latitude, driver_status.current_longitude)
+            if grid_cell == driver_status.grid_cell:
+                continue
+
+            driver_status.grid_cell = grid_cell
+            batch.append(driver_status)
+
+            if len(batch) >= batch_size:
+                DriverStatus.objects.bulk_update(batch, ['grid_cell'])
+                updated_count += len(batch)
+                batch = []
+
+        if batch:
+            DriverStatus.objects.bulk_update(batch, ['grid_cell'])
+            updated_count += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"{updated_count} statut(s) mis a jour"))
+        self.stdout.write("="*80 + "\n")
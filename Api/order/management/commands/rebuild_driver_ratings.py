@@ -0,0 +1,45 @@
+"""
+Commande pour reconstruire les resumes de notes des chauffeurs
+Usage: python manage.py rebuild_driver_ratings [--driver-id ID]
+
+A lancer apres le deploiement (backfill) ou apres une suppression
+manuelle de notations en base.
+"""
+from django.core.management.base import BaseCommand
+from order.models import DriverRatingSummary
+
+
+class Command(BaseCommand):
+    help = 'Recalcule le resume des notes (nombre, somme, moyennes) de chaque chauffeur'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--driver-id',
+            type=int,
+            action='append',
+            dest='driver_ids',
+            help='Limiter au(x) chauffeur(s) indique(s) (option repetable)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre de resumes ecrits par requete',
+        )
+
+    def handle(self, *args, **options):
+        driver_ids = options['driver_ids']
+
+        self.stdout.write("\n" + "="*80)
+        self.stdout.write(self.style.SUCCESS("RECONSTRUCTION DES NOTES CHAUFFEURS"))
+        self.stdout.write("="*80 + "\n")
+
+        if driver_ids:
+            self.stdout.write(f"[INFO] Chauffeurs cibles: {', '.join(str(i) for i in driver_ids)}")
+        else:
+            self.stdout.write("[INFO] Tous les chauffeurs")
+
+        written = DriverRatingSummary.rebuild(driver_ids=driver_ids, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"{written} resume(s) mis a jour"))
+        self.stdout.write("="*80 + "\n")
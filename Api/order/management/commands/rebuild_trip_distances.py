@@ -0,0 +1,80 @@
+"""
+Commande pour reconstruire la distance cumulee des courses depuis l'historique GPS
+Usage: python manage.py rebuild_trip_distances [--order-id UUID] [--dry-run]
+
+A lancer apres le deploiement (backfill), ou en --dry-run pour verifier
+que le cumul incremental correspond a l'historique TripTracking.
+"""
+from django.core.management.base import BaseCommand
+from order.models import TripDistance
+
+
+class Command(BaseCommand):
+    help = 'Recalcule la distance parcourue de chaque course a partir des points TripTracking'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--order-id',
+            action='append',
+            dest='order_ids',
+            help='Limiter a la/aux commande(s) indiquee(s) (option repetable)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre de distances ecrites par requete',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Comparer sans rien ecrire',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.001,
+            help='Ecart tolere (km) avant de signaler une difference',
+        )
+
+    def handle(self, *args, **options):
+        order_ids = options['order_ids']
+        dry_run = options['dry_run']
+        tolerance = options['tolerance']
+
+        self.stdout.write("\n" + "="*80)
+        self.stdout.write(self.style.SUCCESS("RECONSTRUCTION DES DISTANCES DE COURSE"))
+        self.stdout.write("="*80 + "\n")
+
+        if order_ids:
+            self.stdout.write(f"[INFO] Commandes ciblees: {', '.join(order_ids)}")
+        else:
+            self.stdout.write("[INFO] Toutes les courses suivies")
+        if dry_run:
+            self.stdout.write(self.style.WARNING("[DRY RUN] Aucune modification ne sera effectuee"))
+
+        results = TripDistance.rebuild(
+            order_ids=order_ids,
+            batch_size=options['batch_size'],
+            commit=not dry_run
+        )
+
+        mismatches = 0
+        for order_id, (stored_km, rebuilt_km) in results.items():
+            if stored_km is None:
+                self.stdout.write(f"  [NOUVEAU] {order_id}: {rebuilt_km:.3f} km")
+            elif abs(stored_km - rebuilt_km) > tolerance:
+                mismatches += 1
+                self.stdout.write(self.style.WARNING(
+                    f"  [ECART] {order_id}: stocke {stored_km:.3f} km, recalcule {rebuilt_km:.3f} km"
+                ))
+
+        self.stdout.write("\n" + "-"*80)
+        self.stdout.write(f"Courses verifiees: {len(results)}")
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f"Ecarts au-dela de {tolerance} km: {mismatches}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Aucun ecart"))
+        if not dry_run:
+            self.stdout.write(self.style.SUCCESS(f"{len(results)} distance(s) mise(s) a jour"))
+        self.stdout.write("="*80 + "\n")
@@ -1,13 +1,21 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from users.models import UserDriver, UserCustomer
 from vehicles.models import VehicleType
 from core.models import City
+from core.config_registry import get_config_registry
 from core.admin import VipZoneProxy
+from .spatial_index import grid_cell_for
+from . import geo_distance
+from decimal import Decimal
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 
 class PaymentMethod(models.Model):
     """Types de paiement disponibles dans le système"""
@@ -179,7 +187,8 @@ class Order(models.Model):
                 is_night=self.is_night_fare
             )
             # Ajouter le prix d'attente
-            waiting_price = self.waiting_time * service._get_config_value('PRICE_PER_WAITING_MINUTE', 50)
+            price_per_minute = get_config_registry().get_numeric('PRICE_PER_WAITING_MINUTE', 50)
+            waiting_price = self.waiting_time * Decimal(str(price_per_minute))
             self.final_price = pricing['total_price'] + waiting_price
             self.waiting_price = waiting_price
         return self.final_price
@@ -283,6 +292,160 @@ class Rating(models.Model):
         unique_together = [['order', 'rating_type']]
 
 
+class DriverRatingSummary(models.Model):
+    """Agrégat dénormalisé des notes reçues par un chauffeur (client → chauffeur)"""
+    CRITERIA = ['punctuality', 'driving_quality', 'vehicle_cleanliness', 'communication']
+
+    driver = models.OneToOneField(UserDriver, on_delete=models.CASCADE, related_name='rating_summary')
+
+    # Note globale
+    ratings_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de notes")
+    score_sum = models.PositiveIntegerField(default=0, verbose_name="Somme des notes")
+    average_score = models.DecimalField(
+        max_digits=3,
+        decimal_places=2,
+        default=0,
+        verbose_name="Note moyenne"
+    )
+
+    # Critères détaillés (optionnels : chaque critère a son propre compteur)
+    punctuality_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de notes ponctualité")
+    punctuality_sum = models.PositiveIntegerField(default=0, verbose_name="Somme ponctualité")
+    driving_quality_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de notes conduite")
+    driving_quality_sum = models.PositiveIntegerField(default=0, verbose_name="Somme qualité de conduite")
+    vehicle_cleanliness_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de notes propreté")
+    vehicle_cleanliness_sum = models.PositiveIntegerField(default=0, verbose_name="Somme propreté du véhicule")
+    communication_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de notes communication")
+    communication_sum = models.PositiveIntegerField(default=0, verbose_name="Somme communication")
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
+
+    def add_rating(self, rating):
+        """Ajoute une notation aux compteurs (sans sauvegarder)"""
+        self.ratings_count += 1
+        self.score_sum += rating.score
+        for criterion in self.CRITERIA:
+            value = getattr(rating, criterion)
+            if value is not None:
+                setattr(self, f'{criterion}_count', getattr(self, f'{criterion}_count') + 1)
+                setattr(self, f'{criterion}_sum', getattr(self, f'{criterion}_sum') + value)
+        self.refresh_average()
+
+    def refresh_average(self):
+        """Recalcule la note moyenne à partir du nombre et de la somme"""
+        if self.ratings_count:
+            self.average_score = round(Decimal(self.score_sum) / self.ratings_count, 2)
+        else:
+            self.average_score = Decimal('0')
+
+    def get_criteria_averages(self):
+        """Retourne la moyenne de chaque critère détaillé (None si jamais noté)"""
+        averages = {}
+        for criterion in self.CRITERIA:
+            count = getattr(self, f'{criterion}_count')
+            averages[criterion] = round(getattr(self, f'{criterion}_sum') / count, 2) if count else None
+        return averages
+
+    def to_dict(self):
+        """Représentation exposée par l'API"""
+        return {
+            'average': float(self.average_score) if self.ratings_count else None,
+            'count': self.ratings_count,
+            'criteria': self.get_criteria_averages(),
+        }
+
+    @classmethod
+    def record_rating(cls, rating):
+        """
+        Met à jour de façon incrémentale le résumé du chauffeur noté.
+        La ligne est verrouillée pour que deux notations simultanées ne se perdent pas.
+        """
+        if rating.rating_type != 'CUSTOMER_TO_DRIVER' or not rating.rated_driver_id:
+            return None
+
+        with transaction.atomic():
+            summary, _ = cls.objects.select_for_update().get_or_create(driver_id=rating.rated_driver_id)
+            summary.add_rating(rating)
+            summary.save()
+        return summary
+
+    @classmethod
+    def rebuild(cls, driver_ids=None, batch_size=500):
+        """
+        Recalcule les résumés depuis la table des notations (tous les chauffeurs,
+        ou seulement ceux de `driver_ids`). Retourne le nombre de résumés écrits.
+        """
+        ratings = Rating.objects.filter(rating_type='CUSTOMER_TO_DRIVER', rated_driver__isnull=False)
+        summaries = cls.objects.all()
+        if driver_ids is not None:
+            ratings = ratings.filter(rated_driver_id__in=driver_ids)
+            summaries = summaries.filter(driver_id__in=driver_ids)
+
+        aggregates = {'ratings_count': models.Count('id'), 'score_sum': models.Sum('score')}
+        for criterion in cls.CRITERIA:
+            aggregates[f'{criterion}_count'] = models.Count(criterion)
+            aggregates[f'{criterion}_sum'] = models.Sum(criterion)
+        fields = list(aggregates) + ['average_score', 'updated_at']
+
+        now = timezone.now()
+        to_create = []
+        to_update = []
+
+        with transaction.atomic():
+            existing = {summary.driver_id: summary for summary in summaries.select_for_update()}
+
+            for row in ratings.order_by().values('rated_driver_id').annotate(**aggregates):
+                driver_id = row.pop('rated_driver_id')
+                summary = existing.pop(driver_id, None) or cls(driver_id=driver_id)
+                for field, value in row.items():
+                    setattr(summary, field, value or 0)
+                summary.refresh_average()
+                summary.updated_at = now
+                (to_update if summary.pk else to_create).append(summary)
+
+            # Chauffeurs dont toutes les notes ont été supprimées
+            for summary in existing.values():
+                for field in aggregates:
+                    setattr(summary, field, 0)
+                summary.refresh_average()
+                summary.updated_at = now
+                to_update.append(summary)
+
+            cls.objects.bulk_create(to_create, batch_size=batch_size)
+            cls.objects.bulk_update(to_update, fields, batch_size=batch_size)
+
+        return len(to_create) + len(to_update)
+
+    @classmethod
+    def rating_deleted(cls, sender, instance, **kwargs):
+        """
+        post_delete sur Rating (suppression unitaire, en masse, ou en cascade) :
+        le résumé du chauffeur est recalculé depuis les notations restantes
+        """
+        if instance.rating_type == 'CUSTOMER_TO_DRIVER' and instance.rated_driver_id:
+            cls.rebuild(driver_ids=[instance.rated_driver_id])
+
+    @staticmethod
+    def get_average(driver, default=5.0):
+        """
+        Note moyenne d'un chauffeur en O(1) depuis son résumé
+        (`default` si le chauffeur n'a encore jamais été noté)
+        """
+        try:
+            summary = driver.rating_summary
+        except DriverRatingSummary.DoesNotExist:
+            return default
+        return float(summary.average_score) if summary.ratings_count else default
+
+    def __str__(self):
+        return f"Note {self.average_score}/5 ({self.ratings_count}) - {self.driver}"
+
+    class Meta:
+        db_table = 'driver_rating_summaries'
+        verbose_name = 'Résumé des notes chauffeur'
+        verbose_name_plural = 'Résumés des notes chauffeurs'
+
+
 class TripTracking(models.Model):
     """Historique des positions GPS pendant une course"""
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='trip_tracking')
@@ -320,7 +483,8 @@ class TripTracking(models.Model):
         verbose_name="Statut de la commande"
     )
     
-    recorded_at = models.DateTimeField(auto_now_add=True, verbose_name="Enregistré le")
+    # Heure de réception du point (renseignée avant l'insertion différée par lot)
+    recorded_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Enregistré le")
     
     def __str__(self):
         return f"Tracking {self.order.id} - {self.recorded_at}"
@@ -336,6 +500,286 @@ class TripTracking(models.Model):
         ]
 
 
+class TripDistance(models.Model):
+    """
+    Distance parcourue pendant une course, cumulée point par point à
+    l'insertion des TripTracking (voir TripTrackingWriter).
+
+    Les points GPS peu fiables sont écartés :
+    - précision annoncée au-delà de TRIP_DISTANCE_MAX_ACCURACY_M (rejeté),
+    - point antérieur au dernier point retenu (rejeté),
+    - vitesse implicite au-delà de TRIP_DISTANCE_MAX_SPEED_KMH (saut GPS, rejeté),
+    - déplacement inférieur à TRIP_DISTANCE_MIN_SEGMENT_M ou à la précision
+      du point (bruit à l'arrêt, filtré : le point de référence ne bouge pas).
+
+    Chaque point retenu met aussi à jour, en temps constant, la distance
+    restante (à vol d'oiseau jusqu'à la destination) et l'écart entre
+    parcouru + restant et la distance estimée de la commande : c'est le
+    détecteur de déviation d'itinéraire. Cet écart ne fait que croître (un
+    détour reste parcouru) : l'alerte porte sur l'écart accumulé depuis le
+    dernier retour sur l'itinéraire.
+    """
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='trip_distance')
+
+    distance_km = models.DecimalField(
+        max_digits=12,
+        decimal_places=6,
+        default=0,
+        verbose_name="Distance parcourue (km)"
+    )
+    accepted_points = models.PositiveIntegerField(default=0, verbose_name="Points retenus")
+    filtered_points = models.PositiveIntegerField(default=0, verbose_name="Points filtrés (bruit)")
+    rejected_points = models.PositiveIntegerField(default=0, verbose_name="Points rejetés")
+
+    # Dernier point retenu : origine du prochain segment
+    last_latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
+    last_longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
+    last_recorded_at = models.DateTimeField(null=True, blank=True)
+
+    # Déviation d'itinéraire
+    remaining_km = models.DecimalField(
+        max_digits=12,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        verbose_name="Distance restante (km)"
+    )
+    deviation_km = models.DecimalField(
+        max_digits=12,
+        decimal_places=6,
+        default=0,
+        verbose_name="Écart à la distance estimée (km)"
+    )
+    max_deviation_km = models.DecimalField(
+        max_digits=12,
+        decimal_places=6,
+        default=0,
+        verbose_name="Écart maximal (km)"
+    )
+    deviation_alerted = models.BooleanField(default=False, verbose_name="Déviation signalée")
+    deviation_baseline_km = models.DecimalField(
+        max_digits=12,
+        decimal_places=6,
+        default=0,
+        verbose_name="Écart au dernier retour sur l'itinéraire (km)"
+    )
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
+
+    COMPUTED_FIELDS = ['distance_km', 'accepted_points', 'filtered_points', 'rejected_points',
+                       'last_latitude', 'last_longitude', 'last_recorded_at',
+                       'remaining_km', 'deviation_km', 'max_deviation_km', 'deviation_alerted',
+                       'deviation_baseline_km']
+
+    def add_point(self, latitude, longitude, recorded_at, accuracy=None):
+        """
+        Ajoute un point GPS à la distance cumulée (sans sauvegarder).
+        Retourne 'accepted', 'filtered' ou 'rejected'.
+        """
+        max_accuracy_m = getattr(settings, 'TRIP_DISTANCE_MAX_ACCURACY_M', 50)
+        min_segment_m = getattr(settings, 'TRIP_DISTANCE_MIN_SEGMENT_M', 10)
+        max_speed_kmh = getattr(settings, 'TRIP_DISTANCE_MAX_SPEED_KMH', 200)
+
+        accuracy = float(accuracy) if accuracy is not None else None
+        if accuracy is not None and accuracy > max_accuracy_m:
+            self.rejected_points += 1
+            return 'rejected'
+
+        if self.last_recorded_at is None:
+            self._move_to(latitude, longitude, recorded_at)
+            self.accepted_points += 1
+            return 'accepted'
+
+        if recorded_at <= self.last_recorded_at:
+            self.rejected_points += 1
+            return 'rejected'
+
+        segment_km = geo_distance.distance_km(
+            float(self.last_latitude), float(self.last_longitude),
+            float(latitude), float(longitude)
+        )
+
+        if segment_km * 1000 < max(min_segment_m, accuracy or 0):
+            self.filtered_points += 1
+            return 'filtered'
+
+        elapsed_hours = (recorded_at - self.last_recorded_at).total_seconds() / 3600
+        if segment_km / elapsed_hours > max_speed_kmh:
+            self.rejected_points += 1
+            return 'rejected'
+
+        self.distance_km = Decimal(self.distance_km) + Decimal(str(round(segment_km, 6)))
+        self._move_to(latitude, longitude, recorded_at)
+        self.accepted_points += 1
+        return 'accepted'
+
+    def _move_to(self, latitude, longitude, recorded_at):
+        self.last_latitude = round(Decimal(str(latitude)), 8)
+        self.last_longitude = round(Decimal(str(longitude)), 8)
+        self.last_recorded_at = recorded_at
+
+    def update_deviation(self, order, threshold_km):
+        """
+        Recalcule la distance restante et l'écart à la distance estimée depuis
+        le dernier point retenu (sans sauvegarder).
+        Retourne True si l'écart accumulé depuis le dernier retour sur
+        l'itinéraire vient de franchir `threshold_km`. L'alerte est réarmée
+        quand le chauffeur revient sur l'itinéraire : un segment qui le
+        rapproche de la destination d'au moins la moitié de sa longueur.
+        """
+        if self.last_latitude is None:
+            return False
+
+        previous_remaining_km = float(self.remaining_km) if self.remaining_km is not None else None
+        previous_deviation_km = float(self.deviation_km)
+
+        remaining_km = geo_distance.distance_km(
+            float(self.last_latitude), float(self.last_longitude),
+            float(order.destination_latitude), float(order.destination_longitude)
+        )
+        deviation_km = float(self.distance_km) + remaining_km - float(order.estimated_distance_km)
+
+        self.remaining_km = Decimal(str(round(remaining_km, 6)))
+        self.deviation_km = Decimal(str(round(deviation_km, 6)))
+        self.max_deviation_km = max(Decimal(self.max_deviation_km), self.deviation_km)
+
+        if not self.deviation_alerted:
+            if deviation_km - float(self.deviation_baseline_km) > threshold_km:
+                self.deviation_alerted = True
+                return True
+        elif previous_remaining_km is not None:
+            # Segment parcouru = hausse de l'écart + rapprochement de la destination
+            progress_km = previous_remaining_km - remaining_km
+            segment_km = deviation_km - previous_deviation_km + progress_km
+            if segment_km > 0 and progress_km >= segment_km / 2:
+                self.deviation_alerted = False
+                self.deviation_baseline_km = self.deviation_km
+        return False
+
+    def reset(self):
+        """Remet la distance et les compteurs à zéro (sans sauvegarder)"""
+        self.distance_km = Decimal('0')
+        self.accepted_points = self.filtered_points = self.rejected_points = 0
+        self.last_latitude = self.last_longitude = self.last_recorded_at = None
+        self.remaining_km = None
+        self.deviation_km = self.max_deviation_km = self.deviation_baseline_km = Decimal('0')
+        self.deviation_alerted = False
+
+    @classmethod
+    def record_points(cls, order_id, points, on_deviation=None):
+        """
+        Cumule de façon incrémentale les points de course d'une commande
+        (TripTracking, sauvegardés ou non). Seuls les points IN_PROGRESS comptent.
+        La ligne est verrouillée pour que deux lots simultanés ne se perdent pas.
+
+        `on_deviation(trip_distance, point)` est appelé, dans la transaction,
+        pour chaque point qui fait franchir le seuil ROUTE_DEVIATION_THRESHOLD_KM.
+        """
+        points = sorted(
+            (point for point in points if point.order_status == 'IN_PROGRESS'),
+            key=lambda point: point.recorded_at
+        )
+        if not points:
+            return None
+
+        order = points[0].order
+        threshold_km = getattr(settings, 'ROUTE_DEVIATION_THRESHOLD_KM', 2.0)
+
+        with transaction.atomic():
+            trip_distance, _ = cls.objects.select_for_update().get_or_create(order_id=order_id)
+            for point in points:
+                result = trip_distance.add_point(point.latitude, point.longitude, point.recorded_at, point.accuracy)
+                if result == 'accepted' and trip_distance.update_deviation(order, threshold_km) and on_deviation:
+                    on_deviation(trip_distance, point)
+            trip_distance.save()
+        return trip_distance
+
+    @classmethod
+    def rebuild(cls, order_ids=None, batch_size=500, commit=True):
+        """
+        Recalcule les distances depuis l'historique TripTracking (toutes les
+        courses suivies, ou seulement celles de `order_ids`).
+        Retourne {order_id: (distance stockée, distance recalculée)} ; avec
+        commit=False rien n'est écrit (vérification).
+        """
+        points = TripTracking.objects.filter(order_status='IN_PROGRESS')
+        existing = cls.objects.all()
+        if order_ids is not None:
+            points = points.filter(order_id__in=order_ids)
+            existing = existing.filter(order_id__in=order_ids)
+
+        threshold_km = getattr(settings, 'ROUTE_DEVIATION_THRESHOLD_KM', 2.0)
+        orders = Order.objects.only(
+            'destination_latitude', 'destination_longitude', 'estimated_distance_km'
+        ).in_bulk(list(points.order_by().values_list('order_id', flat=True).distinct()))
+
+        # Rejouer l'historique dans l'ordre d'insertion, qui est l'ordre du calcul
+        # incrémental (voir TripTrackingWriter) : un point arrivé après des points
+        # plus récents est rejeté de la même façon. L'écart est recalculé point
+        # par point, sans alerte
+        rebuilt = {}
+        for order_id, latitude, longitude, recorded_at, accuracy in points.order_by(
+            'order_id', 'id'
+        ).values_list('order_id', 'latitude', 'longitude', 'recorded_at', 'accuracy').iterator(chunk_size=2000):
+            trip_distance = rebuilt.get(order_id)
+            if trip_distance is None:
+                trip_distance = rebuilt[order_id] = cls(order_id=order_id)
+            if trip_distance.add_point(latitude, longitude, recorded_at, accuracy) == 'accepted':
+                trip_distance.update_deviation(orders[order_id], threshold_km)
+
+        now = timezone.now()
+        results = {}
+        to_create = []
+        to_update = []
+
+        with transaction.atomic():
+            stored = {trip_distance.order_id: trip_distance for trip_distance in (
+                existing.select_for_update() if commit else existing
+            )}
+
+            for order_id, trip_distance in rebuilt.items():
+                current = stored.pop(order_id, None)
+                results[order_id] = (
+                    float(current.distance_km) if current else None,
+                    float(trip_distance.distance_km)
+                )
+                if current:
+                    for field in cls.COMPUTED_FIELDS:
+                        setattr(current, field, getattr(trip_distance, field))
+                    current.updated_at = now
+                    to_update.append(current)
+                else:
+                    trip_distance.updated_at = now
+                    to_create.append(trip_distance)
+
+            # Courses dont tout l'historique a été supprimé
+            for order_id, current in stored.items():
+                results[order_id] = (float(current.distance_km), 0.0)
+                current.reset()
+                current.updated_at = now
+                to_update.append(current)
+
+            if commit:
+                cls.objects.bulk_create(to_create, batch_size=batch_size)
+                cls.objects.bulk_update(to_update, cls.COMPUTED_FIELDS + ['updated_at'], batch_size=batch_size)
+
+        return results
+
+    @classmethod
+    def get_distance(cls, order_id, default=0.0):
+        """Distance parcourue en O(1) (`default` si aucun point n'a encore été reçu)"""
+        distance_km = cls.objects.filter(order_id=order_id).values_list('distance_km', flat=True).first()
+        return float(distance_km) if distance_km is not None else default
+
+    def __str__(self):
+        return f"{self.distance_km} km - {self.order_id}"
+
+    class Meta:
+        db_table = 'trip_distances'
+        verbose_name = 'Distance parcourue'
+        verbose_name_plural = 'Distances parcourues'
+
+
 class DriverPool(models.Model):
     """Gestion du pool de chauffeurs pour une commande"""
     RESPONSE_STATUS = [
@@ -429,6 +873,14 @@ class DriverStatus(models.Model):
     current_latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True, verbose_name="Latitude actuelle")
     current_longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True, verbose_name="Longitude actuelle")
     last_location_update = models.DateTimeField(null=True, blank=True, verbose_name="Dernière MAJ position")
+    grid_cell = models.CharField(
+        max_length=32,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Cellule de la grille spatiale",
+        help_text="Calculée automatiquement depuis la position actuelle"
+    )
     
     # WebSocket
     websocket_channel = models.CharField(max_length=255, null=True, blank=True, verbose_name="Canal WebSocket")
@@ -447,6 +899,33 @@ class DriverStatus(models.Model):
     last_online = models.DateTimeField(null=True, blank=True, verbose_name="Dernière connexion")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
     
+    def save(self, *args, **kwargs):
+        """
+        Maintient la cellule de la grille spatiale à jour avec la position,
+        et reporte le statut dans le store des positions en temps réel une
+        fois la transaction validée (jamais d'appel Redis sous verrou, ni de
+        statut publié pour une transaction annulée)
+        """
+        self.grid_cell = grid_cell_for(self.current_latitude, self.current_longitude)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'current_latitude', 'current_longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'grid_cell'}
+
+        super().save(*args, **kwargs)
+
+        if update_fields is None or 'status' in update_fields:
+            transaction.on_commit(self._sync_location_store)
+
+    def _sync_location_store(self):
+        from .services import DriverLocationService
+
+        try:
+            DriverLocationService().sync_status(self)
+        except Exception as e:
+            # Store indisponible : la recherche retombe sur DriverStatus
+            logger.warning(f"Statut du chauffeur {self.driver_id} non reporté dans le store: {str(e)}")
+    
     def go_online(self):
         """Passe le chauffeur en ligne"""
         self.status = 'ONLINE'
@@ -470,6 +949,7 @@ class DriverStatus(models.Model):
         indexes = [
             models.Index(fields=['status']),
             models.Index(fields=['current_latitude', 'current_longitude']),
+            models.Index(fields=['status', 'grid_cell']),
         ]
 
 
@@ -532,6 +1012,7 @@ class OrderTracking(models.Model):
         ('PAYMENT_FAILED', 'Paiement échoué'),
         ('RATING_SUBMITTED', 'Note soumise'),
         ('LOCATION_UPDATE', 'MAJ position'),
+        ('ROUTE_DEVIATION', 'Déviation d\'itinéraire'),
     ]
     
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='tracking_events')
@@ -0,0 +1,226 @@
+"""
+Tampon d'écriture différée des positions chauffeurs vers PostgreSQL
+
+Le point d'entrée des positions (DriverLocationService) dépose chaque
+position ici. Seule la dernière position de chaque chauffeur est gardée ;
+le tampon est vidé en une seule requête UPDATE :
+
+- toutes les DRIVER_LOCATION_SYNC_INTERVAL secondes (thread en arrière-plan),
+- dès que DRIVER_LOCATION_BUFFER_MAX_SIZE chauffeurs sont en attente,
+- à l'arrêt du processus (atexit).
+
+Une ligne n'est écrite que si la position est plus récente que
+last_location_update : chaque processus a son propre tampon, et un vidage
+tardif ne doit pas remplacer la position écrite entre-temps par un autre.
+
+Avec un intervalle de 0, chaque position est écrite immédiatement (tests).
+"""
+import atexit
+import logging
+import threading
+import time
+from typing import Dict
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .spatial_index import grid_cell_for
+
+
+logger = logging.getLogger(__name__)
+
+
+class PositionWriteBuffer:
+    """Tampon coalescent (une entrée par chauffeur) vidé par UPDATE groupé"""
+
+    def __init__(self, flush_interval: float = None, max_size: int = None):
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else getattr(settings, 'DRIVER_LOCATION_SYNC_INTERVAL', 15)
+        )
+        self.max_size = max_size or getattr(settings, 'DRIVER_LOCATION_BUFFER_MAX_SIZE', 5000)
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._metrics = {
+            'buffered': 0,        # positions reçues
+            'coalesced': 0,       # positions remplacées par une plus récente avant écriture
+            'flushed': 0,         # lignes DriverStatus écrites
+            'flushes': 0,         # requêtes UPDATE exécutées
+            'failed_flushes': 0,
+            'last_flush_at': None,
+            'last_flush_duration_ms': None,
+        }
+
+    # --- Alimentation ---
+
+    def add(self, driver_id: int, latitude: float, longitude: float, timestamp=None):
+        """Dépose la dernière position connue d'un chauffeur"""
+        timestamp = timestamp or timezone.now()
+
+        with self._lock:
+            previous = self._pending.get(driver_id)
+            if previous is None or previous[2] <= timestamp:
+                self._pending[driver_id] = (latitude, longitude, timestamp)
+            self._metrics['buffered'] += 1
+            if previous is not None:
+                self._metrics['coalesced'] += 1
+            pending_count = len(self._pending)
+
+        if self.flush_interval <= 0 or pending_count >= self.max_size:
+            self.flush()
+        else:
+            self._ensure_started()
+
+    # --- Écriture ---
+
+    def flush(self) -> int:
+        """Écrit toutes les positions en attente ; retourne le nombre de lignes écrites"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            if not pending:
+                return 0
+
+            started = time.monotonic()
+            try:
+                written = self._write(pending)
+            except Exception as e:
+                # Remettre les positions en attente, sans écraser une position plus récente
+                with self._lock:
+                    for driver_id, position in pending.items():
+                        current = self._pending.get(driver_id)
+                        if current is None or current[2] < position[2]:
+                            self._pending[driver_id] = position
+                    self._metrics['failed_flushes'] += 1
+                logger.error(f"Écriture différée des positions échouée ({len(pending)} chauffeurs): {str(e)}")
+                return 0
+
+            with self._lock:
+                self._metrics['flushed'] += written
+                self._metrics['flushes'] += 1
+                self._metrics['last_flush_at'] = timezone.now()
+                self._metrics['last_flush_duration_ms'] = round((time.monotonic() - started) * 1000, 2)
+
+            logger.debug(f"Positions écrites en base: {written} chauffeur(s)")
+            return written
+
+    def _write(self, pending: Dict) -> int:
+        rows = [
+            (driver_id, latitude, longitude, grid_cell_for(latitude, longitude), timestamp)
+            for driver_id, (latitude, longitude, timestamp) in pending.items()
+        ]
+
+        if connection.vendor == 'postgresql':
+            return self._write_postgresql(rows)
+        return self._write_bulk_update(rows)
+
+    def _write_postgresql(self, rows) -> int:
+        """
+        UPDATE ... FROM (VALUES ...) : une seule requête pour tout le lot ; une
+        ligne déjà plus récente (écrite par un autre processus) est conservée
+        """
+        from .models import DriverStatus
+
+        table = DriverStatus._meta.db_table
+        values = ', '.join(
+            ['(%s::bigint, %s::numeric, %s::numeric, %s::varchar, %s::timestamptz)'] * len(rows)
+        )
+        params = [value for row in rows for value in row]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE "{table}" AS ds SET '
+                f'current_latitude = v.latitude, '
+                f'current_longitude = v.longitude, '
+                f'grid_cell = v.grid_cell, '
+                f'last_location_update = v.recorded_at, '
+                f'updated_at = v.recorded_at '
+                f'FROM (VALUES {values}) AS v(driver_id, latitude, longitude, grid_cell, recorded_at) '
+                f'WHERE ds.driver_id = v.driver_id '
+                f'AND (ds.last_location_update IS NULL OR ds.last_location_update < v.recorded_at)',
+                params
+            )
+            return cursor.rowcount
+
+    def _write_bulk_update(self, rows) -> int:
+        """Repli pour les autres bases (SQLite en développement) : bulk_update"""
+        from .models import DriverStatus
+
+        positions = {row[0]: row for row in rows}
+        statuses = [
+            driver_status
+            for driver_status in DriverStatus.objects.filter(driver_id__in=positions).only(
+                'id', 'driver_id', 'last_location_update'
+            )
+            if driver_status.last_location_update is None
+            or driver_status.last_location_update < positions[driver_status.driver_id][4]
+        ]
+        for driver_status in statuses:
+            _, latitude, longitude, grid_cell, timestamp = positions[driver_status.driver_id]
+            driver_status.current_latitude = latitude
+            driver_status.current_longitude = longitude
+            driver_status.grid_cell = grid_cell
+            driver_status.last_location_update = timestamp
+            driver_status.updated_at = timestamp
+
+        DriverStatus.objects.bulk_update(statuses, [
+            'current_latitude', 'current_longitude', 'grid_cell',
+            'last_location_update', 'updated_at'
+        ])
+        return len(statuses)
+
+    # --- Cycle de vie ---
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='driver-position-flush', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+    def close(self):
+        """Arrête le thread d'écriture et vide le tampon (appelé à l'arrêt du processus)"""
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def get_metrics(self) -> Dict:
+        """Compteurs du tampon (positions reçues vs écrites) et taille en attente"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['pending'] = len(self._pending)
+        return metrics
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_position_buffer() -> PositionWriteBuffer:
+    """Tampon partagé du processus, vidé automatiquement à l'arrêt"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = PositionWriteBuffer()
+                atexit.register(_buffer.close)
+    return _buffer
@@ -0,0 +1,252 @@
+"""
+Instantané immuable de la configuration tarifaire
+
+Un calcul de prix lisait jusqu'ici, à chaque appel, six GeneralConfig, le
+type de véhicule, la ville, la zone VIP et ses règles kilométriques.
+PricingSnapshot charge toutes ces tables en une fois (5 requêtes) et les
+garde en mémoire du processus : en régime établi, une estimation de prix ne
+coûte aucune requête. Les contours des villes et zones VIP y sont indexés
+(core.zone_index) pour retrouver la ville et la zone d'un point de départ.
+
+Invalidation :
+- les signaux post_save / post_delete des modèles concernés, et les actions
+  groupées de l'admin (queryset.update()), incrémentent un compteur de version
+  dans le cache Django et oublient l'instantané du processus courant. Ce
+  cache doit être partagé entre processus (CACHES Redis, voir settings) ;
+- chaque processus relit ce compteur au plus toutes les
+  PRICING_SNAPSHOT_CHECK_INTERVAL secondes ;
+- PRICING_SNAPSHOT_MAX_AGE borne l'âge d'un instantané (modifications faites
+  sans signal : SQL direct, scripts).
+"""
+import threading
+import time
+from bisect import bisect_right
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from core.zone_index import ZoneIndex
+
+
+VERSION_CACHE_KEY = 'pricing_snapshot:version'
+
+
+class KilometerTariff:
+    """
+    Règles kilométriques actives d'une zone VIP, compilées en tableaux triés
+    par seuil croissant : la règle applicable (seuil le plus haut atteint)
+    est trouvée par recherche dichotomique.
+    """
+
+    __slots__ = ('thresholds', 'day_prices', 'night_prices')
+
+    def __init__(self, rules):
+        """`rules` : [(min_kilometers, prix_jour_per_km, prix_nuit_per_km)] triées par seuil croissant"""
+        self.thresholds = tuple(rule[0] for rule in rules)
+        self.day_prices = tuple(rule[1] for rule in rules)
+        self.night_prices = tuple(rule[2] for rule in rules)
+
+    def price_per_km(self, distance_km, is_night) -> Optional[Decimal]:
+        """Prix au km de la règle applicable, ou None si aucun seuil n'est atteint"""
+        index = bisect_right(self.thresholds, distance_km) - 1
+        if index < 0:
+            return None
+        return self.night_prices[index] if is_night else self.day_prices[index]
+
+
+class PricingSnapshot:
+    """Tables tarifaires actives, figées au moment du chargement"""
+
+    __slots__ = ('version', 'loaded_at', 'configs', 'vehicle_types', 'vehicle_type_names',
+                 'cities', 'vip_zones', 'km_rules', 'city_index', 'vip_zone_index')
+
+    def __init__(self, version, configs, vehicle_types, vehicle_type_names, cities, vip_zones, km_rules,
+                 city_index=None, vip_zone_index=None):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'loaded_at', time.monotonic())
+        # search_key -> valeur numérique (None si non numérique)
+        object.__setattr__(self, 'configs', MappingProxyType(configs))
+        # id -> montant additionnel
+        object.__setattr__(self, 'vehicle_types', MappingProxyType(vehicle_types))
+        # id -> nom (types actifs)
+        object.__setattr__(self, 'vehicle_type_names', MappingProxyType(vehicle_type_names))
+        # id -> (prix_jour, prix_nuit)
+        object.__setattr__(self, 'cities', MappingProxyType(cities))
+        # id -> (prix_jour, prix_nuit)
+        object.__setattr__(self, 'vip_zones', MappingProxyType(vip_zones))
+        # vip_zone_id -> KilometerTariff
+        object.__setattr__(self, 'km_rules', MappingProxyType(km_rules))
+        # Contours des villes / zones VIP actives
+        object.__setattr__(self, 'city_index', city_index or ZoneIndex([]))
+        object.__setattr__(self, 'vip_zone_index', vip_zone_index or ZoneIndex([]))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PricingSnapshot est immuable")
+
+    @classmethod
+    def load(cls, version=None) -> 'PricingSnapshot':
+        """Charge les tables tarifaires actives depuis la base"""
+        from core.models import City
+        from core.admin import VipZoneProxy, VipZoneKilometerRuleProxy
+        from core.config_registry import get_config_registry
+        from vehicles.models import VehicleType
+
+        # Relu depuis la base : l'instantané et le registre restent cohérents
+        configs = get_config_registry().numeric_values(refresh=True)
+
+        vehicle_types = {}
+        vehicle_type_names = {}
+        for vehicle_type_id, name, additional_amount in VehicleType.objects.filter(
+            is_active=True
+        ).order_by('name').values_list('id', 'name', 'additional_amount'):
+            vehicle_types[vehicle_type_id] = additional_amount
+            vehicle_type_names[vehicle_type_id] = name
+        cities = {}
+        city_boundaries = []
+        for city_id, prix_jour, prix_nuit, boundary in City.objects.filter(
+            active=True
+        ).values_list('id', 'prix_jour', 'prix_nuit', 'boundary'):
+            cities[city_id] = (prix_jour, prix_nuit)
+            city_boundaries.append((city_id, boundary))
+        vip_zones = {}
+        vip_zone_boundaries = []
+        for zone_id, prix_jour, prix_nuit, boundary in VipZoneProxy.objects.filter(
+            active=True
+        ).values_list('id', 'prix_jour', 'prix_nuit', 'boundary'):
+            vip_zones[zone_id] = (prix_jour, prix_nuit)
+            vip_zone_boundaries.append((zone_id, boundary))
+
+        # Un seul tarif par seuil : à seuil égal, la règle la plus ancienne (plus petit id)
+        km_rules = {}
+        for zone_id, min_kilometers, prix_jour_per_km, prix_nuit_per_km in VipZoneKilometerRuleProxy.objects.filter(
+            active=True
+        ).order_by('vip_zone_id', 'min_kilometers', 'id').values_list(
+            'vip_zone_id', 'min_kilometers', 'prix_jour_per_km', 'prix_nuit_per_km'
+        ):
+            rules = km_rules.setdefault(zone_id, [])
+            if not rules or rules[-1][0] != min_kilometers:
+                rules.append((min_kilometers, prix_jour_per_km, prix_nuit_per_km))
+
+        return cls(
+            version=version,
+            configs=configs,
+            vehicle_types=vehicle_types,
+            vehicle_type_names=vehicle_type_names,
+            cities=cities,
+            vip_zones=vip_zones,
+            km_rules={zone_id: KilometerTariff(rules) for zone_id, rules in km_rules.items()},
+            city_index=ZoneIndex.build(city_boundaries),
+            vip_zone_index=ZoneIndex.build(vip_zone_boundaries),
+        )
+
+    # --- Lectures ---
+
+    def get_config(self, search_key, default_value):
+        """Valeur numérique d'une configuration active (default_value si absente, nulle ou non numérique)"""
+        return self.configs.get(search_key) or default_value
+
+    def get_vehicle_additional_price(self, vehicle_type_id) -> Decimal:
+        return self.vehicle_types.get(_int(vehicle_type_id), Decimal('0'))
+
+    def get_city_price(self, city_id, is_night) -> Decimal:
+        prices = self.cities.get(_int(city_id))
+        if prices is None:
+            return Decimal('0')
+        return prices[1] if is_night else prices[0]
+
+    def get_vip_zone_price(self, vip_zone_id, distance_km, is_night) -> Decimal:
+        """Prix de base de la zone VIP + règle kilométrique applicable (seuil le plus haut atteint)"""
+        prices = self.vip_zones.get(_int(vip_zone_id))
+        if prices is None:
+            return Decimal('0')
+
+        base_vip_price = prices[1] if is_night else prices[0]
+        tariff = self.km_rules.get(_int(vip_zone_id))
+        km_price = tariff.price_per_km(distance_km, is_night) if tariff else None
+        if km_price is None:
+            return base_vip_price
+        return base_vip_price + Decimal(str(distance_km)) * km_price
+
+    def locate_city(self, latitude, longitude) -> Optional[int]:
+        """Ville active dont le contour contient le point, ou None"""
+        return self.city_index.locate(latitude, longitude)
+
+    def locate_vip_zone(self, latitude, longitude) -> Optional[int]:
+        """Plus petite zone VIP active dont le contour contient le point, ou None"""
+        return self.vip_zone_index.locate(latitude, longitude)
+
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _current_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, 1, None)
+        version = cache.get(VERSION_CACHE_KEY, 1)
+    return version
+
+
+def get_pricing_snapshot() -> PricingSnapshot:
+    """Instantané courant du processus, rechargé quand la version du cache change"""
+    global _snapshot, _checked_at
+
+    now = time.monotonic()
+    snapshot = _snapshot
+    check_interval = getattr(settings, 'PRICING_SNAPSHOT_CHECK_INTERVAL', 5)
+    max_age = getattr(settings, 'PRICING_SNAPSHOT_MAX_AGE', 300)
+
+    if snapshot is not None and now - _checked_at < check_interval and now - snapshot.loaded_at < max_age:
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshot
+        version = _current_version()
+        if snapshot is None or snapshot.version != version or now - snapshot.loaded_at >= max_age:
+            snapshot = _snapshot = PricingSnapshot.load(version=version)
+        _checked_at = now
+    return snapshot
+
+
+def invalidate_pricing_snapshot(**kwargs):
+    """
+    Publie une nouvelle version (tous les processus) et oublie l'instantané
+    local, une fois la transaction en cours validée
+    """
+    transaction.on_commit(_publish_new_version)
+
+
+def _publish_new_version():
+    global _snapshot
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 2, None)
+    with _lock:
+        _snapshot = None
+
+
+def connect_signals():
+    """Branche l'invalidation sur les modèles tarifaires (appelé par OrderConfig.ready)"""
+    from core.models import GeneralConfig, City
+    from core.admin import VipZoneProxy, VipZoneKilometerRuleProxy
+    from vehicles.models import VehicleType
+
+    for model in (GeneralConfig, VehicleType, City, VipZoneProxy, VipZoneKilometerRuleProxy):
+        dispatch_uid = f'pricing_snapshot_{model._meta.label_lower}'
+        post_save.connect(invalidate_pricing_snapshot, sender=model, dispatch_uid=f'{dispatch_uid}_save')
+        post_delete.connect(invalidate_pricing_snapshot, sender=model, dispatch_uid=f'{dispatch_uid}_delete')
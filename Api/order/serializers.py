@@ -2,12 +2,14 @@
 Serializers pour le module de commande VTC
 """
 from rest_framework import serializers
+from django.conf import settings
 from django.db import transaction
 from decimal import Decimal
 
 from users.models import UserDriver, UserCustomer
 from vehicles.models import VehicleType
 from core.models import City, VipZone
+from .pricing_snapshot import get_pricing_snapshot
 from .models import (
     Order, DriverStatus, CustomerStatus, OrderTracking, PaymentMethod,
     Rating, TripTracking, DriverPool
@@ -81,6 +83,22 @@ class UpdateLocationSerializer(serializers.Serializer):
     )
 
 
+class TripPointSerializer(UpdateLocationSerializer):
+    """Point GPS enregistré par l'application pendant une course"""
+    recorded_at = serializers.DateTimeField()
+
+
+class UpdateDriverLocationSerializer(UpdateLocationSerializer):
+    """Position du chauffeur, avec les points de course enregistrés depuis le dernier envoi"""
+    points = TripPointSerializer(many=True, required=False)
+    
+    def validate_points(self, value):
+        max_points = getattr(settings, 'TRIP_TRACKING_MAX_POINTS', 500)
+        if len(value) > max_points:
+            raise serializers.ValidationError(f"Au plus {max_points} points par envoi")
+        return value
+
+
 # ============= ORDER SERIALIZERS =============
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -151,6 +169,29 @@ class OrderListSerializer(serializers.ModelSerializer):
         return None
 
 
+def resolve_pickup_zones(data):
+    """
+    Complète city_id / vip_zone_id à partir du point de départ quand le client
+    ne les fournit pas (contours indexés dans l'instantané tarifaire).
+    Un vip_zone_id explicitement nul est conservé.
+    """
+    snapshot = get_pricing_snapshot()
+    latitude, longitude = data['pickup_latitude'], data['pickup_longitude']
+
+    if data.get('city_id') is None:
+        city_id = snapshot.locate_city(latitude, longitude)
+        if city_id is None:
+            raise serializers.ValidationError({
+                'city_id': "Aucune ville active ne couvre le point de départ, précisez city_id"
+            })
+        data['city_id'] = city_id
+
+    if 'vip_zone_id' not in data:
+        data['vip_zone_id'] = snapshot.locate_vip_zone(latitude, longitude)
+
+    return data
+
+
 class SearchDriversSerializer(serializers.Serializer):
     """Serializer pour la recherche de chauffeurs"""
     pickup_latitude = serializers.DecimalField(max_digits=10, decimal_places=8)
@@ -166,8 +207,14 @@ class EstimatePriceSerializer(serializers.Serializer):
     destination_latitude = serializers.DecimalField(max_digits=10, decimal_places=8)
     destination_longitude = serializers.DecimalField(max_digits=11, decimal_places=8)
     vehicle_type_id = serializers.IntegerField()
-    city_id = serializers.IntegerField()
-    vip_zone_id = serializers.IntegerField(required=False, allow_null=True)
+    city_id = serializers.IntegerField(
+        required=False, allow_null=True,
+        help_text="Par défaut : ville dont le contour contient le point de départ"
+    )
+    vip_zone_id = serializers.IntegerField(
+        required=False, allow_null=True,
+        help_text="Par défaut : zone VIP dont le contour contient le point de départ"
+    )
     
     def validate_vehicle_type_id(self, value):
         if not VehicleType.objects.filter(id=value, is_active=True).exists():
@@ -175,7 +222,7 @@ class EstimatePriceSerializer(serializers.Serializer):
         return value
     
     def validate_city_id(self, value):
-        if not City.objects.filter(id=value, active=True).exists():
+        if value is not None and not City.objects.filter(id=value, active=True).exists():
             raise serializers.ValidationError("Ville invalide ou inactive")
         return value
     
@@ -183,6 +230,53 @@ class EstimatePriceSerializer(serializers.Serializer):
         if value and not VipZone.objects.filter(id=value, active=True).exists():
             raise serializers.ValidationError("Zone VIP invalide ou inactive")
         return value
+    
+    def validate(self, data):
+        return resolve_pickup_zones(data)
+
+
+class QuotePricesSerializer(serializers.Serializer):
+    """Serializer pour le devis multi-types de véhicule (validé sur l'instantané tarifaire)"""
+    pickup_latitude = serializers.DecimalField(max_digits=10, decimal_places=8)
+    pickup_longitude = serializers.DecimalField(max_digits=11, decimal_places=8)
+    destination_latitude = serializers.DecimalField(max_digits=10, decimal_places=8)
+    destination_longitude = serializers.DecimalField(max_digits=11, decimal_places=8)
+    city_id = serializers.IntegerField(
+        required=False, allow_null=True,
+        help_text="Par défaut : ville dont le contour contient le point de départ"
+    )
+    vip_zone_id = serializers.IntegerField(
+        required=False, allow_null=True,
+        help_text="Par défaut : zone VIP dont le contour contient le point de départ"
+    )
+    vehicle_type_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False,
+        help_text="Types de véhicule à chiffrer (par défaut : tous les types actifs)"
+    )
+    
+    def validate_city_id(self, value):
+        if value is not None and value not in get_pricing_snapshot().cities:
+            raise serializers.ValidationError("Ville invalide ou inactive")
+        return value
+    
+    def validate_vip_zone_id(self, value):
+        if value and value not in get_pricing_snapshot().vip_zones:
+            raise serializers.ValidationError("Zone VIP invalide ou inactive")
+        return value
+    
+    def validate_vehicle_type_ids(self, value):
+        unknown = [vehicle_type_id for vehicle_type_id in value
+                   if vehicle_type_id not in get_pricing_snapshot().vehicle_types]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Type(s) de véhicule invalide(s) ou inactif(s): {', '.join(str(i) for i in unknown)}"
+            )
+        return value
+    
+    def validate(self, data):
+        return resolve_pickup_zones(data)
 
 
 class CreateOrderSerializer(serializers.Serializer):
@@ -194,8 +288,14 @@ class CreateOrderSerializer(serializers.Serializer):
     destination_latitude = serializers.DecimalField(max_digits=10, decimal_places=8)
     destination_longitude = serializers.DecimalField(max_digits=11, decimal_places=8)
     vehicle_type_id = serializers.IntegerField()
-    city_id = serializers.IntegerField()
-    vip_zone_id = serializers.IntegerField(required=False, allow_null=True)
+    city_id = serializers.IntegerField(
+        required=False, allow_null=True,
+        help_text="Par défaut : ville dont le contour contient le point de départ"
+    )
+    vip_zone_id = serializers.IntegerField(
+        required=False, allow_null=True,
+        help_text="Par défaut : zone VIP dont le contour contient le point de départ"
+    )
     payment_method_id = serializers.IntegerField(required=False, allow_null=True)
     customer_notes = serializers.CharField(max_length=1000, required=False, allow_blank=True)
     
@@ -205,7 +305,7 @@ class CreateOrderSerializer(serializers.Serializer):
         return value
     
     def validate_city_id(self, value):
-        if not City.objects.filter(id=value, active=True).exists():
+        if value is not None and not City.objects.filter(id=value, active=True).exists():
             raise serializers.ValidationError("Ville invalide ou inactive")
         return value
     
@@ -243,7 +343,7 @@ class CreateOrderSerializer(serializers.Serializer):
                 "La distance est trop importante (maximum 100 km)"
             )
         
-        return data
+        return resolve_pickup_zones(data)
 
 
 class CancelOrderSerializer(serializers.Serializer):
@@ -254,7 +354,8 @@ class CancelOrderSerializer(serializers.Serializer):
 class CompleteOrderSerializer(serializers.Serializer):
     """Serializer pour terminer une course"""
     actual_distance_km = serializers.DecimalField(
-        max_digits=8, decimal_places=2, min_value=0
+        max_digits=8, decimal_places=2, min_value=0, required=False,
+        help_text="Par défaut : distance cumulée du tracking GPS"
     )
     waiting_time = serializers.IntegerField(min_value=0, default=0)
     driver_notes = serializers.CharField(
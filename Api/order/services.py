@@ -8,16 +8,22 @@ from django.utils import timezone
 from django.db import transaction
 from django.db.models import Q, F, Avg, Count
 from django.conf import settings
+from django.core.cache import cache
 import logging
-import math
 
 from users.models import UserDriver, UserCustomer
-from vehicles.models import VehicleType, Vehicle
-from core.models import GeneralConfig, City, VipZone, VipZoneKilometerRule
+from vehicles.models import Vehicle
+from core.config_registry import get_config_registry
 from .models import (
     Order, DriverStatus, PaymentMethod, Rating, 
-    TripTracking, DriverPool, OrderTracking
+    TripTracking, DriverPool, OrderTracking, DriverRatingSummary, TripDistance
 )
+from .spatial_index import grid_cells_around, grid_cell_for
+from .location_store import get_location_store
+from .position_buffer import get_position_buffer
+from .trip_tracking_writer import get_trip_tracking_writer
+from .pricing_snapshot import get_pricing_snapshot
+from . import geo_distance
 
 logger = logging.getLogger(__name__)
 
@@ -26,33 +32,37 @@ class PricingService:
     """Service pour calculer les prix des commandes"""
     
     def calculate_order_price(self, vehicle_type_id, city_id, distance_km, 
-                            vip_zone_id=None, is_night=None, waiting_minutes=0):
+                            vip_zone_id=None, is_night=None, waiting_minutes=0,
+                            snapshot=None):
         """
         Calcule le prix total d'une commande avec tous les paramètres
         """
+        # Toutes les tables tarifaires viennent du même instantané (aucune requête)
+        snapshot = snapshot or get_pricing_snapshot()
+        
         if is_night is None:
-            is_night = self.is_night_time()
+            is_night = self.is_night_time(snapshot=snapshot)
         
         # Prix de base de la course
-        base_price = self._get_config_value('STD_PRICELIST_ORDER', 500)
+        base_price = snapshot.get_config('STD_PRICELIST_ORDER', 500)
         
         # Prix par kilomètre
-        price_per_km = self._get_config_value('PRICE_PER_KM', 250)
+        price_per_km = snapshot.get_config('PRICE_PER_KM', 250)
         distance_price = Decimal(str(distance_km)) * Decimal(str(price_per_km))
         
         # Prix additionnel du type de véhicule
-        vehicle_additional_price = self._get_vehicle_additional_price(vehicle_type_id)
+        vehicle_additional_price = snapshot.get_vehicle_additional_price(vehicle_type_id)
         
         # Prix de la ville (jour/nuit)
-        city_price = self._get_city_price(city_id, is_night)
+        city_price = snapshot.get_city_price(city_id, is_night)
         
         # Prix zone VIP si applicable
         vip_zone_price = Decimal('0')
         if vip_zone_id:
-            vip_zone_price = self._get_vip_zone_price(vip_zone_id, distance_km, is_night)
+            vip_zone_price = snapshot.get_vip_zone_price(vip_zone_id, distance_km, is_night)
         
         # Prix d'attente
-        waiting_price = self.calculate_waiting_price(waiting_minutes)
+        waiting_price = self.calculate_waiting_price(waiting_minutes, snapshot=snapshot)
         
         # Total
         total_price = (
@@ -83,13 +93,14 @@ class PricingService:
             }
         }
     
-    def calculate_waiting_price(self, waiting_minutes):
+    def calculate_waiting_price(self, waiting_minutes, snapshot=None):
         """Calcule le prix basé sur le temps d'attente"""
         if waiting_minutes <= 0:
             return Decimal('0')
         
-        price_per_minute = self._get_config_value('PRICE_PER_WAITING_MINUTE', 50)
-        free_waiting_time = self._get_config_value('FREE_WAITING_TIME', 5)
+        snapshot = snapshot or get_pricing_snapshot()
+        price_per_minute = snapshot.get_config('PRICE_PER_WAITING_MINUTE', 50)
+        free_waiting_time = snapshot.get_config('FREE_WAITING_TIME', 5)
         
         # Les premières minutes sont gratuites
         billable_minutes = max(0, waiting_minutes - free_waiting_time)
@@ -127,7 +138,8 @@ class PricingService:
         """
         Estime une fourchette de prix (min/max) pour une course
         """
-        is_night = self.is_night_time()
+        snapshot = get_pricing_snapshot()
+        is_night = self.is_night_time(snapshot=snapshot)
         
         # Prix minimum (sans attente, distance optimale -10%)
         min_distance = estimated_distance_km * 0.9
@@ -137,19 +149,21 @@ class PricingService:
             distance_km=min_distance,
             vip_zone_id=vip_zone_id,
             is_night=is_night,
-            waiting_minutes=0
+            waiting_minutes=0,
+            snapshot=snapshot
         )
         
         # Prix maximum (avec attente moyenne, distance +20%)
         max_distance = estimated_distance_km * 1.2
-        avg_waiting = self._get_config_value('AVG_WAITING_TIME', 10)
+        avg_waiting = snapshot.get_config('AVG_WAITING_TIME', 10)
         max_price = self.calculate_order_price(
             vehicle_type_id=vehicle_type_id,
             city_id=city_id,
             distance_km=max_distance,
             vip_zone_id=vip_zone_id,
             is_night=is_night,
-            waiting_minutes=avg_waiting
+            waiting_minutes=avg_waiting,
+            snapshot=snapshot
         )
         
         return {
@@ -160,63 +174,100 @@ class PricingService:
             'currency': 'FCFA'
         }
     
-    def _get_config_value(self, search_key, default_value):
-        """Récupère une valeur de configuration"""
-        try:
-            config = GeneralConfig.objects.get(search_key=search_key, active=True)
-            return config.get_numeric_value() or default_value
-        except GeneralConfig.DoesNotExist:
-            return default_value
+    def quote_vehicle_types(self, pickup_lat, pickup_lng, destination_lat, destination_lng,
+                            city_id, vip_zone_id=None, vehicle_type_ids=None) -> Dict:
+        """
+        Fourchettes de prix (comme estimate_price_range) de tous les types de
+        véhicule actifs, ou de `vehicle_type_ids`, pour un même trajet.
+        La distance, le tarif de nuit et les composantes communes sont calculés
+        une seule fois ; le devis est gardé PRICE_QUOTE_CACHE_TTL secondes en
+        cache par coordonnées arrondies, ville, zone VIP et tarif de nuit.
+        """
+        snapshot = get_pricing_snapshot()
+        is_night = self.is_night_time(snapshot=snapshot)
+        
+        coordinates = tuple(
+            float(value) for value in (pickup_lat, pickup_lng, destination_lat, destination_lng)
+        )
+        # Coordonnées arrondies dans la clé seulement : le devis est calculé sur les
+        # coordonnées exactes. La version de l'instantané dans la clé : un changement
+        # de tarif invalide les devis
+        precision = getattr(settings, 'PRICE_QUOTE_COORDINATE_PRECISION', 3)
+        cache_key = 'price_quote:{}:{}:{}:{}:{}'.format(
+            snapshot.version, ':'.join(str(round(value, precision)) for value in coordinates),
+            city_id, vip_zone_id or 0, int(is_night)
+        )
+        
+        quote = cache.get(cache_key)
+        cached = quote is not None
+        if not cached:
+            quote = self._build_quote(snapshot, coordinates, city_id, vip_zone_id, is_night)
+            cache.set(cache_key, quote, getattr(settings, 'PRICE_QUOTE_CACHE_TTL', 60))
+        
+        quotes = quote['quotes']
+        if vehicle_type_ids:
+            wanted = set(vehicle_type_ids)
+            quotes = [entry for entry in quotes if entry['vehicle_type_id'] in wanted]
+        
+        return {**quote, 'quotes': quotes, 'cached': cached}
+    
+    def _build_quote(self, snapshot, coordinates, city_id, vip_zone_id, is_night) -> Dict:
+        """Devis de tous les types actifs : seul le supplément du véhicule diffère d'un type à l'autre"""
+        distance = geo_distance.distance_km(*coordinates)
+        avg_waiting = snapshot.get_config('AVG_WAITING_TIME', 10)
+        
+        # Mêmes hypothèses que estimate_price_range : -10 % sans attente, +20 % avec attente moyenne
+        shared_min = self.calculate_order_price(
+            vehicle_type_id=None, city_id=city_id, distance_km=distance * 0.9,
+            vip_zone_id=vip_zone_id, is_night=is_night, waiting_minutes=0,
+            snapshot=snapshot
+        )['total_price']
+        shared_max = self.calculate_order_price(
+            vehicle_type_id=None, city_id=city_id, distance_km=distance * 1.2,
+            vip_zone_id=vip_zone_id, is_night=is_night, waiting_minutes=avg_waiting,
+            snapshot=snapshot
+        )['total_price']
+        
+        quotes = []
+        for vehicle_type_id, name in snapshot.vehicle_type_names.items():
+            additional_price = snapshot.get_vehicle_additional_price(vehicle_type_id)
+            min_price = shared_min + additional_price
+            max_price = shared_max + additional_price
+            quotes.append({
+                'vehicle_type_id': vehicle_type_id,
+                'vehicle_type_name': name,
+                'min_price': float(min_price),
+                'max_price': float(max_price),
+                'estimated_price': float((min_price + max_price) / 2),
+            })
+        
+        return {
+            'distance_km': round(distance, 2),
+            'is_night_fare': is_night,
+            'currency': 'FCFA',
+            'quotes': quotes,
+        }
     
     def _get_vehicle_additional_price(self, vehicle_type_id):
         """Récupère le prix additionnel du type de véhicule"""
-        try:
-            vehicle_type = VehicleType.objects.get(id=vehicle_type_id, is_active=True)
-            return vehicle_type.additional_amount
-        except VehicleType.DoesNotExist:
-            return Decimal('0')
+        return get_pricing_snapshot().get_vehicle_additional_price(vehicle_type_id)
     
     def _get_city_price(self, city_id, is_night):
         """Récupère le prix de la ville selon l'heure"""
-        try:
-            city = City.objects.get(id=city_id, active=True)
-            return city.prix_nuit if is_night else city.prix_jour
-        except City.DoesNotExist:
-            return Decimal('0')
+        return get_pricing_snapshot().get_city_price(city_id, is_night)
     
     def _get_vip_zone_price(self, vip_zone_id, distance_km, is_night):
         """Calcule le prix pour une zone VIP avec les règles kilométriques"""
-        try:
-            vip_zone = VipZone.objects.get(id=vip_zone_id, active=True)
-            
-            # Prix de base de la zone VIP
-            base_vip_price = vip_zone.prix_nuit if is_night else vip_zone.prix_jour
-            
-            # Chercher la règle kilométrique applicable
-            rules = VipZoneKilometerRule.objects.filter(
-                vip_zone=vip_zone,
-                min_kilometers__lte=distance_km,
-                active=True
-            ).order_by('-min_kilometers')
-            
-            if rules.exists():
-                rule = rules.first()
-                km_price = rule.prix_nuit_per_km if is_night else rule.prix_jour_per_km
-                additional_km_price = Decimal(str(distance_km)) * km_price
-                return base_vip_price + additional_km_price
-            else:
-                return base_vip_price
-                
-        except VipZone.DoesNotExist:
-            return Decimal('0')
+        return get_pricing_snapshot().get_vip_zone_price(vip_zone_id, distance_km, is_night)
     
-    def is_night_time(self, current_time=None):
+    def is_night_time(self, current_time=None, snapshot=None):
         """Détermine si c'est l'heure de nuit"""
         if current_time is None:
             current_time = timezone.now().time()
         
-        night_start_hour = self._get_config_value('NIGHT_FARE_START_HOUR', 22)
-        night_end_hour = self._get_config_value('NIGHT_FARE_END_HOUR', 6)
+        snapshot = snapshot or get_pricing_snapshot()
+        night_start_hour = snapshot.get_config('NIGHT_FARE_START_HOUR', 22)
+        night_end_hour = snapshot.get_config('NIGHT_FARE_END_HOUR', 6)
         
         night_start = time(int(night_start_hour), 0)
         night_end = time(int(night_end_hour), 0)
@@ -240,12 +291,42 @@ class OrderService:
         drivers_with_distance = []
         radius_km = radius_km or 10  # Rayon par défaut de 10 km
         
-        # Récupérer les chauffeurs ONLINE avec position GPS disponible
+        candidates = self._find_candidates(pickup_lat, pickup_lng, radius_km, vehicle_type_id)
+        
+        # Charger les véhicules de tous les candidats en une seule requête
+        vehicles = self._load_candidate_vehicles(
+            [driver_status.driver_id for driver_status, _ in candidates],
+            vehicle_type_id
+        )
+        
+        for driver_status, distance in candidates:
+            vehicle = vehicles.get(driver_status.driver_id)
+            
+            # Si le chauffeur a un véhicule actif, l'ajouter à la liste
+            if vehicle:
+                drivers_with_distance.append(self._build_driver_entry(driver_status, distance, vehicle))
+                logger.info(f"📍 Chauffeur {driver_status.driver.id} trouvé à {round(distance, 2)}km de distance GPS réelle")
+        
+        # Trier par distance croissante (GPS réelle)
+        drivers_with_distance.sort(key=lambda x: x['distance_km'])
+        
+        logger.info(f"🔍 Recherche GPS terminée: {len(drivers_with_distance)} chauffeurs trouvés dans un rayon de {radius_km}km")
+        
+        # Limiter le nombre de résultats
+        return drivers_with_distance[:limit]
+    
+    def _find_candidates(self, pickup_lat, pickup_lng, radius_km,
+                         vehicle_type_id=None) -> List[Tuple[DriverStatus, float]]:
+        """
+        Retourne les statuts ONLINE situés dans le rayon, avec leur distance GPS réelle
+        """
+        # Récupérer les chauffeurs ONLINE dont la cellule de grille recouvre le rayon
         query = DriverStatus.objects.filter(
             status='ONLINE',
+            grid_cell__in=grid_cells_around(pickup_lat, pickup_lng, radius_km),
             current_latitude__isnull=False,
             current_longitude__isnull=False
-        ).select_related('driver')
+        ).select_related('driver', 'driver__rating_summary')
         
         # Si un type de véhicule est spécifié, filtrer
         if vehicle_type_id:
@@ -255,115 +336,147 @@ class OrderService:
                 driver__vehicles__is_online=True
             ).distinct()
         
-        for driver_status in query:
-            # Calculer la distance réelle basée sur la position GPS
-            distance = self.calculate_real_distance(
-                pickup_lat, pickup_lng,
-                float(driver_status.current_latitude),
-                float(driver_status.current_longitude)
-            )
-            
-            # Filtrer par rayon seulement si dans le rayon demandé
-            if distance <= radius_km:
-                driver_lat = float(driver_status.current_latitude)
-                driver_lng = float(driver_status.current_longitude)
-                
-                # Récupérer les infos du véhicule
-                vehicle = None
-                if vehicle_type_id:
-                    vehicle = Vehicle.objects.filter(
-                        driver=driver_status.driver,
-                        vehicle_type_id=vehicle_type_id,
-                        is_active=True,
-                        is_online=True
-                    ).first()
-                else:
-                    vehicle = Vehicle.objects.filter(
-                        driver=driver_status.driver,
-                        is_active=True,
-                        is_online=True
-                    ).first()
-                
-                # Si le chauffeur a un véhicule actif, l'ajouter à la liste
-                if vehicle:
-                    # Calculer le rating moyen du chauffeur
-                    avg_rating = Rating.objects.filter(
-                        rated_driver=driver_status.driver,
-                        rating_type='CUSTOMER_TO_DRIVER'
-                    ).aggregate(avg=Avg('score'))['avg'] or 5.0
-                    
-                    drivers_with_distance.append({
-                        'driver_id': driver_status.driver.id,
-                        'driver_name': f"{driver_status.driver.name} {driver_status.driver.surname}",
-                        'driver_phone': driver_status.driver.phone_number,
-                        'distance_km': round(distance, 2),  # Distance GPS réelle
-                        'latitude': driver_lat,
-                        'longitude': driver_lng,
-                        'vehicle': {
-                            'id': vehicle.id,
-                            'vehicle_type_id': vehicle.vehicle_type.id if vehicle.vehicle_type else None,
-                            'type': vehicle.vehicle_type.name if vehicle.vehicle_type else None,
-                            'plaque': vehicle.plaque_immatriculation,
-                            'brand': vehicle.brand.name if vehicle.brand else None,
-                            'model': vehicle.model.name if vehicle.model else None,
-                            'color': vehicle.color.name if vehicle.color else None,
-                        },
-                        'rating': round(avg_rating, 1),
-                        'orders_today': driver_status.total_orders_today,
-                        'last_update': driver_status.last_location_update.isoformat() if driver_status.last_location_update else None
-                    })
-                    
-                    logger.info(f"📍 Chauffeur {driver_status.driver.id} trouvé à {round(distance, 2)}km de distance GPS réelle")
+        # Calculer en un seul appel vectorisé la distance réelle de chaque candidat
+        driver_statuses = list(query)
+        distances = geo_distance.distances_from_point_km(
+            pickup_lat, pickup_lng,
+            [driver_status.current_latitude for driver_status in driver_statuses],
+            [driver_status.current_longitude for driver_status in driver_statuses]
+        )
         
-        # Trier par distance croissante (GPS réelle)
-        drivers_with_distance.sort(key=lambda x: x['distance_km'])
+        # Garder ceux dans le rayon
+        return [
+            (driver_status, float(distance))
+            for driver_status, distance in zip(driver_statuses, distances)
+            if distance <= radius_km
+        ]
+    
+    def _load_candidate_vehicles(self, driver_ids: List[int], vehicle_type_id=None) -> Dict:
+        """
+        Charge en lot, pour une liste de chauffeurs, leur véhicule actif en service
+        (avec type, marque, modèle et couleur). Retourne un dictionnaire indexé par driver_id.
+        """
+        return {
+            driver_id: driver_vehicles[0]
+            for driver_id, driver_vehicles in self._load_candidate_vehicle_lists(driver_ids, vehicle_type_id).items()
+        }
+    
+    def _load_candidate_vehicle_lists(self, driver_ids: List[int], vehicle_type_id=None) -> Dict:
+        """
+        Comme _load_candidate_vehicles, mais garde tous les véhicules actifs en service
+        de chaque chauffeur, du plus récent au plus ancien.
+        """
+        if not driver_ids:
+            return {}
         
-        logger.info(f"🔍 Recherche GPS terminée: {len(drivers_with_distance)} chauffeurs trouvés dans un rayon de {radius_km}km")
+        vehicles_query = Vehicle.objects.filter(
+            driver_id__in=driver_ids,
+            is_active=True,
+            is_online=True
+        ).select_related('vehicle_type', 'brand', 'model', 'color')
         
-        # Limiter le nombre de résultats
-        return drivers_with_distance[:limit]
+        if vehicle_type_id:
+            vehicles_query = vehicles_query.filter(vehicle_type_id=vehicle_type_id)
+        
+        # Même ordre que Vehicle.objects.filter(...).first() : le plus récent en tête
+        vehicles = {}
+        for vehicle in vehicles_query.order_by('driver_id', '-created_at', '-id'):
+            vehicles.setdefault(vehicle.driver_id, []).append(vehicle)
+        
+        return vehicles
+    
+    def _build_driver_entry(self, driver_status: DriverStatus, distance: float, vehicle: Vehicle) -> Dict:
+        """
+        Construit la représentation d'un chauffeur trouvé telle que renvoyée par la recherche
+        """
+        return {
+            'driver_id': driver_status.driver.id,
+            'driver_name': f"{driver_status.driver.name} {driver_status.driver.surname}",
+            'driver_phone': driver_status.driver.phone_number,
+            'distance_km': round(distance, 2),  # Distance GPS réelle
+            'latitude': float(driver_status.current_latitude),
+            'longitude': float(driver_status.current_longitude),
+            'vehicle': {
+                'id': vehicle.id,
+                'vehicle_type_id': vehicle.vehicle_type.id if vehicle.vehicle_type else None,
+                'type': vehicle.vehicle_type.name if vehicle.vehicle_type else None,
+                'plaque': vehicle.plaque_immatriculation,
+                'brand': vehicle.brand.name if vehicle.brand else None,
+                'model': vehicle.model.name if vehicle.model else None,
+                'color': vehicle.color.name if vehicle.color else None,
+            },
+            'rating': round(DriverRatingSummary.get_average(driver_status.driver), 1),
+            'orders_today': driver_status.total_orders_today,
+            'last_update': driver_status.last_location_update.isoformat() if driver_status.last_location_update else None
+        }
     
     def find_nearby_drivers_progressive(self, pickup_lat, pickup_lng, vehicle_type_id=None, 
                                        initial_radius_km=5, max_radius_km=50, step_km=5, 
-                                       min_drivers=1) -> Dict:
+                                       min_drivers=1, limit=20) -> Dict:
         """
         Recherche progressive de chauffeurs : augmente le rayon progressivement jusqu'à trouver des chauffeurs
         Retourne les informations de recherche avec le rayon utilisé
-        """
-        current_radius = initial_radius_km
-        drivers_found = []
         
+        Les candidats du rayon maximal sont chargés et mesurés une seule fois ; chaque
+        palier de rayon est ensuite évalué en mémoire, de même que la répartition par
+        type de véhicule.
+        """
         logger.info(f"🔍 Démarrage recherche progressive - Rayon initial: {initial_radius_km}km, Max: {max_radius_km}km")
         
-        while current_radius <= max_radius_km and len(drivers_found) < min_drivers:
-            logger.info(f"📏 Tentative de recherche avec rayon: {current_radius}km")
+        # Une seule lecture des positions et des véhicules, tous types confondus
+        candidates = self._find_candidates(pickup_lat, pickup_lng, max_radius_km)
+        vehicle_lists = self._load_candidate_vehicle_lists(
+            [driver_status.driver_id for driver_status, _ in candidates]
+        )
+        
+        # Couples (distance, entrée) triés par distance : tous types (répartition)
+        # et type demandé (résultat)
+        all_entries = []
+        matching_entries = []
+        for driver_status, distance in candidates:
+            driver_vehicles = vehicle_lists.get(driver_status.driver_id)
+            if not driver_vehicles:
+                continue
             
-            # Rechercher les chauffeurs à ce rayon
-            drivers_found = self.find_nearby_drivers(
-                pickup_lat=pickup_lat,
-                pickup_lng=pickup_lng,
-                vehicle_type_id=vehicle_type_id,
-                radius_km=current_radius
-            )
+            all_entries.append((distance, self._build_driver_entry(driver_status, distance, driver_vehicles[0])))
+            
+            if vehicle_type_id:
+                vehicle = next((v for v in driver_vehicles if v.vehicle_type_id == int(vehicle_type_id)), None)
+                if vehicle:
+                    matching_entries.append((distance, self._build_driver_entry(driver_status, distance, vehicle)))
+        
+        if not vehicle_type_id:
+            matching_entries = all_entries
+        
+        all_entries.sort(key=lambda x: x[1]['distance_km'])
+        matching_entries.sort(key=lambda x: x[1]['distance_km'])
+        
+        # Plus petit palier de rayon contenant au moins `min_drivers` chauffeurs
+        current_radius = initial_radius_km
+        drivers_found = []
+        while current_radius <= max_radius_km:
+            drivers_found = [entry for distance, entry in matching_entries if distance <= current_radius][:limit]
             
             if len(drivers_found) >= min_drivers:
                 logger.info(f"✅ Chauffeurs trouvés ! Rayon utilisé: {current_radius}km, Chauffeurs: {len(drivers_found)}")
                 break
             
-            logger.info(f"⚠️ Aucun chauffeur trouvé à {current_radius}km, élargissement...")
             current_radius += step_km
         
-        # Obtenir les types de véhicules disponibles au rayon final
-        vehicle_types = self.get_available_vehicle_types(
-            pickup_lat=pickup_lat,
-            pickup_lng=pickup_lng,
-            radius_km=current_radius if drivers_found else max_radius_km
+        # Objectif non atteint : on s'arrête au rayon maximal, jamais au-delà
+        radius_used = current_radius if len(drivers_found) >= min_drivers else max_radius_km
+        if len(drivers_found) < min_drivers:
+            logger.info(f"⚠️ Seulement {len(drivers_found)} chauffeur(s) trouvé(s) jusqu'à {max_radius_km}km")
+        
+        # Types de véhicules disponibles au rayon final, depuis la même passe
+        vehicle_types = self._summarize_vehicle_types(
+            [entry for distance, entry in all_entries if distance <= radius_used][:limit]
         )
         
         return {
             'drivers': drivers_found,
             'vehicle_types': vehicle_types,
-            'radius_used_km': current_radius if drivers_found else max_radius_km,
+            'radius_used_km': radius_used,
             'search_attempted': True,
             'max_radius_reached': current_radius > max_radius_km
         }
@@ -371,40 +484,10 @@ class OrderService:
     def calculate_real_distance(self, lat1: float, lng1: float, 
                                lat2: float, lng2: float) -> float:
         """
-        Calcule la distance réelle entre deux points en utilisant geopy
-        ou la formule de Haversine améliorée
+        Calcule la distance réelle entre deux points
+        (mode de précision : réglage DISTANCE_ACCURACY_MODE, voir geo_distance)
         """
-        try:
-            # Essayer d'utiliser geopy si disponible
-            from geopy.distance import geodesic
-            point1 = (lat1, lng1)
-            point2 = (lat2, lng2)
-            return geodesic(point1, point2).km
-        except ImportError:
-            # Fallback sur Haversine
-            return self._haversine_distance(lat1, lng1, lat2, lng2)
-    
-    def _haversine_distance(self, lat1: float, lng1: float, 
-                           lat2: float, lng2: float) -> float:
-        """
-        Formule de Haversine pour calculer la distance entre deux points GPS
-        """
-        # Rayon de la Terre en km
-        R = 6371.0
-        
-        # Convertir en radians
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        dlat = math.radians(lat2 - lat1)
-        dlng = math.radians(lng2 - lng1)
-        
-        # Formule de Haversine
-        a = (math.sin(dlat / 2) ** 2 + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * 
-             math.sin(dlng / 2) ** 2)
-        c = 2 * math.asin(math.sqrt(a))
-        
-        return R * c
+        return geo_distance.distance_km(lat1, lng1, lat2, lng2)
     
     def get_available_vehicle_types(self, pickup_lat: float, pickup_lng: float, 
                                    radius_km: float = None) -> List[Dict]:
@@ -412,7 +495,12 @@ class OrderService:
         Retourne les types de véhicules disponibles avec le nombre de chauffeurs
         """
         nearby_drivers = self.find_nearby_drivers(pickup_lat, pickup_lng, radius_km=radius_km)
-        
+        return self._summarize_vehicle_types(nearby_drivers)
+    
+    def _summarize_vehicle_types(self, nearby_drivers: List[Dict]) -> List[Dict]:
+        """
+        Regroupe des chauffeurs trouvés par type de véhicule
+        """
         vehicle_types = {}
         for driver_info in nearby_drivers:
             if driver_info['vehicle'] and driver_info['vehicle']['vehicle_type_id']:
@@ -580,14 +668,6 @@ class OrderService:
         
         logger.info(f"Commande {order.id}: {old_status} → {new_status}")
         return True
-    
-    def _get_config_value(self, search_key, default_value):
-        """Helper pour récupérer une configuration"""
-        try:
-            config = GeneralConfig.objects.get(search_key=search_key, active=True)
-            return config.get_numeric_value() or default_value
-        except GeneralConfig.DoesNotExist:
-            return default_value
 
 
 class DriverPoolService:
@@ -616,7 +696,7 @@ class DriverPoolService:
         
         # Créer les entrées du pool
         pool_entries = []
-        max_wait_time = self._get_config_value('MAX_DRIVER_WAITING_TIME', 30)
+        max_wait_time = get_config_registry().get_numeric('MAX_DRIVER_WAITING_TIME', 30)
         timeout_at = timezone.now() + timedelta(seconds=max_wait_time)
         
         for index, driver_info in enumerate(nearby_drivers, 1):
@@ -745,14 +825,6 @@ class DriverPoolService:
         ).count()
         
         return pending_count == 0
-    
-    def _get_config_value(self, search_key, default_value):
-        """Helper pour récupérer une configuration"""
-        try:
-            config = GeneralConfig.objects.get(search_key=search_key, active=True)
-            return config.get_numeric_value() or default_value
-        except GeneralConfig.DoesNotExist:
-            return default_value
 
 
 class PaymentService:
@@ -990,10 +1062,123 @@ class PaymentService:
             }
 
 
+class DriverLocationService:
+    """
+    Service pour les positions GPS en temps réel des chauffeurs.
+    Chaque position va dans le store live (Redis) ; DriverStatus est mis à jour
+    en différé par le tampon d'écriture (dernière position de chaque chauffeur,
+    un UPDATE groupé toutes les DRIVER_LOCATION_SYNC_INTERVAL secondes).
+    """
+    
+    def __init__(self, store=None, buffer=None):
+        self.store = store or get_location_store()
+        self.buffer = buffer or get_position_buffer()
+    
+    def record_location(self, driver_id: int, latitude: float, longitude: float) -> Optional[Dict]:
+        """
+        Enregistre une position reçue du chauffeur.
+        Retourne l'entrée du store, ou None si le chauffeur n'a pas de DriverStatus.
+        """
+        now = timezone.now()
+        
+        try:
+            entry = self.store.update_position(driver_id, latitude, longitude, now)
+            
+            # Premier passage : le statut vient de la base
+            if entry['status'] is None:
+                db_status = DriverStatus.objects.filter(
+                    driver_id=driver_id
+                ).values_list('status', flat=True).first()
+                if db_status is None:
+                    self.store.remove(driver_id)
+                    return None
+                self.store.set_status(driver_id, db_status)
+                entry['status'] = db_status
+        except Exception as e:
+            # Store indisponible : écriture directe en base comme avant
+            logger.error(f"Store de positions indisponible: {str(e)}")
+            if not self._write_to_database(driver_id, latitude, longitude, now):
+                return None
+            return {
+                'driver_id': driver_id,
+                'latitude': float(latitude),
+                'longitude': float(longitude),
+                'last_update': now,
+            }
+        
+        # Écriture différée : seule la dernière position de l'intervalle atteint la base
+        self.buffer.add(driver_id, latitude, longitude, now)
+        
+        return entry
+    
+    def sync_status(self, driver_status: DriverStatus):
+        """
+        Reporte le statut d'un DriverStatus sauvegardé dans le store
+        (et sa position si le store ne la connaît pas encore)
+        """
+        try:
+            entry = self.store.get_position(driver_status.driver_id)
+            if ((entry is None or entry.get('latitude') is None)
+                    and driver_status.current_latitude is not None
+                    and driver_status.current_longitude is not None):
+                self.store.update_position(
+                    driver_status.driver_id,
+                    driver_status.current_latitude,
+                    driver_status.current_longitude,
+                    driver_status.last_location_update
+                )
+            self.store.set_status(driver_status.driver_id, driver_status.status)
+        except Exception as e:
+            logger.warning(f"Statut du chauffeur {driver_status.driver_id} non reporté dans le store: {str(e)}")
+    
+    def get_current_position(self, driver_id: int) -> Optional[Dict]:
+        """
+        Position la plus récente du chauffeur : store live, sinon DriverStatus
+        """
+        try:
+            entry = self.store.get_position(driver_id)
+        except Exception as e:
+            logger.warning(f"Store de positions indisponible: {str(e)}")
+            entry = None
+        
+        if entry and entry.get('latitude') is not None:
+            return {
+                'latitude': entry['latitude'],
+                'longitude': entry['longitude'],
+                'last_update': entry['last_update'],
+            }
+        
+        driver_status = DriverStatus.objects.filter(driver_id=driver_id).only(
+            'current_latitude', 'current_longitude', 'last_location_update'
+        ).first()
+        if not driver_status or driver_status.current_latitude is None:
+            return None
+        
+        return {
+            'latitude': float(driver_status.current_latitude),
+            'longitude': float(driver_status.current_longitude),
+            'last_update': driver_status.last_location_update,
+        }
+    
+    def _write_to_database(self, driver_id: int, latitude: float, longitude: float, timestamp) -> int:
+        """
+        Une seule requête UPDATE (sans SELECT préalable) ; retourne le nombre de lignes modifiées
+        """
+        return DriverStatus.objects.filter(driver_id=driver_id).update(
+            current_latitude=latitude,
+            current_longitude=longitude,
+            grid_cell=grid_cell_for(latitude, longitude),
+            last_location_update=timestamp,
+            updated_at=timestamp
+        )
+
+
 class TrackingService:
     """Service pour gérer le tracking GPS des courses"""
     
-    @transaction.atomic
+    def __init__(self, writer=None):
+        self.writer = writer or get_trip_tracking_writer()
+    
     def record_position(self, order: Order, driver: UserDriver, 
                        latitude: float, longitude: float,
                        speed_kmh: float = None, heading: int = None,
@@ -1001,25 +1186,45 @@ class TrackingService:
         """
         Enregistre une position GPS pendant une course
         """
-        tracking = TripTracking.objects.create(
-            order=order,
-            driver=driver,
-            latitude=latitude,
-            longitude=longitude,
-            speed_kmh=speed_kmh,
-            heading=heading,
-            accuracy=accuracy,
-            order_status=order.status
-        )
+        return self.record_positions(order, driver, [{
+            'latitude': latitude,
+            'longitude': longitude,
+            'speed_kmh': speed_kmh,
+            'heading': heading,
+            'accuracy': accuracy,
+        }])[0]
+    
+    def record_positions(self, order: Order, driver: UserDriver, points: List[Dict]) -> List[TripTracking]:
+        """
+        Enregistre un lot de positions GPS d'une course (envoi groupé de
+        l'application) : une insertion et une mise à jour du cumul de distance
+        pour tout le lot, en base avant la fin de la requête (la course peut
+        être clôturée par un autre worker).
+        
+        Chaque point : latitude, longitude, et optionnellement speed_kmh,
+        heading, accuracy, recorded_at (heure de réception sinon).
+        """
+        now = timezone.now()
+        trackings = [
+            TripTracking(
+                order=order,
+                driver=driver,
+                latitude=float(point['latitude']),
+                longitude=float(point['longitude']),
+                speed_kmh=point.get('speed_kmh'),
+                heading=point.get('heading'),
+                accuracy=point.get('accuracy'),
+                order_status=order.status,
+                recorded_at=point.get('recorded_at') or now
+            )
+            for point in points
+        ]
+        self.writer.write(trackings)
         
-        # Mettre à jour la position du chauffeur
-        driver_status = DriverStatus.objects.get(driver=driver)
-        driver_status.current_latitude = latitude
-        driver_status.current_longitude = longitude
-        driver_status.last_location_update = timezone.now()
-        driver_status.save()
+        # La position courante du chauffeur est déjà enregistrée par le point
+        # d'entrée (DriverLocationService.record_location)
         
-        return tracking
+        return trackings
     
     def get_trip_path(self, order: Order) -> List[Dict]:
         """
@@ -1044,70 +1249,96 @@ class TrackingService:
     
     def calculate_actual_distance(self, order: Order) -> float:
         """
-        Calcule la distance réelle parcourue basée sur le tracking GPS
+        Distance réelle parcourue d'après le tracking GPS, lue en O(1) dans le
+        cumul TripDistance (maintenu à l'insertion des points, bruit GPS filtré)
         """
-        trackings = TripTracking.objects.filter(
-            order=order,
-            order_status='IN_PROGRESS'
-        ).order_by('recorded_at')
-        
-        if trackings.count() < 2:
-            return 0
-        
-        total_distance = 0
-        order_service = OrderService()
-        
-        for i in range(1, trackings.count()):
-            prev = trackings[i-1]
-            curr = trackings[i]
-            
-            distance = order_service.calculate_real_distance(
-                float(prev.latitude), float(prev.longitude),
-                float(curr.latitude), float(curr.longitude)
-            )
-            total_distance += distance
-        
-        return total_distance
+        return TripDistance.get_distance(order.id)
     
-    def detect_route_deviation(self, order: Order, threshold_km: float = 2.0) -> bool:
+    def detect_route_deviation(self, order: Order, threshold_km: float = None) -> bool:
         """
-        Détecte si le chauffeur dévie de l'itinéraire optimal
+        Détecte si le chauffeur dévie de l'itinéraire optimal.
+        L'écart (parcouru + restant - estimé) est maintenu point par point à
+        l'ingestion (TripDistance) : la vérification est une simple lecture.
         """
         if order.status != 'IN_PROGRESS':
             return False
         
-        # Récupérer la dernière position
-        last_tracking = TripTracking.objects.filter(
-            order=order
-        ).order_by('-recorded_at').first()
+        if threshold_km is None:
+            threshold_km = getattr(settings, 'ROUTE_DEVIATION_THRESHOLD_KM', 2.0)
         
-        if not last_tracking:
-            return False
+        deviation_km = TripDistance.objects.filter(
+            order=order,
+            last_recorded_at__isnull=False
+        ).values_list('deviation_km', flat=True).first()
         
-        # Calculer la distance directe restante
-        order_service = OrderService()
-        direct_distance = order_service.calculate_real_distance(
-            float(last_tracking.latitude),
-            float(last_tracking.longitude),
-            float(order.destination_latitude),
-            float(order.destination_longitude)
-        )
+        if deviation_km is None:
+            return False
         
-        # Calculer la distance parcourue
-        actual_distance = self.calculate_actual_distance(order)
+        if float(deviation_km) > threshold_km:
+            logger.warning(f"Déviation détectée pour commande {order.id}: {float(deviation_km):.2f} km")
+            return True
         
-        # Si la distance parcourue + distance restante dépasse significativement
-        # la distance estimée, il y a peut-être une déviation
-        total_expected = float(order.estimated_distance_km)
-        total_actual = actual_distance + direct_distance
+        return False
+
+
+class RouteDeviationService:
+    """
+    Alertes de déviation d'itinéraire, déclenchées à l'ingestion des points
+    GPS (TripDistance.record_points) quand l'écart franchit le seuil
+    """
+    
+    def __init__(self, channel_layer=None):
+        self.channel_layer = channel_layer
+    
+    def handle_deviation(self, trip_distance: TripDistance, point: TripTracking):
+        """
+        Enregistre l'événement ROUTE_DEVIATION et programme l'alerte WebSocket
+        au commit (appelé dans la transaction d'insertion des points)
+        """
+        order = point.order
+        deviation_km = round(float(trip_distance.deviation_km), 2)
         
-        deviation = total_actual - total_expected
+        OrderTracking.objects.create(
+            order=order,
+            event_type='ROUTE_DEVIATION',
+            driver_id=point.driver_id,
+            latitude=point.latitude,
+            longitude=point.longitude,
+            metadata={
+                'deviation_km': deviation_km,
+                'distance_travelled_km': round(float(trip_distance.distance_km), 2),
+                'distance_remaining_km': round(float(trip_distance.remaining_km), 2),
+                'estimated_distance_km': float(order.estimated_distance_km),
+            },
+            notes=f"Écart de {deviation_km} km par rapport à la distance estimée"
+        )
+        logger.warning(f"Déviation détectée pour commande {order.id}: {deviation_km:.2f} km")
+        
+        alert = {
+            'type': 'route_deviation',
+            'order_id': str(order.id),
+            'deviation_km': deviation_km,
+            'latitude': float(point.latitude),
+            'longitude': float(point.longitude),
+            'timestamp': point.recorded_at.isoformat(),
+        }
+        groups = [f'customer_{order.customer_id}', f'driver_{point.driver_id}']
+        transaction.on_commit(lambda: self._send_alert(groups, alert))
+    
+    def _send_alert(self, groups: List[str], alert: Dict):
+        """Diffuse l'alerte aux WebSockets du client et du chauffeur"""
+        from channels.layers import get_channel_layer
+        from asgiref.sync import async_to_sync
         
-        if deviation > threshold_km:
-            logger.warning(f"Déviation détectée pour commande {order.id}: {deviation:.2f} km")
-            return True
+        channel_layer = self.channel_layer or get_channel_layer()
+        if not channel_layer:
+            return
         
-        return False
+        for group in groups:
+            try:
+                async_to_sync(channel_layer.group_send)(group, alert)
+            except Exception as e:
+                logger.error(f"Erreur envoi alerte déviation ({group}): {str(e)}")
 
 
 class NotificationService:
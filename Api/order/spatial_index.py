@@ -0,0 +1,72 @@
+"""
+Index spatial par grille fixe pour les positions des chauffeurs
+
+Chaque position GPS est rattachée à une cellule de taille fixe (en degrés).
+La cellule est stockée sur DriverStatus (champ indexé `grid_cell`) : une
+recherche ne lit que les cellules qui recouvrent le rayon demandé, au lieu
+de parcourir toute la flotte en ligne.
+"""
+import math
+from typing import List, Optional
+
+from django.conf import settings
+
+
+# Taille d'une cellule en degrés (~11 km à l'équateur pour 0.1°)
+GRID_CELL_SIZE_DEG = getattr(settings, 'DRIVER_GRID_CELL_SIZE_DEG', 0.1)
+
+# Kilomètres par degré de latitude
+KM_PER_DEGREE = 111.32
+
+
+def _lat_index(lat: float, cell_size: float) -> int:
+    lat = min(max(lat, -90.0), 90.0)
+    return int(math.floor((lat + 90.0) / cell_size))
+
+
+def _lng_index(lng: float, cell_size: float) -> int:
+    lng_cells = int(round(360.0 / cell_size))
+    return int(math.floor((lng + 180.0) / cell_size)) % lng_cells
+
+
+def grid_cell_for(lat, lng, cell_size: float = None) -> Optional[str]:
+    """
+    Retourne la clé de la cellule contenant le point (lat, lng)
+    """
+    if lat is None or lng is None:
+        return None
+    cell_size = cell_size or GRID_CELL_SIZE_DEG
+    return f"{_lat_index(float(lat), cell_size)}:{_lng_index(float(lng), cell_size)}"
+
+
+def grid_cells_around(lat: float, lng: float, radius_km: float,
+                      cell_size: float = None) -> List[str]:
+    """
+    Retourne les clés des cellules qui recouvrent le cercle de rayon
+    `radius_km` centré sur (lat, lng)
+    """
+    cell_size = cell_size or GRID_CELL_SIZE_DEG
+    lat = float(lat)
+    lng = float(lng)
+
+    lat_delta = radius_km / KM_PER_DEGREE
+    min_lat_idx = _lat_index(lat - lat_delta, cell_size)
+    max_lat_idx = _lat_index(lat + lat_delta, cell_size)
+
+    # L'écart en longitude grandit avec la latitude (cos → 0 aux pôles)
+    lng_cells = int(round(360.0 / cell_size))
+    max_abs_lat = min(abs(lat) + lat_delta, 90.0)
+    cos_lat = math.cos(math.radians(max_abs_lat))
+    if cos_lat <= 1e-6 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180.0:
+        lng_indexes = range(lng_cells)
+    else:
+        lng_delta = radius_km / (KM_PER_DEGREE * cos_lat)
+        start = int(math.floor((lng - lng_delta + 180.0) / cell_size))
+        end = int(math.floor((lng + lng_delta + 180.0) / cell_size))
+        lng_indexes = sorted({idx % lng_cells for idx in range(start, end + 1)})
+
+    return [
+        f"{lat_idx}:{lng_idx}"
+        for lat_idx in range(min_lat_idx, max_lat_idx + 1)
+        for lng_idx in lng_indexes
+    ]
@@ -0,0 +1,160 @@
+"""
+Écriture des points GPS de course (TripTracking)
+
+Les points d'une course arrivent sur n'importe quel worker web, et la course
+peut être clôturée par un autre (vue complete_trip, consumer Daphne) : le
+tracé est donc écrit en base pendant la requête qui l'a reçu, jamais gardé
+dans la mémoire d'un processus.
+
+Le regroupement vient du chauffeur : POST driver/location/update/ accepte un
+lot de points (`points`, enregistrés par l'application entre deux envois, au
+plus TRIP_TRACKING_MAX_POINTS). write() insère le lot de chaque commande dans
+une seule transaction :
+
+- les points (COPY sur PostgreSQL, bulk_create ailleurs) ;
+- la distance cumulée de la course (TripDistance, ligne verrouillée une fois
+  par lot), avec une alerte de déviation d'itinéraire quand l'écart franchit
+  ROUTE_DEVIATION_THRESHOLD_KM.
+
+Chaque commande est écrite séparément : une commande en erreur ne bloque pas
+les points des autres.
+"""
+import csv
+import io
+import logging
+import threading
+import time
+from typing import Dict, List
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+COPY_COLUMNS = (
+    'order_id', 'driver_id', 'latitude', 'longitude',
+    'speed_kmh', 'heading', 'accuracy', 'order_status', 'recorded_at',
+)
+
+
+class TripTrackingWriter:
+    """Insertion des points de course par lot, une transaction par commande"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {
+            'received': 0,        # points reçus
+            'written': 0,         # lignes TripTracking insérées
+            'batches': 0,         # lots insérés (une commande, une transaction)
+            'failed_batches': 0,
+            'last_write_at': None,
+            'last_write_duration_ms': None,
+        }
+
+    def write(self, trackings: List) -> int:
+        """
+        Insère des points (non sauvegardés), regroupés par commande ; retourne le
+        nombre de lignes écrites. Relance la dernière erreur après avoir écrit
+        les autres commandes.
+        """
+        pending = {}
+        for tracking in trackings:
+            if tracking.recorded_at is None:
+                tracking.recorded_at = timezone.now()
+            pending.setdefault(tracking.order_id, []).append(tracking)
+
+        with self._lock:
+            self._metrics['received'] += len(trackings)
+
+        written = 0
+        error = None
+        for order_id, points in pending.items():
+            try:
+                written += self._write_order(order_id, points)
+            except Exception as e:
+                error = e
+        if error is not None:
+            raise error
+        return written
+
+    def _write_order(self, order_id, points: List) -> int:
+        """
+        Points d'une commande et cumul TripDistance, dans une même transaction.
+        Les points sont insérés dans l'ordre où ils sont cumulés, après le
+        verrou TripDistance : l'ordre des id est celui du calcul incrémental,
+        que TripDistance.rebuild rejoue à l'identique.
+        """
+        started = time.monotonic()
+        points = sorted(points, key=lambda point: point.recorded_at)
+        try:
+            with transaction.atomic():
+                self._accumulate_distance(order_id, points)
+                written = self._write(points)
+        except Exception as e:
+            with self._lock:
+                self._metrics['failed_batches'] += 1
+            logger.error(f"Insertion des points de la commande {order_id} échouée ({len(points)} points): {str(e)}")
+            raise
+
+        with self._lock:
+            self._metrics['written'] += written
+            self._metrics['batches'] += 1
+            self._metrics['last_write_at'] = timezone.now()
+            self._metrics['last_write_duration_ms'] = round((time.monotonic() - started) * 1000, 2)
+        logger.debug(f"Points de course insérés: {written} (commande {order_id})")
+        return written
+
+    def _write(self, trackings: List) -> int:
+        if connection.vendor == 'postgresql':
+            return self._write_copy(trackings)
+
+        from .models import TripTracking
+        TripTracking.objects.bulk_create(trackings)
+        return len(trackings)
+
+    def _accumulate_distance(self, order_id, points: List):
+        from .models import TripDistance
+        from .services import RouteDeviationService
+
+        TripDistance.record_points(order_id, points, on_deviation=RouteDeviationService().handle_deviation)
+
+    def _write_copy(self, trackings: List) -> int:
+        """COPY ... FROM STDIN (CSV) : le chemin d'insertion le plus rapide de PostgreSQL"""
+        from .models import TripTracking
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for tracking in trackings:
+            writer.writerow([
+                '' if value is None else value
+                for value in (getattr(tracking, column) for column in COPY_COLUMNS)
+            ])
+        buffer.seek(0)
+
+        table = TripTracking._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f'COPY "{table}" ({", ".join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+        return len(trackings)
+
+    def get_metrics(self) -> Dict:
+        """Compteurs d'insertion (points reçus vs insérés, lots)"""
+        with self._lock:
+            return dict(self._metrics)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_trip_tracking_writer() -> TripTrackingWriter:
+    """Instance partagée du processus (compteurs communs)"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = TripTrackingWriter()
+    return _writer
@@ -34,6 +34,7 @@ urlpatterns = [
     # Search & estimate
     path('customer/search-drivers/', views.search_drivers, name='search_drivers'),
     path('customer/estimate-price/', views.estimate_price, name='estimate_price'),
+    path('customer/quote-prices/', views.quote_prices, name='quote_prices'),
     
     # Location sharing
     path('customer/location/update/', views.update_customer_location, name='update_customer_location'),
@@ -84,4 +85,6 @@ urlpatterns = [
     # Debug tools
     path('debug/online-drivers/', views.debug_online_drivers, name='debug_online_drivers'),
     path('debug/search-drivers/', views.debug_search_drivers, name='debug_search_drivers'),
+    path('debug/position-buffer/', views.debug_position_buffer, name='debug_position_buffer'),
+    path('debug/order-dispatch/', views.debug_order_dispatch, name='debug_order_dispatch'),
 ]
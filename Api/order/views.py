@@ -4,7 +4,8 @@ Views/Endpoints pour le module de commande VTC
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import BasePermission, IsAuthenticated
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.utils import timezone
@@ -21,19 +22,25 @@ from authentication.models import Token
 from core.models import City, VipZone
 from .models import (
     Order, DriverStatus, CustomerStatus, OrderTracking, PaymentMethod,
-    Rating, TripTracking, DriverPool
+    Rating, TripTracking, DriverPool, DriverRatingSummary
 )
 from .serializers import (
     PaymentMethodSerializer, DriverStatusSerializer, CustomerStatusSerializer, UpdateLocationSerializer,
+    UpdateDriverLocationSerializer,
     SearchDriversSerializer, EstimatePriceSerializer, CreateOrderSerializer,
     OrderSerializer, OrderListSerializer, RatingSerializer, CreateRatingSerializer,
     TripTrackingSerializer, OrderTrackingSerializer, DriverPoolSerializer,
-    CancelOrderSerializer, CompleteOrderSerializer, ProcessPaymentSerializer
+    CancelOrderSerializer, CompleteOrderSerializer, ProcessPaymentSerializer,
+    QuotePricesSerializer
 )
 from .services import (
     PricingService, OrderService, DriverPoolService,
-    PaymentService, TrackingService
+    PaymentService, TrackingService, DriverLocationService
 )
+from . import geo_distance
+from .position_buffer import get_position_buffer
+from .dispatch import dispatch_new_order, get_order_dispatcher
+from .catalog_search import get_catalog_search
 import requests
 import json
 
@@ -77,104 +84,6 @@ def get_customer_from_token(request):
     return None
 
 
-def notify_drivers_new_order(order, pool_entries):
-    """Envoie une notification WebSocket ET FCM à tous les chauffeurs concernés par une commande"""
-    from notifications.services.fcm_service import FCMService
-    import json
-    
-    try:
-        channel_layer = get_channel_layer()
-        if not channel_layer:
-            logger.warning("Channel layer non disponible - notifications WebSocket non envoyées")
-        
-        # Préparer les données de la commande pour les chauffeurs - Format compatible Flutter
-        order_data = {
-            'id': str(order.id),
-            'customer_id': str(order.customer.id),  # Ajouter customer_id
-            'customer_name': f"Client {order.customer.phone_number}",
-            'customer_phone': order.customer.phone_number,
-            'pickup_address': order.pickup_address,
-            'pickup_latitude': float(order.pickup_latitude),
-            'pickup_longitude': float(order.pickup_longitude),
-            'destination_address': order.destination_address,
-            'destination_latitude': float(order.destination_latitude),
-            'destination_longitude': float(order.destination_longitude),
-            'vehicle_type': order.vehicle_type.name if order.vehicle_type else 'Standard',
-            'estimated_distance_km': float(order.estimated_distance_km or 0),  # Match exact field name
-            'total_price': float(order.total_price),
-            'customer_notes': order.customer_notes or '',
-            'timeout_seconds': 30,  # 30 secondes pour répondre
-            'created_at': order.created_at.isoformat(),
-        }
-        
-        # Envoyer la notification à chaque chauffeur du pool
-        websocket_notifications_sent = 0
-        fcm_notifications_sent = 0
-        
-        for pool_entry in pool_entries:
-            try:
-                driver = pool_entry.driver
-                driver_id = driver.id
-                driver_group_name = f'driver_{driver_id}'
-                
-                logger.info(f"📤 Envoi notification → Chauffeur {driver_id}")
-                
-                # 1. Envoyer via WebSocket
-                if channel_layer:
-                    try:
-                        async_to_sync(channel_layer.group_send)(
-                            driver_group_name,
-                            {
-                                'type': 'order_request',
-                                'order_data': order_data
-                            }
-                        )
-                        websocket_notifications_sent += 1
-                        logger.info(f"✅ WebSocket envoyé au chauffeur {driver_id}")
-                    except Exception as ws_error:
-                        logger.error(f"❌ Erreur WebSocket chauffeur {driver_id}: {ws_error}")
-                
-                # 2. Envoyer via FCM (NOUVEAU!)
-                try:
-                    customer_name = order_data['customer_name']
-                    distance = order_data['estimated_distance_km']
-                    price = order_data['total_price']
-                    
-                    fcm_success = FCMService.send_notification(
-                        user=driver,
-                        title="🚗 Nouvelle commande disponible!",
-                        body=f"{customer_name} • {distance:.1f} km • {price:.0f} FCFA",
-                        data={
-                            'notification_type': 'new_order',
-                            'order_id': str(order.id),
-                            'order_data': json.dumps(order_data),  # Inclure toutes les données
-                            'action_required': 'accept_or_decline',
-                            'timeout_seconds': '30'
-                        },
-                        notification_type='new_order'
-                    )
-                    
-                    if fcm_success:
-                        fcm_notifications_sent += 1
-                        logger.info(f"✅ FCM envoyé au chauffeur {driver_id}")
-                    else:
-                        logger.warning(f"⚠️ FCM échoué pour chauffeur {driver_id}")
-                        
-                except Exception as fcm_error:
-                    logger.error(f"❌ Erreur FCM chauffeur {driver_id}: {fcm_error}")
-                
-            except Exception as driver_error:
-                logger.error(f"❌ Erreur notification chauffeur {pool_entry.driver.id}: {driver_error}")
-                continue
-        
-        logger.info(f"📊 Notifications envoyées: WebSocket {websocket_notifications_sent}/{len(pool_entries)}, FCM {fcm_notifications_sent}/{len(pool_entries)} chauffeurs")
-        return websocket_notifications_sent + fcm_notifications_sent
-        
-    except Exception as e:
-        logger.error(f"❌ Erreur générale notifications: {e}")
-        return 0
-
-
 # ============= DRIVER ENDPOINTS =============
 
 @extend_schema(
@@ -245,7 +154,11 @@ def toggle_driver_status(request):
 @extend_schema(
     tags=['Driver'],
     summary='Mettre à jour la position GPS',
-    description='Met à jour la position actuelle du chauffeur'
+    description=(
+        'Met à jour la position actuelle du chauffeur. En course, `points` transmet en un seul '
+        'envoi les positions enregistrées depuis le dernier (au plus TRIP_TRACKING_MAX_POINTS) ; '
+        'sans `points`, la position envoyée est enregistrée comme point de course.'
+    )
 )
 @api_view(['POST'])
 def update_driver_location(request):
@@ -257,18 +170,19 @@ def update_driver_location(request):
             status=status.HTTP_401_UNAUTHORIZED
         )
     
-    serializer = UpdateLocationSerializer(data=request.data)
+    serializer = UpdateDriverLocationSerializer(data=request.data)
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        driver_status = DriverStatus.objects.get(driver=driver)
-        
-        # Mettre à jour la position
-        driver_status.current_latitude = serializer.validated_data['latitude']
-        driver_status.current_longitude = serializer.validated_data['longitude']
-        driver_status.last_location_update = timezone.now()
-        driver_status.save()
+        # Mettre à jour la position (store live, DriverStatus en différé)
+        location = DriverLocationService().record_location(
+            driver.id,
+            serializer.validated_data['latitude'],
+            serializer.validated_data['longitude']
+        )
+        if location is None:
+            raise DriverStatus.DoesNotExist
         
         # Si le chauffeur est en course, enregistrer dans TripTracking
         current_order = Order.objects.filter(
@@ -278,23 +192,28 @@ def update_driver_location(request):
         
         if current_order:
             tracking_service = TrackingService()
-            tracking_service.record_position(
-                order=current_order,
-                driver=driver,
-                latitude=float(serializer.validated_data['latitude']),
-                longitude=float(serializer.validated_data['longitude']),
-                speed_kmh=serializer.validated_data.get('speed_kmh'),
-                heading=serializer.validated_data.get('heading'),
-                accuracy=serializer.validated_data.get('accuracy')
-            )
+            points = serializer.validated_data.get('points')
+            if points:
+                # Envoi groupé : une insertion pour tout le lot
+                tracking_service.record_positions(current_order, driver, points)
+            else:
+                tracking_service.record_position(
+                    order=current_order,
+                    driver=driver,
+                    latitude=float(serializer.validated_data['latitude']),
+                    longitude=float(serializer.validated_data['longitude']),
+                    speed_kmh=serializer.validated_data.get('speed_kmh'),
+                    heading=serializer.validated_data.get('heading'),
+                    accuracy=serializer.validated_data.get('accuracy')
+                )
         
         return Response({
             'success': True,
             'message': 'Position mise à jour',
             'current_location': {
-                'latitude': float(driver_status.current_latitude),
-                'longitude': float(driver_status.current_longitude),
-                'last_update': driver_status.last_location_update.isoformat()
+                'latitude': location['latitude'],
+                'longitude': location['longitude'],
+                'last_update': location['last_update'].isoformat()
             }
         })
         
@@ -536,8 +455,15 @@ def complete_trip(request, order_id):
         with transaction.atomic():
             order = Order.objects.get(id=order_id, driver=driver, status='IN_PROGRESS')
             
+            # Points GPS déjà en base : écrits par les requêtes qui les ont reçus
+            tracking_service = TrackingService()
+            
             # Mettre à jour les données de la course
-            order.actual_distance_km = serializer.validated_data['actual_distance_km']
+            actual_distance_km = serializer.validated_data.get('actual_distance_km')
+            if actual_distance_km is None:
+                # Distance cumulée pendant la course (TripDistance), lue en O(1)
+                actual_distance_km = round(Decimal(str(tracking_service.calculate_actual_distance(order))), 2)
+            order.actual_distance_km = actual_distance_km
             order.waiting_time = serializer.validated_data.get('waiting_time', 0)
             order.driver_notes = serializer.validated_data.get('driver_notes', '')
             
@@ -690,19 +616,17 @@ def search_drivers(request):
         requested_radius = serializer.validated_data.get('radius_km')
         
         if requested_radius:
-            # Recherche classique avec rayon fixe
-            nearby_drivers = order_service.find_nearby_drivers(
+            # Recherche classique avec rayon fixe (un seul palier : chauffeurs et
+            # types de véhicules sont calculés dans la même passe)
+            search_result = order_service.find_nearby_drivers_progressive(
                 pickup_lat=float(serializer.validated_data['pickup_latitude']),
                 pickup_lng=float(serializer.validated_data['pickup_longitude']),
                 vehicle_type_id=serializer.validated_data.get('vehicle_type_id'),
-                radius_km=requested_radius
-            )
-            
-            vehicle_types = order_service.get_available_vehicle_types(
-                pickup_lat=float(serializer.validated_data['pickup_latitude']),
-                pickup_lng=float(serializer.validated_data['pickup_longitude']),
-                radius_km=requested_radius
+                initial_radius_km=requested_radius,
+                max_radius_km=requested_radius
             )
+            nearby_drivers = search_result['drivers']
+            vehicle_types = search_result['vehicle_types']
             
             return Response({
                 'success': True,
@@ -784,6 +708,8 @@ def estimate_price(request):
         return Response({
             'success': True,
             'distance_km': round(distance, 2),
+            'city_id': serializer.validated_data['city_id'],
+            'vip_zone_id': serializer.validated_data.get('vip_zone_id'),
             'price_estimate': price_range
         })
         
@@ -795,6 +721,51 @@ def estimate_price(request):
         )
 
 
+@extend_schema(
+    tags=['Customer'],
+    summary='Devis pour tous les types de véhicule',
+    description='Fourchettes de prix (min/max/estimé) de chaque type de véhicule actif, ou des types demandés, pour un même trajet'
+)
+@api_view(['POST'])
+def quote_prices(request):
+    """Quote trip prices for every vehicle type"""
+    customer = get_customer_from_token(request)
+    if not customer:
+        return Response(
+            {'error': 'Authentification requise en tant que client'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    serializer = QuotePricesSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        quote = PricingService().quote_vehicle_types(
+            pickup_lat=serializer.validated_data['pickup_latitude'],
+            pickup_lng=serializer.validated_data['pickup_longitude'],
+            destination_lat=serializer.validated_data['destination_latitude'],
+            destination_lng=serializer.validated_data['destination_longitude'],
+            city_id=serializer.validated_data['city_id'],
+            vip_zone_id=serializer.validated_data.get('vip_zone_id'),
+            vehicle_type_ids=serializer.validated_data.get('vehicle_type_ids')
+        )
+        
+        return Response({
+            'success': True,
+            'city_id': serializer.validated_data['city_id'],
+            'vip_zone_id': serializer.validated_data.get('vip_zone_id'),
+            **quote
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur quote prices: {str(e)}")
+        return Response(
+            {'error': 'Erreur lors de l\'estimation'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @extend_schema(
     tags=['Customer'],
     summary='Créer une commande',
@@ -840,9 +811,9 @@ def create_order(request):
                     'order_id': str(order.id)
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            # Notifier les chauffeurs via WebSocket
-            notifications_sent = notify_drivers_new_order(order, pool_entries)
-            logger.info(f"🔔 Commande {order.id}: {notifications_sent} notifications WebSocket envoyées")
+            # Notifier les chauffeurs (WebSocket + FCM) après le commit, hors requête
+            notifications_sent = dispatch_new_order(order, pool_entries)
+            logger.info(f"🔔 Commande {order.id}: diffusion programmée vers {notifications_sent} chauffeur(s)")
             
             return Response({
                 'success': True,
@@ -949,11 +920,11 @@ def track_order(request, order_id):
         # Obtenir la position actuelle du chauffeur si en course
         driver_location = None
         if order.driver and order.status in ['ACCEPTED', 'DRIVER_ARRIVED', 'IN_PROGRESS']:
-            driver_status = DriverStatus.objects.get(driver=order.driver)
+            position = DriverLocationService().get_current_position(order.driver_id)
             driver_location = {
-                'latitude': float(driver_status.current_latitude) if driver_status.current_latitude else None,
-                'longitude': float(driver_status.current_longitude) if driver_status.current_longitude else None,
-                'last_update': driver_status.last_location_update.isoformat() if driver_status.last_location_update else None
+                'latitude': position['latitude'] if position else None,
+                'longitude': position['longitude'] if position else None,
+                'last_update': position['last_update'].isoformat() if position and position['last_update'] else None
             }
         
         # Obtenir les événements de tracking
@@ -1013,24 +984,26 @@ def rate_order(request, order_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Créer la notation
-        rating = Rating.objects.create(
-            order=order,
-            rating_type='CUSTOMER_TO_DRIVER',
-            rated_driver=order.driver,
-            score=serializer.validated_data['score'],
-            comment=serializer.validated_data.get('comment', ''),
-            punctuality=serializer.validated_data.get('punctuality'),
-            driving_quality=serializer.validated_data.get('driving_quality'),
-            vehicle_cleanliness=serializer.validated_data.get('vehicle_cleanliness'),
-            communication=serializer.validated_data.get('communication'),
-            tags=serializer.validated_data.get('tags', []),
-            is_anonymous=serializer.validated_data.get('is_anonymous', False)
-        )
-        
-        # Mettre à jour la note sur la commande
-        order.driver_rating = serializer.validated_data['score']
-        order.save()
+        # Créer la notation et mettre à jour le résumé du chauffeur ensemble
+        with transaction.atomic():
+            rating = Rating.objects.create(
+                order=order,
+                rating_type='CUSTOMER_TO_DRIVER',
+                rated_driver=order.driver,
+                score=serializer.validated_data['score'],
+                comment=serializer.validated_data.get('comment', ''),
+                punctuality=serializer.validated_data.get('punctuality'),
+                driving_quality=serializer.validated_data.get('driving_quality'),
+                vehicle_cleanliness=serializer.validated_data.get('vehicle_cleanliness'),
+                communication=serializer.validated_data.get('communication'),
+                tags=serializer.validated_data.get('tags', []),
+                is_anonymous=serializer.validated_data.get('is_anonymous', False)
+            )
+            DriverRatingSummary.record_rating(rating)
+            
+            # Mettre à jour la note sur la commande
+            order.driver_rating = serializer.validated_data['score']
+            order.save()
         
         return Response({
             'success': True,
@@ -1368,41 +1341,19 @@ def search_city_by_name(request):
         )
     
     try:
-        # Construire la requête
-        query = City.objects.filter(
-            name__icontains=city_name,
-            active=True
-        ).select_related('country')
-        
-        # Filtrer par pays si fourni
-        if country_name:
-            query = query.filter(country__name__icontains=country_name)
-        
-        # Exécuter la recherche
-        cities = query[:10]  # Limiter à 10 résultats
+        # Recherche en mémoire, insensible aux accents (limitée à 10 résultats)
+        cities_data = get_catalog_search().search_cities(city_name, country=country_name, limit=10)
         
-        if not cities:
+        if not cities_data:
             return Response({
                 'success': True,
                 'message': 'Aucune ville trouvée',
                 'cities': []
             })
         
-        # Formatter les résultats
-        cities_data = []
-        for city in cities:
-            cities_data.append({
-                'id': city.id,
-                'name': city.name,
-                'country': city.country.name,
-                'prix_jour': float(city.prix_jour),
-                'prix_nuit': float(city.prix_nuit),
-                'full_name': f"{city.name} ({city.country.name})"
-            })
-        
         return Response({
             'success': True,
-            'message': f'{len(cities)} ville(s) trouvée(s)',
+            'message': f'{len(cities_data)} ville(s) trouvée(s)',
             'cities': cities_data
         })
         
@@ -1440,42 +1391,19 @@ def search_vip_zone_by_name(request):
         )
     
     try:
-        # Rechercher les zones VIP
-        zones = VipZone.objects.filter(
-            name__icontains=zone_name,
-            active=True
-        ).prefetch_related('kilometer_rules')[:10]  # Limiter à 10 résultats
+        # Recherche en mémoire, règles kilométriques incluses (limitée à 10 résultats)
+        zones_data = get_catalog_search().search_vip_zones(zone_name, limit=10)
         
-        if not zones:
+        if not zones_data:
             return Response({
                 'success': True,
                 'message': 'Aucune zone VIP trouvée',
                 'zones': []
             })
         
-        # Formatter les résultats
-        zones_data = []
-        for zone in zones:
-            # Récupérer les règles kilométriques actives
-            km_rules = []
-            for rule in zone.kilometer_rules.filter(active=True).order_by('min_kilometers'):
-                km_rules.append({
-                    'min_kilometers': float(rule.min_kilometers),
-                    'prix_jour_per_km': float(rule.prix_jour_per_km),
-                    'prix_nuit_per_km': float(rule.prix_nuit_per_km)
-                })
-            
-            zones_data.append({
-                'id': zone.id,
-                'name': zone.name,
-                'prix_jour': float(zone.prix_jour),
-                'prix_nuit': float(zone.prix_nuit),
-                'kilometer_rules': km_rules
-            })
-        
         return Response({
             'success': True,
-            'message': f'{len(zones)} zone(s) VIP trouvée(s)',
+            'message': f'{len(zones_data)} zone(s) VIP trouvée(s)',
             'zones': zones_data
         })
         
@@ -1673,8 +1601,8 @@ def demo_create_direct_order(request):
             
             # Envoyer notification WebSocket au chauffeur (même pour les commandes DEMO)
             pool_entries = DriverPool.objects.filter(order=order)
-            notifications_sent = notify_drivers_new_order(order, pool_entries)
-            logger.info(f"🔔 DEMO: Commande {order.id}: {notifications_sent} notification WebSocket envoyée")
+            notifications_sent = dispatch_new_order(order, pool_entries)
+            logger.info(f"🔔 DEMO: Commande {order.id}: notification programmée vers {notifications_sent} chauffeur(s)")
             
             return Response({
                 'success': True,
@@ -1811,16 +1739,18 @@ def debug_search_drivers(request):
             'distances_calculated': []
         }
         
-        # Étape 2: Calculer les distances
-        order_service = OrderService()
+        # Étape 2: Calculer les distances (un seul appel vectorisé)
+        driver_statuses = list(query)
+        distances = geo_distance.distances_from_point_km(
+            pickup_lat, pickup_lng,
+            [driver_status.current_latitude for driver_status in driver_statuses],
+            [driver_status.current_longitude for driver_status in driver_statuses]
+        )
         
-        for driver_status in query:
+        for driver_status, distance in zip(driver_statuses, distances):
             driver_lat = float(driver_status.current_latitude)
             driver_lng = float(driver_status.current_longitude)
-            
-            distance = order_service.calculate_real_distance(
-                pickup_lat, pickup_lng, driver_lat, driver_lng
-            )
+            distance = float(distance)
             
             debug_steps['distances_calculated'].append({
                 'driver_id': driver_status.driver.id,
@@ -1880,6 +1810,53 @@ def debug_search_drivers(request):
         )
 
 
+class IsStaffOrDebug(BasePermission):
+    """Endpoints de debug : réservés au staff (session admin), ouverts à tous en DEBUG"""
+
+    def has_permission(self, request, view):
+        return settings.DEBUG or bool(getattr(request.user, 'is_staff', False))
+
+
+@extend_schema(
+    tags=['Debug'],
+    summary='Debug - Tampon d\'écriture des positions',
+    description='Compteurs du tampon d\'écriture différée des positions chauffeurs (positions reçues, fusionnées, écrites)'
+)
+@api_view(['GET'])
+@permission_classes([IsStaffOrDebug])
+def debug_position_buffer(request):
+    """Debug : Métriques du tampon d'écriture des positions GPS"""
+    metrics = get_position_buffer().get_metrics()
+    if metrics['last_flush_at']:
+        metrics['last_flush_at'] = metrics['last_flush_at'].isoformat()
+    
+    return Response({
+        'success': True,
+        'metrics': metrics,
+        'message': f"{metrics['flushed']} ligne(s) écrite(s) pour {metrics['buffered']} position(s) reçue(s)"
+    })
+
+
+@extend_schema(
+    tags=['Debug'],
+    summary='Debug - Diffusion des nouvelles commandes',
+    description='Compteurs et latence (commit -> fin des envois WebSocket/FCM) de la diffusion des commandes aux chauffeurs'
+)
+@api_view(['GET'])
+@permission_classes([IsStaffOrDebug])
+def debug_order_dispatch(request):
+    """Debug : Métriques de diffusion des nouvelles commandes"""
+    metrics = get_order_dispatcher().get_metrics()
+    if metrics['last_dispatch_at']:
+        metrics['last_dispatch_at'] = metrics['last_dispatch_at'].isoformat()
+    
+    return Response({
+        'success': True,
+        'metrics': metrics,
+        'message': f"{metrics['dispatched']} commande(s) diffusée(s), p95 {metrics['latency_ms']['p95']} ms"
+    })
+
+
 # ============= HELPER FUNCTIONS FOR GPS BROADCASTING =============
 
 def _start_driver_location_broadcasting(driver_id):
@@ -2099,10 +2076,10 @@ def calculate_realtime_eta(request, order_id):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Récupérer les positions actuelles
-        driver_status = DriverStatus.objects.filter(driver=order.driver).first()
+        driver_position = DriverLocationService().get_current_position(order.driver_id)
         customer_status = CustomerStatus.objects.filter(customer=order.customer).first()
         
-        if not driver_status or not driver_status.current_latitude:
+        if not driver_position:
             return Response({
                 'error': 'Position du chauffeur non disponible'
             }, status=status.HTTP_400_BAD_REQUEST)
@@ -2124,8 +2101,8 @@ def calculate_realtime_eta(request, order_id):
         # Calculer la distance directe
         order_service = OrderService()
         distance_km = order_service.calculate_real_distance(
-            float(driver_status.current_latitude),
-            float(driver_status.current_longitude),
+            driver_position['latitude'],
+            driver_position['longitude'],
             float(destination_lat),
             float(destination_lng)
         )
@@ -2141,9 +2118,9 @@ def calculate_realtime_eta(request, order_id):
         
         # Préparer les données de réponse
         driver_location = {
-            'latitude': float(driver_status.current_latitude),
-            'longitude': float(driver_status.current_longitude),
-            'last_update': driver_status.last_location_update.isoformat() if driver_status.last_location_update else None
+            'latitude': driver_position['latitude'],
+            'longitude': driver_position['longitude'],
+            'last_update': driver_position['last_update'].isoformat() if driver_position['last_update'] else None
         }
         
         customer_location = None
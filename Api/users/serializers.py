@@ -112,7 +112,7 @@ class RegisterDriverSerializer(serializers.Serializer):
         from django.contrib.contenttypes.models import ContentType
         from authentication.models import ReferralCode
         from wallet.models import Wallet
-        from core.models import GeneralConfig
+        from core.config_registry import get_config_registry
 
         # Remove confirm_password and otp_code before creating user
         validated_data.pop('confirm_password', None)
@@ -153,14 +153,7 @@ class RegisterDriverSerializer(serializers.Serializer):
                 )
 
                 # Get referral bonus from config (default 1000 FCFA)
-                try:
-                    config = GeneralConfig.objects.get(
-                        search_key='referral_bonus',
-                        active=True
-                    )
-                    referral_bonus = config.get_numeric_value() or 1000.0
-                except GeneralConfig.DoesNotExist:
-                    referral_bonus = 1000.0  # Valeur par défaut
+                referral_bonus = get_config_registry().get_numeric('referral_bonus', 1000.0)
 
                 # Get referrer user via GenericForeignKey
                 referrer_user = referrer_code.user_type.get_object_for_this_type(
@@ -181,20 +174,15 @@ class RegisterDriverSerializer(serializers.Serializer):
                 referrer_code.used_count += 1
                 referrer_code.save()
 
-                # Send notification to referrer (async to not block registration)
+                # Notify referrer (push delivered by the notification outbox workers)
                 from notifications.services.notification_service import NotificationService
-                import threading
 
-                def send_referral_notification():
-                    NotificationService.send_referral_bonus_notification(
-                        referrer_user=referrer_user,
-                        referred_user=driver,
-                        referral_code=referral_code,
-                        bonus_amount=referral_bonus
-                    )
-
-                thread = threading.Thread(target=send_referral_notification)
-                thread.start()
+                NotificationService.send_referral_bonus_notification(
+                    referrer_user=referrer_user,
+                    referred_user=driver,
+                    referral_code=referral_code,
+                    bonus_amount=referral_bonus
+                )
 
             except ReferralCode.DoesNotExist:
                 # Invalid referral code, silently ignore
@@ -267,7 +255,7 @@ class RegisterCustomerSerializer(serializers.Serializer):
         from django.contrib.contenttypes.models import ContentType
         from authentication.models import ReferralCode
         from wallet.models import Wallet
-        from core.models import GeneralConfig
+        from core.config_registry import get_config_registry
 
         # Remove confirm_password and otp_code before creating user
         validated_data.pop('confirm_password', None)
@@ -307,14 +295,7 @@ class RegisterCustomerSerializer(serializers.Serializer):
                 )
 
                 # Get referral bonus from config (default 1000 FCFA)
-                try:
-                    config = GeneralConfig.objects.get(
-                        search_key='referral_bonus',
-                        active=True
-                    )
-                    referral_bonus = config.get_numeric_value() or 1000.0
-                except GeneralConfig.DoesNotExist:
-                    referral_bonus = 1000.0
+                referral_bonus = get_config_registry().get_numeric('referral_bonus', 1000.0)
 
                 # Get referrer user via GenericForeignKey
                 referrer_user = referrer_code.user_type.get_object_for_this_type(
@@ -335,20 +316,15 @@ class RegisterCustomerSerializer(serializers.Serializer):
                 referrer_code.used_count += 1
                 referrer_code.save()
 
-                # Send notification to referrer (async)
+                # Notify referrer (push delivered by the notification outbox workers)
                 from notifications.services.notification_service import NotificationService
-                import threading
-
-                def send_referral_notification():
-                    NotificationService.send_referral_bonus_notification(
-                        referrer_user=referrer_user,
-                        referred_user=customer,
-                        referral_code=referral_code,
-                        bonus_amount=referral_bonus
-                    )
 
-                thread = threading.Thread(target=send_referral_notification)
-                thread.start()
+                NotificationService.send_referral_bonus_notification(
+                    referrer_user=referrer_user,
+                    referred_user=customer,
+                    referral_code=referral_code,
+                    bonus_amount=referral_bonus
+                )
 
             except ReferralCode.DoesNotExist:
                 pass
@@ -365,6 +341,7 @@ class UserDriverDetailSerializer(serializers.ModelSerializer):
     profile_picture_url = serializers.SerializerMethodField()
     vehicles_count = serializers.SerializerMethodField()
     documents_count = serializers.SerializerMethodField()
+    rating = serializers.SerializerMethodField()
 
     class Meta:
         model = UserDriver
@@ -372,12 +349,12 @@ class UserDriverDetailSerializer(serializers.ModelSerializer):
             'id', 'phone_number', 'name', 'surname', 'gender', 'age',
             'birthday', 'profile_picture', 'profile_picture_url',
             'is_partenaire_interne', 'is_partenaire_externe',
-            'vehicles_count', 'documents_count',
+            'vehicles_count', 'documents_count', 'rating',
             'created_at', 'updated_at', 'is_active'
         ]
         read_only_fields = [
             'id', 'created_at', 'updated_at', 'vehicles_count',
-            'documents_count', 'profile_picture_url'
+            'documents_count', 'profile_picture_url', 'rating'
         ]
 
     @extend_schema_field(serializers.CharField(allow_null=True))
@@ -395,6 +372,16 @@ class UserDriverDetailSerializer(serializers.ModelSerializer):
         user_content_type = ContentType.objects.get_for_model(obj)
         return Document.objects.filter(user_id=obj.id, user_type=user_content_type).count()
 
+    @extend_schema_field(serializers.DictField)
+    def get_rating(self, obj) -> dict:
+        # Lecture du résumé dénormalisé (pas d'agrégat sur la table des notations)
+        from order.models import DriverRatingSummary
+        try:
+            summary = obj.rating_summary
+        except DriverRatingSummary.DoesNotExist:
+            summary = DriverRatingSummary(driver=obj)
+        return summary.to_dict()
+
 
 class UserCustomerDetailSerializer(serializers.ModelSerializer):
     """Serializer détaillé pour UserCustomer"""
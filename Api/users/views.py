@@ -413,7 +413,7 @@ class AllDriversView(APIView):
         Récupérer tous les chauffeurs avec filtres optionnels
         """
         # Base queryset
-        drivers = UserDriver.objects.all()
+        drivers = UserDriver.objects.select_related('rating_summary')
         
         # Filtres
         is_active = request.query_params.get('is_active')
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
+from order.pricing_snapshot import invalidate_pricing_snapshot
 from .models import Vehicle, VehicleType, VehicleBrand, VehicleModel, VehicleColor
 
 @admin.register(VehicleType)
@@ -35,10 +36,12 @@ class VehicleTypeAdmin(admin.ModelAdmin):
     
     def activate(self, request, queryset):
         queryset.update(is_active=True)
+        invalidate_pricing_snapshot()
     activate.short_description = "Activer les types sélectionnés"
     
     def deactivate(self, request, queryset):
         queryset.update(is_active=False)
+        invalidate_pricing_snapshot()
     deactivate.short_description = "Désactiver les types sélectionnés"
 
 @admin.register(VehicleBrand)
@@ -538,27 +538,11 @@ class WalletConfigView(APIView):
             if auth_error:
                 return auth_error
 
-            from core.models import GeneralConfig
+            from core.config_registry import get_config_registry
 
-            # Récupérer MIN_RECHARGE_AMOUNT
-            try:
-                min_recharge_config = GeneralConfig.objects.get(
-                    search_key='MIN_RECHARGE_AMOUNT',
-                    active=True
-                )
-                min_recharge = min_recharge_config.get_numeric_value() or 50.0
-            except GeneralConfig.DoesNotExist:
-                min_recharge = 50.0
-
-            # Récupérer MIN_RETRAIT_AMOUNT
-            try:
-                min_retrait_config = GeneralConfig.objects.get(
-                    search_key='MIN_RETRAIT_AMOUNT',
-                    active=True
-                )
-                min_retrait = min_retrait_config.get_numeric_value() or 50.0
-            except GeneralConfig.DoesNotExist:
-                min_retrait = 50.0
+            config_registry = get_config_registry()
+            min_recharge = config_registry.get_numeric('MIN_RECHARGE_AMOUNT', 50.0)
+            min_retrait = config_registry.get_numeric('MIN_RETRAIT_AMOUNT', 50.0)
 
             return Response({
                 'success': True,